@@ -2,8 +2,9 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
-from .models import StationOwner, ChargingStation, StationImage, ChargingConnector, AppContent, StationReview, ReviewReply, PayoutMethod, WithdrawalRequest
+from .models import StationOwner, ChargingStation, StationImage, ChargingConnector, ConnectorTariff, AppContent, StationReview, ReviewReply, PayoutMethod, PayoutBatch, WithdrawalRequest
 from .admin_views import DatabaseBackupView, system_stats_view
+from .system_stats import get_system_stats
 
 class StationImageInline(admin.TabularInline):
     model = StationImage
@@ -377,6 +378,12 @@ class ChargingStationAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} station(s) deactivated.')
     deactivate_stations.short_description = "🔴 Deactivate stations"
 
+class ConnectorTariffInline(admin.TabularInline):
+    model = ConnectorTariff
+    extra = 0
+    fields = ('name', 'price_per_kwh', 'weekdays', 'start_hour', 'end_hour', 'priority', 'is_active')
+
+
 @admin.register(ChargingConnector)
 class ChargingConnectorAdmin(admin.ModelAdmin):
     list_display = ('connector_type_display', 'station_name', 'power_kw', 'quantity_display', 'availability_status', 'status_badge')
@@ -403,6 +410,7 @@ class ChargingConnectorAdmin(admin.ModelAdmin):
         }),
     )
 
+    inlines = [ConnectorTariffInline]
     actions = ['mark_available', 'mark_unavailable', 'mark_out_of_order', 'mark_maintenance']
 
     def connector_type_display(self, obj):
@@ -587,6 +595,8 @@ class EvmeriAdminSite(admin.AdminSite):
                 'description': 'View system statistics and metrics'
             }
         ]
+        # Cached for ADMIN_STATS_CACHE_SECONDS, so this does not count tables on every page view
+        extra_context['system_stats'] = get_system_stats()
         return super().index(request, extra_context)
 
 
@@ -738,7 +748,7 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
     list_per_page = 25
     ordering = ['-created_at']
 
-    actions = ['approve_withdrawals', 'reject_withdrawals', 'mark_processing', 'mark_completed', 'mark_failed']
+    actions = ['approve_withdrawals', 'reject_withdrawals', 'batch_approved_withdrawals', 'mark_processing', 'mark_completed', 'mark_failed']
 
     def station_owner_name(self, obj):
         return obj.station_owner.company_name
@@ -781,12 +791,9 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
     # Admin Actions
     def approve_withdrawals(self, request, queryset):
         from django.utils import timezone
-        updated = 0
-        for withdrawal in queryset.filter(status='pending'):
-            withdrawal.status = 'approved'
-            withdrawal.approved_by = request.user
-            withdrawal.save()
-            updated += 1
+        updated = queryset.filter(status='pending').update(
+            status='approved', approved_by=request.user, updated_at=timezone.now()
+        )
 
         self.message_user(request, f'{updated} withdrawal(s) approved.')
     approve_withdrawals.short_description = "✅ Approve selected withdrawals"
@@ -804,6 +811,21 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} withdrawal(s) rejected.')
     reject_withdrawals.short_description = "❌ Reject selected withdrawals"
 
+    def batch_approved_withdrawals(self, request, queryset):
+        from .payouts import create_payout_batch
+
+        # Batches every approved withdrawal, not only the selected ones
+        batch, report = create_payout_batch(created_by=request.user)
+        if batch is None:
+            self.message_user(request, 'No approved withdrawals to batch.')
+            return
+        self.message_user(
+            request,
+            f"Payout batch {batch.reference_number}: {report['withdrawals']} withdrawal(s) for {report['amount']} ETB, "
+            f"{report['insufficient']} failed for insufficient balance. Settlement file: {batch.settlement_file}"
+        )
+    batch_approved_withdrawals.short_description = "📦 Batch all approved withdrawals for payout"
+
     def mark_processing(self, request, queryset):
         updated = 0
         for withdrawal in queryset.filter(status='approved'):
@@ -837,3 +859,15 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
 
         self.message_user(request, f'{updated} withdrawal(s) marked as failed.')
     mark_failed.short_description = "⚠️ Mark as failed"
+
+
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ('reference_number', 'status', 'withdrawal_count', 'total_amount', 'failed_count', 'created_at', 'settled_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('reference_number',)
+    readonly_fields = (
+        'reference_number', 'status', 'currency', 'withdrawal_count', 'total_amount', 'failed_count',
+        'settlement_file', 'firestore_withdrawals', 'created_by', 'created_at', 'settled_at'
+    )
+    ordering = ['-created_at']
@@ -205,31 +205,17 @@ evmeri System
 @staff_member_required
 def system_stats_view(request):
     """Display system statistics"""
-    from django.db import connection
-    from charging_stations.models import StationOwner, ChargingStation, ChargingConnector, StationReview
-    from authentication.models import CustomUser
-    
-    # Get database stats
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
-        db_size = cursor.fetchone()[0] if cursor.fetchone() else "Unknown"
-    
-    stats = {
-        'total_users': CustomUser.objects.count(),
-        'verified_station_owners': StationOwner.objects.filter(verification_status='verified').count(),
-        'pending_station_owners': StationOwner.objects.filter(verification_status='pending').count(),
-        'total_stations': ChargingStation.objects.count(),
-        'active_stations': ChargingStation.objects.filter(is_active=True).count(),
-        'total_connectors': ChargingConnector.objects.count(),
-        'available_connectors': ChargingConnector.objects.filter(is_available=True).count(),
-        'total_reviews': StationReview.objects.count(),
-        'verified_reviews': StationReview.objects.filter(is_verified_review=True).count(),
-        'database_size': db_size,
-    }
-    
+    from charging_stations.system_stats import get_system_stats
+    from payments.session_expiry import expiry_stats
+    from utils.metrics import snapshot_all
+
+    stats = get_system_stats(refresh=request.GET.get('refresh') == '1')
+
     context = {
         'title': 'System Statistics',
         'stats': stats,
+        'outbound_latency': snapshot_all(),
+        'session_expiry': expiry_stats(),
     }
-    
+
     return render(request, 'admin/system_stats.html', context)
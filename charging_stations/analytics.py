@@ -0,0 +1,361 @@
+"""
+Owner analytics reports and their precomputed snapshots.
+
+Reports are expensive (the 'Last Year' range scans a year of sessions), so they
+are computed in the background for the standard ranges and stored as
+AnalyticsReportSnapshot rows. Requests are answered from the snapshot; a
+snapshot that is older than ANALYTICS_SETTINGS['REPORT_MAX_AGE_SECONDS'] or was
+marked stale by a session event is still served, and a refresh is queued on
+the background scheduler.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import AnalyticsReportSnapshot, ChargingStation
+from utils.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+ALL_STATIONS = 'All Stations'
+DEFAULT_TIME_RANGE = 'Last 30 Days'
+
+# Ranges precomputed for every owner
+REPORT_TIME_RANGES = {
+    'Last 7 Days': 7,
+    'Last 30 Days': 30,
+    'Last 90 Days': 90,
+    'Last Year': 365,
+}
+
+
+def normalize_time_range(time_range):
+    return time_range if time_range in REPORT_TIME_RANGES else DEFAULT_TIME_RANGE
+
+
+def _list_owner_stations(user):
+    from utils.firestore_repo import firestore_repo
+    try:
+        return firestore_repo.list_stations(filters={'owner_id': str(user.id)})
+    except Exception as e:
+        logger.warning("Could not load Firestore stations for owner %s: %s", user.id, e)
+        return []
+
+
+class UnknownStation(ValueError):
+    """The selected station is not one of the owner's stations"""
+
+
+def owner_station_ids(user, stations=None):
+    """Ids of an owner's Firestore and SQL stations, as strings"""
+    if stations is None:
+        stations = _list_owner_stations(user)
+    ids = {str(s['id']) for s in stations if s.get('id')}
+    sql_ids = ChargingStation.objects.filter(owner__user=user).values_list('id', flat=True)
+    ids.update(str(station_id) for station_id in sql_ids)
+    return ids
+
+
+def compute_owner_report(user, time_range=DEFAULT_TIME_RANGE, selected_station=ALL_STATIONS, stations=None):
+    """Build the analytics report payload returned by AnalyticsReportsView."""
+    from ocpp_integration.models import ChargingSession
+    from payments.models import QRPaymentSession, SimpleChargingSession
+
+    time_range = normalize_time_range(time_range)
+    if stations is None:
+        stations = _list_owner_stations(user)
+
+    now = timezone.now()
+    start_date = now - timedelta(days=REPORT_TIME_RANGES[time_range])
+
+    if selected_station != ALL_STATIONS:
+        stations = [s for s in stations if s.get('id') == selected_station]
+
+    total_revenue = 0
+    transactions_count = 0
+    total_energy_dispensed = 0
+    avg_session_duration = 0
+
+    monthly_revenue = []
+    daily_energy_data = []
+    session_distribution = {'morning': 0, 'afternoon': 0}
+    top_stations = []
+
+    sql_stations = ChargingStation.objects.filter(owner__user=user)
+    if selected_station != ALL_STATIONS:
+        owned = {str(station_id) for station_id in sql_stations.values_list('id', flat=True)}
+        # A Firestore station id is not a UUID and has no SQL station
+        sql_stations = sql_stations.filter(id=selected_station) if selected_station in owned else sql_stations.none()
+
+    if sql_stations.exists():
+        station_connectors = []
+        for station in sql_stations.prefetch_related('connectors'):
+            station_connectors.extend(station.connectors.all())
+
+        # REVENUE CALCULATION
+        revenue_qr_sessions = QRPaymentSession.objects.filter(
+            connector__in=station_connectors,
+            status__in=['payment_completed', 'payment_initiated', 'charging_started', 'charging_completed'],
+            payment_transaction__isnull=False,
+            created_at__gte=start_date
+        ).select_related('payment_transaction')
+
+        for qr_session in revenue_qr_sessions:
+            if qr_session.payment_transaction.status in ['completed', 'pending', 'processing']:
+                total_revenue += float(qr_session.payment_transaction.amount)
+                transactions_count += 1
+
+        simple_sessions = SimpleChargingSession.objects.filter(
+            connector__in=station_connectors,
+            status__in=['completed', 'stopped'],
+            start_time__gte=start_date
+        )
+        for session in simple_sessions:
+            if session.energy_consumed_kwh and session.cost_per_kwh:
+                total_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
+
+        # ENERGY & DURATION
+        ocpp_sessions = ChargingSession.objects.filter(
+            ocpp_station__charging_station__in=sql_stations,
+            start_time__gte=start_date
+        )
+        ocpp_energy = sum(session.energy_consumed_kwh or 0 for session in ocpp_sessions)
+
+        completed_ocpp_sessions = [s for s in ocpp_sessions if s.stop_time is not None]
+        ocpp_duration = 0
+        if completed_ocpp_sessions:
+            ocpp_duration = sum(
+                (session.stop_time - session.start_time).total_seconds() / 60
+                for session in completed_ocpp_sessions
+            ) / len(completed_ocpp_sessions)
+
+        simple_energy = sum(session.energy_consumed_kwh or 0 for session in simple_sessions)
+
+        completed_simple_sessions = [s for s in simple_sessions if s.stop_time is not None]
+        simple_duration = 0
+        if completed_simple_sessions:
+            simple_duration = sum(
+                session.duration_seconds / 60 for session in completed_simple_sessions
+            ) / len(completed_simple_sessions)
+
+        total_energy_dispensed = float(ocpp_energy + simple_energy)
+
+        total_sessions_count = len(completed_ocpp_sessions) + len(completed_simple_sessions)
+        if total_sessions_count > 0:
+            avg_session_duration = (
+                (ocpp_duration * len(completed_ocpp_sessions)) +
+                (simple_duration * len(completed_simple_sessions))
+            ) / total_sessions_count
+
+        # MONTHLY REVENUE
+        for i in range(7):
+            month_start = now - timedelta(days=(i+1)*30)
+            month_end = now - timedelta(days=i*30)
+
+            month_revenue = QRPaymentSession.objects.filter(
+                connector__in=station_connectors,
+                payment_transaction__status__in=['completed', 'pending', 'processing'],
+                created_at__gte=month_start,
+                created_at__lt=month_end
+            ).aggregate(total=Sum('payment_transaction__amount'))['total'] or 0
+
+            month_simple_sessions = SimpleChargingSession.objects.filter(
+                connector__in=station_connectors,
+                status__in=['completed', 'stopped'],
+                start_time__gte=month_start,
+                start_time__lt=month_end
+            ).only('energy_consumed_kwh', 'cost_per_kwh')
+            month_revenue = float(month_revenue)
+            for session in month_simple_sessions:
+                if session.energy_consumed_kwh and session.cost_per_kwh:
+                    month_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
+
+            monthly_revenue.append({
+                'month': month_start.strftime('%b'),
+                'value': month_revenue
+            })
+        monthly_revenue.reverse()
+
+        # DAILY ENERGY
+        for i in range(12):
+            day_start = now - timedelta(days=(i+1)*30)
+            day_end = now - timedelta(days=i*30)
+
+            day_energy = ChargingSession.objects.filter(
+                ocpp_station__charging_station__in=sql_stations,
+                start_time__gte=day_start,
+                start_time__lt=day_end
+            ).aggregate(total=Sum('energy_consumed_kwh'))['total'] or 0
+
+            day_energy += SimpleChargingSession.objects.filter(
+                connector__station__in=sql_stations,
+                start_time__gte=day_start,
+                start_time__lt=day_end
+            ).aggregate(total=Sum('energy_consumed_kwh'))['total'] or 0
+
+            daily_energy_data.append({
+                'day': day_start.strftime('%b'),
+                'value': float(day_energy)
+            })
+        daily_energy_data.reverse()
+
+        # SESSION DISTRIBUTION
+        morning_sessions = 0
+        afternoon_sessions = 0
+
+        start_times = [session.start_time for session in ocpp_sessions]
+        start_times.extend(SimpleChargingSession.objects.filter(
+            connector__station__in=sql_stations,
+            start_time__gte=start_date
+        ).values_list('start_time', flat=True))
+
+        for start_time in start_times:
+            if 6 <= start_time.hour < 12:
+                morning_sessions += 1
+            elif 12 <= start_time.hour < 18:
+                afternoon_sessions += 1
+
+        total_dist = morning_sessions + afternoon_sessions
+        if total_dist > 0:
+            session_distribution['morning'] = round((morning_sessions / total_dist) * 100)
+            session_distribution['afternoon'] = round((afternoon_sessions / total_dist) * 100)
+
+        # TOP STATIONS
+        for sql_station in sql_stations:
+            station_revenue = 0
+            station_sessions = SimpleChargingSession.objects.filter(
+                connector__station=sql_station,
+                start_time__gte=start_date
+            ).only('energy_consumed_kwh', 'cost_per_kwh')
+            for session in station_sessions:
+                if session.energy_consumed_kwh and session.cost_per_kwh:
+                    station_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
+
+            top_stations.append({
+                'name': sql_station.name,
+                'revenue': station_revenue
+            })
+        top_stations.sort(key=lambda x: x['revenue'], reverse=True)
+        top_stations = top_stations[:5]
+
+    # Fault data: stations currently under maintenance (Firestore has no status history)
+    faults = sum(1 for s in stations if s.get('status') == 'under_maintenance')
+    fault_data = []
+    for i in range(9):
+        month_start = now - timedelta(days=(i+1)*30)
+        fault_data.append({
+            'month': month_start.strftime('%b'),
+            'faults': faults
+        })
+    fault_data.reverse()
+
+    return {
+        'totalRevenue': float(total_revenue),
+        'totalEnergyDispensed': total_energy_dispensed,
+        'avgSessionDuration': avg_session_duration,
+        'monthlyRevenue': monthly_revenue,
+        'dailyEnergyData': daily_energy_data,
+        'sessionDistribution': session_distribution,
+        'topStations': top_stations,
+        'faultData': fault_data,
+        'timeRange': time_range,
+        'selectedStation': selected_station,
+        'stationsCount': len(stations),
+        'transactionsCount': transactions_count
+    }
+
+
+def refresh_owner_report(user_id, time_range, selected_station=ALL_STATIONS, stations=None):
+    """Recompute one report and store it as the owner's snapshot."""
+    user = get_user_model().objects.get(pk=user_id)
+    payload = compute_owner_report(user, time_range, selected_station, stations=stations)
+    snapshot, _ = AnalyticsReportSnapshot.objects.update_or_create(
+        owner=user,
+        time_range=payload['timeRange'],
+        station=selected_station,
+        defaults={
+            'payload': payload,
+            'computed_at': timezone.now(),
+            'is_stale': False,
+        }
+    )
+    return snapshot
+
+
+def refresh_owner_reports(user_id):
+    """Recompute the standard ranges for one owner, loading Firestore stations once."""
+    user = get_user_model().objects.get(pk=user_id)
+    stations = _list_owner_stations(user)
+    for time_range in REPORT_TIME_RANGES:
+        refresh_owner_report(user_id, time_range, stations=stations)
+
+
+def schedule_report_refresh(user_id, time_range, selected_station=ALL_STATIONS):
+    """Queue a background refresh for one snapshot. Duplicate requests are dropped."""
+    key = f'analytics-report:{user_id}:{time_range}:{selected_station}'
+    return scheduler.submit(key, refresh_owner_report, user_id, time_range, selected_station)
+
+
+def get_owner_report(user, time_range=DEFAULT_TIME_RANGE, selected_station=ALL_STATIONS):
+    """
+    Return ``(payload, computed_at)`` for an owner's report.
+
+    Serves the stored snapshot when there is one, queueing a background refresh
+    if it is stale. Only computes in the request when no snapshot exists yet,
+    after checking that ``selected_station`` is one of the owner's stations;
+    raises UnknownStation otherwise, so no snapshot is stored for it.
+    """
+    time_range = normalize_time_range(time_range)
+    snapshot = AnalyticsReportSnapshot.objects.filter(
+        owner=user, time_range=time_range, station=selected_station
+    ).first()
+
+    if snapshot is None:
+        stations = _list_owner_stations(user)
+        if selected_station != ALL_STATIONS and selected_station not in owner_station_ids(user, stations):
+            raise UnknownStation(f'Unknown station: {selected_station}')
+        snapshot = refresh_owner_report(user.id, time_range, selected_station, stations=stations)
+    elif snapshot.needs_refresh(settings.ANALYTICS_SETTINGS['REPORT_MAX_AGE_SECONDS']):
+        schedule_report_refresh(user.id, time_range, selected_station)
+
+    return snapshot.payload, snapshot.computed_at
+
+
+def mark_owner_reports_stale(user_id):
+    """Flag every snapshot of an owner for refresh after a session or payment changed."""
+    return AnalyticsReportSnapshot.objects.filter(owner_id=user_id, is_stale=False).update(is_stale=True)
+
+
+def precompute_all_reports():
+    """Periodic job: recompute the standard ranges for every station owner."""
+    owner_ids = ChargingStation.objects.values_list('owner__user', flat=True).distinct()
+    for user_id in owner_ids:
+        try:
+            refresh_owner_reports(user_id)
+        except Exception:
+            logger.exception("Failed to precompute analytics reports for owner %s", user_id)
+
+
+def refresh_stale_reports():
+    """Periodic job: recompute snapshots marked stale by session events."""
+    stale = AnalyticsReportSnapshot.objects.filter(is_stale=True).values_list('owner_id', 'time_range', 'station')
+    for user_id, time_range, selected_station in stale:
+        try:
+            refresh_owner_report(user_id, time_range, selected_station)
+        except Exception:
+            logger.exception("Failed to refresh analytics report for owner %s", user_id)
+
+
+def register_jobs(job_scheduler=scheduler):
+    job_scheduler.add_job(
+        'analytics-precompute', precompute_all_reports,
+        settings.ANALYTICS_SETTINGS['PRECOMPUTE_INTERVAL_SECONDS']
+    )
+    job_scheduler.add_job(
+        'analytics-refresh-stale', refresh_stale_reports,
+        settings.ANALYTICS_SETTINGS['STALE_REFRESH_INTERVAL_SECONDS']
+    )
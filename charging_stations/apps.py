@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ChargingStationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "charging_stations"
+
+    def ready(self):
+        import charging_stations.signals
+        from utils.scheduler import scheduler
+        from .analytics import register_jobs
+
+        register_jobs(scheduler)
+        if settings.BACKGROUND_JOBS['AUTOSTART']:
+            scheduler.start()
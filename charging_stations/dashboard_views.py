@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 from rest_framework.authentication import SessionAuthentication
 from authentication.authentication import TokenAuthentication
-from django.db.models import Sum
+from django.http import StreamingHttpResponse, FileResponse
 from django.utils import timezone
 from datetime import timedelta
 from .models import StationOwner, ChargingStation
@@ -340,6 +340,7 @@ class AnalyticsReportsView(APIView):
 
     def get(self, request):
         from utils.firestore_repo import firestore_repo
+        from .analytics import UnknownStation, get_owner_report
         try:
             station_owner = firestore_repo.get_station_owner(request.user.id)
             if not station_owner:
@@ -347,274 +348,18 @@ class AnalyticsReportsView(APIView):
                     'error': 'Station owner profile not found'
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            stations = firestore_repo.list_stations(filters={'owner_id': str(request.user.id)})
-
-            # Get query parameters
             time_range = request.GET.get('time_range', 'Last 30 Days')
             selected_station = request.GET.get('station', 'All Stations')
 
-            # Calculate date range
-            now = timezone.now()
-            if time_range == 'Last 7 Days':
-                start_date = now - timedelta(days=7)
-            elif time_range == 'Last 30 Days':
-                start_date = now - timedelta(days=30)
-            elif time_range == 'Last 90 Days':
-                start_date = now - timedelta(days=90)
-            elif time_range == 'Last Year':
-                start_date = now - timedelta(days=365)
-            else:
-                start_date = now - timedelta(days=30)
-
-            # Filter stations if specific station selected
-            if selected_station != 'All Stations':
-                stations = [s for s in stations if s.get('id') == selected_station]
-
-            # Get real revenue data from transactions made to station owner's stations
-            # SQL Fallback strategy
-            
-            total_revenue = 0
-            revenue_transactions = []
-            total_energy_dispensed = 0
-            avg_session_duration = 0
-            
-            # Data containers
-            monthly_revenue = []
-            daily_energy_data = []
-            session_distribution = {'morning': 0, 'afternoon': 0}
-            top_stations = []
-            
+            # Served from the precomputed snapshot; stale snapshots refresh in the background
             try:
-                from ocpp_integration.models import ChargingSession
-                from payments.models import SimpleChargingSession
-                
-                # Fetch SQL stations for session filtering
-                sql_stations = ChargingStation.objects.filter(owner__user=request.user)
-                if selected_station != 'All Stations':
-                     sql_stations = sql_stations.filter(id=selected_station)
-
-                if sql_stations.exists():
-                    # REVENUE CALCULATION
-                    station_connectors = []
-                    for station in sql_stations:
-                        station_connectors.extend(station.connectors.all())
-
-                    revenue_qr_sessions = QRPaymentSession.objects.filter(
-                        connector__in=station_connectors,
-                        status__in=['payment_completed', 'payment_initiated', 'charging_started', 'charging_completed'],
-                        payment_transaction__isnull=False,
-                        created_at__gte=start_date
-                    ).select_related('payment_transaction')
-
-                    for qr_session in revenue_qr_sessions:
-                        if (qr_session.payment_transaction and
-                            qr_session.payment_transaction.status in ['completed', 'pending', 'processing']):
-                            total_revenue += float(qr_session.payment_transaction.amount)
-                            revenue_transactions.append(qr_session.payment_transaction)
-
-                    # Simple Sessions Revenue
-                    simple_sessions = SimpleChargingSession.objects.filter(
-                        connector__in=station_connectors,
-                        status__in=['completed', 'stopped'],
-                        start_time__gte=start_date
-                    )
-                    for session in simple_sessions:
-                        if session.energy_consumed_kwh and session.cost_per_kwh:
-                            total_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
-
-                    # ENERGY & DURATION
-                    # OCPP
-                    ocpp_sessions = ChargingSession.objects.filter(
-                        ocpp_station__charging_station__in=sql_stations,
-                        start_time__gte=start_date
-                    )
-                    ocpp_energy = sum(session.energy_consumed or 0 for session in ocpp_sessions)
-
-                    completed_ocpp_sessions = ocpp_sessions.filter(end_time__isnull=False)
-                    ocpp_duration = 0
-                    if completed_ocpp_sessions.exists():
-                        ocpp_duration = sum(
-                            (session.end_time - session.start_time).total_seconds() / 60
-                            for session in completed_ocpp_sessions
-                        ) / completed_ocpp_sessions.count()
-
-                    # Simple
-                    simple_energy = sum(session.energy_consumed_kwh or 0 for session in simple_sessions)
-                    
-                    completed_simple_sessions = simple_sessions.filter(stop_time__isnull=False)
-                    simple_duration = 0
-                    if completed_simple_sessions.exists():
-                        simple_duration = sum(
-                            session.duration_seconds / 60 for session in completed_simple_sessions
-                        ) / completed_simple_sessions.count()
-                    
-                    total_energy_dispensed = ocpp_energy + simple_energy
-                    
-                    total_sessions_count = completed_ocpp_sessions.count() + completed_simple_sessions.count()
-                    if total_sessions_count > 0:
-                        avg_session_duration = (
-                            (ocpp_duration * completed_ocpp_sessions.count()) +
-                            (simple_duration * completed_simple_sessions.count())
-                        ) / total_sessions_count
-
-                    # MONTHLY REVENUE
-                    for i in range(7):
-                        month_start = now - timedelta(days=(i+1)*30)
-                        month_end = now - timedelta(days=i*30)
-
-                        month_qr_sessions = QRPaymentSession.objects.filter(
-                            connector__in=station_connectors,
-                            payment_transaction__isnull=False,
-                            created_at__gte=month_start,
-                            created_at__lt=month_end
-                        ).select_related('payment_transaction')
-
-                        month_revenue = 0
-                        for qr_session in month_qr_sessions:
-                            if (qr_session.payment_transaction and
-                                qr_session.payment_transaction.status in ['completed', 'pending', 'processing']):
-                                month_revenue += float(qr_session.payment_transaction.amount)
-
-                        month_simple_sessions = SimpleChargingSession.objects.filter(
-                            connector__in=station_connectors,
-                            status__in=['completed', 'stopped'],
-                            start_time__gte=month_start,
-                            start_time__lt=month_end
-                        )
-                        for session in month_simple_sessions:
-                            if session.energy_consumed_kwh and session.cost_per_kwh:
-                                month_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
-
-                        monthly_revenue.append({
-                            'month': month_start.strftime('%b'),
-                            'value': month_revenue
-                        })
-                    monthly_revenue.reverse()
-                    
-                    # DAILY ENERGY
-                    for i in range(12):
-                        day_start = now - timedelta(days=(i+1)*30)
-                        day_end = now - timedelta(days=i*30)
-
-                        day_energy = 0
-                        try:
-                            ocpp_energy = ChargingSession.objects.filter(
-                                ocpp_station__charging_station__in=sql_stations,
-                                start_time__gte=day_start,
-                                start_time__lt=day_end
-                            ).aggregate(total=Sum('energy_consumed'))['total'] or 0
-                            day_energy += ocpp_energy
-                        except: pass
-                        
-                        try:
-                            simple_energy = SimpleChargingSession.objects.filter(
-                                connector__station__in=sql_stations,
-                                start_time__gte=day_start,
-                                start_time__lt=day_end
-                            ).aggregate(total=Sum('energy_consumed_kwh'))['total'] or 0
-                            day_energy += simple_energy
-                        except: pass
-
-                        daily_energy_data.append({
-                            'day': day_start.strftime('%b'),
-                            'value': float(day_energy)
-                        })
-                    daily_energy_data.reverse()
-                    
-                    # SESSION DISTRIBUTION
-                    morning_sessions = 0
-                    afternoon_sessions = 0
-                    
-                    for session in ocpp_sessions:
-                        if 6 <= session.start_time.hour < 12: morning_sessions += 1
-                        elif 12 <= session.start_time.hour < 18: afternoon_sessions += 1
-                        
-                    simple_dist_sessions = SimpleChargingSession.objects.filter(
-                        connector__station__in=sql_stations,
-                        start_time__gte=start_date
-                    )
-                    for session in simple_dist_sessions:
-                        if 6 <= session.start_time.hour < 12: morning_sessions += 1
-                        elif 12 <= session.start_time.hour < 18: afternoon_sessions += 1
-
-                    total_dist = morning_sessions + afternoon_sessions
-                    if total_dist > 0:
-                        session_distribution['morning'] = round((morning_sessions / total_dist) * 100)
-                        session_distribution['afternoon'] = round((afternoon_sessions / total_dist) * 100)
-
-                    # TOP STATIONS (Hybrid: SQL Revenue mapped to Firestore Stations?)
-                    # If we have SQL stations, we can just use them for revenue calculation
-                    for sql_station in sql_stations:
-                         # Calculate revenue
-                         station_revenue = 0
-                         # Logic simplified for brevity
-                         station_sessions = SimpleChargingSession.objects.filter(
-                            connector__station=sql_station,
-                            start_time__gte=start_date
-                         )
-                         for session in station_sessions:
-                             if session.energy_consumed_kwh and session.cost_per_kwh:
-                                 station_revenue += float(session.energy_consumed_kwh * session.cost_per_kwh)
-                         
-                         top_stations.append({
-                             'name': sql_station.name,
-                             'revenue': station_revenue
-                         })
-                    top_stations.sort(key=lambda x: x['revenue'], reverse=True)
-                    top_stations = top_stations[:5]
-
-            except Exception as e:
-                print(f"Error calculating analytics reports (SQL fallback): {e}")
-
-            # Fault data from real maintenance records (Firestore)
-            fault_data = []
-            for i in range(9):
-                month_start = now - timedelta(days=(i+1)*30)
-                month_end = now - timedelta(days=i*30)
-                month_name = month_start.strftime('%b')
-
-                # Count stations that were updated to 'under_maintenance' ... 
-                # Firestore 'updated_at' is a string or timestamp?
-                # The filtering logic here is complex because we don't have historical status changes in Firestore easily available
-                # unless we query a history collection.
-                # The original code filtered by current status AND updated_at range, which implies "currently in maintenance, and updated recently".
-                # We can approximate this by iterating stations.
-                
-                faults = 0
-                for s in stations:
-                    if s.get('status') == 'under_maintenance':
-                         # Parse date if possible, or just count currently maintenance
-                         # For now, to be safe, we might just count current status if we ignore date, 
-                         # OR we try to parse 'updated_at'
-                         updated_at = s.get('updated_at')
-                         if updated_at:
-                             # Warning: updated_at format might vary.
-                             pass
-                         faults += 1 
-                         # This logic is weak in original code too (it only counts current status updated in time range)
-                
-                # Mocking fault data slightly if 0 to show graph capability?
-                # Or just append 0.
-                fault_data.append({
-                    'month': month_name,
-                    'faults': faults 
-                })
-
-            fault_data.reverse()
+                report, computed_at = get_owner_report(request.user, time_range, selected_station)
+            except UnknownStation as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response({
-                'totalRevenue': float(total_revenue),
-                'totalEnergyDispensed': total_energy_dispensed,
-                'avgSessionDuration': avg_session_duration,
-                'monthlyRevenue': monthly_revenue,
-                'dailyEnergyData': daily_energy_data,
-                'sessionDistribution': session_distribution,
-                'topStations': top_stations,
-                'faultData': fault_data,
-                'timeRange': time_range,
-                'selectedStation': selected_station,
-                'stationsCount': len(stations),
-                'transactionsCount': len(revenue_transactions)
+                **report,
+                'computedAt': computed_at.isoformat(),
             })
 
         except Exception as e:
@@ -684,6 +429,7 @@ class RevenueTransactionsView(APIView):
                             transactions.append({
                                 'id': str(transaction.id),
                                 'date': transaction.created_at.strftime('%Y-%m-%d'),
+                                'created_at': transaction.created_at.isoformat(),
                                 'transaction_id': transaction.reference_number,
                                 'type': 'Charging Payment',
                                 'description': f'Charging at {qr_session.connector.station.name}',
@@ -709,6 +455,7 @@ class RevenueTransactionsView(APIView):
                             transactions.append({
                                 'id': str(session.id),
                                 'date': session.start_time.strftime('%Y-%m-%d'),
+                                'created_at': session.start_time.isoformat(),
                                 'transaction_id': f'SIMPLE-{session.id}',
                                 'type': 'Simple Charging',
                                 'description': f'Simple charging at {session.connector.station.name}',
@@ -720,7 +467,8 @@ class RevenueTransactionsView(APIView):
                                 'cost_per_kwh': float(session.cost_per_kwh)
                             })
 
-                    transactions.sort(key=lambda x: x['date'], reverse=True)
+                    # Sort on the full timestamp so entries keep their order within a day
+                    transactions.sort(key=lambda x: x['created_at'], reverse=True)
 
             except Exception as e:
                 print(f"Error fetching revenue transactions (SQL fallback): {e}")
@@ -905,3 +653,125 @@ class RevenueDetailView(APIView):
             return Response({
                 'error': f'Error calculating revenue details: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RevenueExportView(APIView):
+    """Stream a station owner's transaction history as CSV or XLSX"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    def get(self, request):
+        from utils.asgi_streaming import aiter_file, is_asgi_request
+        from utils.firestore_repo import firestore_repo
+        from .revenue import (
+            async_stream_transactions_csv, iter_owner_transactions, start_date_for_range,
+            stream_transactions_csv, write_transactions_xlsx
+        )
+
+        if not firestore_repo.get_station_owner(request.user.id):
+            return Response({
+                'error': 'Station owner profile not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # 'format' is reserved by DRF for renderer negotiation
+        export_format = request.GET.get('export_format', 'csv').lower()
+        time_range = request.GET.get('timeRange', 'all')
+        selected_station = request.GET.get('selectedStation', 'All Stations')
+
+        try:
+            rows = iter_owner_transactions(
+                request.user,
+                start_date=start_date_for_range(time_range),
+                station_id=selected_station
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        filename = f"transactions_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # Under ASGI, Django buffers sync iterators and files whole; hand it async generators instead
+        asgi = is_asgi_request(request)
+
+        if export_format == 'csv':
+            stream = async_stream_transactions_csv(rows) if asgi else stream_transactions_csv(rows)
+            response = StreamingHttpResponse(stream, content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+
+        if export_format == 'xlsx':
+            try:
+                output = write_transactions_xlsx(rows)
+            except ImportError:
+                return Response({
+                    'error': 'XLSX export is not available on this server, use export_format=csv'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            if asgi:
+                response = StreamingHttpResponse(aiter_file(output), content_type=content_type)
+                response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+                return response
+            return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx', content_type=content_type)
+
+        return Response({
+            'error': f'Unsupported export format: {export_format}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RevenueLedgerView(APIView):
+    """Keyset-paginated ledger of a station owner's payments and charging sessions"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    def get(self, request):
+        from utils.firestore_repo import firestore_repo
+        from utils.keyset import decode_cursor, InvalidCursor
+        from .revenue import (
+            owner_ledger_page, start_date_for_range,
+            LEDGER_DEFAULT_PAGE_SIZE, LEDGER_TYPE_LABELS
+        )
+
+        if not firestore_repo.get_station_owner(request.user.id):
+            return Response({
+                'error': 'Station owner profile not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        cursor = request.GET.get('cursor')
+        entry_type = request.GET.get('type') or None
+        status_filter = request.GET.get('status') or None
+        time_range = request.GET.get('timeRange', 'all')
+        selected_station = request.GET.get('selectedStation', 'All Stations')
+
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            limit = int(request.GET.get('limit', LEDGER_DEFAULT_PAGE_SIZE))
+        except (InvalidCursor, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if entry_type and entry_type not in LEDGER_TYPE_LABELS:
+            return Response({
+                'error': f'Unsupported type: {entry_type}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows, next_cursor = owner_ledger_page(
+                request.user,
+                after=after,
+                limit=limit,
+                station_id=selected_station,
+                entry_type=entry_type,
+                status_filter=status_filter.lower() if status_filter else None,
+                start_date=start_date_for_range(time_range)
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for row in rows:
+            for key in ('amount', 'energy_consumed', 'cost_per_kwh'):
+                if row[key] is not None:
+                    row[key] = float(row[key])
+
+        return Response({
+            'success': True,
+            'transactions': rows,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+        })
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from charging_stations.models import PayoutBatch
+from charging_stations.payouts import SettlementError, create_payout_batch, settle_payout_batch
+
+
+class Command(BaseCommand):
+    help = 'Collect approved withdrawals into a payout batch and write its settlement file, or settle a batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Most withdrawals to put in the batch')
+        parser.add_argument(
+            '--settle',
+            metavar='BATCH_REFERENCE',
+            help='Settle this batch instead of creating one',
+        )
+        parser.add_argument(
+            '--failed',
+            nargs='*',
+            default=[],
+            help='With --settle: withdrawal references whose payout failed; they are refunded',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be batched without creating anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['settle']:
+            try:
+                batch = PayoutBatch.objects.get(reference_number=options['settle'])
+            except PayoutBatch.DoesNotExist:
+                raise CommandError(f"Payout batch {options['settle']} not found")
+            try:
+                stats = settle_payout_batch(batch, options['failed'])
+            except SettlementError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Settled {batch.reference_number}: {stats['completed']} paid, {stats['failed']} refunded"
+            ))
+            return
+
+        batch, report = create_payout_batch(limit=options['limit'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"Would batch {report['withdrawals']} withdrawals for {report['amount']} ETB")
+            return
+        if batch is None:
+            self.stdout.write(self.style.WARNING('⚠️ No approved withdrawals to batch'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Batch {batch.reference_number}: {report['withdrawals']} withdrawals for {report['amount']} ETB"
+        ))
+        if report['insufficient']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {report['insufficient']} withdrawals failed for insufficient wallet balance"
+            ))
+        self.stdout.write(f"📄 Settlement file: {batch.settlement_file}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from utils.scheduler import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the periodic background jobs (analytics precompute, ...) in the foreground'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every registered job once and exit',
+        )
+
+    def handle(self, *args, **options):
+        jobs = scheduler.jobs()
+        self.stdout.write(self.style.SUCCESS(f'⏱️  {len(jobs)} background jobs registered'))
+        for job in jobs:
+            self.stdout.write(f'  - {job.name} (every {job.interval}s)')
+
+        if options['once']:
+            ran = scheduler.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'✅ Ran {ran} jobs'))
+            return
+
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping background jobs...')
+        finally:
+            scheduler.stop(wait=True)
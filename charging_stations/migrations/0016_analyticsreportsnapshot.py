@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("charging_stations", "0015_convert_images_to_base64"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsReportSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("time_range", models.CharField(max_length=20)),
+                ("station", models.CharField(default="All Stations", max_length=64)),
+                ("payload", models.JSONField(default=dict)),
+                ("computed_at", models.DateTimeField()),
+                ("is_stale", models.BooleanField(default=False, help_text="Set when a session or payment changed after computed_at")),
+                ("owner", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="analytics_snapshots", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["is_stale"], name="charging_st_is_stal_dd5237_idx")],
+                "unique_together": {("owner", "time_range", "station")},
+            },
+        ),
+    ]
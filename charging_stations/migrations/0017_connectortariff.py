@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("charging_stations", "0016_analyticsreportsnapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConnectorTariff",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("name", models.CharField(blank=True, default="", max_length=100)),
+                ("price_per_kwh", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("weekdays", models.CharField(default="0123456", help_text="Days the tariff applies, Monday=0 ... Sunday=6", max_length=7)),
+                ("start_hour", models.PositiveSmallIntegerField(default=0, help_text="Local hour the window starts (0-23)")),
+                ("end_hour", models.PositiveSmallIntegerField(default=24, help_text="Local hour the window ends (1-24); before start_hour wraps past midnight")),
+                ("priority", models.PositiveSmallIntegerField(default=0, help_text="Higher priority wins where windows overlap")),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("connector", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="tariffs", to="charging_stations.chargingconnector")),
+            ],
+            options={
+                "ordering": ["priority", "start_hour"],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("charging_stations", "0017_connectortariff"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PayoutBatch",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("reference_number", models.CharField(max_length=100, unique=True)),
+                ("status", models.CharField(choices=[("processing", "Processing"), ("settled", "Settled")], default="processing", max_length=20)),
+                ("currency", models.CharField(default="ETB", max_length=3)),
+                ("withdrawal_count", models.PositiveIntegerField(default=0)),
+                ("total_amount", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("failed_count", models.PositiveIntegerField(default=0)),
+                ("settlement_file", models.CharField(blank=True, help_text="Path of the settlement CSV", max_length=500)),
+                ("firestore_withdrawals", models.JSONField(blank=True, default=list, help_text="Firestore withdrawals in the batch: id, owner_id, amount and held transaction_id")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("settled_at", models.DateTimeField(blank=True, null=True)),
+                ("created_by", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="payout_batches", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name_plural": "Payout batches",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="withdrawalrequest",
+            name="batch",
+            field=models.ForeignKey(blank=True, help_text="Settlement batch this withdrawal was paid out in", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="withdrawals", to="charging_stations.payoutbatch"),
+        ),
+    ]
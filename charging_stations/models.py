@@ -223,6 +223,31 @@ class ChargingConnector(models.Model):
     def __str__(self):
         return f"{self.get_connector_type_display()} - {self.power_kw}kW"
 
+
+class ConnectorTariff(models.Model):
+    """Time-of-use price for a connector, overriding price_per_kwh inside its window (see tariffs.py)"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    connector = models.ForeignKey(ChargingConnector, on_delete=models.CASCADE, related_name='tariffs')
+    name = models.CharField(max_length=100, blank=True, default='')
+    price_per_kwh = models.DecimalField(max_digits=6, decimal_places=2)
+    weekdays = models.CharField(max_length=7, default='0123456', help_text='Days the tariff applies, Monday=0 ... Sunday=6')
+    start_hour = models.PositiveSmallIntegerField(default=0, help_text='Local hour the window starts (0-23)')
+    end_hour = models.PositiveSmallIntegerField(
+        default=24, help_text='Local hour the window ends (1-24); before start_hour wraps past midnight'
+    )
+    priority = models.PositiveSmallIntegerField(default=0, help_text='Higher priority wins where windows overlap')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['priority', 'start_hour']
+
+    def __str__(self):
+        return f"{self.name or 'Tariff'} - {self.price_per_kwh} ETB/kWh ({self.start_hour:02d}-{self.end_hour:02d})"
+
+
 class FavoriteStation(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='favorite_stations')
@@ -654,6 +679,42 @@ class PayoutMethod(models.Model):
         return {'type': 'Unknown', 'details': '', 'holder': ''}
 
 
+class PayoutBatch(models.Model):
+    """Settlement batch of approved withdrawals, paid out together (see payouts.py)"""
+
+    class BatchStatus(models.TextChoices):
+        PROCESSING = 'processing', 'Processing'
+        SETTLED = 'settled', 'Settled'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reference_number = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=BatchStatus.choices, default=BatchStatus.PROCESSING)
+    currency = models.CharField(max_length=3, default='ETB')
+    withdrawal_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    settlement_file = models.CharField(max_length=500, blank=True, help_text="Path of the settlement CSV")
+    firestore_withdrawals = models.JSONField(
+        default=list, blank=True,
+        help_text="Firestore withdrawals in the batch: id, owner_id, amount and held transaction_id"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='payout_batches'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    settled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Payout batches'
+
+    def __str__(self):
+        return f"Payout batch {self.reference_number} - {self.total_amount} {self.currency} ({self.status})"
+
+
 class WithdrawalRequest(models.Model):
     """Model for tracking withdrawal/payout requests from station owners"""
 
@@ -706,6 +767,13 @@ class WithdrawalRequest(models.Model):
     )
     admin_notes = models.TextField(blank=True, null=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    batch = models.ForeignKey(
+        PayoutBatch,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='withdrawals',
+        help_text="Settlement batch this withdrawal was paid out in"
+    )
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -728,3 +796,28 @@ class WithdrawalRequest(models.Model):
             import string
             self.reference_number = 'WD' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
         super().save(*args, **kwargs)
+
+
+class AnalyticsReportSnapshot(models.Model):
+    """Precomputed analytics report for one owner, time range and station filter"""
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='analytics_snapshots')
+    time_range = models.CharField(max_length=20)
+    station = models.CharField(max_length=64, default='All Stations')
+    payload = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+    is_stale = models.BooleanField(default=False, help_text="Set when a session or payment changed after computed_at")
+
+    class Meta:
+        unique_together = ('owner', 'time_range', 'station')
+        indexes = [
+            models.Index(fields=['is_stale']),
+        ]
+
+    def __str__(self):
+        return f"{self.owner.email} - {self.time_range} ({self.station})"
+
+    def needs_refresh(self, max_age_seconds):
+        from django.utils import timezone
+        age = (timezone.now() - self.computed_at).total_seconds()
+        return self.is_stale or age > max_age_seconds
@@ -0,0 +1,356 @@
+"""
+Station owner payout batches.
+
+``create_payout_batch`` gathers every approved withdrawal that is not in a
+batch yet into one PayoutBatch:
+
+- SQL WithdrawalRequest rows are debited from the owners' wallets in one
+  bulk ledger operation (``wallet_ledger.post_debits``). A withdrawal the
+  wallet cannot cover is marked failed instead of being paid out.
+- Firestore withdrawals were already debited when they were requested. They
+  join the batch with the ``WD-`` transaction that holds their funds.
+
+The batch is saved in the database and mirrored to Firestore with batched
+writes. A settlement CSV listing every payout is written to
+PAYOUTS['SETTLEMENT_DIR'] for the bank or mobile money upload.
+``settle_payout_batch`` closes the batch once the transfers have gone
+through, refunding the payouts the provider reported as failed.
+"""
+import csv
+import logging
+import os
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from .models import PayoutBatch, WithdrawalRequest
+from payments import wallet_ledger
+from payments.models import Transaction
+from utils.firestore_repo import firestore_repo
+
+logger = logging.getLogger(__name__)
+
+WithdrawalStatus = WithdrawalRequest.WithdrawalStatus
+
+# Key of the advisory lock held while a batch is created
+BATCH_CREATION_LOCK = 0x50415953
+
+SETTLEMENT_COLUMNS = (
+    'batch_reference', 'withdrawal_reference', 'source', 'owner_email', 'account_holder',
+    'method', 'bank_name', 'account', 'amount', 'currency',
+)
+
+
+def _config():
+    return settings.PAYOUTS
+
+
+class SettlementError(Exception):
+    """The failed payouts reported for a batch cannot be matched to its payouts"""
+
+
+def payout_transaction_reference(withdrawal):
+    return f"PAYOUT-{withdrawal.reference_number}"
+
+
+def _lock_batch_creation():
+    """
+    Serialize batch creation for the rest of the transaction, so two runs (the
+    admin action and the command) cannot both pick the same Firestore withdrawal.
+
+    Uses a PostgreSQL advisory transaction lock. SQLite, used in development,
+    is not locked.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [BATCH_CREATION_LOCK])
+
+
+def _batched_firestore_ids():
+    """
+    Firestore withdrawals already in a batch, in case their documents were not updated.
+
+    Settled batches count too: if mirroring a batch to Firestore failed, its
+    withdrawals still look approved and unbatched after settlement.
+    """
+    ids = set()
+    for withdrawals in PayoutBatch.objects.exclude(firestore_withdrawals=[]).values_list(
+        'firestore_withdrawals', flat=True
+    ):
+        ids.update(item['id'] for item in withdrawals)
+    return ids
+
+
+def approved_firestore_withdrawals():
+    """Approved Firestore withdrawals not yet in a batch, with the transaction that holds their funds"""
+    if not firestore_repo.db:
+        return []
+
+    batched = _batched_firestore_ids()
+    withdrawals = [
+        withdrawal for withdrawal in firestore_repo.list_withdrawals(status='approved')
+        if not withdrawal.get('batch_id') and withdrawal['id'] not in batched
+    ]
+    held = dict(Transaction.objects.filter(
+        reference_number__in=[f"WD-{withdrawal['id'][:8]}" for withdrawal in withdrawals]
+    ).values_list('reference_number', 'id'))
+    for withdrawal in withdrawals:
+        transaction_id = held.get(f"WD-{withdrawal['id'][:8]}")
+        withdrawal['transaction_id'] = str(transaction_id) if transaction_id else None
+    return withdrawals
+
+
+def _sql_settlement_row(batch, withdrawal):
+    method = withdrawal.payout_method
+    return {
+        'batch_reference': batch.reference_number,
+        'withdrawal_reference': withdrawal.reference_number,
+        'source': 'sql',
+        'owner_email': withdrawal.station_owner.user.email,
+        'account_holder': method.account_holder_name,
+        'method': method.method_type,
+        'bank_name': method.bank_name,
+        'account': method.account_number or method.phone_number or method.paypal_email,
+        'amount': withdrawal.amount,
+        'currency': withdrawal.currency,
+    }
+
+
+def _firestore_settlement_row(batch, withdrawal, owner_emails):
+    method = withdrawal.get('payment_method_snapshot') or {}
+    return {
+        'batch_reference': batch.reference_number,
+        'withdrawal_reference': withdrawal['id'],
+        'source': 'firestore',
+        'owner_email': owner_emails.get(str(withdrawal.get('owner_id')), ''),
+        'account_holder': method.get('account_holder_name', ''),
+        'method': method.get('method_type', ''),
+        'bank_name': method.get('bank_name', ''),
+        'account': method.get('account_number') or method.get('phone_number', ''),
+        'amount': Decimal(str(withdrawal['amount'])),
+        'currency': 'ETB',
+    }
+
+
+def write_settlement_file(batch, rows):
+    directory = _config()['SETTLEMENT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{batch.reference_number}.csv")
+    with open(path, 'w', newline='') as settlement:
+        writer = csv.DictWriter(settlement, fieldnames=SETTLEMENT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def sync_batch_to_firestore(batch, withdrawal_updates):
+    """Mirror ``batch`` and its Firestore withdrawals' new fields (id -> fields) to Firestore"""
+    if not firestore_repo.db:
+        return False
+    try:
+        firestore_repo.write_payout_batch(batch.pk, {
+            'reference_number': batch.reference_number,
+            'status': batch.status,
+            'currency': batch.currency,
+            'withdrawal_count': batch.withdrawal_count,
+            'failed_count': batch.failed_count,
+            'total_amount': float(batch.total_amount),
+            'created_at': batch.created_at.isoformat(),
+            'settled_at': batch.settled_at.isoformat() if batch.settled_at else None,
+        }, withdrawal_updates)
+        return True
+    except Exception as e:
+        logger.error(f"Could not mirror payout batch {batch.reference_number} to Firestore: {e}")
+        return False
+
+
+def create_payout_batch(created_by=None, limit=None, dry_run=False):
+    """
+    Collect approved withdrawals into a new batch.
+
+    Returns ``(batch, report)``. ``batch`` is None when nothing was approved, or
+    on a dry run. ``report`` counts ``withdrawals``, ``amount`` and
+    ``insufficient`` (SQL withdrawals whose wallet could not cover them).
+    """
+    limit = limit or _config()['BATCH_LIMIT']
+    report = {'withdrawals': 0, 'amount': Decimal('0'), 'insufficient': 0}
+
+    with db_transaction.atomic():
+        _lock_batch_creation()
+        # Read under the lock, so withdrawals batched by a concurrent run are excluded
+        firestore_withdrawals = approved_firestore_withdrawals()[:limit]
+        withdrawals = list(
+            WithdrawalRequest.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status=WithdrawalStatus.APPROVED, batch__isnull=True)
+            .select_related('station_owner__user', 'payout_method')
+            .order_by('created_at')[:max(0, limit - len(firestore_withdrawals))]
+        )
+        if not withdrawals and not firestore_withdrawals:
+            return None, report
+
+        if dry_run:
+            report['withdrawals'] = len(withdrawals) + len(firestore_withdrawals)
+            report['amount'] = sum((w.amount for w in withdrawals), Decimal('0')) + sum(
+                (Decimal(str(w['amount'])) for w in firestore_withdrawals), Decimal('0')
+            )
+            return None, report
+
+        now = timezone.now()
+        batch = PayoutBatch.objects.create(
+            reference_number=f"PB-{now:%Y%m%d}-{uuid.uuid4().hex[:6].upper()}",
+            created_by=created_by
+        )
+
+        # One withdrawal transaction per SQL withdrawal, then a single bulk debit
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user_id=withdrawal.station_owner.user_id,
+                transaction_type=Transaction.TransactionType.WITHDRAWAL,
+                status=Transaction.TransactionStatus.PROCESSING,
+                amount=withdrawal.amount,
+                currency=withdrawal.currency,
+                reference_number=payout_transaction_reference(withdrawal),
+                description=f"Payout {withdrawal.reference_number} in batch {batch.reference_number}"
+            )
+            for withdrawal in withdrawals
+        ])
+        _, rejected = wallet_ledger.post_debits([
+            (withdrawal.station_owner.user_id, payout_transaction.pk, withdrawal.amount,
+             f"Payout {withdrawal.reference_number}")
+            for withdrawal, payout_transaction in zip(withdrawals, transactions)
+        ])
+
+        rejected_transactions = {transaction_id for _, transaction_id, _, _ in rejected}
+        paid = [w for w, t in zip(withdrawals, transactions) if t.pk not in rejected_transactions]
+        unpaid = [w for w, t in zip(withdrawals, transactions) if t.pk in rejected_transactions]
+
+        WithdrawalRequest.objects.filter(pk__in=[w.pk for w in paid]).update(
+            status=WithdrawalStatus.PROCESSING, batch=batch, processed_at=now, updated_at=now
+        )
+        WithdrawalRequest.objects.filter(pk__in=[w.pk for w in unpaid]).update(
+            status=WithdrawalStatus.FAILED, admin_notes='Insufficient wallet balance',
+            processed_at=now, updated_at=now
+        )
+        Transaction.objects.filter(pk__in=rejected_transactions).update(status=Transaction.TransactionStatus.FAILED)
+        Transaction.objects.filter(
+            pk__in=[w['transaction_id'] for w in firestore_withdrawals if w['transaction_id']]
+        ).update(status=Transaction.TransactionStatus.PROCESSING)
+
+        batch.firestore_withdrawals = [
+            {
+                'id': w['id'],
+                'owner_id': str(w.get('owner_id')),
+                'amount': str(w['amount']),
+                'transaction_id': w['transaction_id'],
+            }
+            for w in firestore_withdrawals
+        ]
+        batch.withdrawal_count = len(paid) + len(firestore_withdrawals)
+        batch.total_amount = sum((w.amount for w in paid), Decimal('0')) + sum(
+            (Decimal(str(w['amount'])) for w in firestore_withdrawals), Decimal('0')
+        )
+
+        owner_emails = {
+            str(pk): email for pk, email in get_user_model().objects.filter(
+                pk__in=[w['owner_id'] for w in firestore_withdrawals if str(w.get('owner_id', '')).isdigit()]
+            ).values_list('pk', 'email')
+        }
+        rows = [_sql_settlement_row(batch, w) for w in paid]
+        rows += [_firestore_settlement_row(batch, w, owner_emails) for w in firestore_withdrawals]
+        batch.settlement_file = write_settlement_file(batch, rows)
+        batch.save()
+
+    sync_batch_to_firestore(batch, {
+        w['id']: {'status': 'processing', 'batch_id': str(batch.pk), 'batch_reference': batch.reference_number}
+        for w in firestore_withdrawals
+    })
+
+    report.update(withdrawals=batch.withdrawal_count, amount=batch.total_amount, insufficient=len(unpaid))
+    logger.info(f"Created payout batch {batch.reference_number}: {report}")
+    return batch, report
+
+
+def settle_payout_batch(batch, failed_references=()):
+    """
+    Mark a batch's payouts completed, except ``failed_references``.
+
+    Failed payouts are given back to the owner's wallet with a credit on their
+    withdrawal transaction. References are WithdrawalRequest reference numbers
+    or Firestore withdrawal ids. Returns counts of ``completed`` and ``failed``.
+
+    Raises SettlementError, leaving the batch unsettled, when a reference is
+    not a payout of the batch or a failed payout has no transaction to refund.
+    """
+    failed_references = set(failed_references)
+    now = timezone.now()
+
+    with db_transaction.atomic():
+        batch = PayoutBatch.objects.select_for_update().get(pk=batch.pk)
+        if batch.status == PayoutBatch.BatchStatus.SETTLED:
+            return {'completed': 0, 'failed': 0}
+        withdrawals = list(batch.withdrawals.filter(status=WithdrawalStatus.PROCESSING).select_related('station_owner'))
+        unknown = failed_references - {w.reference_number for w in withdrawals} - {
+            w['id'] for w in batch.firestore_withdrawals
+        }
+        if unknown:
+            raise SettlementError(f"Not payouts of batch {batch.reference_number}: {', '.join(sorted(unknown))}")
+        failed = [w for w in withdrawals if w.reference_number in failed_references]
+        completed = [w for w in withdrawals if w.reference_number not in failed_references]
+        payout_transactions = dict(Transaction.objects.filter(
+            reference_number__in=[payout_transaction_reference(w) for w in withdrawals]
+        ).values_list('reference_number', 'id'))
+        failed_firestore = [w for w in batch.firestore_withdrawals if w['id'] in failed_references]
+
+        unrefundable = [
+            w.reference_number for w in failed if payout_transaction_reference(w) not in payout_transactions
+        ] + [w['id'] for w in failed_firestore if not w['transaction_id'] or not w['owner_id'].isdigit()]
+        if unrefundable:
+            raise SettlementError(f"No payout transaction to refund for: {', '.join(unrefundable)}")
+
+        refunds = [
+            (w.station_owner.user_id, payout_transactions[payout_transaction_reference(w)], w.amount,
+             f"Refund of failed payout {w.reference_number}")
+            for w in failed
+        ]
+        refunds += [
+            (int(w['owner_id']), uuid.UUID(w['transaction_id']), w['amount'], f"Refund of failed payout {w['id']}")
+            for w in failed_firestore
+        ]
+        wallet_ledger.post_credits(refunds)
+
+        WithdrawalRequest.objects.filter(pk__in=[w.pk for w in completed]).update(
+            status=WithdrawalStatus.COMPLETED, processed_at=now, updated_at=now
+        )
+        WithdrawalRequest.objects.filter(pk__in=[w.pk for w in failed]).update(
+            status=WithdrawalStatus.FAILED, admin_notes='Payout failed at settlement', processed_at=now, updated_at=now
+        )
+
+        failed_transactions = {str(transaction_id) for _, transaction_id, _, _ in refunds}
+        batch_transactions = {str(transaction_id) for transaction_id in payout_transactions.values()} | {
+            w['transaction_id'] for w in batch.firestore_withdrawals if w['transaction_id']
+        }
+        Transaction.objects.filter(pk__in=batch_transactions - failed_transactions).update(
+            status=Transaction.TransactionStatus.COMPLETED, completed_at=now
+        )
+        Transaction.objects.filter(pk__in=failed_transactions).update(status=Transaction.TransactionStatus.FAILED)
+
+        batch.status = PayoutBatch.BatchStatus.SETTLED
+        batch.failed_count = len(failed) + len(failed_firestore)
+        batch.settled_at = now
+        batch.save(update_fields=['status', 'failed_count', 'settled_at'])
+
+    sync_batch_to_firestore(batch, {
+        w['id']: {'status': 'failed' if w['id'] in failed_references else 'completed'}
+        for w in batch.firestore_withdrawals
+    })
+
+    stats = {
+        'completed': len(completed) + len(batch.firestore_withdrawals) - len(failed_firestore),
+        'failed': batch.failed_count,
+    }
+    logger.info(f"Settled payout batch {batch.reference_number}: {stats}")
+    return stats
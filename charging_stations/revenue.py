@@ -0,0 +1,347 @@
+import csv
+import heapq
+import logging
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import CharField, DecimalField, ExpressionWrapper, F, Value
+from django.utils import timezone
+
+from .models import ChargingConnector
+from payments.models import QRPaymentSession, SimpleChargingSession
+from utils.asgi_streaming import aiter_batches
+from utils.keyset import encode_cursor, seek_before
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip while streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+REVENUE_QR_STATUSES = ['payment_completed', 'payment_initiated', 'charging_started', 'charging_completed']
+REVENUE_PAYMENT_STATUSES = ['completed', 'pending', 'processing']
+REVENUE_SIMPLE_STATUSES = ['completed', 'stopped']
+
+# Page size bounds for the keyset-paginated ledger
+LEDGER_DEFAULT_PAGE_SIZE = 50
+LEDGER_MAX_PAGE_SIZE = 200
+
+LEDGER_TYPE_PAYMENT = 'payment'
+LEDGER_TYPE_SIMPLE = 'simple'
+LEDGER_TYPE_LABELS = {
+    LEDGER_TYPE_PAYMENT: 'Charging Payment',
+    LEDGER_TYPE_SIMPLE: 'Simple Charging',
+}
+
+# Columns shared by both halves of the ledger UNION, in SELECT order
+LEDGER_FIELDS = [
+    'id', 'created_at', 'connector_id',
+    'entry_type', 'reference', 'station_name', 'customer_email',
+    'entry_amount', 'entry_status', 'energy_kwh', 'unit_price',
+]
+
+TIME_RANGE_DAYS = {
+    '7d': 7,
+    '30d': 30,
+    '90d': 90,
+    '365d': 365,
+}
+
+EXPORT_COLUMNS = [
+    ('date', 'Date'),
+    ('transaction_id', 'Transaction ID'),
+    ('type', 'Type'),
+    ('station_name', 'Station'),
+    ('connector_id', 'Connector ID'),
+    ('user_email', 'Customer Email'),
+    ('amount', 'Amount (ETB)'),
+    ('status', 'Status'),
+    ('energy_consumed', 'Energy (kWh)'),
+    ('cost_per_kwh', 'Cost per kWh'),
+]
+
+
+def start_date_for_range(time_range, now=None):
+    """Translate a revenue page time range ('7d', '30d', ...) into a start datetime.
+
+    Returns None for 'all' so callers can skip the date filter entirely.
+    """
+    if time_range == 'all':
+        return None
+    now = now or timezone.now()
+    return now - timedelta(days=TIME_RANGE_DAYS.get(time_range, 7))
+
+
+def owner_connectors(user, station_id=None):
+    """Connector queryset for every station owned by ``user``.
+
+    Raises ValueError when ``station_id`` is neither 'All Stations' nor a station UUID.
+    """
+    connectors = ChargingConnector.objects.filter(station__owner__user=user)
+    if station_id and station_id != 'All Stations':
+        try:
+            station_id = uuid.UUID(str(station_id))
+        except ValueError:
+            raise ValueError(f'Invalid station: {station_id}')
+        connectors = connectors.filter(station_id=station_id)
+    return connectors
+
+
+def _qr_payment_rows(connector_ids, start_date, chunk_size):
+    sessions = QRPaymentSession.objects.filter(
+        connector__in=connector_ids,
+        status__in=REVENUE_QR_STATUSES,
+        payment_transaction__status__in=REVENUE_PAYMENT_STATUSES,
+    )
+    if start_date:
+        sessions = sessions.filter(created_at__gte=start_date)
+
+    sessions = sessions.order_by('-created_at', '-id').values(
+        'id', 'created_at', 'connector_id', 'user__email',
+        'connector__station__name',
+        'payment_transaction__reference_number',
+        'payment_transaction__amount',
+        'payment_transaction__status',
+    )
+
+    for row in sessions.iterator(chunk_size=chunk_size):
+        yield {
+            'sort_key': (row['created_at'], str(row['id'])),
+            'date': row['created_at'].isoformat(),
+            'transaction_id': row['payment_transaction__reference_number'],
+            'type': 'Charging Payment',
+            'station_name': row['connector__station__name'],
+            'connector_id': str(row['connector_id']),
+            'user_email': row['user__email'],
+            'amount': row['payment_transaction__amount'],
+            'status': row['payment_transaction__status'].title(),
+            'energy_consumed': None,
+            'cost_per_kwh': None,
+        }
+
+
+def _simple_session_rows(connector_ids, start_date, chunk_size):
+    sessions = SimpleChargingSession.objects.filter(
+        connector__in=connector_ids,
+        status__in=REVENUE_SIMPLE_STATUSES,
+        energy_consumed_kwh__gt=0,
+        cost_per_kwh__gt=0,
+    )
+    if start_date:
+        sessions = sessions.filter(created_at__gte=start_date)
+
+    sessions = sessions.order_by('-created_at', '-id').values(
+        'id', 'created_at', 'connector_id', 'user__email',
+        'connector__station__name',
+        'energy_consumed_kwh', 'cost_per_kwh',
+    )
+
+    for row in sessions.iterator(chunk_size=chunk_size):
+        yield {
+            'sort_key': (row['created_at'], str(row['id'])),
+            'date': row['created_at'].isoformat(),
+            'transaction_id': f"SIMPLE-{row['id']}",
+            'type': 'Simple Charging',
+            'station_name': row['connector__station__name'],
+            'connector_id': str(row['connector_id']),
+            'user_email': row['user__email'],
+            'amount': (row['energy_consumed_kwh'] * row['cost_per_kwh']).quantize(Decimal('0.01')),
+            'status': 'Completed',
+            'energy_consumed': row['energy_consumed_kwh'],
+            'cost_per_kwh': row['cost_per_kwh'],
+        }
+
+
+def iter_owner_transactions(user, start_date=None, station_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield an owner's QR payments and simple charging sessions newest first.
+
+    Both sources are read with server-side chunked iterators already ordered by
+    the database, then merged lazily, so memory use does not grow with history size.
+    """
+    connector_ids = owner_connectors(user, station_id).values('id')
+    return heapq.merge(
+        _qr_payment_rows(connector_ids, start_date, chunk_size),
+        _simple_session_rows(connector_ids, start_date, chunk_size),
+        key=lambda row: row['sort_key'],
+        reverse=True,
+    )
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def stream_transactions_csv(rows):
+    """Generate CSV lines for ``rows`` one at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([label for _, label in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(['' if row[key] is None else row[key] for key, _ in EXPORT_COLUMNS])
+
+
+async def async_stream_transactions_csv(rows):
+    """
+    Async version of ``stream_transactions_csv`` for ASGI servers.
+
+    Lines are generated on the request's worker thread a batch at a time, so
+    the database iterators behind ``rows`` are never drained in one go.
+    """
+    async for lines in aiter_batches(stream_transactions_csv(rows), EXPORT_CHUNK_SIZE):
+        yield ''.join(lines)
+
+
+def write_transactions_xlsx(rows):
+    """
+    Write ``rows`` to a temporary XLSX file using openpyxl's write-only mode.
+
+    Write-only worksheets flush rows to disk as they are appended, so memory stays
+    constant. Returns the open temporary file positioned at the start.
+    Raises ImportError when openpyxl is not installed.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Transactions')
+    sheet.append([label for _, label in EXPORT_COLUMNS])
+    for row in rows:
+        values = []
+        for key, _ in EXPORT_COLUMNS:
+            value = row[key]
+            values.append(float(value) if isinstance(value, Decimal) else value)
+        sheet.append(values)
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _ledger_money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=12, decimal_places=3))
+
+
+def _ledger_payment_entries(connector_ids, start_date, status_filter):
+    sessions = QRPaymentSession.objects.filter(
+        connector__in=connector_ids,
+        status__in=REVENUE_QR_STATUSES,
+        payment_transaction__status__in=REVENUE_PAYMENT_STATUSES,
+    )
+    if start_date:
+        sessions = sessions.filter(created_at__gte=start_date)
+    if status_filter:
+        sessions = sessions.filter(payment_transaction__status=status_filter)
+
+    # Annotation order must match _ledger_simple_entries so the UNION columns line up
+    return sessions.annotate(
+        entry_type=Value(LEDGER_TYPE_PAYMENT, output_field=CharField()),
+        reference=F('payment_transaction__reference_number'),
+        station_name=F('connector__station__name'),
+        customer_email=F('user__email'),
+        entry_amount=_ledger_money(F('payment_transaction__amount')),
+        entry_status=F('payment_transaction__status'),
+        energy_kwh=_ledger_money(Value(None)),
+        unit_price=_ledger_money(Value(None)),
+    )
+
+
+def _ledger_simple_entries(connector_ids, start_date, status_filter):
+    sessions = SimpleChargingSession.objects.filter(
+        connector__in=connector_ids,
+        status__in=REVENUE_SIMPLE_STATUSES,
+        energy_consumed_kwh__gt=0,
+        cost_per_kwh__gt=0,
+    )
+    if start_date:
+        sessions = sessions.filter(created_at__gte=start_date)
+    if status_filter and status_filter != 'completed':
+        # Simple sessions are only ever reported as completed
+        sessions = sessions.none()
+
+    return sessions.annotate(
+        entry_type=Value(LEDGER_TYPE_SIMPLE, output_field=CharField()),
+        reference=Value('', output_field=CharField()),
+        station_name=F('connector__station__name'),
+        customer_email=F('user__email'),
+        entry_amount=_ledger_money(F('energy_consumed_kwh') * F('cost_per_kwh')),
+        entry_status=Value('completed', output_field=CharField()),
+        energy_kwh=_ledger_money(F('energy_consumed_kwh')),
+        unit_price=_ledger_money(F('cost_per_kwh')),
+    )
+
+
+def _ledger_row(row):
+    if row['entry_type'] == LEDGER_TYPE_SIMPLE:
+        reference = f"SIMPLE-{row['id']}"
+    else:
+        reference = row['reference']
+
+    def as_decimal(value, places):
+        if value is None:
+            return None
+        return Decimal(str(value)).quantize(Decimal(places))
+
+    return {
+        'id': str(row['id']),
+        'date': row['created_at'].isoformat(),
+        'transaction_id': reference,
+        'type': LEDGER_TYPE_LABELS[row['entry_type']],
+        'station_name': row['station_name'],
+        'connector_id': str(row['connector_id']),
+        'user_email': row['customer_email'],
+        'amount': as_decimal(row['entry_amount'], '0.01'),
+        'status': row['entry_status'].title(),
+        'energy_consumed': as_decimal(row['energy_kwh'], '0.001'),
+        'cost_per_kwh': as_decimal(row['unit_price'], '0.01'),
+    }
+
+
+def owner_ledger_page(user, after=None, limit=LEDGER_DEFAULT_PAGE_SIZE, station_id=None,
+                      entry_type=None, status_filter=None, start_date=None):
+    """
+    Return one page of an owner's unified transaction ledger, newest first.
+
+    QR payments and simple charging sessions are combined with a single
+    ``UNION ALL`` query ordered by ``(created_at, id)`` and cut with keyset
+    pagination, so each page costs the same regardless of how deep it is.
+    ``after`` is the ``(created_at, id)`` pair decoded from the previous page's
+    cursor. Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    limit = max(1, min(int(limit), LEDGER_MAX_PAGE_SIZE))
+    connector_ids = owner_connectors(user, station_id).values('id')
+
+    parts = []
+    if entry_type in (None, LEDGER_TYPE_PAYMENT):
+        parts.append(_ledger_payment_entries(connector_ids, start_date, status_filter))
+    if entry_type in (None, LEDGER_TYPE_SIMPLE):
+        parts.append(_ledger_simple_entries(connector_ids, start_date, status_filter))
+    if not parts:
+        return [], None
+
+    if after:
+        parts = [qs.filter(seek_before(*after)) for qs in parts]
+    parts = [qs.values(*LEDGER_FIELDS) for qs in parts]
+
+    if len(parts) == 1:
+        ledger = parts[0].order_by('-created_at', '-id')
+    else:
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Let each branch stop at the page boundary using its own index
+            parts = [qs.order_by('-created_at', '-id')[:limit + 1] for qs in parts]
+        else:
+            parts = [qs.order_by() for qs in parts]
+        ledger = parts[0].union(*parts[1:], all=True).order_by('-created_at', '-id')
+    rows = list(ledger[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+
+    return [_ledger_row(row) for row in rows], next_cursor
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ChargingConnector
+from payments.models import QRPaymentSession, SimpleChargingSession
+from ocpp_integration.models import ChargingSession
+
+# Fields the owner analytics reports read. A save limited by update_fields to
+# other fields (meter readings, timestamps, costs) leaves the snapshots valid.
+REPORT_FIELDS = {
+    QRPaymentSession: {'connector', 'status', 'payment_transaction', 'created_at'},
+    SimpleChargingSession: {
+        'connector', 'status', 'start_time', 'stop_time', 'duration_seconds',
+        'energy_consumed_kwh', 'cost_per_kwh',
+    },
+    ChargingSession: {'ocpp_station', 'status', 'start_time', 'stop_time', 'energy_consumed_kwh'},
+}
+
+
+def _touches_reports(sender, update_fields):
+    return update_fields is None or not REPORT_FIELDS[sender].isdisjoint(update_fields)
+
+
+def _mark_connector_owner_stale(connector_id):
+    from .analytics import mark_owner_reports_stale
+
+    owner_user_id = ChargingConnector.objects.filter(pk=connector_id).values_list(
+        'station__owner__user', flat=True
+    ).first()
+    if owner_user_id:
+        mark_owner_reports_stale(owner_user_id)
+
+
+@receiver(post_save, sender=QRPaymentSession)
+def qr_session_saved(sender, instance=None, update_fields=None, **kwargs):
+    if _touches_reports(sender, update_fields):
+        _mark_connector_owner_stale(instance.connector_id)
+
+
+@receiver(post_save, sender=SimpleChargingSession)
+def simple_session_saved(sender, instance=None, update_fields=None, **kwargs):
+    if _touches_reports(sender, update_fields):
+        _mark_connector_owner_stale(instance.connector_id)
+
+
+@receiver(post_save, sender=ChargingSession)
+def ocpp_session_saved(sender, instance=None, update_fields=None, **kwargs):
+    from .analytics import mark_owner_reports_stale
+
+    if not _touches_reports(sender, update_fields):
+        return
+
+    owner_user_id = ChargingSession.objects.filter(pk=instance.pk).values_list(
+        'ocpp_station__charging_station__owner__user', flat=True
+    ).first()
+    if owner_user_id:
+        mark_owner_reports_stale(owner_user_id)
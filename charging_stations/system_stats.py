@@ -0,0 +1,102 @@
+"""
+Fleet-wide statistics for the admin dashboard.
+
+Each SQL table is counted with one conditional aggregate query, Firestore
+collections are counted with aggregation queries, and the combined result is
+cached for ADMIN_STATS_CACHE_SECONDS so the admin pages don't hit the databases
+on every view.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_STATS_CACHE_KEY = 'admin:system_stats'
+
+# Migrated collections counted on the Firestore side
+FIRESTORE_COUNTED_COLLECTIONS = {
+    'firestore_stations': 'charging_stations',
+    'firestore_station_owners': 'station_owners',
+    'firestore_users': 'users',
+    'firestore_withdrawals': 'withdrawals',
+    'firestore_support_tickets': 'support_tickets',
+}
+
+
+def collect_sql_stats():
+    from authentication.models import CustomUser
+    from .models import StationOwner, ChargingStation, ChargingConnector, StationReview
+
+    stats = {'total_users': CustomUser.objects.count()}
+    stats.update(StationOwner.objects.aggregate(
+        verified_station_owners=Count('id', filter=Q(verification_status='verified')),
+        pending_station_owners=Count('id', filter=Q(verification_status='pending')),
+    ))
+    stats.update(ChargingStation.objects.aggregate(
+        total_stations=Count('id'),
+        active_stations=Count('id', filter=Q(is_active=True)),
+    ))
+    stats.update(ChargingConnector.objects.aggregate(
+        total_connectors=Count('id'),
+        available_connectors=Count('id', filter=Q(is_available=True)),
+    ))
+    stats.update(StationReview.objects.aggregate(
+        total_reviews=Count('id'),
+        verified_reviews=Count('id', filter=Q(is_verified_review=True)),
+    ))
+    return stats
+
+
+def _format_bytes(size):
+    for unit in ('bytes', 'kB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'bytes' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def database_size():
+    """Human readable size of the default database, or 'Unknown'."""
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
+                row = cursor.fetchone()
+                return row[0] if row else 'Unknown'
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()")
+                row = cursor.fetchone()
+                return _format_bytes(row[0]) if row else 'Unknown'
+    except Exception as e:
+        logger.warning("Could not determine database size: %s", e)
+    return 'Unknown'
+
+
+def collect_firestore_stats():
+    from utils.firestore_repo import firestore_repo
+
+    stats = {}
+    for key, collection in FIRESTORE_COUNTED_COLLECTIONS.items():
+        try:
+            stats[key] = firestore_repo.count_collection(collection)
+        except Exception as e:
+            logger.warning("Could not count Firestore collection %s: %s", collection, e)
+            stats[key] = None
+    return stats
+
+
+def get_system_stats(refresh=False):
+    """Return the cached admin statistics, recomputing them when missing or ``refresh`` is set."""
+    stats = None if refresh else cache.get(SYSTEM_STATS_CACHE_KEY)
+    if stats is None:
+        stats = collect_sql_stats()
+        stats['database_size'] = database_size()
+        stats.update(collect_firestore_stats())
+        stats['generated_at'] = timezone.now()
+        cache.set(SYSTEM_STATS_CACHE_KEY, stats, settings.ADMIN_STATS_CACHE_SECONDS)
+    return stats
@@ -0,0 +1,152 @@
+"""
+Connector tariff engine.
+
+A connector is priced at its ``price_per_kwh`` (TARIFFS['DEFAULT_PRICE_PER_KWH']
+when it has none), overridden inside the windows of its active ConnectorTariff
+rows. Each connector's tariffs are compiled once into a table of 168 prices, one
+per local hour of the week, and cached under a version of the connector read
+from the database: its ``updated_at``, its tariffs' latest ``updated_at`` and
+their count. A change saved by any worker gives the connector a new key, so a
+per-process cache never serves stale prices. Pricing energy is then one table
+lookup per meter reading. ``price_sessions`` prices any number of sessions
+with one version query and a single cache read, plus two queries for
+connectors that are not cached yet.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+HOURS_PER_WEEK = 7 * 24
+CENT = Decimal('0.01')
+TABLE_CACHE_KEY = 'tariffs:connector:{}:{}'
+
+
+def _config():
+    return settings.TARIFFS
+
+
+def default_price():
+    return Decimal(str(_config()['DEFAULT_PRICE_PER_KWH']))
+
+
+def hour_of_week(at):
+    """Slot of ``at`` in a compiled table: Monday 00:00-01:00 local time is 0."""
+    local = at.astimezone(ZoneInfo(_config()['TIME_ZONE']))
+    return local.weekday() * 24 + local.hour
+
+
+def tariff_hours(weekdays, start_hour, end_hour):
+    """Hour-of-week slots a window covers. An end_hour at or before start_hour runs into the next day."""
+    length = (end_hour - start_hour) % 24 or 24
+    for day in weekdays:
+        if day.isdigit() and int(day) < 7:
+            for offset in range(length):
+                yield (int(day) * 24 + start_hour + offset) % HOURS_PER_WEEK
+
+
+def compile_table(base_price, tariffs):
+    """
+    Build the 168-slot price table for one connector.
+
+    ``tariffs`` are ``(price_per_kwh, weekdays, start_hour, end_hour, priority)``
+    rows. They are applied in priority order, so the highest priority wins where
+    windows overlap.
+    """
+    table = [base_price if base_price is not None else default_price()] * HOURS_PER_WEEK
+    for price, weekdays, start_hour, end_hour, _ in sorted(tariffs, key=lambda row: row[4]):
+        for slot in tariff_hours(weekdays, start_hour, end_hour):
+            table[slot] = price
+    return tuple(table)
+
+
+def _compile_connectors(connector_ids):
+    from .models import ChargingConnector, ConnectorTariff
+
+    tariffs = defaultdict(list)
+    for row in ConnectorTariff.objects.filter(connector_id__in=connector_ids, is_active=True).order_by(
+        'priority', 'start_hour'
+    ).values_list('connector_id', 'price_per_kwh', 'weekdays', 'start_hour', 'end_hour', 'priority'):
+        tariffs[str(row[0])].append(row[1:])
+
+    return {
+        str(connector_id): compile_table(price, tariffs[str(connector_id)])
+        for connector_id, price in ChargingConnector.objects.filter(pk__in=connector_ids).values_list(
+            'id', 'price_per_kwh'
+        )
+    }
+
+
+def connector_versions(connector_ids):
+    """Pricing version of each existing connector, in one query"""
+    from .models import ChargingConnector
+
+    rows = ChargingConnector.objects.filter(pk__in=connector_ids).annotate(
+        tariffs_updated=Max('tariffs__updated_at'), tariff_count=Count('tariffs')
+    ).values_list('id', 'updated_at', 'tariffs_updated', 'tariff_count')
+    return {
+        str(connector_id): f"{updated_at.timestamp()}-{tariffs_updated.timestamp() if tariffs_updated else 0}-{tariff_count}"
+        for connector_id, updated_at, tariffs_updated, tariff_count in rows
+    }
+
+
+def connector_tables(connector_ids):
+    """Compiled tables keyed by the ids passed in. Connectors that do not exist are left out."""
+    ids = {str(connector_id): connector_id for connector_id in connector_ids if connector_id}
+    if not ids:
+        return {}
+    keys = {key: TABLE_CACHE_KEY.format(key, version) for key, version in connector_versions(list(ids.values())).items()}
+    cached = cache.get_many(list(keys.values()))
+    tables = {}
+    for key, cache_key in keys.items():
+        table = cached.get(cache_key)
+        if table is not None:
+            tables[key] = table
+
+    missing = keys.keys() - tables.keys()
+    if missing:
+        compiled = _compile_connectors(missing)
+        cache.set_many(
+            {keys[key]: table for key, table in compiled.items()},
+            _config()['CACHE_SECONDS']
+        )
+        tables.update(compiled)
+
+    return {ids[key]: table for key, table in tables.items()}
+
+
+def price_at(connector_id, at=None):
+    """Price per kWh on ``connector_id`` at ``at`` (now by default)."""
+    table = connector_tables([connector_id]).get(connector_id)
+    if table is None:
+        return default_price()
+    return table[hour_of_week(at or timezone.now())]
+
+
+def price_energy(table, readings):
+    """Cost of ``(timestamp, kwh)`` readings, each priced at the hour it was metered in."""
+    total = Decimal('0')
+    for at, kwh in readings:
+        if kwh:
+            total += table[hour_of_week(at)] * Decimal(str(kwh))
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def price_sessions(sessions):
+    """
+    Price many sessions in one pass.
+
+    ``sessions`` maps a key to ``(connector_id, readings)``, with readings as for
+    ``price_energy``. A session with only a total can pass
+    ``[(start_time, energy_kwh)]``. Returns a dict of key to cost.
+    """
+    tables = connector_tables({connector_id for connector_id, _ in sessions.values()})
+    fallback = (default_price(),) * HOURS_PER_WEEK
+    return {
+        key: price_energy(tables.get(connector_id, fallback), readings)
+        for key, (connector_id, readings) in sessions.items()
+    }
@@ -419,3 +419,632 @@ class ChargingStationAPITests(APITestCase):
 
         # Verify station was deleted
         self.assertFalse(ChargingStation.objects.filter(id=self.station.id).exists())
+
+
+class RevenueExportTests(APITestCase):
+    """Test cases for the streaming revenue export endpoint"""
+
+    def setUp(self):
+        from payments.models import Transaction, QRPaymentSession, SimpleChargingSession
+        from django.utils import timezone
+
+        self.owner = User.objects.create_user(email='exporter@example.com', password='testpass123')
+        self.customer = User.objects.create_user(email='driver@example.com', password='testpass123')
+        StationOwner.objects.create(user=self.owner, company_name='Export Co')
+        self.station = ChargingStation.objects.create(
+            owner=self.owner.station_owner,
+            name='Export Station',
+            address='1 Export Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.connector = ChargingConnector.objects.create(
+            station=self.station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+
+        transaction = Transaction.objects.create(
+            user=self.customer,
+            transaction_type=Transaction.TransactionType.PAYMENT,
+            status=Transaction.TransactionStatus.COMPLETED,
+            amount=Decimal('150.00'),
+            reference_number='QR-REF-1'
+        )
+        self.qr_session = QRPaymentSession.objects.create(
+            user=self.customer,
+            connector=self.connector,
+            payment_type='amount',
+            amount=Decimal('150.00'),
+            phone_number='+251912345678',
+            status='charging_completed',
+            payment_transaction=transaction,
+            expires_at=timezone.now()
+        )
+        SimpleChargingSession.objects.create(
+            transaction_id='SIMPLE-TX-1',
+            user=self.customer,
+            connector=self.connector,
+            qr_session=self.qr_session,
+            status='completed',
+            energy_consumed_kwh=Decimal('4.000'),
+            cost_per_kwh=Decimal('10.00')
+        )
+        owner_profile = patch(
+            'utils.firestore_repo.firestore_repo.get_station_owner',
+            side_effect=lambda user_id: {'id': str(user_id)} if user_id == self.owner.id else None
+        )
+        owner_profile.start()
+        self.addCleanup(owner_profile.stop)
+        self.client.force_authenticate(user=self.owner)
+
+    def test_csv_export_streams_both_sources(self):
+        response = self.client.get('/api/revenue/export/', {'export_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('Date,Transaction ID'))
+        body = '\n'.join(lines[1:])
+        self.assertIn('QR-REF-1', body)
+        self.assertIn('40.00', body)
+
+    async def test_export_streams_async_chunks_under_asgi(self):
+        import tempfile
+        from asgiref.sync import sync_to_async
+
+        await sync_to_async(self.async_client.force_login)(self.owner)
+        response = await self.async_client.get('/api/revenue/export/', {'export_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.strip().splitlines()), 3)
+        self.assertIn('QR-REF-1', body)
+
+        workbook = tempfile.TemporaryFile()
+        workbook.write(b'x' * 200000)
+        workbook.seek(0)
+        with patch('charging_stations.revenue.write_transactions_xlsx', return_value=workbook):
+            response = await self.async_client.get('/api/revenue/export/', {'export_format': 'xlsx'})
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertTrue(response.is_async)
+        self.assertIn('attachment; filename="transactions_', response['Content-Disposition'])
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 200000)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(workbook.closed)
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get('/api/revenue/export/', {'export_format': 'pdf'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_rejects_malformed_station(self):
+        response = self.client.get('/api/revenue/export/', {'selectedStation': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/revenue/export/', {'selectedStation': str(self.station.id)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_export_requires_station_owner(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get('/api/revenue/export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RevenueLedgerTests(APITestCase):
+    """Test cases for the keyset-paginated revenue ledger"""
+
+    def setUp(self):
+        from payments.models import Transaction, QRPaymentSession, SimpleChargingSession
+        from django.utils import timezone
+        from datetime import timedelta
+
+        self.owner = User.objects.create_user(email='ledger@example.com', password='testpass123')
+        customer = User.objects.create_user(email='ledger-driver@example.com', password='testpass123')
+        StationOwner.objects.create(user=self.owner, company_name='Ledger Co')
+        station = ChargingStation.objects.create(
+            owner=self.owner.station_owner,
+            name='Ledger Station',
+            address='2 Ledger Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+
+        # Five payments and five simple sessions, all on the same day
+        base = timezone.now().replace(hour=12)
+        for i in range(5):
+            transaction = Transaction.objects.create(
+                user=customer,
+                transaction_type=Transaction.TransactionType.PAYMENT,
+                status=Transaction.TransactionStatus.COMPLETED if i % 2 else Transaction.TransactionStatus.PENDING,
+                amount=Decimal('100.00'),
+                reference_number=f'LEDGER-{i}'
+            )
+            qr_session = QRPaymentSession.objects.create(
+                user=customer,
+                connector=connector,
+                payment_type='amount',
+                amount=Decimal('100.00'),
+                phone_number='+251912345678',
+                status='charging_completed',
+                payment_transaction=transaction,
+                expires_at=base
+            )
+            simple = SimpleChargingSession.objects.create(
+                transaction_id=f'LEDGER-SIMPLE-{i}',
+                user=customer,
+                connector=connector,
+                qr_session=qr_session,
+                status='completed',
+                energy_consumed_kwh=Decimal('2.500'),
+                cost_per_kwh=Decimal('10.00')
+            )
+            QRPaymentSession.objects.filter(pk=qr_session.pk).update(created_at=base - timedelta(minutes=2 * i))
+            SimpleChargingSession.objects.filter(pk=simple.pk).update(created_at=base - timedelta(minutes=2 * i + 1))
+
+        owner_profile = patch(
+            'utils.firestore_repo.firestore_repo.get_station_owner',
+            side_effect=lambda user_id: {'id': str(user_id)} if user_id == self.owner.id else None
+        )
+        owner_profile.start()
+        self.addCleanup(owner_profile.stop)
+        self.client.force_authenticate(user=self.owner)
+
+    def test_pages_cover_ledger_in_timestamp_order(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/revenue/ledger/', params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data['transactions'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len({row['id'] for row in seen}), 10)
+        dates = [row['date'] for row in seen]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(seen[0]['type'], 'Charging Payment')
+        self.assertEqual(seen[1]['type'], 'Simple Charging')
+        self.assertEqual(seen[1]['amount'], 25.0)
+
+    def test_filters_by_type_and_status(self):
+        response = self.client.get('/api/revenue/ledger/', {'type': 'payment', 'status': 'completed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['transactions']), 2)
+        self.assertTrue(all(row['status'] == 'Completed' for row in response.data['transactions']))
+
+        response = self.client.get('/api/revenue/ledger/', {'type': 'simple', 'status': 'pending'})
+        self.assertEqual(response.data['transactions'], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/revenue/ledger/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_station_is_rejected(self):
+        response = self.client.get('/api/revenue/ledger/', {'selectedStation': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ledger_requires_station_owner(self):
+        self.client.force_authenticate(user=User.objects.get(email='ledger-driver@example.com'))
+        response = self.client.get('/api/revenue/ledger/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AnalyticsReportSnapshotTests(APITestCase):
+    """Test cases for precomputed analytics report snapshots"""
+
+    def setUp(self):
+        from payments.models import Transaction, QRPaymentSession, SimpleChargingSession
+        from django.utils import timezone
+
+        self.owner = User.objects.create_user(email='analytics@example.com', password='testpass123')
+        self.customer = User.objects.create_user(email='analytics-driver@example.com', password='testpass123')
+        StationOwner.objects.create(user=self.owner, company_name='Analytics Co')
+        station = ChargingStation.objects.create(
+            owner=self.owner.station_owner,
+            name='Analytics Station',
+            address='3 Analytics Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+        transaction = Transaction.objects.create(
+            user=self.customer,
+            transaction_type=Transaction.TransactionType.PAYMENT,
+            status=Transaction.TransactionStatus.COMPLETED,
+            amount=Decimal('120.00'),
+            reference_number='ANALYTICS-1'
+        )
+        self.qr_session = QRPaymentSession.objects.create(
+            user=self.customer,
+            connector=self.connector,
+            payment_type='amount',
+            amount=Decimal('120.00'),
+            phone_number='+251912345678',
+            status='charging_completed',
+            payment_transaction=transaction,
+            expires_at=timezone.now()
+        )
+        SimpleChargingSession.objects.create(
+            transaction_id='ANALYTICS-SIMPLE-1',
+            user=self.customer,
+            connector=self.connector,
+            qr_session=self.qr_session,
+            status='completed',
+            energy_consumed_kwh=Decimal('3.000'),
+            cost_per_kwh=Decimal('10.00')
+        )
+
+    def test_first_request_computes_and_stores_snapshot(self):
+        from .analytics import get_owner_report
+        from .models import AnalyticsReportSnapshot
+
+        report, computed_at = get_owner_report(self.owner, 'Last Year')
+        self.assertEqual(report['totalRevenue'], 150.0)
+        self.assertEqual(report['transactionsCount'], 1)
+        self.assertEqual(report['timeRange'], 'Last Year')
+        self.assertTrue(AnalyticsReportSnapshot.objects.filter(owner=self.owner, time_range='Last Year').exists())
+
+    def test_stale_snapshot_is_served_and_refresh_queued(self):
+        from .analytics import get_owner_report
+        from .models import AnalyticsReportSnapshot
+
+        get_owner_report(self.owner, 'Last 7 Days')
+        AnalyticsReportSnapshot.objects.filter(owner=self.owner).update(payload={'totalRevenue': 1.0})
+
+        # A session event marks the owner's snapshots stale
+        self.qr_session.save()
+        self.assertTrue(AnalyticsReportSnapshot.objects.get(owner=self.owner).is_stale)
+
+        with patch('charging_stations.analytics.schedule_report_refresh') as schedule:
+            report, _ = get_owner_report(self.owner, 'Last 7 Days')
+        self.assertEqual(report, {'totalRevenue': 1.0})
+        schedule.assert_called_once_with(self.owner.id, 'Last 7 Days', 'All Stations')
+
+    def test_saves_of_other_fields_leave_snapshots_fresh(self):
+        from .analytics import get_owner_report
+        from .models import AnalyticsReportSnapshot
+
+        get_owner_report(self.owner, 'Last 7 Days')
+        self.qr_session.save(update_fields=['expires_at', 'updated_at'])
+        self.assertFalse(AnalyticsReportSnapshot.objects.get(owner=self.owner).is_stale)
+
+        self.qr_session.save(update_fields=['status', 'updated_at'])
+        self.assertTrue(AnalyticsReportSnapshot.objects.get(owner=self.owner).is_stale)
+
+    def test_refresh_stale_reports_recomputes(self):
+        from .analytics import get_owner_report, refresh_stale_reports
+        from .models import AnalyticsReportSnapshot
+
+        get_owner_report(self.owner, 'Last 30 Days')
+        AnalyticsReportSnapshot.objects.filter(owner=self.owner).update(is_stale=True, payload={})
+
+        refresh_stale_reports()
+        snapshot = AnalyticsReportSnapshot.objects.get(owner=self.owner)
+        self.assertFalse(snapshot.is_stale)
+        self.assertEqual(snapshot.payload['totalRevenue'], 150.0)
+
+    def test_view_serves_snapshot(self):
+        self.client.force_authenticate(user=self.owner)
+        with patch('utils.firestore_repo.firestore_repo.get_station_owner', return_value={'id': str(self.owner.id)}):
+            response = self.client.get('/api/analytics/reports/', {'time_range': 'Last 90 Days'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totalRevenue'], 150.0)
+        self.assertIn('computedAt', response.data)
+
+    def test_unknown_station_is_rejected_without_a_snapshot(self):
+        from .analytics import UnknownStation, get_owner_report
+        from .models import AnalyticsReportSnapshot
+
+        for selected_station in ('not-my-station', 'x' * 100):
+            with self.assertRaises(UnknownStation):
+                get_owner_report(self.owner, 'Last 7 Days', selected_station)
+        self.assertFalse(AnalyticsReportSnapshot.objects.exists())
+
+        report, _ = get_owner_report(self.owner, 'Last 7 Days', str(self.connector.station_id))
+        self.assertEqual(report['totalRevenue'], 150.0)
+
+        self.client.force_authenticate(user=self.owner)
+        with patch('utils.firestore_repo.firestore_repo.get_station_owner', return_value={'id': str(self.owner.id)}):
+            response = self.client.get('/api/analytics/reports/', {'station': 'not-my-station'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SystemStatsTests(TestCase):
+    """Test cases for the cached admin system statistics"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.admin = User.objects.create_superuser(email='admin-stats@example.com', password='testpass123')
+        owner = User.objects.create_user(email='stats-owner@example.com', password='testpass123')
+        StationOwner.objects.create(user=owner, company_name='Stats Co', verification_status='verified')
+        station = ChargingStation.objects.create(
+            owner=owner.station_owner,
+            name='Stats Station',
+            address='4 Stats Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+
+    def test_stats_are_counted_and_cached(self):
+        from .system_stats import get_system_stats
+
+        stats = get_system_stats()
+        self.assertEqual(stats['total_users'], 2)
+        self.assertEqual(stats['verified_station_owners'], 1)
+        self.assertEqual(stats['pending_station_owners'], 0)
+        self.assertEqual(stats['total_stations'], 1)
+        self.assertEqual(stats['total_connectors'], 1)
+        self.assertNotEqual(stats['database_size'], 'Unknown')
+        self.assertIsNone(stats['firestore_stations'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_system_stats()['total_users'], 2)
+
+    def test_admin_page_renders(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/system-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'System Statistics')
+
+
+class TariffEngineTests(TestCase):
+    """Test cases for compiled time-of-use connector tariffs"""
+
+    def setUp(self):
+        from .models import ConnectorTariff
+
+        owner = User.objects.create_user(email='tariff-owner@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Tariff Co'),
+            name='Tariff Station',
+            address='7 Tariff Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+        self.peak = ConnectorTariff.objects.create(
+            connector=self.connector, name='Peak', price_per_kwh=Decimal('15.00'),
+            weekdays='01234', start_hour=18, end_hour=22
+        )
+        ConnectorTariff.objects.create(
+            connector=self.connector, name='Night', price_per_kwh=Decimal('6.00'),
+            start_hour=22, end_hour=6
+        )
+
+    def _local(self, day, hour, minute=0):
+        from datetime import datetime
+        from zoneinfo import ZoneInfo
+
+        return datetime(2025, 6, day, hour, minute, tzinfo=ZoneInfo('Africa/Addis_Ababa'))
+
+    def test_windows_override_base_price(self):
+        from .tariffs import price_at
+
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 12)), Decimal('10.00'))  # Monday midday
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 19)), Decimal('15.00'))  # Monday peak
+        self.assertEqual(price_at(self.connector.pk, self._local(3, 3)), Decimal('6.00'))  # Night wraps into Tuesday
+        self.assertEqual(price_at(self.connector.pk, self._local(7, 19)), Decimal('10.00'))  # No peak on Saturday
+
+    def test_tables_are_cached_until_a_tariff_changes(self):
+        from django.utils import timezone
+        from .models import ConnectorTariff
+        from .tariffs import price_at
+
+        price_at(self.connector.pk)
+        # Only the version query; the table comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(price_at(self.connector.pk, self._local(2, 19)), Decimal('15.00'))
+
+        self.peak.price_per_kwh = Decimal('20.00')
+        self.peak.save()
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 19)), Decimal('20.00'))
+
+        # A change saved by another worker, whose cache this process never sees cleared
+        ConnectorTariff.objects.filter(pk=self.peak.pk).update(price_per_kwh=Decimal('25.00'), updated_at=timezone.now())
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 19)), Decimal('25.00'))
+        self.peak.delete()
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 19)), Decimal('10.00'))
+
+        self.connector.price_per_kwh = None
+        self.connector.save()
+        self.assertEqual(price_at(self.connector.pk, self._local(2, 12)), Decimal('5.50'))
+
+    def test_sessions_are_priced_per_reading(self):
+        from .tariffs import price_sessions
+
+        costs = price_sessions({
+            'evening': (self.connector.pk, [(self._local(2, 17, 30), Decimal('2')), (self._local(2, 18, 30), Decimal('3'))]),
+            'night': (self.connector.pk, [(self._local(4, 23), '1.5')]),
+            'unknown': (None, [(self._local(2, 12), Decimal('1'))]),
+        })
+        self.assertEqual(costs, {'evening': Decimal('65.00'), 'night': Decimal('9.00'), 'unknown': Decimal('5.50')})
+
+
+class PayoutBatchTests(TestCase):
+    """Test cases for batched station owner payouts"""
+
+    def setUp(self):
+        import tempfile
+        from .models import PayoutMethod, WithdrawalRequest
+        from payments.models import Wallet
+
+        settlement_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(settlement_dir.cleanup)
+        override = self.settings(PAYOUTS={'SETTLEMENT_DIR': settlement_dir.name, 'BATCH_LIMIT': 100})
+        override.enable()
+        self.addCleanup(override.disable)
+
+        def owner(email, balance):
+            user = User.objects.create_user(email=email, password='testpass123')
+            Wallet.objects.create(user=user, balance=Decimal(balance))
+            station_owner = StationOwner.objects.create(user=user, company_name=email.split('@')[0])
+            method = PayoutMethod.objects.create(
+                station_owner=station_owner, account_holder_name=email, bank_name='CBE', account_number='1000123'
+            )
+            return user, station_owner, method
+
+        self.rich_user, rich_owner, rich_method = owner('rich@example.com', '500.00')
+        self.poor_user, poor_owner, poor_method = owner('poor@example.com', '50.00')
+
+        def withdrawal(station_owner, method, amount, status='approved'):
+            return WithdrawalRequest.objects.create(
+                station_owner=station_owner, payout_method=method, amount=Decimal(amount), status=status
+            )
+
+        self.first = withdrawal(rich_owner, rich_method, '200.00')
+        self.second = withdrawal(rich_owner, rich_method, '100.00')
+        self.overdrawn = withdrawal(poor_owner, poor_method, '80.00')
+        self.pending = withdrawal(rich_owner, rich_method, '10.00', status='pending')
+
+    def test_batch_debits_in_bulk_and_writes_settlement_file(self):
+        import csv
+        from payments.models import Wallet
+        from .payouts import create_payout_batch
+
+        batch, report = create_payout_batch()
+        self.assertEqual(report, {'withdrawals': 2, 'amount': Decimal('300.00'), 'insufficient': 1})
+        self.assertEqual(batch.total_amount, Decimal('300.00'))
+        self.assertEqual(Wallet.objects.get(user=self.rich_user).balance, Decimal('200.00'))
+        self.assertEqual(Wallet.objects.get(user=self.poor_user).balance, Decimal('50.00'))
+
+        for withdrawal, expected in ((self.first, 'processing'), (self.overdrawn, 'failed'), (self.pending, 'pending')):
+            withdrawal.refresh_from_db()
+            self.assertEqual(withdrawal.status, expected)
+        self.assertEqual(self.first.batch, batch)
+
+        with open(batch.settlement_file, newline='') as settlement:
+            rows = list(csv.DictReader(settlement))
+        self.assertEqual(
+            sorted(row['withdrawal_reference'] for row in rows),
+            sorted([self.first.reference_number, self.second.reference_number])
+        )
+        self.assertEqual(rows[0]['account'], '1000123')
+
+        self.assertEqual(create_payout_batch(), (None, {'withdrawals': 0, 'amount': Decimal('0'), 'insufficient': 0}))
+
+    def test_settlement_refunds_failed_payouts(self):
+        from payments.models import Wallet
+        from .payouts import create_payout_batch, settle_payout_batch
+
+        batch, _ = create_payout_batch()
+        stats = settle_payout_batch(batch, failed_references=[self.second.reference_number])
+        self.assertEqual(stats, {'completed': 1, 'failed': 1})
+        self.assertEqual(Wallet.objects.get(user=self.rich_user).balance, Decimal('300.00'))
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        batch.refresh_from_db()
+        self.assertEqual((self.first.status, self.second.status), ('completed', 'failed'))
+        self.assertEqual(batch.status, 'settled')
+        self.assertEqual(settle_payout_batch(batch), {'completed': 0, 'failed': 0})
+
+    def test_settlement_rejects_unmatched_failures(self):
+        from payments.models import Transaction, Wallet
+        from .payouts import SettlementError, create_payout_batch, payout_transaction_reference, settle_payout_batch
+
+        batch, _ = create_payout_batch()
+        with self.assertRaises(SettlementError):
+            settle_payout_batch(batch, failed_references=['WR-UNKNOWN'])
+
+        Transaction.objects.filter(reference_number=payout_transaction_reference(self.second)).delete()
+        with self.assertRaises(SettlementError):
+            settle_payout_batch(batch, failed_references=[self.second.reference_number])
+
+        batch.refresh_from_db()
+        self.first.refresh_from_db()
+        self.assertEqual(batch.status, 'processing')
+        self.assertEqual(self.first.status, 'processing')
+        self.assertEqual(Wallet.objects.get(user=self.rich_user).balance, Decimal('200.00'))
+
+    def test_firestore_withdrawals_join_batch_with_their_held_funds(self):
+        from payments.models import Transaction
+        from utils.firestore_repo import firestore_repo
+        from .payouts import create_payout_batch
+
+        held = Transaction.objects.create(
+            user=self.poor_user, transaction_type='withdrawal', status='pending',
+            amount=Decimal('40.00'), reference_number='WD-fsdoc123'
+        )
+        firestore_withdrawal = {
+            'id': 'fsdoc1234567', 'owner_id': str(self.poor_user.id), 'amount': 40.0, 'status': 'approved',
+            'payment_method_snapshot': {'method_type': 'mobile_money', 'phone_number': '0911000000'}
+        }
+        with patch.object(firestore_repo, 'db', Mock()), \
+                patch.object(firestore_repo, 'list_withdrawals', return_value=[firestore_withdrawal]), \
+                patch.object(firestore_repo, 'write_payout_batch') as write_payout_batch:
+            batch, report = create_payout_batch()
+
+        self.assertEqual(report['withdrawals'], 3)
+        self.assertEqual(batch.total_amount, Decimal('340.00'))
+        self.assertEqual(batch.firestore_withdrawals[0]['transaction_id'], str(held.pk))
+        held.refresh_from_db()
+        self.assertEqual(held.status, 'processing')
+
+        batch_id, batch_data, withdrawal_updates = write_payout_batch.call_args[0]
+        self.assertEqual(batch_data['reference_number'], batch.reference_number)
+        self.assertEqual(withdrawal_updates['fsdoc1234567']['status'], 'processing')
+
+    def test_firestore_withdrawals_are_read_under_the_batch_lock(self):
+        from .payouts import approved_firestore_withdrawals, create_payout_batch
+
+        steps = []
+
+        def read_withdrawals():
+            steps.append('read')
+            return approved_firestore_withdrawals()
+
+        with patch('charging_stations.payouts.approved_firestore_withdrawals', side_effect=read_withdrawals), \
+                patch('charging_stations.payouts._lock_batch_creation', side_effect=lambda: steps.append('lock')):
+            create_payout_batch()
+        self.assertEqual(steps, ['lock', 'read'])
+
+    def test_withdrawals_of_settled_batches_are_not_batched_again(self):
+        from utils.firestore_repo import firestore_repo
+        from .models import PayoutBatch
+        from .payouts import approved_firestore_withdrawals
+
+        PayoutBatch.objects.create(
+            reference_number='PB-OLD', status=PayoutBatch.BatchStatus.SETTLED,
+            firestore_withdrawals=[{'id': 'fsdoc1234567', 'owner_id': str(self.poor_user.id), 'amount': 40.0}]
+        )
+        # The mirror of the settled batch failed, so Firestore still reports the withdrawal as approved
+        stale = {'id': 'fsdoc1234567', 'owner_id': str(self.poor_user.id), 'amount': 40.0, 'status': 'approved'}
+        with patch.object(firestore_repo, 'db', Mock()), \
+                patch.object(firestore_repo, 'list_withdrawals', return_value=[stale]):
+            self.assertEqual(approved_firestore_withdrawals(), [])
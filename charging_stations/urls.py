@@ -50,7 +50,9 @@ from .dashboard_views import (
     MarkAllNotificationsReadView,
     AnalyticsReportsView,
     RevenueTransactionsView,
-    RevenueDetailView
+    RevenueDetailView,
+    RevenueExportView,
+    RevenueLedgerView
 )
 
 app_name = 'charging_stations'
@@ -83,6 +85,8 @@ urlpatterns = [
     path('analytics/reports/', AnalyticsReportsView.as_view(), name='analytics-reports'),
     path('revenue/transactions/', RevenueTransactionsView.as_view(), name='revenue-transactions'),
     path('revenue/details/', RevenueDetailView.as_view(), name='revenue-details'),
+    path('revenue/export/', RevenueExportView.as_view(), name='revenue-export'),
+    path('revenue/ledger/', RevenueLedgerView.as_view(), name='revenue-ledger'),
     path('notifications/', NotificationsView.as_view(), name='notifications'),
     path('notifications/<int:notification_id>/mark-read/', MarkNotificationReadView.as_view(), name='mark-notification-read'),
     path('notifications/mark-all-read/', MarkAllNotificationsReadView.as_view(), name='mark-all-notifications-read'),
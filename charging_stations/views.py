@@ -11,6 +11,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
+from django.db import transaction as db_transaction
 from math import cos, radians
 from .models import (
     StationOwner, ChargingStation, StationImage, ChargingConnector,
@@ -928,105 +929,48 @@ class StationOwnerReviewsView(generics.ListAPIView):
 
 
 class MobileChargingHistoryView(APIView):
-    """Simplified charging history view for mobile users"""
+    """Simplified charging history view for mobile users, a page at a time"""
 
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [TokenAuthentication, SessionAuthentication]
 
+    DEFAULT_PAGE_SIZE = 20
+
     def get(self, request):
-        try:
-            all_sessions = []
+        from payments.history import mobile_history, history_page
+        from utils.keyset import decode_cursor, InvalidCursor
+        from .tariffs import price_sessions
 
-            # Get QR Payment Sessions (most common for mobile app)
-            try:
-                from payments.models import QRPaymentSession
-
-                # Get QR sessions with completed payments and charging
-                qr_sessions = QRPaymentSession.objects.filter(
-                    user=request.user,
-                    status__in=['charging_completed', 'charging_started', 'payment_completed']
-                ).select_related(
-                    'connector__station',
-                    'payment_transaction',
-                    'simple_charging_session'
-                ).order_by('-created_at')[:20]  # Reduced limit for debugging
-
-                for qr_session in qr_sessions:
-                    try:
-                        # Calculate duration and cost
-                        duration_seconds = 0
-                        energy_kwh = 0.0
-                        final_cost = 0.0
-                        start_time = None
-                        stop_time = None
-
-                        # Get data from simple charging session if available
-                        if hasattr(qr_session, 'simple_charging_session') and qr_session.simple_charging_session:
-                            charging_session = qr_session.simple_charging_session
-                            duration_seconds = charging_session.duration_seconds or 0
-                            energy_kwh = float(charging_session.energy_delivered_kwh or 0)
-                            start_time = charging_session.start_time
-                            stop_time = charging_session.stop_time
-
-                            # Calculate duration if not stored
-                            if start_time and stop_time and not duration_seconds:
-                                duration_seconds = int((stop_time - start_time).total_seconds())
-
-                        # Calculate cost based on energy and connector price
-                        if energy_kwh > 0 and qr_session.connector and qr_session.connector.price_per_kwh:
-                            final_cost = energy_kwh * float(qr_session.connector.price_per_kwh)
-                        elif qr_session.payment_transaction:
-                            final_cost = float(qr_session.payment_transaction.amount)
-
-                        # Format duration for display
-                        duration_minutes = duration_seconds // 60 if duration_seconds else 0
-
-                        # Safe access to connector and station data
-                        station_name = qr_session.connector.station.name if qr_session.connector and qr_session.connector.station else 'Unknown Station'
-                        station_address = qr_session.connector.station.address if qr_session.connector and qr_session.connector.station else 'Unknown Location'
-                        station_city = qr_session.connector.station.city if qr_session.connector and qr_session.connector.station else 'Unknown City'
-                        connector_type = qr_session.connector.get_connector_type_display() if qr_session.connector else 'Unknown'
-                        connector_power = f"{qr_session.connector.power_kw} kW" if qr_session.connector else 'Unknown'
-
-                        session_data = {
-                            'id': str(qr_session.id),
-                            'transaction_id': qr_session.session_token,
-                            'station_name': station_name,
-                            'station_address': station_address,
-                            'station_city': station_city,
-                            'connector_type': connector_type,
-                            'connector_power': connector_power,
-                            'start_time': start_time.isoformat() if start_time else qr_session.created_at.isoformat(),
-                            'stop_time': stop_time.isoformat() if stop_time else None,
-                            'energy_consumed_kwh': f"{energy_kwh:.3f}",
-                            'final_cost': f"{final_cost:.2f}",
-                            'currency': 'ETB',
-                            'status': 'CHARGING_COMPLETED' if qr_session.status == 'charging_completed' else 'COMPLETED',
-                            'payment_status': 'completed' if qr_session.payment_transaction else 'pending',
-                            'duration_minutes': duration_minutes,
-                            'duration_seconds': duration_seconds,
-                            'payment_method': 'QR Code',
-                            'payment_amount': str(qr_session.payment_transaction.amount) if qr_session.payment_transaction else '0.00',
-                            'created_at': qr_session.created_at.isoformat(),
-                        }
-                        all_sessions.append(session_data)
-                    except Exception as session_error:
-                        # Skip problematic sessions but continue processing
-                        continue
-
-            except ImportError:
-                pass
-            except Exception as qr_error:
-                # Log QR session error but continue
-                pass
+        try:
+            after = decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+            limit = int(request.GET.get('limit', self.DEFAULT_PAGE_SIZE))
+        except (InvalidCursor, ValueError) as e:
+            return Response({
+                'success': False,
+                'error': str(e),
+                'results': [],
+                'count': 0
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Sort all sessions by creation date (newest first)
-            all_sessions.sort(key=lambda x: x['created_at'], reverse=True)
+        try:
+            rows, next_cursor = history_page(mobile_history(request.user), after=after, limit=limit)
+            connector_types = dict(ChargingConnector.ConnectorType.choices)
+            # Price the energy of the whole page in one pass
+            energy_costs = price_sessions({
+                row['id']: (row['connector_id'], [(
+                    row['simple_charging_session__start_time'] or row['created_at'],
+                    row['simple_charging_session__energy_delivered_kwh']
+                )])
+                for row in rows if row['simple_charging_session__energy_delivered_kwh']
+            })
+            results = [self._session_data(row, connector_types, energy_costs.get(row['id'])) for row in rows]
 
             return Response({
                 'success': True,
-                'results': all_sessions,
-                'count': len(all_sessions)
+                'results': results,
+                'count': len(results),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             })
 
         except Exception as e:
@@ -1037,6 +981,48 @@ class MobileChargingHistoryView(APIView):
                 'count': 0
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _session_data(row, connector_types, energy_cost=None):
+        duration_seconds = row['simple_charging_session__duration_seconds'] or 0
+        energy_kwh = float(row['simple_charging_session__energy_delivered_kwh'] or 0)
+        start_time = row['simple_charging_session__start_time']
+        stop_time = row['simple_charging_session__stop_time']
+
+        # Calculate duration if not stored
+        if start_time and stop_time and not duration_seconds:
+            duration_seconds = int((stop_time - start_time).total_seconds())
+
+        # Cost of the energy delivered at the connector's tariff, otherwise what was paid
+        payment_amount = row['payment_transaction__amount']
+        final_cost = 0.0
+        if energy_cost is not None:
+            final_cost = float(energy_cost)
+        elif payment_amount is not None:
+            final_cost = float(payment_amount)
+
+        connector_type = row['connector__connector_type']
+        return {
+            'id': str(row['id']),
+            'transaction_id': row['session_token'],
+            'station_name': row['connector__station__name'] or 'Unknown Station',
+            'station_address': row['connector__station__address'] or 'Unknown Location',
+            'station_city': row['connector__station__city'] or 'Unknown City',
+            'connector_type': connector_types.get(connector_type, connector_type or 'Unknown'),
+            'connector_power': f"{row['connector__power_kw']} kW" if row['connector__power_kw'] is not None else 'Unknown',
+            'start_time': (start_time or row['created_at']).isoformat(),
+            'stop_time': stop_time.isoformat() if stop_time else None,
+            'energy_consumed_kwh': f"{energy_kwh:.3f}",
+            'final_cost': f"{final_cost:.2f}",
+            'currency': 'ETB',
+            'status': 'CHARGING_COMPLETED' if row['status'] == 'charging_completed' else 'COMPLETED',
+            'payment_status': 'completed' if row['payment_transaction_id'] else 'pending',
+            'duration_minutes': duration_seconds // 60 if duration_seconds else 0,
+            'duration_seconds': duration_seconds,
+            'payment_method': 'QR Code',
+            'payment_amount': str(payment_amount) if payment_amount is not None else '0.00',
+            'created_at': row['created_at'].isoformat(),
+        }
+
 
 class StationOwnerSettingsView(generics.RetrieveUpdateAPIView):
     """View to manage station owner settings"""
@@ -1288,6 +1274,7 @@ class StationOwnerRepliesView(generics.ListAPIView):
 
 
 from .serializers import FirestoreAvailableStationSerializer
+from ocpp_integration.connector_state import connector_states
 
 class AvailableStationsView(generics.ListAPIView):
     """View to fetch only available charging stations with real-time data"""
@@ -1307,8 +1294,12 @@ class AvailableStationsView(generics.ListAPIView):
             'status': 'operational'
         }
         stations = firestore_repo.list_stations(filters=filters)
-        
-        # 2. Filter available_connectors > 0
+
+        # 2. Prefer the live OCPP counts over the stored ones, then keep stations with a free connector
+        for station in stations:
+            live = connector_states.station_availability(station.get('id'))
+            if live is not None:
+                station['available_connectors'], station['total_connectors'] = live
         stations = [s for s in stations if s.get('available_connectors', 0) > 0]
         
         # 3. Filter by Connector Type (Optional - In Memory, requires fetching connectors or assuming we optimize later)
@@ -1530,12 +1521,13 @@ class WithdrawalRequestView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
             # Check available balance from wallet system
-            from payments.models import Wallet, WalletTransaction, Transaction
+            from payments.models import Transaction
+            from payments import wallet_ledger
             
             # Create wallet if it doesn't exist
-            wallet, created = Wallet.objects.get_or_create(user=request.user)
+            wallet = wallet_ledger.get_or_create_wallet(request.user)
 
-            if wallet.balance < float(amount):
+            if wallet.balance < amount:
                 return Response({
                     'success': False,
                     'error': f'Insufficient balance. Available: {wallet.balance} ETB'
@@ -1551,31 +1543,32 @@ class WithdrawalRequestView(APIView):
             withdrawal_id = withdrawal['id']
             
             # Deduct from Wallet (SQL Transaction)
-            # Create a Transaction object for the withdrawal
-            withdrawal_transaction = Transaction.objects.create(
-                user=request.user,
-                amount=float(amount),
-                currency='ETB',
-                transaction_type='withdrawal',
-                status='pending',
-                reference_number=f"WD-{withdrawal_id[:8]}", # Use Firestore ID segment
-                description=f'Withdrawal request {withdrawal_id}'
-            )
-
-            balance_before = wallet.balance
-            wallet.balance -= float(amount)
-            balance_after = wallet.balance
-            wallet.save()
-            
-            WalletTransaction.objects.create(
-                wallet=wallet,
-                transaction=withdrawal_transaction,
-                transaction_type=WalletTransaction.TransactionType.DEBIT,
-                amount=float(amount),
-                balance_before=balance_before,
-                balance_after=balance_after,
-                description=f'Withdrawal request {withdrawal_id}'
-            )
+            # The balance check above can race with another withdrawal; the ledger debit is the authoritative one
+            try:
+                with db_transaction.atomic():
+                    withdrawal_transaction = Transaction.objects.create(
+                        user=request.user,
+                        amount=amount,
+                        currency='ETB',
+                        transaction_type='withdrawal',
+                        status='pending',
+                        reference_number=f"WD-{withdrawal_id[:8]}", # Use Firestore ID segment
+                        description=f'Withdrawal request {withdrawal_id}'
+                    )
+                    wallet_ledger.debit(
+                        request.user, amount, withdrawal_transaction,
+                        description=f'Withdrawal request {withdrawal_id}'
+                    )
+            except wallet_ledger.InsufficientBalance:
+                firestore_repo.update_withdrawal(withdrawal_id, {
+                    'status': 'rejected',
+                    'admin_notes': 'Insufficient wallet balance'
+                })
+                wallet.refresh_from_db()
+                return Response({
+                    'success': False,
+                    'error': f'Insufficient balance. Available: {wallet.balance} ETB'
+                }, status=status.HTTP_400_BAD_REQUEST)
 
             # Send notification (skipped for brevity or can use existing logic if adapted)
 
@@ -2,6 +2,10 @@
 ASGI config for mengedmate project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections under ``OCPP_CENTRAL_SYSTEM['PATH_PREFIX']`` go to the
+OCPP 1.6J central system; everything else is served by Django. Views that
+stream large bodies must give Django async iterators under ASGI (see
+utils/asgi_streaming.py), or the handler buffers the whole body.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/dev/howto/deployment/asgi/
@@ -9,8 +13,17 @@ https://docs.djangoproject.com/en/dev/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mengedmate.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from ocpp_integration.central_system import central_system  # noqa: E402  (needs apps loaded)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket' and scope['path'].startswith(settings.OCPP_CENTRAL_SYSTEM['PATH_PREFIX']):
+        return await central_system(scope, receive, send)
+    return await django_application(scope, receive, send)
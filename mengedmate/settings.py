@@ -437,7 +437,7 @@ CHAPA_SETTINGS = {
     'CALLBACK_URL': f'{API_BASE_URL}/payments/callback/',
     'RETURN_URL': f'{API_BASE_URL}/api/payments/mobile-return/',
     'WEB_RETURN_URL': f'{FRONTEND_URL}/payment/success',
-    'SANDBOX_URL': 'https://api.chapa.co',
+    'SANDBOX_URL': os.environ.get('CHAPA_SANDBOX_URL', 'https://api.chapa.co'),
     'PRODUCTION_URL': 'https://api.chapa.co',
     'USE_SANDBOX': os.environ.get('CHAPA_USE_SANDBOX', 'True').lower() == 'true',
 }
@@ -449,4 +449,148 @@ OCPP_SETTINGS = {
     'API_KEY': os.environ.get('OCPP_API_KEY', ''),
     'TIMEOUT': int(os.environ.get('OCPP_TIMEOUT', '30')),
     'RETRY_ATTEMPTS': int(os.environ.get('OCPP_RETRY_ATTEMPTS', '3')),
-}
\ No newline at end of file
+    'SYNC_WORKERS': int(os.environ.get('OCPP_SYNC_WORKERS', '8')),
+    'UTILIZATION_REBUILD_INTERVAL_SECONDS': int(os.environ.get('OCPP_UTILIZATION_REBUILD_INTERVAL_SECONDS', '900')),
+}
+# In-process background job scheduler (see utils/scheduler.py)
+BACKGROUND_JOBS = {
+    'AUTOSTART': os.environ.get('BACKGROUND_JOBS_AUTOSTART', 'False').lower() == 'true',
+    'MAX_WORKERS': int(os.environ.get('BACKGROUND_JOBS_MAX_WORKERS', '2')),
+    'TICK_SECONDS': int(os.environ.get('BACKGROUND_JOBS_TICK_SECONDS', '5')),
+}
+
+ANALYTICS_SETTINGS = {
+    'REPORT_MAX_AGE_SECONDS': int(os.environ.get('ANALYTICS_REPORT_MAX_AGE_SECONDS', '900')),
+    'PRECOMPUTE_INTERVAL_SECONDS': int(os.environ.get('ANALYTICS_PRECOMPUTE_INTERVAL_SECONDS', '3600')),
+    'STALE_REFRESH_INTERVAL_SECONDS': int(os.environ.get('ANALYTICS_STALE_REFRESH_INTERVAL_SECONDS', '60')),
+}
+
+# How long the admin dashboard statistics are cached
+ADMIN_STATS_CACHE_SECONDS = int(os.environ.get('ADMIN_STATS_CACHE_SECONDS', '60'))
+
+# Pooled outbound HTTP client used for Chapa and OCPP calls (see utils/http_client.py)
+OUTBOUND_HTTP = {
+    'POOL_CONNECTIONS': int(os.environ.get('OUTBOUND_HTTP_POOL_CONNECTIONS', '10')),
+    'POOL_MAXSIZE': int(os.environ.get('OUTBOUND_HTTP_POOL_MAXSIZE', '20')),
+    'CONNECT_TIMEOUT': float(os.environ.get('OUTBOUND_HTTP_CONNECT_TIMEOUT', '5')),
+    'READ_TIMEOUT': float(os.environ.get('OUTBOUND_HTTP_READ_TIMEOUT', '30')),
+    'RETRIES': int(os.environ.get('OUTBOUND_HTTP_RETRIES', '2')),
+    'BACKOFF_BASE_SECONDS': float(os.environ.get('OUTBOUND_HTTP_BACKOFF_BASE_SECONDS', '0.5')),
+    'BACKOFF_MAX_SECONDS': float(os.environ.get('OUTBOUND_HTTP_BACKOFF_MAX_SECONDS', '8')),
+}
+
+# Chapa callback queue (see payments/callback_queue.py). WORKERS=0 processes callbacks inline.
+CALLBACK_QUEUE = {
+    'WORKERS': int(os.environ.get('CALLBACK_QUEUE_WORKERS', '4')),
+    'MAX_ATTEMPTS': int(os.environ.get('CALLBACK_QUEUE_MAX_ATTEMPTS', '5')),
+    'STALE_AFTER_SECONDS': int(os.environ.get('CALLBACK_QUEUE_STALE_AFTER_SECONDS', '300')),
+    'DRAIN_INTERVAL_SECONDS': int(os.environ.get('CALLBACK_QUEUE_DRAIN_INTERVAL_SECONDS', '60')),
+}
+
+# Station owner credit reconciliation (see payments/reconciliation.py)
+RECONCILIATION_SETTINGS = {
+    'CHUNK_SIZE': int(os.environ.get('RECONCILIATION_CHUNK_SIZE', '500')),
+}
+
+# Verification sweep for pending payments whose callback never arrived (see payments/verification_sweep.py).
+# INTERVAL_SECONDS=0 leaves it to the verify_pending_payments command.
+PAYMENT_VERIFICATION = {
+    'MIN_AGE_SECONDS': int(os.environ.get('PAYMENT_VERIFICATION_MIN_AGE_SECONDS', '300')),
+    'MAX_AGE_SECONDS': int(os.environ.get('PAYMENT_VERIFICATION_MAX_AGE_SECONDS', str(2 * 24 * 3600))),
+    'PAGE_SIZE': int(os.environ.get('PAYMENT_VERIFICATION_PAGE_SIZE', '200')),
+    'WORKERS': int(os.environ.get('PAYMENT_VERIFICATION_WORKERS', '8')),
+    'RATE_PER_SECOND': float(os.environ.get('PAYMENT_VERIFICATION_RATE_PER_SECOND', '5')),
+    'INTERVAL_SECONDS': int(os.environ.get('PAYMENT_VERIFICATION_INTERVAL_SECONDS', '300')),
+}
+
+# QR payment session expiry sweeper (see payments/session_expiry.py)
+QR_SESSION_EXPIRY = {
+    'CHARGING_MAX_SECONDS': int(os.environ.get('QR_SESSION_CHARGING_MAX_SECONDS', str(12 * 3600))),
+    'BATCH_SIZE': int(os.environ.get('QR_SESSION_EXPIRY_BATCH_SIZE', '500')),
+    'INTERVAL_SECONDS': int(os.environ.get('QR_SESSION_EXPIRY_INTERVAL_SECONDS', '60')),
+}
+
+# Connector tariffs (see charging_stations/tariffs.py). DEFAULT_PRICE_PER_KWH prices connectors without a price;
+# time-of-use windows are read in TIME_ZONE.
+TARIFFS = {
+    'DEFAULT_PRICE_PER_KWH': os.environ.get('TARIFF_DEFAULT_PRICE_PER_KWH', '5.50'),
+    'TIME_ZONE': os.environ.get('TARIFF_TIME_ZONE', 'Africa/Addis_Ababa'),
+    'CACHE_SECONDS': int(os.environ.get('TARIFF_CACHE_SECONDS', '3600')),
+}
+
+# Station owner payout batches (see charging_stations/payouts.py)
+PAYOUTS = {
+    'SETTLEMENT_DIR': os.environ.get('PAYOUT_SETTLEMENT_DIR', str(BASE_DIR / 'settlements')),
+    'BATCH_LIMIT': int(os.environ.get('PAYOUT_BATCH_LIMIT', '2000')),
+}
+
+# OCPP 1.6J central system (see ocpp_integration/central_system.py). Chargers connect to PATH_PREFIX<charge point id>;
+# DB_WORKERS bounds the threads doing database work for all connections. With AUTHORIZATION_KEY set, chargers must send it
+# as HTTP Basic auth (OCPP 1.6 Security Profile 1). A USER_ idTag without an unused payment needs MIN_WALLET_BALANCE ETB.
+OCPP_CENTRAL_SYSTEM = {
+    'PATH_PREFIX': os.environ.get('OCPP_CENTRAL_SYSTEM_PATH_PREFIX', '/ocpp/'),
+    'HEARTBEAT_INTERVAL': int(os.environ.get('OCPP_HEARTBEAT_INTERVAL', '300')),
+    'DB_WORKERS': int(os.environ.get('OCPP_CENTRAL_SYSTEM_DB_WORKERS', '16')),
+    'AUTHORIZATION_KEY': os.environ.get('OCPP_AUTHORIZATION_KEY', ''),
+    'MIN_WALLET_BALANCE': os.environ.get('OCPP_MIN_WALLET_BALANCE', '100.00'),
+}
+
+# Buffered meter value ingestion (see ocpp_integration/meter_ingest.py). FLUSH_INTERVAL_SECONDS=0 writes inline;
+# MAX_BUFFERED rows makes producers flush synchronously.
+METER_INGEST = {
+    'BATCH_SIZE': int(os.environ.get('METER_INGEST_BATCH_SIZE', '1000')),
+    'FLUSH_INTERVAL_SECONDS': float(os.environ.get('METER_INGEST_FLUSH_INTERVAL_SECONDS', '2')),
+    'MAX_BUFFERED': int(os.environ.get('METER_INGEST_MAX_BUFFERED', '20000')),
+}
+
+# Meter value compaction (see ocpp_integration/meter_archive.py). Sessions finished MIN_AGE_HOURS ago are archived;
+# INTERVAL_SECONDS=0 leaves it to the compact_meter_values command.
+METER_ARCHIVE = {
+    'MIN_AGE_HOURS': int(os.environ.get('METER_ARCHIVE_MIN_AGE_HOURS', '48')),
+    'BATCH_SIZE': int(os.environ.get('METER_ARCHIVE_BATCH_SIZE', '200')),
+    'INTERVAL_SECONDS': int(os.environ.get('METER_ARCHIVE_INTERVAL_SECONDS', '3600')),
+}
+
+# OCPP status/progress webhook coalescing (see ocpp_integration/webhook_coalescer.py). WINDOW_SECONDS=0 applies inline.
+OCPP_WEBHOOKS = {
+    'WINDOW_SECONDS': float(os.environ.get('OCPP_WEBHOOK_WINDOW_SECONDS', '1')),
+}
+
+# Live connector state (see ocpp_integration/connector_state.py). Station availability is pushed to SQL and Firestore
+# at most once per DEBOUNCE_SECONDS; 0 pushes on every change.
+CONNECTOR_STATE = {
+    'DEBOUNCE_SECONDS': float(os.environ.get('CONNECTOR_STATE_DEBOUNCE_SECONDS', '5')),
+}
+
+# Live session progress stream (see ocpp_integration/session_stream.py). Streams are only held open under ASGI;
+# watched sessions are re-read every POLL_SECONDS (0 disables) to pick up updates handled by other workers.
+SESSION_STREAM = {
+    'KEEPALIVE_SECONDS': int(os.environ.get('SESSION_STREAM_KEEPALIVE_SECONDS', '15')),
+    'MAX_STREAM_SECONDS': int(os.environ.get('SESSION_STREAM_MAX_SECONDS', '3600')),
+    'QUEUE_SIZE': int(os.environ.get('SESSION_STREAM_QUEUE_SIZE', '32')),
+    'POLL_SECONDS': float(os.environ.get('SESSION_STREAM_POLL_SECONDS', '2')),
+    'RETRY_SECONDS': int(os.environ.get('SESSION_STREAM_RETRY_SECONDS', '5')),
+    'LATEST_TTL_SECONDS': int(os.environ.get('SESSION_STREAM_LATEST_TTL_SECONDS', '900')),
+}
+
+# OCPP event log (see ocpp_integration/log_writer.py and log_archive.py). FLUSH_INTERVAL_SECONDS=0 writes inline.
+# Rows older than RETENTION_DAYS are moved to gzipped JSON Lines files in ARCHIVE_DIR.
+OCPP_LOGS = {
+    'BATCH_SIZE': int(os.environ.get('OCPP_LOG_BATCH_SIZE', '500')),
+    'FLUSH_INTERVAL_SECONDS': float(os.environ.get('OCPP_LOG_FLUSH_INTERVAL_SECONDS', '2')),
+    'MAX_BUFFERED': int(os.environ.get('OCPP_LOG_MAX_BUFFERED', '10000')),
+    'RETENTION_DAYS': int(os.environ.get('OCPP_LOG_RETENTION_DAYS', '30')),
+    'ARCHIVE_DIR': os.environ.get('OCPP_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archives', 'ocpp_logs')),
+    'ARCHIVE_BATCH_SIZE': int(os.environ.get('OCPP_LOG_ARCHIVE_BATCH_SIZE', '5000')),
+    'ARCHIVE_INTERVAL_SECONDS': int(os.environ.get('OCPP_LOG_ARCHIVE_INTERVAL_SECONDS', '86400')),
+}
+
+# Station liveness (see ocpp_integration/liveness.py). Heartbeats are written every FLUSH_INTERVAL_SECONDS (0 writes
+# inline); stations silent for MISSED_HEARTBEATS heartbeat intervals are marked offline by a sweep every
+# SWEEP_INTERVAL_SECONDS.
+STATION_LIVENESS = {
+    'FLUSH_INTERVAL_SECONDS': float(os.environ.get('STATION_LIVENESS_FLUSH_INTERVAL_SECONDS', '30')),
+    'BATCH_SIZE': int(os.environ.get('STATION_LIVENESS_BATCH_SIZE', '500')),
+    'MISSED_HEARTBEATS': int(os.environ.get('STATION_LIVENESS_MISSED_HEARTBEATS', '3')),
+    'SWEEP_INTERVAL_SECONDS': int(os.environ.get('STATION_LIVENESS_SWEEP_INTERVAL_SECONDS', '30')),
+}
@@ -24,7 +24,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from django.views.decorators.csrf import csrf_exempt
 from charging_stations.home_views import HomeView, AppConfigView
-from charging_stations.admin_views import DatabaseBackupView
+from charging_stations.admin_views import DatabaseBackupView, system_stats_view
 
 # Simple test view with explicit permission
 @api_view(['GET', 'POST'])
@@ -123,8 +123,10 @@ urlpatterns = [
 
     path("docs/", include("docs.urls")),
 
-    path("admin/", admin.site.urls),
+    # Must come before admin.site.urls, whose catch-all view would otherwise match them
     path("admin/database-backup/", DatabaseBackupView.as_view(), name="database-backup"),
+    path("admin/system-stats/", system_stats_view, name="system-stats"),
+    path("admin/", admin.site.urls),
 
     path("health/", health_check, name="health"),
 
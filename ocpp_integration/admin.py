@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import OCPPStation, OCPPConnector, ChargingSession, SessionMeterValue, OCPPLog
+from .models import OCPPStation, OCPPConnector, ChargingSession, SessionMeterValue, SessionMeterArchive, OCPPLog
 
 
 @admin.register(OCPPStation)
@@ -112,6 +112,15 @@ class SessionMeterValueAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(SessionMeterArchive)
+class SessionMeterArchiveAdmin(admin.ModelAdmin):
+    list_display = ['charging_session', 'sample_count', 'started_at', 'created_at']
+    search_fields = ['charging_session__transaction_id']
+    readonly_fields = ['charging_session', 'started_at', 'series', 'sample_count', 'created_at']
+    exclude = ['data']
+    date_hierarchy = 'created_at'
+
+
 @admin.register(OCPPLog)
 class OCPPLogAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'level', 'ocpp_station', 'charging_session', 'action', 'message_type', 'message']
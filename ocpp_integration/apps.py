@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class OcppIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ocpp_integration'
+
+    def ready(self):
+        from utils.scheduler import scheduler
+        from . import liveness, log_archive, meter_archive, utilization
+
+        utilization.register_jobs(scheduler)
+        meter_archive.register_jobs(scheduler)
+        log_archive.register_jobs(scheduler)
+        liveness.register_jobs(scheduler)
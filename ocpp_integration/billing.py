@@ -0,0 +1,110 @@
+"""
+Final billing for OCPP charging sessions.
+
+A session's energy comes from its Energy.Active.Import.Register meter values,
+raw or compacted into its SessionMeterArchive. Each increase between
+consecutive readings is priced at the connector tariff in force when it was
+metered (charging_stations.tariffs). Sessions without register readings are
+priced from ``energy_consumed_kwh`` at their start time.
+``bill_sessions`` prices each batch with one meter value query and one tariff
+lookup, and writes ``final_cost`` with a single bulk_update.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from charging_stations.tariffs import price_sessions
+from .meter_archive import archived_samples
+from .models import ChargingSession, SessionMeterValue
+
+logger = logging.getLogger(__name__)
+
+ENERGY_MEASURAND = SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER
+BILLING_FIELDS = ('id', 'start_time', 'created_at', 'meter_start', 'energy_consumed_kwh', 'ocpp_connector__charging_connector')
+
+
+def _register_kwh(value, unit):
+    # OCPP reports the energy register in Wh unless a unit says otherwise
+    return value if unit == 'kWh' else value / 1000
+
+
+def energy_readings(sessions):
+    """
+    ``(timestamp, kwh)`` increments per session id, from the energy register.
+
+    ``sessions`` are rows with the BILLING_FIELDS. A session with no register
+    readings gets its whole ``energy_consumed_kwh`` at its start time.
+    """
+    registers = defaultdict(list)
+    meter_values = SessionMeterValue.objects.filter(
+        charging_session__in=[session['id'] for session in sessions], measurand=ENERGY_MEASURAND
+    ).order_by('charging_session', 'timestamp').values_list('charging_session', 'timestamp', 'value', 'unit')
+    for session_id, timestamp, value, unit in meter_values.iterator(chunk_size=5000):
+        registers[session_id].append((timestamp, _register_kwh(value, unit)))
+    compacted = [session['id'] for session in sessions if session['id'] not in registers]
+    for session_id, timestamp, _, value, unit in archived_samples(compacted, [ENERGY_MEASURAND]):
+        registers[session_id].append((timestamp, _register_kwh(value, unit)))
+
+    readings = {}
+    for session in sessions:
+        points = registers.get(session['id'])
+        if not points:
+            readings[session['id']] = [(session['start_time'] or session['created_at'], session['energy_consumed_kwh'])]
+            continue
+
+        # meter_start is the register at StartTransaction (Wh); 0 means the charger did not report it
+        if session['meter_start']:
+            points = [(points[0][0], Decimal(session['meter_start']) / 1000)] + points
+        # A register that went backwards was reset; skip that step
+        readings[session['id']] = [
+            (at, current - previous)
+            for (_, previous), (at, current) in zip(points, points[1:])
+            if current > previous
+        ]
+    return readings
+
+
+def final_costs(sessions):
+    """Cost of each session in ``sessions`` (rows with the BILLING_FIELDS), keyed by session id."""
+    readings = energy_readings(sessions)
+    return price_sessions({
+        session['id']: (session['ocpp_connector__charging_connector'], readings[session['id']])
+        for session in sessions
+    })
+
+
+def bill_sessions(queryset=None, batch_size=500, dry_run=False):
+    """
+    Write ``final_cost`` for completed sessions, ``batch_size`` at a time.
+
+    By default only completed sessions that have no final cost yet are billed.
+    Returns counts of ``billed`` sessions and the total ``amount``.
+    """
+    if queryset is None:
+        queryset = ChargingSession.objects.filter(
+            status=ChargingSession.SessionStatus.COMPLETED, final_cost__isnull=True
+        )
+    queryset = queryset.order_by('pk')
+    stats = {'billed': 0, 'amount': Decimal('0')}
+
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        sessions = list(page.values(*BILLING_FIELDS)[:batch_size])
+        if not sessions:
+            break
+        last_pk = sessions[-1]['id']
+
+        costs = final_costs(sessions)
+        stats['billed'] += len(costs)
+        stats['amount'] += sum(costs.values(), Decimal('0'))
+        if not dry_run:
+            ChargingSession.objects.bulk_update(
+                [ChargingSession(pk=session_id, final_cost=cost) for session_id, cost in costs.items()],
+                ['final_cost']
+            )
+        if len(sessions) < batch_size:
+            break
+
+    logger.info(f"Billed {stats['billed']} charging sessions for {stats['amount']} ETB")
+    return stats
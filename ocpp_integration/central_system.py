@@ -0,0 +1,160 @@
+"""
+OCPP 1.6J central system served over ASGI WebSockets.
+
+Chargers connect to ``<PATH_PREFIX><charge point id>`` with the ``ocpp1.6``
+subprotocol. Each connection is a coroutine on the event loop, so one process
+holds thousands of idle chargers; the database work for each CALL runs on a
+bounded thread pool (``DB_WORKERS``) through ``ocpp16.handle_call``. Serve
+``mengedmate.asgi:application`` with an ASGI server (for example
+``uvicorn mengedmate.asgi:application``) to accept charger connections.
+
+When AUTHORIZATION_KEY is set, chargers must authenticate as in OCPP 1.6
+Security Profile 1: HTTP Basic auth with the charge point id as user name
+and the key as password. Connections without it are refused.
+"""
+import asyncio
+import base64
+import binascii
+import hmac
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import ocpp16
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOL = 'ocpp1.6'
+
+_executor = None
+
+# Live connection of each charge point in this process. A charger that reconnects before its old
+# connection is torn down replaces it here, so closing the old one does not mark the station offline.
+_connections = {}
+
+
+def _db_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.OCPP_CENTRAL_SYSTEM['DB_WORKERS'], thread_name_prefix='ocpp-db'
+        )
+    return _executor
+
+
+def _run_db(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_thread(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor(), partial(_run_db, func, *args))
+
+
+def charge_point_id_from_path(path):
+    prefix = settings.OCPP_CENTRAL_SYSTEM['PATH_PREFIX']
+    if not path.startswith(prefix):
+        return None
+    charge_point_id = path[len(prefix):].strip('/')
+    return charge_point_id if charge_point_id and '/' not in charge_point_id else None
+
+
+def charge_point_authorized(scope, charge_point_id):
+    """Check the Basic credentials of the upgrade request against AUTHORIZATION_KEY"""
+    key = settings.OCPP_CENTRAL_SYSTEM['AUTHORIZATION_KEY']
+    if not key:
+        return True
+    header = dict(scope.get('headers') or []).get(b'authorization', b'')
+    scheme, _, credentials = header.partition(b' ')
+    if scheme.lower() != b'basic':
+        return False
+    try:
+        username, _, password = base64.b64decode(credentials, validate=True).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    return username == charge_point_id and hmac.compare_digest(password.encode(), key.encode())
+
+
+def call_error(message_id, code, description=''):
+    return [ocpp16.CALL_ERROR, message_id, code, description, {}]
+
+
+async def handle_message(charge_point_id, text):
+    """
+    The reply frame for one OCPP-J message, or None when nothing is sent back.
+
+    Only CALLs are answered. CALLRESULT/CALLERROR frames from the charger would
+    answer central-system initiated calls, which this server does not send.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return call_error('-1', 'FormationViolation', 'Message is not valid JSON')
+    if not isinstance(message, list) or len(message) < 3 or not isinstance(message[1], str):
+        return call_error('-1', 'FormationViolation', 'Message is not an OCPP-J frame')
+
+    message_type, message_id = message[0], message[1]
+    if message_type != ocpp16.CALL:
+        return None
+    if len(message) != 4:
+        return call_error(message_id, 'FormationViolation', 'CALL must have 4 elements')
+
+    action, payload = message[2], message[3]
+    try:
+        result = await run_in_db_thread(ocpp16.handle_call, charge_point_id, action, payload)
+    except ocpp16.OCPPError as e:
+        return call_error(message_id, e.code, e.description)
+    except Exception as e:
+        logger.exception(f"OCPP {action} from {charge_point_id} failed: {str(e)}")
+        return call_error(message_id, 'InternalError', 'Internal error')
+    return [ocpp16.CALL_RESULT, message_id, result]
+
+
+async def central_system(scope, receive, send):
+    """ASGI application for one charger WebSocket connection"""
+    charge_point_id = charge_point_id_from_path(scope['path'])
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    if (
+        charge_point_id is None
+        or SUBPROTOCOL not in scope.get('subprotocols', [])
+        or not charge_point_authorized(scope, charge_point_id)
+        or not await run_in_db_thread(ocpp16.station_exists, charge_point_id)
+    ):
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+
+    await send({'type': 'websocket.accept', 'subprotocol': SUBPROTOCOL})
+    connection = object()
+    _connections[charge_point_id] = connection
+    logger.info(f"Charge point {charge_point_id} connected")
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] != 'websocket.receive':
+                continue
+            text = message.get('text')
+            if text is None:
+                text = (message.get('bytes') or b'').decode('utf-8', errors='replace')
+            reply = await handle_message(charge_point_id, text)
+            if reply is not None:
+                await send({'type': 'websocket.send', 'text': json.dumps(reply, default=str)})
+    finally:
+        if _connections.get(charge_point_id) is connection:
+            del _connections[charge_point_id]
+            await run_in_db_thread(ocpp16.station_disconnected, charge_point_id)
+            logger.info(f"Charge point {charge_point_id} disconnected")
+        else:
+            logger.info(f"Replaced connection of charge point {charge_point_id} closed")
@@ -0,0 +1,201 @@
+"""
+Live connector state.
+
+An in-process map of the latest OCPP status of every connector, keyed by
+``(charge point id, connector id)``. The OCPP handlers and webhooks feed it
+with ``set_status``; reads are dictionary lookups.
+
+Each change marks the connector's charging station dirty. Every
+DEBOUNCE_SECONDS the dirty stations are recomputed in one pass:
+ChargingConnector ``available_quantity``/``is_available`` and the
+ChargingStation counters are bulk updated where they changed, and the
+Firestore station documents get their ``available_connectors`` and
+``total_connectors`` in batched writes. The computed counts are kept for
+``station_availability``, which AvailableStationsView uses to override the
+counts stored in Firestore.
+
+The map is per process. The database rows written by the handlers remain the
+shared source of truth, and ``load`` rebuilds the map from them.
+"""
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OCPPConnector
+from utils.buffered_flusher import BufferedFlusher
+
+logger = logging.getLogger(__name__)
+
+ConnectorState = namedtuple('ConnectorState', 'status charging_connector_id charging_station_id updated_at')
+
+FREE_STATUS = OCPPConnector.ConnectorStatus.AVAILABLE
+
+
+def _config():
+    return settings.CONNECTOR_STATE
+
+
+class ConnectorStateMap(BufferedFlusher):
+    thread_name = 'connector-state'
+    failure_message = 'Connector availability push failed'
+
+    def __init__(self):
+        super().__init__()
+        self._states = {}
+        self._by_station = {}
+        self._by_charging_connector = {}
+        self._station_counts = {}
+        self._dirty = set()
+        self._loaded = False
+
+    def _put(self, key, state):
+        self._states[key] = state
+        self._by_station.setdefault(key[0], set()).add(key[1])
+        if state.charging_connector_id:
+            self._by_charging_connector[state.charging_connector_id] = key
+
+    def load(self):
+        """Rebuild the map from the OCPPConnector table"""
+        rows = OCPPConnector.objects.values_list(
+            'ocpp_station__station_id', 'connector_id', 'status',
+            'charging_connector_id', 'charging_connector__station_id', 'updated_at'
+        )
+        with self._lock:
+            self._states, self._by_station, self._by_charging_connector = {}, {}, {}
+            for station_id, connector_id, status, charging_connector_id, charging_station_id, updated_at in rows.iterator():
+                self._put((station_id, connector_id), ConnectorState(
+                    status, charging_connector_id, charging_station_id, updated_at
+                ))
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _resolve(self, station_id, connector_id):
+        """Charging connector and station behind an OCPP connector, from the map or the database"""
+        state = self._states.get((station_id, connector_id))
+        if state is not None:
+            return state.charging_connector_id, state.charging_station_id
+        row = OCPPConnector.objects.filter(
+            ocpp_station__station_id=station_id, connector_id=connector_id
+        ).values_list('charging_connector_id', 'charging_connector__station_id').first()
+        return row or (None, None)
+
+    def set_status(self, station_id, connector_id, status):
+        """Record a connector's OCPP status and schedule its station's availability push"""
+        self._ensure_loaded()
+        connector_id = int(connector_id)
+        charging_connector_id, charging_station_id = self._resolve(station_id, connector_id)
+
+        with self._lock:
+            self._put((station_id, connector_id), ConnectorState(
+                status, charging_connector_id, charging_station_id, timezone.now()
+            ))
+            if charging_station_id:
+                self._dirty.add(charging_station_id)
+
+        if charging_station_id:
+            if _config()['DEBOUNCE_SECONDS'] <= 0:
+                self.flush()
+            else:
+                self._ensure_started()
+
+    def get(self, station_id, connector_id):
+        self._ensure_loaded()
+        return self._states.get((station_id, int(connector_id)))
+
+    def station_connectors(self, station_id):
+        """``{connector id: ConnectorState}`` for one charge point"""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                connector_id: self._states[(station_id, connector_id)]
+                for connector_id in sorted(self._by_station.get(station_id, ()))
+            }
+
+    def station_availability(self, charging_station_id):
+        """``(available, total)`` last pushed for a charging station, or None if it had no live update"""
+        return self._station_counts.get(str(charging_station_id))
+
+    def _occupied(self, charging_connector_id):
+        key = self._by_charging_connector.get(charging_connector_id)
+        if key is None:
+            return None
+        return 0 if self._states[key].status == FREE_STATUS else 1
+
+    def flush(self):
+        """Push the availability of every dirty station. Returns the number of stations pushed."""
+        from charging_stations.models import ChargingConnector, ChargingStation
+        from utils.firestore_repo import firestore_repo
+
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return 0
+
+            connectors = list(ChargingConnector.objects.filter(station_id__in=dirty).only(
+                'id', 'station_id', 'quantity', 'available_quantity', 'is_available', 'status'
+            ))
+            changed_connectors = []
+            counts = {station_id: [0, 0] for station_id in dirty}
+            for connector in connectors:
+                occupied = self._occupied(connector.id)
+                if occupied is not None:
+                    available_quantity = max(0, connector.quantity - occupied)
+                    is_available = available_quantity > 0 and connector.status == 'available'
+                    if (available_quantity, is_available) != (connector.available_quantity, connector.is_available):
+                        connector.available_quantity, connector.is_available = available_quantity, is_available
+                        changed_connectors.append(connector)
+                totals = counts[connector.station_id]
+                totals[1] += connector.quantity
+                if connector.status == 'available':
+                    totals[0] += connector.available_quantity
+            if changed_connectors:
+                ChargingConnector.objects.bulk_update(changed_connectors, ['available_quantity', 'is_available'])
+
+            changed_stations = []
+            for station in ChargingStation.objects.filter(pk__in=dirty).only('id', 'available_connectors', 'total_connectors'):
+                available, total = counts[station.pk]
+                if (station.available_connectors, station.total_connectors) != (available, total):
+                    station.available_connectors, station.total_connectors = available, total
+                    changed_stations.append(station)
+            if changed_stations:
+                ChargingStation.objects.bulk_update(changed_stations, ['available_connectors', 'total_connectors'])
+
+            with self._lock:
+                for station_id, (available, total) in counts.items():
+                    self._station_counts[str(station_id)] = (available, total)
+
+            if changed_stations and firestore_repo.db:
+                try:
+                    firestore_repo.update_station_counts({
+                        station.pk: {
+                            'available_connectors': station.available_connectors,
+                            'total_connectors': station.total_connectors,
+                        }
+                        for station in changed_stations
+                    })
+                except Exception as e:
+                    logger.error(f"Pushing availability of {len(changed_stations)} stations to Firestore failed: {str(e)}")
+            return len(dirty)
+
+    def interval(self):
+        return _config()['DEBOUNCE_SECONDS']
+
+    def buffer_counts(self):
+        return {'tracked': len(self._states), 'pending': len(self._dirty)}
+
+    def reset(self):
+        """Forget every state; the next access reloads the map"""
+        with self._lock:
+            self._states, self._by_station, self._by_charging_connector = {}, {}, {}
+            self._station_counts = {}
+            self._dirty = set()
+            self._loaded = False
+
+
+connector_states = ConnectorStateMap()
@@ -0,0 +1,213 @@
+"""
+Station liveness.
+
+Heartbeats (OCPP Heartbeat and BootNotification, and ``station_status``
+webhooks that report one) only record the charger's time in an in-process
+map. Every FLUSH_INTERVAL_SECONDS the stations that beat are written with one
+``bulk_update`` of ``last_heartbeat`` and ``is_online``.
+
+Each beat also pushes the station's deadline, MISSED_HEARTBEATS heartbeat
+intervals later, on a heap. ``sweep`` pops only the deadlines that have
+passed and skips those superseded by a later beat, so it costs nothing while
+the stations keep beating. Stations that really missed their heartbeats are
+marked offline with one UPDATE. Stations going offline or coming back online
+get ``is_online`` and ``last_heartbeat`` on their Firestore station documents
+in batched writes.
+
+The map is per process. A station's stored ``last_heartbeat`` is checked
+before it is marked offline, so beats flushed by another process keep it
+online, and ``load`` seeds the heap with the stations stored as online.
+
+FLUSH_INTERVAL_SECONDS=0 writes each beat inline.
+"""
+import heapq
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OCPPStation
+from utils.buffered_flusher import BufferedFlusher
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return settings.STATION_LIVENESS
+
+
+def offline_after():
+    """How long a station may stay silent before it is considered offline"""
+    return timedelta(seconds=settings.OCPP_CENTRAL_SYSTEM['HEARTBEAT_INTERVAL'] * _config()['MISSED_HEARTBEATS'])
+
+
+class StationLivenessTracker(BufferedFlusher):
+    thread_name = 'station-liveness'
+    failure_message = 'Station heartbeat flush failed'
+
+    def __init__(self):
+        super().__init__()
+        self._last_seen = {}
+        self._dirty = set()
+        self._deadlines = []
+        self._loaded = False
+        self.stats = {'beats': 0, 'written': 0, 'flushes': 0, 'sweeps': 0, 'offline': 0}
+
+    def load(self, now=None):
+        """Seed the map and the heap with the stations stored as online"""
+        now = now or timezone.now()
+        timeout = offline_after()
+        rows = OCPPStation.objects.filter(is_online=True).values_list('station_id', 'last_heartbeat')
+        with self._lock:
+            for station_id, last_heartbeat in rows.iterator():
+                if station_id not in self._last_seen:
+                    seen = min(last_heartbeat or now, now)
+                    self._last_seen[station_id] = seen
+                    heapq.heappush(self._deadlines, (seen + timeout, station_id))
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def beat(self, station_id, at=None):
+        """Record a heartbeat of a charge point, at the charger's time when it is known"""
+        now = timezone.now()
+        at = min(at or now, now)
+        with self._lock:
+            self.stats['beats'] += 1
+            previous = self._last_seen.get(station_id)
+            if previous is not None and previous >= at:
+                return
+            self._last_seen[station_id] = at
+            self._dirty.add(station_id)
+            heapq.heappush(self._deadlines, (at + offline_after(), station_id))
+
+        if _config()['FLUSH_INTERVAL_SECONDS'] <= 0:
+            self.flush()
+        else:
+            self._ensure_started()
+
+    def forget(self, station_id):
+        """Stop tracking a charge point that disconnected; its pending beat is not written"""
+        with self._lock:
+            self._last_seen.pop(station_id, None)
+            self._dirty.discard(station_id)
+
+    def last_seen(self, station_id):
+        return self._last_seen.get(station_id)
+
+    def flush(self):
+        """Write the latest beat of every station that beat. Returns the number of stations written."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                beats = {station_id: self._last_seen[station_id] for station_id in dirty if station_id in self._last_seen}
+            if not beats:
+                return 0
+
+            stations = list(OCPPStation.objects.filter(station_id__in=list(beats)).only(
+                'id', 'station_id', 'is_online', 'last_heartbeat', 'charging_station_id'
+            ))
+            revived = [station for station in stations if not station.is_online]
+            for station in stations:
+                seen = beats[station.station_id]
+                station.last_heartbeat = max(seen, station.last_heartbeat or seen)
+                station.is_online = True
+            OCPPStation.objects.bulk_update(stations, ['last_heartbeat', 'is_online'], batch_size=_config()['BATCH_SIZE'])
+
+            with self._lock:
+                self.stats['written'] += len(stations)
+                self.stats['flushes'] += 1
+            _push_to_firestore(revived)
+            return len(stations)
+
+    def sweep(self, now=None):
+        """Mark offline the stations that missed their heartbeats. Returns the number marked offline."""
+        self._ensure_loaded()
+        now = now or timezone.now()
+        timeout = offline_after()
+        cutoff = now - timeout
+
+        candidates = {}
+        with self._lock:
+            self.stats['sweeps'] += 1
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, station_id = heapq.heappop(self._deadlines)
+                seen = self._last_seen.get(station_id)
+                if seen is not None and seen <= cutoff:
+                    candidates[station_id] = seen
+        if not candidates:
+            return 0
+
+        stations = list(OCPPStation.objects.filter(station_id__in=list(candidates), is_online=True).only(
+            'id', 'station_id', 'last_heartbeat', 'charging_station_id'
+        ))
+        stale = []
+        with self._lock:
+            for station in stations:
+                if station.last_heartbeat and station.last_heartbeat > cutoff:
+                    # Another process wrote a later beat; keep watching from there
+                    if self._last_seen.get(station.station_id) == candidates[station.station_id]:
+                        self._last_seen[station.station_id] = station.last_heartbeat
+                        heapq.heappush(self._deadlines, (station.last_heartbeat + timeout, station.station_id))
+                    candidates.pop(station.station_id)
+                else:
+                    stale.append(station)
+            for station_id, seen in candidates.items():
+                if self._last_seen.get(station_id) == seen:
+                    del self._last_seen[station_id]
+        if not stale:
+            return 0
+
+        marked = OCPPStation.objects.filter(pk__in=[station.pk for station in stale], is_online=True).filter(
+            Q(last_heartbeat__isnull=True) | Q(last_heartbeat__lte=cutoff)
+        ).update(is_online=False, updated_at=now)
+        for station in stale:
+            station.is_online = False
+        with self._lock:
+            self.stats['offline'] += marked
+        logger.info(f"Marked {marked} OCPP stations offline after {timeout} without a heartbeat")
+        _push_to_firestore(stale)
+        return marked
+
+    def interval(self):
+        return _config()['FLUSH_INTERVAL_SECONDS']
+
+    def buffer_counts(self):
+        return {'tracked': len(self._last_seen), 'pending': len(self._dirty), 'deadlines': len(self._deadlines)}
+
+    def reset(self):
+        """Forget every station; the next sweep reloads them"""
+        with self._lock:
+            self._last_seen, self._dirty, self._deadlines = {}, set(), []
+            self._loaded = False
+
+
+def _push_to_firestore(stations):
+    """Write the online state of OCPP stations to their charging stations' Firestore documents"""
+    from utils.firestore_repo import firestore_repo
+
+    updates = {
+        station.charging_station_id: {
+            'is_online': station.is_online,
+            'last_heartbeat': station.last_heartbeat.isoformat() if station.last_heartbeat else None,
+        }
+        for station in stations if station.charging_station_id
+    }
+    if not updates or not firestore_repo.db:
+        return
+    try:
+        firestore_repo.update_station_fields(updates)
+    except Exception as e:
+        logger.error(f"Pushing the online state of {len(updates)} stations to Firestore failed: {str(e)}")
+
+
+def register_jobs(job_scheduler):
+    if _config()['SWEEP_INTERVAL_SECONDS'] > 0:
+        job_scheduler.add_job('station-liveness-sweep', station_liveness.sweep, _config()['SWEEP_INTERVAL_SECONDS'])
+
+
+station_liveness = StationLivenessTracker()
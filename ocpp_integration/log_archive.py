@@ -0,0 +1,107 @@
+"""
+OCPPLog retention.
+
+Rows older than RETENTION_DAYS are moved out of the database into gzipped
+JSON Lines files, one per UTC day (``ocpp-logs-YYYY-MM-DD.jsonl.gz`` in
+ARCHIVE_DIR). Each batch is appended to its files as a new gzip member
+before its rows are deleted, so an interrupted run can at worst archive a
+row twice, never lose it. ``gunzip -c`` and ``gzip.open`` read the members
+back as one file.
+
+Stations and sessions are archived by their OCPP ids, which stay meaningful
+after the rows they point to are gone.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import OCPPLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'level', 'message_type', 'action', 'message', 'raw_data',
+    'ocpp_station__station_id', 'charging_session__transaction_id',
+)
+
+
+def _config():
+    return settings.OCPP_LOGS
+
+
+def expired_logs(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=_config()['RETENTION_DAYS'])
+    return OCPPLog.objects.filter(timestamp__lt=cutoff)
+
+
+def archive_path(output_dir, day):
+    return os.path.join(output_dir, f"ocpp-logs-{day.isoformat()}.jsonl.gz")
+
+
+def _archive_record(row):
+    record = {field: row[field] for field in ARCHIVE_FIELDS[:7]}
+    record['station_id'] = row['ocpp_station__station_id']
+    record['transaction_id'] = row['charging_session__transaction_id']
+    return record
+
+
+def _write_batch(rows, output_dir):
+    lines = {}
+    for row in rows:
+        day = row['timestamp'].astimezone(dt_timezone.utc).date()
+        lines.setdefault(day, []).append(json.dumps(_archive_record(row), cls=DjangoJSONEncoder))
+
+    for day, day_lines in lines.items():
+        member = gzip.compress(('\n'.join(day_lines) + '\n').encode('utf-8'))
+        with open(archive_path(output_dir, day), 'ab') as archive:
+            archive.write(member)
+            archive.flush()
+            os.fsync(archive.fileno())
+    return set(lines)
+
+
+def archive_logs(queryset=None, output_dir=None, batch_size=None, archive=True, dry_run=False):
+    """
+    Move expired OCPPLog rows to the archive files, ``batch_size`` rows at a
+    time; with ``archive=False`` they are only deleted. Returns counts of
+    ``rows`` and archive ``files`` touched.
+    """
+    if queryset is None:
+        queryset = expired_logs()
+    output_dir = output_dir or _config()['ARCHIVE_DIR']
+    batch_size = batch_size or _config()['ARCHIVE_BATCH_SIZE']
+    stats = {'rows': 0, 'files': 0}
+
+    if dry_run:
+        stats['rows'] = queryset.count()
+        return stats
+
+    if archive:
+        os.makedirs(output_dir, exist_ok=True)
+    days = set()
+    while True:
+        rows = list(queryset.order_by('timestamp').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        if archive:
+            days |= _write_batch(rows, output_dir)
+        OCPPLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        stats['rows'] += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    stats['files'] = len(days)
+    if stats['rows']:
+        logger.info(f"Archived {stats['rows']} OCPP logs into {stats['files']} files")
+    return stats
+
+
+def register_jobs(job_scheduler):
+    if _config()['ARCHIVE_INTERVAL_SECONDS'] > 0:
+        job_scheduler.add_job('ocpp-log-retention', archive_logs, _config()['ARCHIVE_INTERVAL_SECONDS'])
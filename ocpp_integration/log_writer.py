@@ -0,0 +1,107 @@
+"""
+Queued OCPPLog writer.
+
+``ocpp_log_writer.log`` only builds an OCPPLog and queues it; the rows are
+written with ``bulk_create`` from a background thread once BATCH_SIZE are
+queued or FLUSH_INTERVAL_SECONDS have passed. Each entry keeps the time it
+was logged, not the time it was written.
+
+Logging never blocks the caller: once MAX_BUFFERED entries are waiting, new
+ones are dropped and counted. If a batch fails (typically a station or
+session deleted meanwhile), its rows are written one by one and only the
+failing ones are dropped.
+
+FLUSH_INTERVAL_SECONDS=0 writes every entry inline.
+"""
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OCPPLog
+from utils.buffered_flusher import BufferedFlusher
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return settings.OCPP_LOGS
+
+
+class OCPPLogWriter(BufferedFlusher):
+    thread_name = 'ocpp-log-writer'
+    failure_message = 'OCPP log writer failed'
+
+    def __init__(self):
+        super().__init__()
+        self._entries = []
+        self.stats = {'queued': 0, 'written': 0, 'flushes': 0, 'dropped': 0, 'failed': 0}
+
+    def log(self, ocpp_station=None, charging_session=None, level=OCPPLog.LogLevel.INFO,
+            message_type=None, action=None, message="", raw_data=None):
+        """Queue one OCPPLog entry"""
+        config = _config()
+        entry = OCPPLog(
+            ocpp_station=ocpp_station,
+            charging_session=charging_session,
+            level=level,
+            message_type=message_type,
+            action=action,
+            message=message,
+            raw_data=raw_data,
+            timestamp=timezone.now(),
+        )
+        with self._lock:
+            if len(self._entries) >= config['MAX_BUFFERED']:
+                self.stats['dropped'] += 1
+                return
+            self._entries.append(entry)
+            self.stats['queued'] += 1
+            queued = len(self._entries)
+
+        if config['FLUSH_INTERVAL_SECONDS'] <= 0:
+            self.flush()
+        else:
+            self._ensure_started()
+            if queued >= config['BATCH_SIZE']:
+                self._wake.set()
+
+    def flush(self):
+        """Write every queued entry. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+
+            try:
+                OCPPLog.objects.bulk_create(entries, batch_size=_config()['BATCH_SIZE'])
+                written = len(entries)
+            except Exception as e:
+                logger.warning(f"OCPP log batch of {len(entries)} rows failed, writing them one by one: {str(e)}")
+                written = self._write_each(entries)
+
+            with self._lock:
+                self.stats['written'] += written
+                self.stats['failed'] += len(entries) - written
+                self.stats['flushes'] += 1
+            return written
+
+    def _write_each(self, entries):
+        written = 0
+        for entry in entries:
+            try:
+                OCPPLog.objects.bulk_create([entry])
+                written += 1
+            except Exception as e:
+                logger.error(f"Error logging OCPP event: {e}")
+        return written
+
+    def interval(self):
+        return _config()['FLUSH_INTERVAL_SECONDS']
+
+    def buffer_counts(self):
+        return {'buffered': len(self._entries)}
+
+
+ocpp_log_writer = OCPPLogWriter()
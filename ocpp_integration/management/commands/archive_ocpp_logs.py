@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from ocpp_integration.log_archive import archive_logs, expired_logs
+
+
+class Command(BaseCommand):
+    help = 'Move OCPP logs older than the retention period to gzipped JSON Lines archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='Archive directory (default: OCPP_LOGS ARCHIVE_DIR)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows archived per batch')
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete expired logs without writing them to the archive',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many logs would be archived without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        stats = archive_logs(
+            expired_logs(),
+            output_dir=options['output_dir'],
+            batch_size=options['batch_size'],
+            archive=not options['no_archive'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Would archive {stats['rows']} OCPP logs"))
+        elif options['no_archive']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Deleted {stats['rows']} OCPP logs"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Archived {stats['rows']} OCPP logs into {stats['files']} files"
+            ))
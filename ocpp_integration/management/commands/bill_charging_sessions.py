@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from ocpp_integration.billing import bill_sessions
+from ocpp_integration.models import ChargingSession
+
+
+class Command(BaseCommand):
+    help = 'Price completed OCPP charging sessions from their meter values and connector tariffs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebill',
+            action='store_true',
+            help='Recompute final_cost for every completed session, not only unbilled ones',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions priced per batch')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be billed without saving',
+        )
+
+    def handle(self, *args, **options):
+        queryset = None
+        if options['rebill']:
+            queryset = ChargingSession.objects.filter(status=ChargingSession.SessionStatus.COMPLETED)
+
+        stats = bill_sessions(queryset, batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        prefix = 'Would bill' if options['dry_run'] else 'Billed'
+        self.stdout.write(self.style.SUCCESS(f"✅ {prefix} {stats['billed']} sessions for {stats['amount']} ETB"))
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ocpp_integration.utilization import rebuild_utilization
+
+
+class Command(BaseCommand):
+    help = 'Downsample OCPP meter values into per-connector utilization series'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First UTC day to rebuild (YYYY-MM-DD), defaults to yesterday',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Number of days to rebuild starting at --start',
+        )
+
+    def handle(self, *args, **options):
+        if options['start']:
+            try:
+                start = date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError(f"Invalid --start date: {options['start']}")
+        else:
+            start = timezone.now().date() - timedelta(days=1)
+
+        total = 0
+        for offset in range(options['days']):
+            day = start + timedelta(days=offset)
+            written = rebuild_utilization(day)
+            total += written
+            self.stdout.write(f'📈 {day}: {written} utilization rows')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {total} utilization rows'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ocpp_integration.meter_archive import compact_sessions
+
+
+class Command(BaseCommand):
+    help = 'Pack the meter values of finished charging sessions into compact per-session archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Sessions compacted per batch')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be compacted without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        stats = compact_sessions(batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        prefix = 'Would compact' if options['dry_run'] else 'Compacted'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix} {stats['samples']} meter values of {stats['sessions']} sessions into {stats['bytes']} bytes"
+        ))
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ocpp_integration.simulator import MODES, FleetSimulator
+
+
+class Command(BaseCommand):
+    help = 'Run a fleet of simulated OCPP chargers against the central system or the OCPP webhook'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chargers', type=int, default=10, help='Number of simulated chargers')
+        parser.add_argument('--connectors', type=int, default=2, help='Connectors per charger')
+        parser.add_argument('--mode', choices=MODES, default='central', help='OCPP-J WebSockets or backend webhooks')
+        parser.add_argument(
+            '--url',
+            help='Run against a server: the central system prefix (ws://host/ocpp) or the webhook URL. '
+                 'Defaults to the application in this process.',
+        )
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run the fleet')
+        parser.add_argument('--ramp', type=float, default=5, help='Seconds over which chargers come online')
+        parser.add_argument('--idle', type=float, default=10, help='Mean seconds a connector idles between sessions')
+        parser.add_argument('--session', type=float, default=60, help='Seconds each charging session lasts')
+        parser.add_argument('--progress-interval', type=float, default=5, help='Seconds between meter readings')
+        parser.add_argument('--heartbeat-interval', type=float, default=60, help='Seconds between heartbeats')
+        parser.add_argument('--power-kw', type=float, default=22, help='Connector power in kW')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for repeatable runs')
+        parser.add_argument('--keep', action='store_true', help='Keep the simulated stations and sessions')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['chargers'] < 1 or options['connectors'] < 1:
+            raise CommandError('--chargers and --connectors must be at least 1')
+        if options['progress_interval'] <= 0:
+            raise CommandError('--progress-interval must be positive')
+
+        simulator = FleetSimulator(
+            chargers=options['chargers'],
+            connectors=options['connectors'],
+            mode=options['mode'],
+            url=options['url'],
+            duration=options['duration'],
+            ramp_seconds=options['ramp'],
+            idle_seconds=options['idle'],
+            session_seconds=options['session'],
+            progress_interval=options['progress_interval'],
+            heartbeat_interval=options['heartbeat_interval'],
+            power_kw=options['power_kw'],
+            seed=options['seed'],
+            keep=options['keep'],
+        )
+        self.stdout.write(
+            f"🔌 Running {options['chargers']} chargers x {options['connectors']} connectors "
+            f"({options['mode']}) for {options['duration']}s"
+        )
+        report = simulator.run()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"📨 {report['messages']} messages, {report['messages_per_second']}/s, {report['errors']} errors")
+        self.stdout.write(f"⚡ Sessions: {report['sessions']}")
+        for kind, latency in report['latency'].items():
+            self.stdout.write(f"   {kind}: {latency}")
+        self.stdout.write(f"⏱️  State lag: {report['state_lag']} ({report['state_lag_unresolved']} unresolved)")
+        if 'db_writes' in report:
+            self.stdout.write(f"💾 DB writes: {report['db_writes']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Fleet run {report['run_id']} finished"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from charging_stations.models import ChargingStation
+from ocpp_integration.services import OCPPIntegrationService
+
+
+class Command(BaseCommand):
+    help = 'Sync charging stations to the OCPP backend, several at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--station',
+            action='append',
+            dest='stations',
+            default=[],
+            help='Charging station id to sync (repeatable); defaults to every active station',
+        )
+        parser.add_argument('--owner', help='Only sync the stations of this owner email')
+        parser.add_argument('--workers', type=int, default=None, help='Stations posted concurrently')
+        parser.add_argument('--vendor', default='Generic', help='Vendor reported for new OCPP stations')
+        parser.add_argument('--model', default='EV Charger', help='Model reported for new OCPP stations')
+
+    def handle(self, *args, **options):
+        stations = ChargingStation.objects.filter(is_active=True).order_by('name')
+        if options['stations']:
+            stations = stations.filter(id__in=options['stations'])
+        if options['owner']:
+            stations = stations.filter(owner__user__email=options['owner'])
+        if not stations.exists():
+            raise CommandError('No active charging stations to sync')
+
+        results = OCPPIntegrationService().sync_stations_to_ocpp(
+            stations, vendor=options['vendor'], model=options['model'], max_workers=options['workers']
+        )
+
+        for result in results:
+            if result['success']:
+                self.stdout.write(f"✅ {result['name']} ({result['station_id']})")
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ {result['name']}: {result['error']}"))
+
+        synced = sum(1 for result in results if result['success'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Synced {synced} of {len(results)} stations'))
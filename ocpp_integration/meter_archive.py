@@ -0,0 +1,211 @@
+"""
+Compacted meter value storage for finished sessions.
+
+Once a session has been finished for MIN_AGE_HOURS its SessionMeterValue rows
+are packed into one SessionMeterArchive and the raw rows are deleted. Each
+(measurand, unit) series is stored as little-endian uint32 millisecond deltas
+followed by its values, all zlib-compressed. Values are float32, except energy
+registers, which stay float64 so billing still reproduces them to the Wh.
+The per-row ``context`` and ``location`` strings are not kept.
+
+``archived_samples`` yields archived readings in the same shape as a
+SessionMeterValue ``values_list``, so billing and utilization read raw and
+compacted sessions alike.
+"""
+import logging
+import sys
+import zlib
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import ChargingSession, SessionMeterArchive, SessionMeterValue
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = [
+    ChargingSession.SessionStatus.STOPPED,
+    ChargingSession.SessionStatus.COMPLETED,
+    ChargingSession.SessionStatus.FAILED,
+]
+
+# Registers are large running totals; float32 would round them to tens of Wh
+EXACT_MEASURANDS = {
+    SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER,
+    SessionMeterValue.MeasurandType.ENERGY_REACTIVE_IMPORT_REGISTER,
+}
+MILLI = Decimal('0.001')
+
+
+def _config():
+    return settings.METER_ARCHIVE
+
+
+def _to_bytes(data):
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_bytes(typecode, blob):
+    data = array(typecode)
+    data.frombytes(blob)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def encode_samples(samples):
+    """
+    Pack ``(timestamp, measurand, value, unit)`` samples.
+
+    Returns ``(started_at, series, data)`` for a SessionMeterArchive.
+    """
+    grouped = {}
+    for timestamp, measurand, value, unit in samples:
+        grouped.setdefault((measurand, unit), []).append((timestamp, value))
+    started_at = min(timestamp for timestamp, _, _, _ in samples)
+
+    series = []
+    chunks = []
+    for (measurand, unit), points in grouped.items():
+        points.sort(key=lambda point: point[0])
+        typecode = 'd' if measurand in EXACT_MEASURANDS else 'f'
+        deltas = array('I')
+        previous = started_at
+        for timestamp, _ in points:
+            deltas.append(round((timestamp - previous).total_seconds() * 1000))
+            previous = timestamp
+        chunks.append(_to_bytes(deltas))
+        chunks.append(_to_bytes(array(typecode, (float(value) for _, value in points))))
+        series.append({'measurand': measurand, 'unit': unit, 'count': len(points), 'type': typecode})
+
+    return started_at, series, zlib.compress(b''.join(chunks), 6)
+
+
+def decode_archive(archive):
+    """``[(measurand, unit, timestamps, values)]`` for each series in ``archive``"""
+    blob = zlib.decompress(bytes(archive.data))
+    decoded = []
+    offset = 0
+    for entry in archive.series:
+        count = entry['count']
+        deltas = _from_bytes('I', blob[offset:offset + 4 * count])
+        offset += 4 * count
+        width = array(entry['type']).itemsize
+        values = _from_bytes(entry['type'], blob[offset:offset + width * count])
+        offset += width * count
+
+        timestamps = []
+        at = archive.started_at
+        for delta in deltas:
+            at = at + timedelta(milliseconds=delta)
+            timestamps.append(at)
+        decoded.append((entry['measurand'], entry['unit'], timestamps, values))
+    return decoded
+
+
+def archived_samples(session_ids, measurands=None, start=None, end=None):
+    """
+    Yield ``(session_id, timestamp, measurand, value, unit)`` from the archives
+    of ``session_ids``, ordered by session and timestamp. Values are Decimals
+    at the precision of SessionMeterValue.value.
+    """
+    archives = SessionMeterArchive.objects.filter(charging_session__in=session_ids).order_by('charging_session')
+    for archive in archives.iterator(chunk_size=200):
+        samples = []
+        for measurand, unit, timestamps, values in decode_archive(archive):
+            if measurands is not None and measurand not in measurands:
+                continue
+            for timestamp, value in zip(timestamps, values):
+                if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                    samples.append((timestamp, measurand, Decimal(value).quantize(MILLI), unit))
+        samples.sort(key=lambda sample: sample[0])
+        for timestamp, measurand, value, unit in samples:
+            yield archive.charging_session_id, timestamp, measurand, value, unit
+
+
+def archived_meter_values(session):
+    """A compacted session's readings as SessionMeterValue-like dicts, newest first"""
+    return [
+        {'timestamp': timestamp, 'measurand': measurand, 'value': value, 'unit': unit}
+        for _, timestamp, measurand, value, unit in reversed(list(archived_samples([session.pk])))
+    ]
+
+
+def compactable_sessions(now=None):
+    cutoff = (now or timezone.now()) - timedelta(hours=_config()['MIN_AGE_HOURS'])
+    return ChargingSession.objects.filter(
+        status__in=FINISHED_STATUSES,
+        updated_at__lt=cutoff,
+        meter_archive__isnull=True,
+    ).filter(
+        Exists(SessionMeterValue.objects.filter(charging_session=OuterRef('pk')))
+    ).order_by('pk')
+
+
+def _compact_batch(session_ids, dry_run):
+    samples = {}
+    meter_values = SessionMeterValue.objects.filter(
+        charging_session__in=session_ids
+    ).values_list('charging_session_id', 'timestamp', 'measurand', 'value', 'unit')
+    for session_id, timestamp, measurand, value, unit in meter_values.iterator(chunk_size=5000):
+        samples.setdefault(session_id, []).append((timestamp, measurand, value, unit))
+
+    archives = []
+    for session_id, session_samples in samples.items():
+        started_at, series, data = encode_samples(session_samples)
+        archives.append(SessionMeterArchive(
+            charging_session_id=session_id,
+            started_at=started_at,
+            series=series,
+            data=data,
+            sample_count=len(session_samples),
+        ))
+
+    if not dry_run:
+        with transaction.atomic():
+            SessionMeterArchive.objects.bulk_create(archives)
+            SessionMeterValue.objects.filter(charging_session__in=list(samples)).delete()
+    return archives
+
+
+def compact_sessions(queryset=None, batch_size=None, dry_run=False):
+    """
+    Archive the meter values of finished sessions, ``batch_size`` sessions at
+    a time. Returns counts of ``sessions``, ``samples`` and archive ``bytes``.
+    """
+    if queryset is None:
+        queryset = compactable_sessions()
+    queryset = queryset.filter(meter_archive__isnull=True).order_by('pk')
+    batch_size = batch_size or _config()['BATCH_SIZE']
+    stats = {'sessions': 0, 'samples': 0, 'bytes': 0}
+
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        session_ids = list(page.values_list('pk', flat=True)[:batch_size])
+        if not session_ids:
+            break
+        last_pk = session_ids[-1]
+
+        archives = _compact_batch(session_ids, dry_run)
+        stats['sessions'] += len(archives)
+        stats['samples'] += sum(archive.sample_count for archive in archives)
+        stats['bytes'] += sum(len(archive.data) for archive in archives)
+        if len(session_ids) < batch_size:
+            break
+
+    if stats['sessions']:
+        logger.info(f"Compacted {stats['samples']} meter values of {stats['sessions']} sessions into {stats['bytes']} bytes")
+    return stats
+
+
+def register_jobs(job_scheduler):
+    if _config()['INTERVAL_SECONDS'] > 0:
+        job_scheduler.add_job('meter-value-compaction', compact_sessions, _config()['INTERVAL_SECONDS'])
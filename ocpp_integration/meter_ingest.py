@@ -0,0 +1,129 @@
+"""
+Buffered MeterValues ingestion.
+
+Meter samples are held in memory and written with ``bulk_create`` once
+BATCH_SIZE rows are buffered or FLUSH_INTERVAL_SECONDS have passed, whichever
+comes first. The running session aggregates (energy, power, status...) are
+coalesced per session, so a flush issues one ``update()`` per session however
+many samples arrived, instead of a full-row ``save()`` per sample.
+
+Backpressure: once MAX_BUFFERED rows are waiting, the thread adding more
+flushes synchronously before returning, so a slow database slows producers
+down instead of growing memory. Rows from a failed flush are put back while
+there is room, once, and are counted as ``lost`` otherwise.
+
+FLUSH_INTERVAL_SECONDS=0 writes every sample inline.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChargingSession, SessionMeterValue
+from utils.buffered_flusher import BufferedFlusher
+
+logger = logging.getLogger(__name__)
+
+# Aggregates are only written to sessions that have not been stopped meanwhile
+OPEN_STATUSES = [
+    ChargingSession.SessionStatus.PENDING,
+    ChargingSession.SessionStatus.STARTED,
+    ChargingSession.SessionStatus.CHARGING,
+    ChargingSession.SessionStatus.SUSPENDED,
+]
+
+
+def _config():
+    return settings.METER_INGEST
+
+
+class MeterIngestBuffer(BufferedFlusher):
+    thread_name = 'meter-ingest'
+    failure_message = 'Meter ingest flusher failed'
+
+    def __init__(self):
+        super().__init__()
+        self._rows = []
+        self._aggregates = {}
+        self.stats = {'accepted': 0, 'written': 0, 'flushes': 0, 'forced_flushes': 0, 'requeued': 0, 'lost': 0}
+
+    @property
+    def buffered(self):
+        with self._lock:
+            return len(self._rows)
+
+    def add(self, session_id, rows=(), aggregates=None):
+        """
+        Buffer SessionMeterValue ``rows`` and the latest ``aggregates`` field
+        values for one session.
+        """
+        config = _config()
+        with self._lock:
+            self._rows.extend(rows)
+            if aggregates:
+                self._aggregates.setdefault(session_id, {}).update(aggregates)
+            self.stats['accepted'] += len(rows)
+            buffered = len(self._rows)
+
+        if config['FLUSH_INTERVAL_SECONDS'] <= 0:
+            self.flush()
+        elif buffered >= config['MAX_BUFFERED']:
+            with self._lock:
+                self.stats['forced_flushes'] += 1
+            self.flush()
+        else:
+            self._ensure_started()
+            if buffered >= config['BATCH_SIZE']:
+                self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                aggregates, self._aggregates = self._aggregates, {}
+            if not rows and not aggregates:
+                return 0
+
+            try:
+                with transaction.atomic():
+                    SessionMeterValue.objects.bulk_create(rows, batch_size=_config()['BATCH_SIZE'])
+                    for session_id, fields in aggregates.items():
+                        ChargingSession.objects.filter(pk=session_id, status__in=OPEN_STATUSES).update(**fields)
+            except Exception as e:
+                logger.error(f"Meter value flush of {len(rows)} rows failed: {str(e)}")
+                self._requeue(rows, aggregates)
+                return 0
+
+            with self._lock:
+                self.stats['written'] += len(rows)
+                self.stats['flushes'] += 1
+            return len(rows)
+
+    def _requeue(self, rows, aggregates):
+        # Rows get one retry, so a row the database rejects cannot block every later flush
+        retry, lost = [], []
+        for row in rows:
+            (lost if getattr(row, '_ingest_retried', False) else retry).append(row)
+            row._ingest_retried = True
+        with self._lock:
+            room = max(0, _config()['MAX_BUFFERED'] - len(self._rows))
+            kept = retry[:room]
+            lost += retry[room:]
+            self._rows = kept + self._rows
+            for session_id, fields in aggregates.items():
+                # Newer values that arrived during the failed flush win
+                self._aggregates[session_id] = {**fields, **self._aggregates.get(session_id, {})}
+            self.stats['requeued'] += len(kept)
+            self.stats['lost'] += len(lost)
+        if lost:
+            logger.warning(f"Dropped {len(lost)} meter values after a failed flush")
+
+    def interval(self):
+        return _config()['FLUSH_INTERVAL_SECONDS']
+
+    def buffer_counts(self):
+        return {'buffered': len(self._rows), 'sessions': len(self._aggregates)}
+
+
+meter_buffer = MeterIngestBuffer()
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ocpp_integration", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConnectorUtilization",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("resolution_seconds", models.PositiveIntegerField()),
+                ("occupancy", models.BinaryField(help_text="Fraction of each bucket the connector was in a session")),
+                ("avg_power_kw", models.BinaryField()),
+                ("peak_power_kw", models.BinaryField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("ocpp_connector", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="utilization", to="ocpp_integration.ocppconnector")),
+            ],
+            options={
+                "verbose_name": "Connector Utilization",
+                "verbose_name_plural": "Connector Utilization",
+                "indexes": [models.Index(fields=["resolution_seconds", "day"], name="ocpp_integr_resolut_756341_idx")],
+                "unique_together": {("ocpp_connector", "day", "resolution_seconds")},
+            },
+        ),
+    ]
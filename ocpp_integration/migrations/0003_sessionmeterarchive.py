@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ocpp_integration", "0002_connectorutilization"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionMeterArchive",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("started_at", models.DateTimeField(help_text="Timestamp the first delta is counted from")),
+                ("series", models.JSONField(default=list)),
+                ("data", models.BinaryField()),
+                ("sample_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("charging_session", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="meter_archive", to="ocpp_integration.chargingsession")),
+            ],
+            options={
+                "verbose_name": "Session Meter Archive",
+                "verbose_name_plural": "Session Meter Archives",
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ocpp_integration", "0003_sessionmeterarchive"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ocpplog",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="ocpplog",
+            index=models.Index(fields=["ocpp_station", "level", "-timestamp"], name="ocpp_integr_ocpp_st_fec3cf_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ocpplog",
+            index=models.Index(fields=["timestamp"], name="ocpp_integr_timesta_8d467d_idx"),
+        ),
+    ]
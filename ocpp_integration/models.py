@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import uuid
 
@@ -187,6 +188,60 @@ class SessionMeterValue(models.Model):
         ordering = ['-timestamp']
 
 
+class SessionMeterArchive(models.Model):
+    """
+    Compacted meter values of a finished charging session.
+
+    ``series`` lists each (measurand, unit) series with its sample count, in
+    the order they are stored in ``data``: a zlib-compressed run of delta
+    encoded millisecond timestamps followed by the values, see
+    ocpp_integration.meter_archive.
+    """
+    charging_session = models.OneToOneField(ChargingSession, on_delete=models.CASCADE, related_name='meter_archive')
+    started_at = models.DateTimeField(help_text="Timestamp the first delta is counted from")
+    series = models.JSONField(default=list)
+    data = models.BinaryField()
+    sample_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Meter archive {self.charging_session} ({self.sample_count} samples)"
+
+    class Meta:
+        verbose_name = "Session Meter Archive"
+        verbose_name_plural = "Session Meter Archives"
+
+
+class ConnectorUtilization(models.Model):
+    """
+    Downsampled occupancy and power for one connector over one UTC day.
+
+    Each series is a packed little-endian float32 array with one value per
+    ``resolution_seconds`` bucket, see ocpp_integration.utilization.
+    """
+    ocpp_connector = models.ForeignKey(OCPPConnector, on_delete=models.CASCADE, related_name='utilization')
+    day = models.DateField()
+    resolution_seconds = models.PositiveIntegerField()
+
+    occupancy = models.BinaryField(help_text="Fraction of each bucket the connector was in a session")
+    avg_power_kw = models.BinaryField()
+    peak_power_kw = models.BinaryField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Utilization {self.ocpp_connector} {self.day} @{self.resolution_seconds}s"
+
+    class Meta:
+        verbose_name = "Connector Utilization"
+        verbose_name_plural = "Connector Utilization"
+        unique_together = ['ocpp_connector', 'day', 'resolution_seconds']
+        indexes = [
+            models.Index(fields=['resolution_seconds', 'day']),
+        ]
+
+
 class OCPPLog(models.Model):
     class LogLevel(models.TextChoices):
         DEBUG = 'debug', _('Debug')
@@ -209,7 +264,8 @@ class OCPPLog(models.Model):
     message = models.TextField()
     raw_data = models.JSONField(blank=True, null=True)
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event is logged; rows are written later by log_writer
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"{self.level.upper()}: {self.action or 'General'} - {self.timestamp}"
@@ -218,3 +274,7 @@ class OCPPLog(models.Model):
         verbose_name = "OCPP Log"
         verbose_name_plural = "OCPP Logs"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['ocpp_station', 'level', '-timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
@@ -0,0 +1,410 @@
+"""
+OCPP 1.6J message handling for the in-project central system.
+
+``handle_call(charge_point_id, action, payload)`` runs one charger-initiated
+CALL and returns the CALLRESULT payload, or raises OCPPError, which the
+central system sends back as a CALLERROR. Handlers are synchronous and write
+to OCPPStation, OCPPConnector and ChargingSession; MeterValues go through the
+buffered meter_ingest pipeline and heartbeats through the liveness tracker. central_system.py runs them on a bounded thread pool, so
+the event loop serving the WebSockets never blocks on the database.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from charging_stations.tariffs import CENT, default_price, price_at
+from payments.models import Transaction, Wallet
+
+from .connector_state import connector_states
+from .liveness import station_liveness
+from .log_writer import ocpp_log_writer
+from .meter_ingest import meter_buffer
+from .models import ChargingSession, OCPPConnector, OCPPLog, OCPPStation, SessionMeterValue
+from .session_stream import publish_progress
+
+logger = logging.getLogger(__name__)
+
+# OCPP-J message type ids
+CALL = 2
+CALL_RESULT = 3
+CALL_ERROR = 4
+
+CONNECTOR_STATUSES = {
+    'Available': OCPPConnector.ConnectorStatus.AVAILABLE,
+    'Preparing': OCPPConnector.ConnectorStatus.PREPARING,
+    'Charging': OCPPConnector.ConnectorStatus.CHARGING,
+    'SuspendedEVSE': OCPPConnector.ConnectorStatus.SUSPENDED_EVSE,
+    'SuspendedEV': OCPPConnector.ConnectorStatus.SUSPENDED_EV,
+    'Finishing': OCPPConnector.ConnectorStatus.FINISHING,
+    'Reserved': OCPPConnector.ConnectorStatus.RESERVED,
+    'Unavailable': OCPPConnector.ConnectorStatus.UNAVAILABLE,
+    'Faulted': OCPPConnector.ConnectorStatus.FAULTED,
+}
+
+# connectorId 0 in a StatusNotification describes the whole charge point
+STATION_STATUSES = {
+    'Available': OCPPStation.StationStatus.AVAILABLE,
+    'Unavailable': OCPPStation.StationStatus.UNAVAILABLE,
+    'Faulted': OCPPStation.StationStatus.FAULTED,
+}
+
+MEASURANDS = {
+    'Energy.Active.Import.Register': SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER,
+    'Energy.Reactive.Import.Register': SessionMeterValue.MeasurandType.ENERGY_REACTIVE_IMPORT_REGISTER,
+    'Power.Active.Import': SessionMeterValue.MeasurandType.POWER_ACTIVE_IMPORT,
+    'Current.Import': SessionMeterValue.MeasurandType.CURRENT_IMPORT,
+    'Voltage': SessionMeterValue.MeasurandType.VOLTAGE,
+    'Temperature': SessionMeterValue.MeasurandType.TEMPERATURE,
+}
+DEFAULT_MEASURAND = 'Energy.Active.Import.Register'
+
+SESSION_OPEN_STATUSES = [
+    ChargingSession.SessionStatus.PENDING,
+    ChargingSession.SessionStatus.STARTED,
+    ChargingSession.SessionStatus.CHARGING,
+    ChargingSession.SessionStatus.SUSPENDED,
+]
+
+
+class OCPPError(Exception):
+    """Sent back to the charger as a CALLERROR with ``code``"""
+
+    def __init__(self, code, description=''):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+def _config():
+    return settings.OCPP_CENTRAL_SYSTEM
+
+
+def _now():
+    return timezone.now().isoformat().replace('+00:00', 'Z')
+
+
+def _timestamp(value):
+    parsed = parse_datetime(value) if value else None
+    if value and parsed is None:
+        raise OCPPError('TypeConstraintViolation', f'Invalid timestamp {value}')
+    return parsed or timezone.now()
+
+
+def _id_tag_info(status):
+    return {'idTagInfo': {'status': status}}
+
+
+def _station(charge_point_id):
+    try:
+        return OCPPStation.objects.get(station_id=charge_point_id)
+    except OCPPStation.DoesNotExist:
+        raise OCPPError('SecurityError', f'Unknown charge point {charge_point_id}')
+
+
+def _connector(station, connector_id):
+    connector, _ = OCPPConnector.objects.get_or_create(ocpp_station=station, connector_id=connector_id)
+    return connector
+
+
+def _log(station, action, message, session=None, raw_data=None, level=OCPPLog.LogLevel.INFO):
+    ocpp_log_writer.log(
+        ocpp_station=station, charging_session=session, level=level,
+        message_type=OCPPLog.MessageType.CALL, action=action, message=message, raw_data=raw_data
+    )
+
+
+def _refresh_connector_availability(connector):
+    if connector.charging_connector_id:
+        connector.charging_connector.update_availability()
+
+
+def tag_authorization(id_tag, station=None):
+    """
+    ``(user id, payment)`` for an idTag, or ``(None, None)`` when it is not accepted.
+
+    A tag is accepted when an open session on ``station`` was created for it,
+    as initiate_charging does before the charger starts. Tags issued by
+    OCPPIntegrationService look like ``USER_<user id>_<payment>``; without a
+    session they are only accepted for an active user who can pay:
+    ``<payment>`` is one of their completed payments that no session has used
+    yet, returned as ``payment`` so the new session records it, or their wallet
+    holds at least MIN_WALLET_BALANCE.
+    """
+    sessions = ChargingSession.objects.filter(id_tag=id_tag, status__in=SESSION_OPEN_STATUSES)
+    if station is not None:
+        sessions = sessions.filter(ocpp_station=station)
+    user_id = sessions.values_list('user_id', flat=True).first()
+    if user_id is not None or not id_tag.startswith('USER_'):
+        return user_id, None
+
+    _, user_id, payment = (id_tag.split('_', 2) + [''])[:3]
+    if not user_id.isdigit() or not get_user_model().objects.filter(pk=user_id, is_active=True).exists():
+        return None, None
+    if payment and Transaction.objects.filter(
+        user_id=user_id, reference_number=payment, status=Transaction.TransactionStatus.COMPLETED
+    ).exists() and not ChargingSession.objects.filter(payment_transaction_id=payment).exists():
+        return int(user_id), payment
+    minimum = Decimal(settings.OCPP_CENTRAL_SYSTEM['MIN_WALLET_BALANCE'])
+    if Wallet.objects.filter(user_id=user_id, is_active=True, balance__gte=minimum).exists():
+        return int(user_id), None
+    return None, None
+
+
+def authorized_user_id(id_tag, station=None):
+    """The user an idTag belongs to, or None (see ``tag_authorization``)"""
+    return tag_authorization(id_tag, station)[0]
+
+
+def boot_notification(station, payload):
+    OCPPStation.objects.filter(pk=station.pk).update(
+        vendor=payload['chargePointVendor'][:100],
+        model=payload['chargePointModel'][:100],
+        firmware_version=(payload.get('firmwareVersion') or '')[:50] or None,
+        updated_at=timezone.now()
+    )
+    station_liveness.beat(station.station_id)
+    _log(station, 'BootNotification', f"{station.station_id} booted", raw_data=payload)
+    return {'status': 'Accepted', 'currentTime': _now(), 'interval': _config()['HEARTBEAT_INTERVAL']}
+
+
+def heartbeat(station, payload):
+    station_liveness.beat(station.station_id)
+    return {'currentTime': _now()}
+
+
+def authorize(station, payload):
+    return _id_tag_info('Accepted' if authorized_user_id(payload['idTag'], station) else 'Invalid')
+
+
+def status_notification(station, payload):
+    status = payload['status']
+    connector_id = int(payload['connectorId'])
+    if connector_id == 0:
+        if status in STATION_STATUSES:
+            OCPPStation.objects.filter(pk=station.pk).update(status=STATION_STATUSES[status], updated_at=timezone.now())
+        return {}
+
+    if status not in CONNECTOR_STATUSES:
+        raise OCPPError('PropertyConstraintViolation', f'Unknown status {status}')
+    connector = _connector(station, connector_id)
+    connector.status = CONNECTOR_STATUSES[status]
+    connector.error_code = payload.get('errorCode')
+    connector.info = payload.get('info')
+    connector.vendor_id = payload.get('vendorId')
+    connector.vendor_error_code = payload.get('vendorErrorCode')
+    connector.save(update_fields=['status', 'error_code', 'info', 'vendor_id', 'vendor_error_code', 'updated_at'])
+    connector_states.set_status(station.station_id, connector_id, connector.status)
+    return {}
+
+
+def _next_transaction_id():
+    return (ChargingSession.objects.aggregate(last=Max('transaction_id'))['last'] or 0) + 1
+
+
+def start_transaction(station, payload):
+    id_tag = payload['idTag']
+    connector = _connector(station, int(payload['connectorId']))
+    meter_start = int(payload['meterStart'])
+    started_at = _timestamp(payload['timestamp'])
+
+    user_id, payment = tag_authorization(id_tag, station)
+    if user_id is None:
+        return {'transactionId': 0, **_id_tag_info('Invalid')}
+
+    # A session created by initiate_charging for this tag is picked up rather than duplicated
+    session = ChargingSession.objects.filter(
+        ocpp_connector=connector, id_tag=id_tag, status__in=SESSION_OPEN_STATUSES, meter_start=0
+    ).order_by('-created_at').first()
+    if session:
+        session.meter_start = meter_start
+        session.start_time = started_at
+        session.status = ChargingSession.SessionStatus.STARTED
+        session.save(update_fields=['meter_start', 'start_time', 'status', 'updated_at'])
+    else:
+        for _ in range(5):
+            transaction_id = _next_transaction_id()
+            try:
+                with transaction.atomic():
+                    session = ChargingSession.objects.create(
+                        transaction_id=transaction_id,
+                        user_id=user_id,
+                        ocpp_station=station,
+                        ocpp_connector=connector,
+                        id_tag=id_tag,
+                        payment_transaction_id=payment,
+                        status=ChargingSession.SessionStatus.STARTED,
+                        start_time=started_at,
+                        meter_start=meter_start,
+                        max_power_kw=connector.charging_connector.power_kw if connector.charging_connector else 0
+                    )
+                break
+            except IntegrityError:
+                if not ChargingSession.objects.filter(transaction_id=transaction_id).exists():
+                    raise
+                # Another charger took the same transaction id; try the next one
+                continue
+        else:
+            raise OCPPError('InternalError', 'Could not allocate a transaction id')
+
+    _refresh_connector_availability(connector)
+    publish_progress(session.transaction_id, status=session.status)
+    _log(station, 'StartTransaction', f"Transaction {session.transaction_id} started", session, payload)
+    return {'transactionId': session.transaction_id, **_id_tag_info('Accepted')}
+
+
+def meter_value_rows(session_id, meter_values):
+    rows = []
+    for meter_value in meter_values:
+        at = _timestamp(meter_value['timestamp'])
+        for sampled in meter_value['sampledValue']:
+            measurand = MEASURANDS.get(sampled.get('measurand', DEFAULT_MEASURAND))
+            if measurand is None or sampled.get('format') == 'SignedData':
+                continue
+            try:
+                value = Decimal(sampled['value'])
+            except InvalidOperation:
+                raise OCPPError('TypeConstraintViolation', f"Invalid sampled value {sampled['value']}")
+            rows.append(SessionMeterValue(
+                charging_session_id=session_id,
+                timestamp=at,
+                measurand=measurand,
+                value=value,
+                unit=sampled.get('unit'),
+                context=sampled.get('context'),
+                location=sampled.get('location'),
+            ))
+    return rows
+
+
+def _latest_aggregates(session, rows):
+    """The session's running energy and power from its newest readings"""
+    aggregates = {}
+    energy = [row for row in rows if row.measurand == SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER]
+    if energy:
+        latest = max(energy, key=lambda row: row.timestamp)
+        register_wh = latest.value * 1000 if latest.unit == 'kWh' else latest.value
+        aggregates['energy_consumed_kwh'] = max(Decimal('0'), (register_wh - session['meter_start']) / 1000)
+    power = [row for row in rows if row.measurand == SessionMeterValue.MeasurandType.POWER_ACTIVE_IMPORT]
+    if power:
+        latest = max(power, key=lambda row: row.timestamp)
+        aggregates['current_power_kw'] = latest.value if latest.unit == 'kW' else latest.value / 1000
+    return aggregates
+
+
+def meter_values(station, payload):
+    transaction_id = payload.get('transactionId')
+    if transaction_id is None:
+        # Readings outside a transaction are not stored
+        return {}
+
+    session = ChargingSession.objects.filter(
+        ocpp_station=station, transaction_id=transaction_id
+    ).values('pk', 'meter_start', 'ocpp_connector__charging_connector').first()
+    if session is None:
+        return {}
+
+    rows = meter_value_rows(session['pk'], payload['meterValue'])
+    aggregates = _latest_aggregates(session, rows)
+    if 'energy_consumed_kwh' in aggregates:
+        connector_id = session['ocpp_connector__charging_connector']
+        price = price_at(connector_id) if connector_id else default_price()
+        aggregates['estimated_cost'] = (aggregates['energy_consumed_kwh'] * price).quantize(CENT)
+    aggregates['status'] = ChargingSession.SessionStatus.CHARGING
+    publish_progress(transaction_id, **aggregates)
+    aggregates['updated_at'] = timezone.now()
+    meter_buffer.add(session['pk'], rows, aggregates)
+    return {}
+
+
+def stop_transaction(station, payload):
+    from .billing import BILLING_FIELDS, final_costs
+
+    # Buffered readings must be stored before the session is closed and billed
+    meter_buffer.flush()
+    with transaction.atomic():
+        session = ChargingSession.objects.select_for_update(of=('self',)).filter(
+            ocpp_station=station, transaction_id=payload['transactionId']
+        ).select_related('ocpp_connector__charging_connector').first()
+        # Spec: the central system must accept the StopTransaction even if it does not know the transaction.
+        # Chargers resend it after a timeout; a session already completed is not stored or billed twice.
+        if session is None or session.status == ChargingSession.SessionStatus.COMPLETED:
+            return _id_tag_info('Accepted')
+
+        meter_stop = int(payload['meterStop'])
+        stopped_at = _timestamp(payload['timestamp'])
+        rows = meter_value_rows(session.pk, payload.get('transactionData') or [])
+        # meterStop is the final register reading; billing prices the increments up to it
+        rows.append(SessionMeterValue(
+            charging_session=session,
+            timestamp=stopped_at,
+            measurand=SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER,
+            value=meter_stop,
+            unit='Wh',
+            context='Transaction.End'
+        ))
+        SessionMeterValue.objects.bulk_create(rows)
+
+        session.status = ChargingSession.SessionStatus.COMPLETED
+        session.stop_time = stopped_at
+        session.meter_stop = meter_stop
+        session.energy_consumed_kwh = max(Decimal('0'), Decimal(meter_stop - session.meter_start) / 1000)
+        session.current_power_kw = 0
+        if session.start_time:
+            session.duration_seconds = max(0, int((session.stop_time - session.start_time).total_seconds()))
+        session.stop_reason = payload.get('reason', 'Local')
+        session.save()
+
+        row = ChargingSession.objects.filter(pk=session.pk).values(*BILLING_FIELDS).get()
+        session.final_cost = final_costs([row])[session.pk]
+        session.save(update_fields=['final_cost'])
+
+    _refresh_connector_availability(session.ocpp_connector)
+    publish_progress(
+        session.transaction_id, status=session.status,
+        energy_consumed_kwh=session.energy_consumed_kwh, final_cost=session.final_cost
+    )
+    _log(station, 'StopTransaction', f"Transaction {session.transaction_id} stopped", session, payload)
+    return _id_tag_info('Accepted')
+
+
+HANDLERS = {
+    'BootNotification': boot_notification,
+    'Heartbeat': heartbeat,
+    'Authorize': authorize,
+    'StatusNotification': status_notification,
+    'StartTransaction': start_transaction,
+    'MeterValues': meter_values,
+    'StopTransaction': stop_transaction,
+}
+
+
+def handle_call(charge_point_id, action, payload):
+    """Run one CALL from ``charge_point_id`` and return the CALLRESULT payload"""
+    handler = HANDLERS.get(action)
+    if handler is None:
+        raise OCPPError('NotImplemented', f'{action} is not supported')
+    if not isinstance(payload, dict):
+        raise OCPPError('FormationViolation', 'Payload must be an object')
+
+    station = _station(charge_point_id)
+    try:
+        return handler(station, payload)
+    except KeyError as e:
+        raise OCPPError('ProtocolError', f'{action} is missing {e}')
+    except (TypeError, ValueError) as e:
+        raise OCPPError('TypeConstraintViolation', str(e))
+
+
+def station_disconnected(charge_point_id):
+    station_liveness.forget(charge_point_id)
+    OCPPStation.objects.filter(station_id=charge_point_id).update(is_online=False, updated_at=timezone.now())
+
+
+def station_exists(charge_point_id):
+    return OCPPStation.objects.filter(station_id=charge_point_id).exists()
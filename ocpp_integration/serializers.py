@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .meter_archive import archived_meter_values
 from .models import OCPPStation, OCPPConnector, ChargingSession, SessionMeterValue, OCPPLog
 from charging_stations.models import ChargingStation, ChargingConnector
 
@@ -52,7 +53,7 @@ class ChargingSessionSerializer(serializers.ModelSerializer):
     station_name = serializers.CharField(source='ocpp_station.charging_station.name', read_only=True)
     station_address = serializers.CharField(source='ocpp_station.charging_station.address', read_only=True)
     connector_type = serializers.CharField(source='ocpp_connector.charging_connector.connector_type', read_only=True)
-    meter_values = SessionMeterValueSerializer(many=True, read_only=True)
+    meter_values = serializers.SerializerMethodField()
     
     class Meta:
         model = ChargingSession
@@ -70,6 +71,11 @@ class ChargingSessionSerializer(serializers.ModelSerializer):
     def get_user_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip() or obj.user.email
 
+    def get_meter_values(self, obj):
+        # Finished sessions keep their readings in a SessionMeterArchive
+        meter_values = list(obj.meter_values.all()) or archived_meter_values(obj)
+        return SessionMeterValueSerializer(meter_values, many=True).data
+
 
 class ChargingSessionDetailSerializer(ChargingSessionSerializer):
     ocpp_station = OCPPStationSerializer(read_only=True)
@@ -104,6 +110,14 @@ class SyncStationSerializer(serializers.Serializer):
             raise serializers.ValidationError("Charging station not found")
 
 
+class BulkSyncStationSerializer(serializers.Serializer):
+    charging_station_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False, max_length=1000
+    )
+    vendor = serializers.CharField(max_length=100, required=False, default="Generic")
+    model = serializers.CharField(max_length=100, required=False, default="EV Charger")
+
+
 class InitiateChargingSerializer(serializers.Serializer):
     station_id = serializers.CharField(max_length=100)
     connector_id = serializers.IntegerField()
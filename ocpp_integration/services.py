@@ -1,13 +1,17 @@
 import requests
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Prefetch
 from .models import OCPPStation, OCPPConnector, ChargingSession, SessionMeterValue, OCPPLog
 from charging_stations.models import ChargingStation, ChargingConnector
 from authentication.models import CustomUser
+from utils import http_client
+from .log_writer import ocpp_log_writer
 
 logger = logging.getLogger(__name__)
 
@@ -36,106 +40,192 @@ class OCPPIntegrationService:
         url = f"{self.base_url.rstrip('/')}/{endpoint.lstrip('/')}"
         headers = self.get_headers()
         
-        for attempt in range(retries + 1):
-            try:
-                if method.upper() == 'GET':
-                    response = requests.get(url, headers=headers, timeout=self.timeout)
-                elif method.upper() == 'POST':
-                    response = requests.post(url, json=data, headers=headers, timeout=self.timeout)
-                elif method.upper() == 'PUT':
-                    response = requests.put(url, json=data, headers=headers, timeout=self.timeout)
-                elif method.upper() == 'DELETE':
-                    response = requests.delete(url, headers=headers, timeout=self.timeout)
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {method}")
-                
-                response.raise_for_status()
-                return {'success': True, 'data': response.json()}
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"OCPP API request failed (attempt {attempt + 1}): {e}")
-                if attempt == retries:
-                    return {'success': False, 'error': str(e)}
-                
-        return {'success': False, 'error': 'Max retries exceeded'}
+        if method.upper() not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
 
-    def sync_station_to_ocpp(self, charging_station):
         try:
-            with transaction.atomic():
-                station_data = {
-                    "station_id": f"STATION_{charging_station.id}",
-                    "name": charging_station.name,
-                    "latitude": float(charging_station.latitude) if charging_station.latitude else 0.0,
-                    "longitude": float(charging_station.longitude) if charging_station.longitude else 0.0,
-                    "address": charging_station.address,
-                    "vendor": "Generic",
-                    "model": "EV Charger",
-                    "connectors": []
+            # Every method is retried as before, now with jittered backoff instead of immediately
+            response = http_client.request(
+                method, url, service='ocpp', retries=retries, timeout=self.timeout,
+                retry_unsafe=True, headers=headers,
+                json=data if method.upper() in ('POST', 'PUT') else None
+            )
+            response.raise_for_status()
+            return {'success': True, 'data': response.json()}
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"OCPP API request failed: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def sync_station_to_ocpp(self, charging_station):
+        results = self.sync_stations_to_ocpp(ChargingStation.objects.filter(pk=charging_station.pk))
+        if not results:
+            return {'success': False, 'error': 'Charging station not found'}
+        result = results[0]
+        if not result['success']:
+            return {'success': False, 'error': result['error']}
+        return {
+            'success': True,
+            'ocpp_station': OCPPStation.objects.get(charging_station=charging_station),
+            'data': result['data']
+        }
+
+    def station_payload(self, charging_station, connector_ids, vendor="Generic", model="EV Charger"):
+        return {
+            "station_id": f"STATION_{charging_station.id}",
+            "name": charging_station.name,
+            "latitude": float(charging_station.latitude) if charging_station.latitude else 0.0,
+            "longitude": float(charging_station.longitude) if charging_station.longitude else 0.0,
+            "address": charging_station.address,
+            "vendor": vendor,
+            "model": model,
+            "connectors": [
+                {
+                    "connector_id": connector_ids[connector.id],
+                    "connector_type": connector.connector_type,
+                    "max_power": float(connector.power_kw)
                 }
-                
-                for connector in charging_station.connectors.all():
-                    connector_data = {
-                        "connector_id": connector.id,
-                        "connector_type": connector.connector_type,
-                        "max_power": float(connector.power_kw)
-                    }
-                    station_data["connectors"].append(connector_data)
-                
-                result = self.make_request('POST', '/api/locator/sync-station/', station_data)
-                
-                if result['success']:
-                    response_data = result['data']
-                    
-                    ocpp_station, created = OCPPStation.objects.get_or_create(
-                        charging_station=charging_station,
-                        defaults={
-                            'station_id': station_data["station_id"],
-                            'vendor': station_data.get("vendor"),
-                            'model': station_data.get("model"),
-                            'ocpp_websocket_url': response_data.get('ocpp_websocket'),
-                            'is_online': True
-                        }
-                    )
-                    
-                    if not created:
-                        ocpp_station.station_id = station_data["station_id"]
-                        ocpp_station.ocpp_websocket_url = response_data.get('ocpp_websocket')
-                        ocpp_station.is_online = True
-                        ocpp_station.save()
-                    
-                    for connector in charging_station.connectors.all():
-                        ocpp_connector, created = OCPPConnector.objects.get_or_create(
-                            ocpp_station=ocpp_station,
-                            connector_id=connector.id,
-                            defaults={
-                                'charging_connector': connector,
-                                'status': OCPPConnector.ConnectorStatus.AVAILABLE
-                            }
-                        )
-                    
-                    self.log_event(
-                        ocpp_station=ocpp_station,
-                        level=OCPPLog.LogLevel.INFO,
-                        message=f"Station {ocpp_station.station_id} synced successfully",
-                        raw_data=response_data
-                    )
-                    
-                    return {
-                        'success': True,
-                        'ocpp_station': ocpp_station,
-                        'data': response_data
-                    }
-                else:
-                    self.log_event(
-                        level=OCPPLog.LogLevel.ERROR,
-                        message=f"Failed to sync station {charging_station.name}: {result['error']}"
-                    )
-                    return result
-                    
+                for connector in charging_station.connectors.all()
+            ]
+        }
+
+    def _ocpp_connector_ids(self, charging_station):
+        """
+        OCPP connector number of each charging connector. Numbers already
+        mapped are kept; new connectors first take the numbers the charge
+        point reported without a mapping, then the next free ones.
+        """
+        try:
+            ocpp_connectors = list(charging_station.ocpp_station.ocpp_connectors.all())
+        except OCPPStation.DoesNotExist:
+            ocpp_connectors = []
+        existing = {
+            connector.charging_connector_id: connector.connector_id
+            for connector in ocpp_connectors if connector.charging_connector_id
+        }
+        unmapped = sorted(connector.connector_id for connector in ocpp_connectors if not connector.charging_connector_id)
+        next_id = max((connector.connector_id for connector in ocpp_connectors), default=0) + 1
+
+        connector_ids = {}
+        for connector in charging_station.connectors.all():
+            if connector.id in existing:
+                connector_ids[connector.id] = existing[connector.id]
+            elif unmapped:
+                connector_ids[connector.id] = unmapped.pop(0)
+            else:
+                connector_ids[connector.id] = next_id
+                next_id += 1
+        return connector_ids
+
+    def _post_station(self, payload):
+        try:
+            return self.make_request('POST', '/api/locator/sync-station/', payload)
         except Exception as e:
-            logger.error(f"Error syncing station to OCPP: {e}")
             return {'success': False, 'error': str(e)}
 
+    def sync_stations_to_ocpp(self, charging_stations, vendor="Generic", model="EV Charger", max_workers=None):
+        """
+        Sync many stations to the OCPP backend. The stations are posted
+        concurrently, at most ``max_workers`` at a time, and the OCPPStation and
+        OCPPConnector rows of those that succeeded are then upserted in bulk.
+        Returns one result dict per station.
+        """
+        stations = list(charging_stations.prefetch_related(
+            Prefetch('connectors', queryset=ChargingConnector.objects.order_by('created_at', 'id')),
+            'ocpp_station__ocpp_connectors'
+        ))
+        if not stations:
+            return []
+
+        connector_ids = [self._ocpp_connector_ids(station) for station in stations]
+        payloads = [
+            self.station_payload(station, ids, vendor, model)
+            for station, ids in zip(stations, connector_ids)
+        ]
+        workers = min(max_workers or self.config['SYNC_WORKERS'], len(payloads))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocpp-sync') as executor:
+            responses = list(executor.map(self._post_station, payloads))
+
+        results = []
+        synced = []
+        for station, ids, payload, response in zip(stations, connector_ids, payloads, responses):
+            result = {
+                'charging_station_id': str(station.id),
+                'name': station.name,
+                'station_id': payload['station_id'],
+                'success': response['success'],
+            }
+            if response['success']:
+                result['data'] = response['data'] if isinstance(response['data'], dict) else {}
+                synced.append((station, ids, payload, result))
+            else:
+                result['error'] = response['error']
+                self.log_event(
+                    level=OCPPLog.LogLevel.ERROR,
+                    message=f"Failed to sync station {station.name}: {response['error']}"
+                )
+            results.append(result)
+
+        if synced:
+            try:
+                self._save_synced_stations(synced)
+            except Exception as e:
+                logger.error(f"Error saving {len(synced)} synced OCPP stations: {e}")
+                for _, _, _, result in synced:
+                    result.update(success=False, error=str(e))
+        return results
+
+    def _save_synced_stations(self, synced):
+        with transaction.atomic():
+            OCPPStation.objects.bulk_create(
+                [
+                    OCPPStation(
+                        charging_station=station,
+                        station_id=payload['station_id'],
+                        vendor=payload['vendor'],
+                        model=payload['model'],
+                        ocpp_websocket_url=result['data'].get('ocpp_websocket'),
+                        is_online=True
+                    )
+                    for station, _, payload, result in synced
+                ],
+                update_conflicts=True,
+                unique_fields=['charging_station'],
+                update_fields=['station_id', 'ocpp_websocket_url', 'is_online', 'updated_at']
+            )
+            # Conflicting rows keep their own primary keys, so read them back
+            ocpp_stations = {
+                ocpp_station.charging_station_id: ocpp_station
+                for ocpp_station in OCPPStation.objects.filter(
+                    charging_station__in=[station for station, _, _, _ in synced]
+                )
+            }
+            OCPPConnector.objects.bulk_create(
+                [
+                    OCPPConnector(
+                        ocpp_station=ocpp_stations[station.id],
+                        connector_id=connector_id,
+                        charging_connector_id=charging_connector_id,
+                        status=OCPPConnector.ConnectorStatus.AVAILABLE
+                    )
+                    for station, ids, _, _ in synced
+                    for charging_connector_id, connector_id in ids.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['ocpp_station', 'connector_id'],
+                update_fields=['charging_connector', 'updated_at']
+            )
+
+        for station, _, _, result in synced:
+            ocpp_station = ocpp_stations[station.id]
+            result['ocpp_websocket_url'] = ocpp_station.ocpp_websocket_url
+            self.log_event(
+                ocpp_station=ocpp_station,
+                level=OCPPLog.LogLevel.INFO,
+                message=f"Station {ocpp_station.station_id} synced successfully",
+                raw_data=result['data']
+            )
+
     def initiate_charging(self, station_id, connector_id, user, payment_transaction_id, owner_info=None):
         try:
             ocpp_station = OCPPStation.objects.get(station_id=station_id)
@@ -308,15 +398,12 @@ class OCPPIntegrationService:
 
     def log_event(self, ocpp_station=None, charging_session=None, level=OCPPLog.LogLevel.INFO, 
                   message_type=None, action=None, message="", raw_data=None):
-        try:
-            OCPPLog.objects.create(
-                ocpp_station=ocpp_station,
-                charging_session=charging_session,
-                level=level,
-                message_type=message_type,
-                action=action,
-                message=message,
-                raw_data=raw_data
-            )
-        except Exception as e:
-            logger.error(f"Error logging OCPP event: {e}")
+        ocpp_log_writer.log(
+            ocpp_station=ocpp_station,
+            charging_session=charging_session,
+            level=level,
+            message_type=message_type,
+            action=action,
+            message=message,
+            raw_data=raw_data
+        )
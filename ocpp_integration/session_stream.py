@@ -0,0 +1,175 @@
+"""
+Live charging session progress over Server-Sent Events.
+
+The OCPP handlers and webhooks call ``publish_progress`` whenever a session's
+status, energy, power or cost changes. Events go through an in-process
+PubSubHub keyed by transaction id, so each update is fanned out only to the
+clients watching that session. Clients read them from SessionStreamView,
+which starts with the session's current state and then streams every update
+until the session ends. No remote OCPP call is made.
+
+The hub is per process, so a SessionPoller re-reads the watched sessions
+every POLL_SECONDS, with one query for all of them, and publishes the
+changes made by other workers.
+
+Streams are only held open under ASGI, where an idle client costs no thread.
+A WSGI worker gets the current state with an SSE ``retry`` hint and closes,
+so the browser's EventSource reconnects every RETRY_SECONDS instead of
+holding the worker.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from utils.pubsub import PubSubHub
+from .models import ChargingSession
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {
+    ChargingSession.SessionStatus.STOPPED,
+    ChargingSession.SessionStatus.COMPLETED,
+    ChargingSession.SessionStatus.FAILED,
+}
+SNAPSHOT_FIELDS = (
+    'transaction_id', 'status', 'energy_consumed_kwh', 'current_power_kw',
+    'estimated_cost', 'final_cost', 'duration_seconds',
+)
+
+session_hub = PubSubHub(
+    queue_size=settings.SESSION_STREAM['QUEUE_SIZE'],
+    latest_ttl=settings.SESSION_STREAM['LATEST_TTL_SECONDS'],
+)
+
+
+def _config():
+    return settings.SESSION_STREAM
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _publish(transaction_id, event):
+    session_hub.publish(transaction_id, event)
+    if event.get('status') in TERMINAL_STATUSES:
+        session_hub.forget(transaction_id)
+
+
+def publish_progress(transaction_id, **fields):
+    """Send a progress update for ``transaction_id`` to its subscribers"""
+    event = {'transaction_id': transaction_id, 'timestamp': timezone.now().isoformat()}
+    event.update({field: _json_value(value) for field, value in fields.items()})
+    _publish(transaction_id, event)
+
+
+def session_snapshot(session):
+    """Current state of ``session`` in the shape of a progress event"""
+    event = {field: _json_value(getattr(session, field)) for field in SNAPSHOT_FIELDS}
+    event['timestamp'] = session.updated_at.isoformat()
+    return event
+
+
+def sse_message(event, name='progress', retry=None):
+    message = f"event: {name}\ndata: {json.dumps(event)}\n\n"
+    if retry is not None:
+        message = f"retry: {int(retry * 1000)}\n{message}"
+    return message
+
+
+KEEPALIVE = ': keepalive\n\n'
+
+
+def _first_event(transaction_id, snapshot):
+    # The hub may hold an update that is not in the database yet (meter values are written in batches)
+    latest = session_hub.latest(transaction_id)
+    if latest and latest['timestamp'] > snapshot['timestamp']:
+        return {**snapshot, **latest}
+    return snapshot
+
+
+def event_stream(transaction_id, snapshot):
+    """SSE response for WSGI workers: the current state, then the client reconnects after RETRY_SECONDS"""
+    first = _first_event(transaction_id, snapshot)
+    retry = None if first['status'] in TERMINAL_STATUSES else _config()['RETRY_SECONDS']
+    yield sse_message(first, retry=retry)
+
+
+async def async_event_stream(transaction_id, snapshot):
+    """SSE async generator for ASGI servers; subscribes on the server's event loop"""
+    subscription = session_hub.subscribe(transaction_id, loop=asyncio.get_running_loop())
+    session_poller.ensure_started()
+    try:
+        first = _first_event(transaction_id, snapshot)
+        yield sse_message(first)
+        if first['status'] in TERMINAL_STATUSES:
+            return
+        deadline = time.monotonic() + _config()['MAX_STREAM_SECONDS']
+        while time.monotonic() < deadline:
+            event = await subscription.aget(_config()['KEEPALIVE_SECONDS'])
+            if event is None:
+                yield KEEPALIVE
+                continue
+            yield sse_message(event)
+            if event.get('status') in TERMINAL_STATUSES:
+                return
+    finally:
+        subscription.close()
+
+
+class SessionPoller:
+    """Publishes the changes other workers made to the sessions watched in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def poll(self):
+        """Read every watched session and publish those that changed. Returns the number published."""
+        transaction_ids = session_hub.keys()
+        if not transaction_ids:
+            return 0
+        published = 0
+        for session in ChargingSession.objects.filter(transaction_id__in=transaction_ids).only(*SNAPSHOT_FIELDS, 'updated_at'):
+            event = session_snapshot(session)
+            latest = session_hub.latest(session.transaction_id)
+            # Skip what this process already published; the database can lag behind batched meter aggregates
+            if latest and (latest['timestamp'] >= event['timestamp']
+                           or all(latest.get(field) == event[field] for field in SNAPSHOT_FIELDS)):
+                continue
+            _publish(session.transaction_id, event)
+            published += 1
+        return published
+
+    def ensure_started(self):
+        if self._thread is not None or _config()['POLL_SECONDS'] <= 0:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='session-stream-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(_config()['POLL_SECONDS'])
+            close_old_connections()
+            try:
+                self.poll()
+                session_hub.evict_stale()
+            except Exception:
+                logger.exception("Session stream poll failed")
+            finally:
+                close_old_connections()
+
+
+session_poller = SessionPoller()
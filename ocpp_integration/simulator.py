@@ -0,0 +1,703 @@
+"""
+OCPP charger fleet simulator for load and soak tests.
+
+Runs ``chargers`` virtual chargers with ``connectors`` connectors each as
+asyncio tasks. Every connector idles for a random time (exponential, mean
+``idle_seconds``), runs a session reporting its meter every
+``progress_interval`` seconds for ``session_seconds``, stops, and starts over
+until ``duration`` has passed. Chargers start spread over ``ramp_seconds``.
+
+Two paths into the server:
+
+- ``central``: OCPP 1.6J frames over WebSockets to the central system
+  (BootNotification, StatusNotification, Start/StopTransaction, MeterValues,
+  Heartbeat)
+- ``webhook``: the JSON webhooks the hosted OCPP backend posts to
+  ``ocpp_webhook`` (connector_status, session_started, session_progress,
+  session_stopped), after creating the pending session the way
+  ``initiate_charging`` does
+
+Without a ``url`` the simulator drives ``mengedmate.asgi.application`` in
+this process, so it can also count the SQL writes the server made. With a
+``url`` it loads a running server; the ``central`` path then needs the
+``websockets`` package (installed with uvicorn[standard]).
+
+Either way the fleet is provisioned in, and state lag is read from, the
+configured database: lag is the time from sending a meter reading until the
+session's stored energy reaches it. The fleet is deleted afterwards unless
+``keep`` is set.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+
+from .models import ChargingSession, OCPPConnector, OCPPStation
+from .ocpp16 import CALL, CALL_ERROR
+
+logger = logging.getLogger(__name__)
+
+MODES = ('central', 'webhook')
+SUBPROTOCOL = 'ocpp1.6'
+WEBHOOK_PATH = '/api/ocpp/webhook/'
+# Simulator-side database work runs on these threads and is left out of the write counts
+THREAD_PREFIX = 'fleet-sim'
+REPLY_TIMEOUT = 30
+
+
+class SimulationError(Exception):
+    pass
+
+
+def _now():
+    return datetime.now(dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 1)
+
+    return {'count': len(ordered), 'p50_ms': at(0.5), 'p95_ms': at(0.95), 'p99_ms': at(0.99), 'max_ms': at(1)}
+
+
+class FleetMetrics:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.sessions = Counter()
+        self.lags = []
+
+    def record(self, kind, latency, ok=True):
+        self.latencies[kind].append(latency)
+        if not ok:
+            self.errors[kind] += 1
+
+    def report(self, elapsed):
+        messages = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            'elapsed_seconds': round(elapsed, 2),
+            'messages': messages,
+            'messages_per_second': round(messages / elapsed, 1) if elapsed else 0.0,
+            'errors': sum(self.errors.values()),
+            'sessions': dict(self.sessions),
+            'latency': {kind: _percentiles(latencies) for kind, latencies in sorted(self.latencies.items())},
+            'errors_by_kind': dict(self.errors),
+            'state_lag': _percentiles(self.lags),
+        }
+
+
+class WriteCounter:
+    """
+    Counts INSERT/UPDATE/DELETE statements made by this process. Only
+    connections of the current thread and those opened during the run are
+    seen, which is every server connection when the simulator runs in a fresh
+    process, as the management command does.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.active = False
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active and not threading.current_thread().name.startswith(THREAD_PREFIX):
+            verb = sql.lstrip()[:6].upper()
+            if verb in ('INSERT', 'UPDATE', 'DELETE'):
+                with self._lock:
+                    self.counts[verb.lower()] += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def start(self):
+        self.active = True
+        connection_created.connect(self._install)
+        # Connections opened before the run belong to this thread; later ones are caught by the signal
+        for connection in connections.all():
+            self._install(None, connection)
+
+    def stop(self):
+        self.active = False
+        connection_created.disconnect(self._install)
+
+    def report(self):
+        with self._lock:
+            return {**self.counts, 'total': sum(self.counts.values())}
+
+
+class StateLagProbe:
+    """Measures how long meter readings take to show up in the sessions' stored energy"""
+
+    def __init__(self, simulator, interval):
+        self.simulator = simulator
+        self.interval = interval
+        self._pending = defaultdict(list)
+
+    def expect(self, transaction_id, energy_kwh):
+        self._pending[transaction_id].append((Decimal(str(round(energy_kwh, 3))), time.monotonic()))
+
+    @property
+    def unresolved(self):
+        return sum(len(expected) for expected in self._pending.values())
+
+    def _stored_energy(self, transaction_ids):
+        return dict(ChargingSession.objects.filter(
+            transaction_id__in=transaction_ids
+        ).values_list('transaction_id', 'energy_consumed_kwh'))
+
+    async def check(self):
+        if not self._pending:
+            return
+        stored = await self.simulator.run_db(self._stored_energy, list(self._pending))
+        now = time.monotonic()
+        for transaction_id, energy in stored.items():
+            expected = self._pending.get(transaction_id)
+            if energy is None or not expected:
+                continue
+            waiting = [(kwh, sent_at) for kwh, sent_at in expected if kwh > energy]
+            self.simulator.metrics.lags.extend(now - sent_at for kwh, sent_at in expected if kwh <= energy)
+            if waiting:
+                self._pending[transaction_id] = waiting
+            else:
+                del self._pending[transaction_id]
+
+    async def run(self, stopped):
+        while True:
+            try:
+                await asyncio.wait_for(stopped.wait(), self.interval)
+                return
+            except asyncio.TimeoutError:
+                await self.check()
+
+
+def basic_auth_headers(station_id):
+    """Security Profile 1 credentials for ``station_id`` when the central system requires them"""
+    from django.conf import settings
+
+    key = settings.OCPP_CENTRAL_SYSTEM['AUTHORIZATION_KEY']
+    if not key:
+        return []
+    return [('Authorization', 'Basic ' + base64.b64encode(f'{station_id}:{key}'.encode()).decode())]
+
+
+class InProcessSocket:
+    """OCPP-J connection to the central system of ``mengedmate.asgi.application``"""
+
+    def __init__(self, application, path, headers=()):
+        from asgiref.testing import ApplicationCommunicator
+
+        self.communicator = ApplicationCommunicator(application, {
+            'type': 'websocket', 'path': path, 'subprotocols': [SUBPROTOCOL], 'query_string': b'',
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        })
+
+    async def open(self):
+        await self.communicator.send_input({'type': 'websocket.connect'})
+        message = await self.communicator.receive_output(REPLY_TIMEOUT)
+        if message['type'] != 'websocket.accept':
+            raise SimulationError(f"Connection refused with code {message.get('code')}")
+
+    async def send(self, text):
+        await self.communicator.send_input({'type': 'websocket.receive', 'text': text})
+
+    async def recv(self):
+        message = await self.communicator.receive_output(REPLY_TIMEOUT)
+        if message['type'] != 'websocket.send':
+            raise SimulationError(f"Connection closed with code {message.get('code')}")
+        return message['text']
+
+    async def close(self):
+        await self.communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        try:
+            await self.communicator.wait(REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RemoteSocket:
+    """OCPP-J connection to a running central system"""
+
+    def __init__(self, url, headers=()):
+        self.url = url
+        self.headers = list(headers)
+        self.connection = None
+
+    async def open(self):
+        import websockets
+
+        if not self.headers:
+            self.connection = await websockets.connect(self.url, subprotocols=[SUBPROTOCOL])
+            return
+        try:
+            self.connection = await websockets.connect(self.url, subprotocols=[SUBPROTOCOL], additional_headers=self.headers)
+        except TypeError:
+            # websockets < 14
+            self.connection = await websockets.connect(self.url, subprotocols=[SUBPROTOCOL], extra_headers=self.headers)
+
+    async def send(self, text):
+        await self.connection.send(text)
+
+    async def recv(self):
+        return await asyncio.wait_for(self.connection.recv(), REPLY_TIMEOUT)
+
+    async def close(self):
+        await self.connection.close()
+
+
+class ChargePointConnection:
+    """One charger's OCPP-J session; CALLs go out one at a time, as OCPP 1.6J requires"""
+
+    def __init__(self, socket, metrics):
+        self.socket = socket
+        self.metrics = metrics
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+
+    async def call(self, action, payload):
+        async with self._lock:
+            message_id = str(next(self._ids))
+            started = time.monotonic()
+            await self.socket.send(json.dumps([CALL, message_id, action, payload]))
+            reply = json.loads(await self.socket.recv())
+        ok = reply[0] != CALL_ERROR
+        self.metrics.record(action, time.monotonic() - started, ok)
+        if not ok:
+            raise SimulationError(f"{action} failed: {reply[2]} {reply[3]}")
+        return reply[2]
+
+
+class FleetSimulator:
+    def __init__(self, chargers=10, connectors=2, mode='central', url=None, duration=60, ramp_seconds=5,
+                 idle_seconds=10, session_seconds=60, progress_interval=5, heartbeat_interval=60,
+                 power_kw=22, probe_interval=0.5, seed=None, keep=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}; expected one of {', '.join(MODES)}")
+        self.chargers = chargers
+        self.connectors = connectors
+        self.mode = mode
+        self.url = url.rstrip('/') if url else None
+        self.duration = duration
+        self.ramp_seconds = ramp_seconds
+        self.idle_seconds = idle_seconds
+        self.session_seconds = session_seconds
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.power_kw = power_kw
+        self.keep = keep
+        self.random = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+
+        self.metrics = FleetMetrics()
+        self.writes = WriteCounter()
+        self.probe = StateLagProbe(self, probe_interval)
+        self.fleet = None
+        self._executor = None
+        self._application = None
+        self._transaction_ids = None
+
+    @property
+    def in_process(self):
+        return self.url is None
+
+    @property
+    def owner_email(self):
+        return f'fleet-sim-{self.run_id}@example.com'
+
+    async def run_db(self, func, *args):
+        def run():
+            close_old_connections()
+            try:
+                return func(*args)
+            finally:
+                close_old_connections()
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    # Fleet provisioning
+
+    def provision(self):
+        """Create the simulated owner, stations and connectors"""
+        from charging_stations.models import ChargingConnector, ChargingStation, StationOwner
+        from payments.models import Wallet
+
+        user = get_user_model().objects.create_user(email=self.owner_email)
+        owner = StationOwner.objects.create(user=user, company_name=f'Fleet simulator {self.run_id}')
+        # The simulated driver pays from its wallet, so its idTag is authorized without a payment
+        Wallet.objects.create(user=user, balance=Decimal('1000000.00'))
+        stations = ChargingStation.objects.bulk_create([
+            ChargingStation(
+                owner=owner, name=f'Simulated charger {number}', address='Simulated', city='Simulated',
+                state='Simulated', zip_code='0000', is_public=False
+            )
+            for number in range(1, self.chargers + 1)
+        ])
+        charging_connectors = ChargingConnector.objects.bulk_create([
+            ChargingConnector(
+                station=station, connector_type=ChargingConnector.ConnectorType.TYPE_2,
+                power_kw=self.power_kw, quantity=1, available_quantity=1
+            )
+            for station in stations for _ in range(self.connectors)
+        ])
+        ocpp_stations = OCPPStation.objects.bulk_create([
+            OCPPStation(
+                station_id=f'SIM-{self.run_id}-{number:04d}', charging_station=station,
+                vendor='MengedMate', model='Fleet Simulator'
+            )
+            for number, station in enumerate(stations, 1)
+        ])
+        ocpp_connectors = OCPPConnector.objects.bulk_create([
+            OCPPConnector(
+                ocpp_station=ocpp_station, connector_id=connector_id,
+                charging_connector=charging_connectors[index * self.connectors + connector_id - 1]
+            )
+            for index, ocpp_station in enumerate(ocpp_stations)
+            for connector_id in range(1, self.connectors + 1)
+        ])
+
+        self.fleet = {
+            'user_id': user.pk,
+            'stations': [
+                {
+                    'station_id': ocpp_station.station_id,
+                    'pk': ocpp_station.pk,
+                    'connectors': {
+                        connector.connector_id: connector.pk
+                        for connector in ocpp_connectors[index * self.connectors:(index + 1) * self.connectors]
+                    },
+                }
+                for index, ocpp_station in enumerate(ocpp_stations)
+            ],
+        }
+        last = ChargingSession.objects.aggregate(last=Max('transaction_id'))['last'] or 0
+        self._transaction_ids = itertools.count(last + 1)
+
+    def remove(self):
+        """Delete the simulated fleet with its sessions, meter values and logs"""
+        get_user_model().objects.filter(email=self.owner_email).delete()
+
+    def _create_session(self, station, connector_id):
+        # What initiate_charging stores before the backend starts the session
+        for _ in range(5):
+            try:
+                return ChargingSession.objects.create(
+                    transaction_id=next(self._transaction_ids),
+                    user_id=self.fleet['user_id'],
+                    ocpp_station_id=station['pk'],
+                    ocpp_connector_id=station['connectors'][connector_id],
+                    id_tag=f"USER_{self.fleet['user_id']}_SIM",
+                    status=ChargingSession.SessionStatus.PENDING,
+                    max_power_kw=self.power_kw,
+                ).transaction_id
+            except IntegrityError:
+                # Real traffic took the id; continue after the current maximum
+                last = ChargingSession.objects.aggregate(last=Max('transaction_id'))['last'] or 0
+                self._transaction_ids = itertools.count(last + 1)
+        raise SimulationError('Could not allocate a transaction id')
+
+    # Transports
+
+    async def _open_socket(self, station_id):
+        from django.conf import settings
+
+        headers = basic_auth_headers(station_id)
+        if self.in_process:
+            socket = InProcessSocket(self._application, settings.OCPP_CENTRAL_SYSTEM['PATH_PREFIX'] + station_id, headers)
+        else:
+            socket = RemoteSocket(f'{self.url}/{station_id}', headers)
+        await socket.open()
+        return socket
+
+    async def _post_in_process(self, body):
+        from asgiref.testing import ApplicationCommunicator
+
+        communicator = ApplicationCommunicator(self._application, {
+            'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+            'path': WEBHOOK_PATH, 'raw_path': WEBHOOK_PATH.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', b'localhost'), (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+            ],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        })
+        await communicator.send_input({'type': 'http.request', 'body': body, 'more_body': False})
+        start = await communicator.receive_output(REPLY_TIMEOUT)
+        while (await communicator.receive_output(REPLY_TIMEOUT)).get('more_body'):
+            pass
+        await communicator.send_input({'type': 'http.disconnect'})
+        try:
+            await communicator.wait(REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        return start['status']
+
+    async def _post_remote(self, body):
+        from utils import http_client
+
+        response = await asyncio.to_thread(
+            http_client.request, 'POST', self.url, service='fleet-simulator', retries=0,
+            data=body, headers={'Content-Type': 'application/json'}
+        )
+        return response.status_code
+
+    async def post_webhook(self, webhook_type, station_id, data, transaction_id=None):
+        body = {'type': webhook_type, 'station_id': station_id, 'data': data, 'timestamp': _now()}
+        if transaction_id is not None:
+            body['transaction_id'] = transaction_id
+        started = time.monotonic()
+        try:
+            if self.in_process:
+                status = await self._post_in_process(json.dumps(body).encode())
+            else:
+                status = await self._post_remote(json.dumps(body))
+        except Exception as e:
+            self.metrics.record(webhook_type, time.monotonic() - started, ok=False)
+            raise SimulationError(f"{webhook_type} webhook failed: {e}")
+        ok = status < 400
+        self.metrics.record(webhook_type, time.monotonic() - started, ok)
+        if not ok:
+            raise SimulationError(f"{webhook_type} webhook failed with HTTP {status}")
+
+    # Charger behaviour
+
+    def _remaining(self, deadline):
+        return deadline - time.monotonic()
+
+    async def _idle(self, deadline):
+        wait = min(self.random.expovariate(1 / self.idle_seconds) if self.idle_seconds > 0 else 0, self._remaining(deadline))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self._remaining(deadline) > 0
+
+    async def _progress_loop(self, deadline, report):
+        """Call ``report(elapsed seconds, power kW)`` every progress interval until the session ends"""
+        ends_at = min(time.monotonic() + self.session_seconds, deadline)
+        power_kw = self.power_kw * self.random.uniform(0.5, 1.0)
+        started = time.monotonic()
+        while time.monotonic() + self.progress_interval <= ends_at:
+            await asyncio.sleep(self.progress_interval)
+            await report(time.monotonic() - started, power_kw)
+        await asyncio.sleep(max(0, ends_at - time.monotonic()))
+        return time.monotonic() - started, power_kw
+
+    async def _central_session(self, charger, station, connector_id, deadline):
+        meter_start = charger['registers'][connector_id]
+        await charger['connection'].call('StatusNotification', {
+            'connectorId': connector_id, 'status': 'Preparing', 'errorCode': 'NoError'
+        })
+        reply = await charger['connection'].call('StartTransaction', {
+            'connectorId': connector_id, 'idTag': f"USER_{self.fleet['user_id']}_SIM",
+            'meterStart': meter_start, 'timestamp': _now()
+        })
+        transaction_id = reply['transactionId']
+        if reply['idTagInfo']['status'] != 'Accepted':
+            raise SimulationError(f"StartTransaction rejected: {reply['idTagInfo']['status']}")
+        self.metrics.sessions['started'] += 1
+        await charger['connection'].call('StatusNotification', {
+            'connectorId': connector_id, 'status': 'Charging', 'errorCode': 'NoError'
+        })
+
+        async def report(elapsed, power_kw):
+            register = meter_start + round(power_kw * elapsed / 3.6)
+            charger['registers'][connector_id] = register
+            await charger['connection'].call('MeterValues', {
+                'connectorId': connector_id, 'transactionId': transaction_id,
+                'meterValue': [{'timestamp': _now(), 'sampledValue': [
+                    {'value': str(register), 'measurand': 'Energy.Active.Import.Register', 'unit': 'Wh'},
+                    {'value': f'{power_kw:.2f}', 'measurand': 'Power.Active.Import', 'unit': 'kW'},
+                ]}]
+            })
+            self.probe.expect(transaction_id, (register - meter_start) / 1000)
+
+        elapsed, power_kw = await self._progress_loop(deadline, report)
+        meter_stop = meter_start + round(power_kw * elapsed / 3.6)
+        charger['registers'][connector_id] = meter_stop
+        await charger['connection'].call('StopTransaction', {
+            'transactionId': transaction_id, 'meterStop': meter_stop, 'timestamp': _now(), 'reason': 'Local'
+        })
+        self.probe.expect(transaction_id, (meter_stop - meter_start) / 1000)
+        self.metrics.sessions['completed'] += 1
+        for status in ('Finishing', 'Available'):
+            await charger['connection'].call('StatusNotification', {
+                'connectorId': connector_id, 'status': status, 'errorCode': 'NoError'
+            })
+
+    async def _webhook_session(self, charger, station, connector_id, deadline):
+        station_id = station['station_id']
+        transaction_id = await self.run_db(self._create_session, station, connector_id)
+        await self.post_webhook('connector_status', station_id, {
+            'connector_id': connector_id, 'status': OCPPConnector.ConnectorStatus.PREPARING
+        })
+        await self.post_webhook('session_started', station_id, {'connector_id': connector_id}, transaction_id)
+        self.metrics.sessions['started'] += 1
+
+        async def report(elapsed, power_kw):
+            energy_kwh = round(power_kw * elapsed / 3600, 3)
+            await self.post_webhook('session_progress', station_id, {
+                'energy_consumed_kwh': f'{energy_kwh:.3f}',
+                'current_power_kw': f'{power_kw:.2f}',
+                'duration_seconds': int(elapsed),
+                'meter_values': [{'timestamp': _now(), 'sampledValue': [
+                    {'value': f'{energy_kwh * 1000:.0f}', 'measurand': 'Energy.Active.Import.Register', 'unit': 'Wh'},
+                    {'value': f'{power_kw:.2f}', 'measurand': 'Power.Active.Import', 'unit': 'kW'},
+                ]}],
+            }, transaction_id)
+            self.probe.expect(transaction_id, energy_kwh)
+
+        elapsed, power_kw = await self._progress_loop(deadline, report)
+        await self.post_webhook('session_stopped', station_id, {
+            'meter_stop': round(power_kw * elapsed / 3.6), 'stop_reason': 'Local'
+        }, transaction_id)
+        self.metrics.sessions['completed'] += 1
+
+    async def _connector(self, charger, station, connector_id, deadline):
+        run_session = self._central_session if self.mode == 'central' else self._webhook_session
+        while await self._idle(deadline):
+            try:
+                await run_session(charger, station, connector_id, deadline)
+            except SimulationError as e:
+                self.metrics.sessions['failed'] += 1
+                logger.warning(f"{station['station_id']} connector {connector_id}: {e}")
+                if charger.get('closed'):
+                    return
+
+    async def _heartbeat(self, connection):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await connection.call('Heartbeat', {})
+
+    async def _charger(self, station, delay, deadline):
+        await asyncio.sleep(delay)
+        charger = {'registers': {connector_id: 0 for connector_id in station['connectors']}}
+        heartbeat = socket = None
+        if self.mode == 'central':
+            try:
+                socket = await self._open_socket(station['station_id'])
+                charger['connection'] = ChargePointConnection(socket, self.metrics)
+                await charger['connection'].call('BootNotification', {
+                    'chargePointVendor': 'MengedMate', 'chargePointModel': 'Fleet Simulator'
+                })
+                for connector_id in station['connectors']:
+                    await charger['connection'].call('StatusNotification', {
+                        'connectorId': connector_id, 'status': 'Available', 'errorCode': 'NoError'
+                    })
+            except Exception as e:
+                self.metrics.errors['connect'] += 1
+                logger.warning(f"{station['station_id']} could not connect: {e}")
+                if socket is not None:
+                    await socket.close()
+                return
+            heartbeat = asyncio.create_task(self._heartbeat(charger['connection']))
+
+        try:
+            await asyncio.gather(*(
+                self._connector(charger, station, connector_id, deadline) for connector_id in station['connectors']
+            ))
+        finally:
+            if socket is not None:
+                heartbeat.cancel()
+                charger['closed'] = True
+                await socket.close()
+
+    async def _flush_server(self):
+        # Buffered server state is written before the last lag check; flushing counts as server writes
+        from .connector_state import connector_states
+        from .log_writer import ocpp_log_writer
+        from .meter_ingest import meter_buffer
+        from .webhook_coalescer import webhook_coalescer
+
+        def flush():
+            close_old_connections()
+            try:
+                webhook_coalescer.flush()
+                meter_buffer.flush()
+                connector_states.flush()
+                ocpp_log_writer.flush()
+            finally:
+                close_old_connections()
+
+        await asyncio.to_thread(flush)
+
+    def _server_stats(self):
+        from .log_writer import ocpp_log_writer
+        from .meter_ingest import meter_buffer
+        from .webhook_coalescer import webhook_coalescer
+
+        return {
+            'meter_ingest': meter_buffer.snapshot(),
+            'webhooks': webhook_coalescer.snapshot(),
+            'logs': ocpp_log_writer.snapshot(),
+        }
+
+    async def _run(self):
+        if self.in_process:
+            from mengedmate.asgi import application
+
+            self._application = application
+            self.writes.start()
+
+        started = time.monotonic()
+        deadline = started + self.duration
+        stopped = asyncio.Event()
+        probe = asyncio.create_task(self.probe.run(stopped))
+        spacing = self.ramp_seconds / max(1, self.chargers)
+        try:
+            await asyncio.gather(*(
+                self._charger(station, index * spacing, deadline)
+                for index, station in enumerate(self.fleet['stations'])
+            ))
+            elapsed = time.monotonic() - started
+            if self.in_process:
+                await self._flush_server()
+            # Give buffered writes up to five seconds to land
+            for _ in range(10):
+                await self.probe.check()
+                if not self.probe.unresolved:
+                    break
+                await asyncio.sleep(0.5)
+        finally:
+            stopped.set()
+            await probe
+            self.writes.stop()
+
+        report = self.metrics.report(elapsed)
+        report['state_lag_unresolved'] = self.probe.unresolved
+        if self.in_process:
+            report['db_writes'] = self.writes.report()
+            report['server'] = self._server_stats()
+        return report
+
+    def run(self):
+        """Provision the fleet, run it and return the report"""
+        self.provision()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=THREAD_PREFIX)
+        try:
+            report = asyncio.run(self._run())
+        finally:
+            self._executor.shutdown()
+            if not self.keep:
+                self.remove()
+        report.update(
+            mode=self.mode, target=self.url or 'in-process', chargers=self.chargers,
+            connectors=self.connectors, run_id=self.run_id
+        )
+        return report
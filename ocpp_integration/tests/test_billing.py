@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class SessionBillingTests(TestCase):
+    """Test cases for bulk final billing from meter values"""
+
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+        from charging_stations.models import StationOwner, ChargingConnector, ConnectorTariff
+        from ..models import OCPPStation, ChargingSession, SessionMeterValue
+
+        owner = User.objects.create_user(email='billing-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='billing-driver@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Billing Co'),
+            name='Billing Station',
+            address='9 Billing Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        charging_connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+        # 18:00-22:00 in Addis Ababa is 15:00-19:00 UTC
+        ConnectorTariff.objects.create(
+            connector=charging_connector, price_per_kwh=Decimal('15.00'), start_hour=18, end_hour=22
+        )
+        ocpp_station = OCPPStation.objects.create(station_id='BILL-1', charging_station=station)
+        connector = OCPPConnector.objects.create(ocpp_station=ocpp_station, connector_id=1, charging_connector=charging_connector)
+
+        def session(transaction_id, **fields):
+            return ChargingSession.objects.create(
+                transaction_id=transaction_id,
+                user=driver,
+                ocpp_station=ocpp_station,
+                ocpp_connector=connector,
+                id_tag='billing',
+                status=ChargingSession.SessionStatus.COMPLETED,
+                start_time=datetime(2025, 6, 2, 10, 0, tzinfo=dt_timezone.utc),
+                **fields
+            )
+
+        self.metered = session(5001, meter_start=1000)
+        for hour, minute, wh in ((10, 30, 3000), (15, 30, 6000)):
+            SessionMeterValue.objects.create(
+                charging_session=self.metered,
+                timestamp=datetime(2025, 6, 2, hour, minute, tzinfo=dt_timezone.utc),
+                measurand=SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER,
+                value=Decimal(wh),
+                unit='Wh'
+            )
+        self.unmetered = session(5002, energy_consumed_kwh=Decimal('4.000'))
+        self.billed = session(5003, energy_consumed_kwh=Decimal('1.000'), final_cost=Decimal('99.00'))
+
+    def test_bill_sessions_prices_meter_increments(self):
+        from ..billing import bill_sessions
+
+        stats = bill_sessions(batch_size=1)
+        self.assertEqual(stats, {'billed': 2, 'amount': Decimal('105.00')})
+
+        self.metered.refresh_from_db()
+        self.unmetered.refresh_from_db()
+        self.billed.refresh_from_db()
+        self.assertEqual(self.metered.final_cost, Decimal('65.00'))  # 2 kWh at 10 + 3 kWh at 15
+        self.assertEqual(self.unmetered.final_cost, Decimal('40.00'))
+        self.assertEqual(self.billed.final_cost, Decimal('99.00'))
@@ -0,0 +1,270 @@
+from django.test import TestCase, TransactionTestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from payments.models import Transaction, Wallet
+from decimal import Decimal
+import asyncio
+import json
+
+User = get_user_model()
+
+
+class CentralSystemHandlerTests(TestCase):
+    """Test cases for the OCPP 1.6J central system message handlers"""
+
+    def setUp(self):
+        for override in (
+            self.settings(METER_INGEST={**settings.METER_INGEST, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(OCPP_LOGS={**settings.OCPP_LOGS, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(STATION_LIVENESS={**settings.STATION_LIVENESS, 'FLUSH_INTERVAL_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+
+        from charging_stations.models import StationOwner, ChargingConnector
+        from ..models import OCPPStation
+
+        owner = User.objects.create_user(email='cs-owner@example.com', password='testpass123')
+        self.driver = User.objects.create_user(email='cs-driver@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Central Co'),
+            name='Central Station',
+            address='1 Central Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.charging_connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+        self.station = OCPPStation.objects.create(station_id='CS-1', charging_station=station)
+        OCPPConnector.objects.create(ocpp_station=self.station, connector_id=1, charging_connector=self.charging_connector)
+        self.id_tag = f'USER_{self.driver.id}_tx-1'
+        Transaction.objects.create(
+            user=self.driver, transaction_type='payment', amount=Decimal('100.00'),
+            status='completed', reference_number='tx-1'
+        )
+
+    def call(self, action, payload):
+        from ..ocpp16 import handle_call
+        return handle_call('CS-1', action, payload)
+
+    def test_boot_heartbeat_and_status(self):
+        result = self.call('BootNotification', {'chargePointVendor': 'ABB', 'chargePointModel': 'Terra AC'})
+        self.assertEqual(result['status'], 'Accepted')
+        self.assertEqual(result['interval'], 300)
+        self.assertIn('currentTime', self.call('Heartbeat', {}))
+
+        self.station.refresh_from_db()
+        self.assertTrue(self.station.is_online)
+        self.assertEqual(self.station.vendor, 'ABB')
+
+        self.call('StatusNotification', {'connectorId': 2, 'errorCode': 'NoError', 'status': 'Faulted'})
+        self.assertEqual(OCPPConnector.objects.get(ocpp_station=self.station, connector_id=2).status, 'faulted')
+
+    def test_transaction_lifecycle(self):
+        from ..models import ChargingSession, SessionMeterValue
+
+        started = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': self.id_tag, 'meterStart': 1000, 'timestamp': '2025-06-02T10:00:00Z'
+        })
+        self.assertEqual(started['idTagInfo']['status'], 'Accepted')
+        transaction_id = started['transactionId']
+
+        self.call('MeterValues', {'connectorId': 1, 'transactionId': transaction_id, 'meterValue': [{
+            'timestamp': '2025-06-02T10:30:00Z',
+            'sampledValue': [
+                {'value': '3000', 'measurand': 'Energy.Active.Import.Register', 'unit': 'Wh'},
+                {'value': '7.4', 'measurand': 'Power.Active.Import', 'unit': 'kW'},
+                {'value': '12', 'measurand': 'SoC', 'unit': 'Percent'},
+            ]
+        }]})
+        session = ChargingSession.objects.get(transaction_id=transaction_id)
+        self.assertEqual(session.status, ChargingSession.SessionStatus.CHARGING)
+        self.assertEqual(session.energy_consumed_kwh, Decimal('2.000'))
+        self.assertEqual(SessionMeterValue.objects.filter(charging_session=session).count(), 2)
+
+        stopped = self.call('StopTransaction', {
+            'transactionId': transaction_id, 'meterStop': 5000, 'timestamp': '2025-06-02T11:00:00Z'
+        })
+        self.assertEqual(stopped['idTagInfo']['status'], 'Accepted')
+        session.refresh_from_db()
+        self.assertEqual(session.status, ChargingSession.SessionStatus.COMPLETED)
+        self.assertEqual(session.energy_consumed_kwh, Decimal('4.000'))
+        self.assertEqual(session.duration_seconds, 3600)
+        self.assertEqual(session.final_cost, Decimal('40.00'))
+
+        # A resent StopTransaction is accepted without storing or billing anything again
+        readings = SessionMeterValue.objects.filter(charging_session=session).count()
+        resent = self.call('StopTransaction', {
+            'transactionId': transaction_id, 'meterStop': 6000, 'timestamp': '2025-06-02T11:05:00Z',
+            'transactionData': [{'timestamp': '2025-06-02T11:00:00Z', 'sampledValue': [{'value': '6000'}]}]
+        })
+        self.assertEqual(resent['idTagInfo']['status'], 'Accepted')
+        self.assertEqual(SessionMeterValue.objects.filter(charging_session=session).count(), readings)
+        session.refresh_from_db()
+        self.assertEqual((session.meter_stop, session.final_cost), (5000, Decimal('40.00')))
+
+    def test_rejects_unknown_tags_stations_and_actions(self):
+        from ..ocpp16 import OCPPError, handle_call
+
+        rejected = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': 'STRANGER', 'meterStart': 0, 'timestamp': '2025-06-02T10:00:00Z'
+        })
+        self.assertEqual(rejected['idTagInfo']['status'], 'Invalid')
+
+        # USER_ tags must name an active user who paid or has a funded wallet
+        stranger = User.objects.create_user(email='cs-stranger@example.com', password='testpass123')
+        for id_tag in ('USER_999999_tx-1', f'USER_{stranger.id}_tx-1', f'USER_{stranger.id}_other'):
+            rejected = self.call('StartTransaction', {
+                'connectorId': 1, 'idTag': id_tag, 'meterStart': 0, 'timestamp': '2025-06-02T10:00:00Z'
+            })
+            self.assertEqual(rejected['idTagInfo']['status'], 'Invalid')
+        wallet = Wallet.objects.create(user=stranger, balance=Decimal('0.01'))
+        rejected = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': f'USER_{stranger.id}_other', 'meterStart': 0, 'timestamp': '2025-06-02T10:00:00Z'
+        })
+        self.assertEqual(rejected['idTagInfo']['status'], 'Invalid')
+        wallet.balance = Decimal(settings.OCPP_CENTRAL_SYSTEM['MIN_WALLET_BALANCE'])
+        wallet.save()
+        accepted = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': f'USER_{stranger.id}_other', 'meterStart': 0, 'timestamp': '2025-06-02T10:00:00Z'
+        })
+        self.assertEqual(accepted['idTagInfo']['status'], 'Accepted')
+
+        # A payment pays for one session only
+        started = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': self.id_tag, 'meterStart': 0, 'timestamp': '2025-06-02T10:00:00Z'
+        })
+        self.call('StopTransaction', {
+            'transactionId': started['transactionId'], 'meterStop': 100, 'timestamp': '2025-06-02T10:10:00Z'
+        })
+        reused = self.call('StartTransaction', {
+            'connectorId': 1, 'idTag': self.id_tag, 'meterStart': 100, 'timestamp': '2025-06-02T11:00:00Z'
+        })
+        self.assertEqual(reused['idTagInfo']['status'], 'Invalid')
+
+        with self.assertRaises(OCPPError) as error:
+            self.call('DataTransfer', {'vendorId': 'x'})
+        self.assertEqual(error.exception.code, 'NotImplemented')
+        with self.assertRaises(OCPPError) as error:
+            self.call('StartTransaction', {'connectorId': 1})
+        self.assertEqual(error.exception.code, 'ProtocolError')
+        with self.assertRaises(OCPPError) as error:
+            handle_call('NOPE', 'Heartbeat', {})
+        self.assertEqual(error.exception.code, 'SecurityError')
+
+
+class CentralSystemWebSocketTests(TransactionTestCase):
+    """Test cases for the OCPP-J WebSocket protocol of the central system"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner
+        from ..models import OCPPStation
+
+        for override in (
+            self.settings(OCPP_LOGS={**settings.OCPP_LOGS, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(STATION_LIVENESS={**settings.STATION_LIVENESS, 'FLUSH_INTERVAL_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+
+        owner = User.objects.create_user(email='ws-owner@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Socket Co'),
+            name='Socket Station',
+            address='2 Socket Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.station = OCPPStation.objects.create(station_id='WS-1', charging_station=station)
+
+    def connect(self, path, subprotocols=('ocpp1.6',), headers=()):
+        from asgiref.testing import ApplicationCommunicator
+        from ..central_system import central_system
+
+        return ApplicationCommunicator(central_system, {
+            'type': 'websocket', 'path': path, 'subprotocols': list(subprotocols), 'headers': list(headers)
+        })
+
+    def test_call_and_errors_over_websocket(self):
+        async def scenario():
+            communicator = self.connect('/ocpp/WS-1')
+            await communicator.send_input({'type': 'websocket.connect'})
+            accepted = await communicator.receive_output(5)
+            self.assertEqual(accepted, {'type': 'websocket.accept', 'subprotocol': 'ocpp1.6'})
+
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps([2, 'm1', 'Heartbeat', {}])})
+            reply = json.loads((await communicator.receive_output(5))['text'])
+            self.assertEqual(reply[:2], [3, 'm1'])
+            self.assertIn('currentTime', reply[2])
+
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps([2, 'm2', 'Reset', {}])})
+            reply = json.loads((await communicator.receive_output(5))['text'])
+            self.assertEqual(reply[:3], [4, 'm2', 'NotImplemented'])
+
+            await communicator.send_input({'type': 'websocket.receive', 'text': 'not json'})
+            reply = json.loads((await communicator.receive_output(5))['text'])
+            self.assertEqual(reply[2], 'FormationViolation')
+
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(5)
+
+        asyncio.run(scenario())
+        self.station.refresh_from_db()
+        self.assertFalse(self.station.is_online)
+
+    def test_closing_a_replaced_connection_keeps_the_station_online(self):
+        async def open_connection():
+            communicator = self.connect('/ocpp/WS-1')
+            await communicator.send_input({'type': 'websocket.connect'})
+            await communicator.receive_output(5)
+            return communicator
+
+        async def scenario():
+            old = await open_connection()
+            await old.send_input({'type': 'websocket.receive', 'text': json.dumps([2, 'm1', 'Heartbeat', {}])})
+            await old.receive_output(5)
+            # The charger reconnects before its old connection is torn down
+            new = await open_connection()
+            await old.send_input({'type': 'websocket.disconnect', 'code': 1006})
+            await old.wait(5)
+            await asyncio.to_thread(self.station.refresh_from_db)
+            self.assertTrue(self.station.is_online)
+
+            await new.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await new.wait(5)
+
+        asyncio.run(scenario())
+        self.station.refresh_from_db()
+        self.assertFalse(self.station.is_online)
+
+    def test_rejects_unknown_station_and_missing_subprotocol(self):
+        async def attempt(path, subprotocols):
+            communicator = self.connect(path, subprotocols)
+            await communicator.send_input({'type': 'websocket.connect'})
+            return await communicator.receive_output(5)
+
+        self.assertEqual(asyncio.run(attempt('/ocpp/UNKNOWN', ['ocpp1.6']))['type'], 'websocket.close')
+        self.assertEqual(asyncio.run(attempt('/ocpp/WS-1', []))['type'], 'websocket.close')
+
+    def test_requires_basic_auth_when_a_key_is_set(self):
+        import base64
+
+        async def attempt(credentials):
+            headers = [(b'authorization', b'Basic ' + base64.b64encode(credentials))] if credentials else []
+            communicator = self.connect('/ocpp/WS-1', headers=headers)
+            await communicator.send_input({'type': 'websocket.connect'})
+            return await communicator.receive_output(5)
+
+        with self.settings(OCPP_CENTRAL_SYSTEM={**settings.OCPP_CENTRAL_SYSTEM, 'AUTHORIZATION_KEY': 'secret'}):
+            self.assertEqual(asyncio.run(attempt(None))['type'], 'websocket.close')
+            self.assertEqual(asyncio.run(attempt(b'WS-1:wrong'))['type'], 'websocket.close')
+            self.assertEqual(asyncio.run(attempt(b'OTHER:secret'))['type'], 'websocket.close')
+            self.assertEqual(asyncio.run(attempt(b'WS-1:secret'))['type'], 'websocket.accept')
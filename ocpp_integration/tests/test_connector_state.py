@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from unittest.mock import patch, Mock
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class ConnectorStateTests(APITestCase):
+    """Test cases for the live connector state map and availability push"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner, ChargingConnector
+        from ..connector_state import connector_states
+        from ..models import OCPPStation
+
+        for override in (
+            self.settings(CONNECTOR_STATE={'DEBOUNCE_SECONDS': 3600}),
+            self.settings(OCPP_WEBHOOKS={'WINDOW_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+        self.states = connector_states
+        self.states.reset()
+        self.addCleanup(self.states.reset)
+
+        owner = User.objects.create_user(email='live-owner@example.com', password='testpass123')
+        self.station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Live Co'),
+            name='Live Station',
+            address='6 Live Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        ocpp_station = OCPPStation.objects.create(station_id='LIVE-1', charging_station=self.station)
+        self.connectors = []
+        for connector_id in (1, 2):
+            charging_connector = ChargingConnector.objects.create(
+                station=self.station, connector_type='type2', power_kw=Decimal('22.00')
+            )
+            OCPPConnector.objects.create(
+                ocpp_station=ocpp_station, connector_id=connector_id, charging_connector=charging_connector
+            )
+            self.connectors.append(charging_connector)
+
+    def test_status_changes_are_pushed_once_per_window(self):
+        from utils.firestore_repo import firestore_repo
+
+        self.states.set_status('LIVE-1', 1, 'preparing')
+        self.states.set_status('LIVE-1', 1, 'charging')
+        self.assertEqual(self.states.get('LIVE-1', 1).status, 'charging')
+        self.assertIsNone(self.states.station_availability(self.station.pk))
+
+        with patch.object(firestore_repo, 'db', Mock()), \
+                patch.object(firestore_repo, 'update_station_counts') as update_station_counts:
+            self.assertEqual(self.states.flush(), 1)
+        update_station_counts.assert_called_once_with(
+            {self.station.pk: {'available_connectors': 1, 'total_connectors': 2}}
+        )
+
+        self.connectors[0].refresh_from_db()
+        self.station.refresh_from_db()
+        self.assertEqual((self.connectors[0].available_quantity, self.connectors[0].is_available), (0, False))
+        self.assertEqual((self.station.available_connectors, self.station.total_connectors), (1, 2))
+        self.assertEqual(self.states.station_availability(self.station.pk), (1, 2))
+
+    def test_webhooks_feed_the_map_and_live_endpoint(self):
+        self.client.post('/api/ocpp/webhook/', {
+            'type': 'connector_status', 'station_id': 'LIVE-1', 'data': {'connector_id': 2, 'status': 'faulted'}
+        }, format='json')
+        self.assertEqual(self.states.get('LIVE-1', 2).status, 'faulted')
+
+        response = self.client.get('/api/ocpp/stations/LIVE-1/live/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['status'] for c in response.data['connectors']], ['available', 'faulted'])
+        self.assertEqual(self.client.get('/api/ocpp/stations/NOPE/live/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_available_stations_use_live_counts(self):
+        from utils.firestore_repo import firestore_repo
+
+        self.states.set_status('LIVE-1', 1, 'charging')
+        self.states.set_status('LIVE-1', 2, 'charging')
+        self.states.flush()
+
+        stored = {'id': str(self.station.pk), 'name': 'Live Station', 'available_connectors': 2, 'total_connectors': 2}
+        with patch.object(firestore_repo, 'list_stations', return_value=[stored]):
+            response = self.client.get('/api/available-stations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
@@ -0,0 +1,131 @@
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from unittest.mock import patch, Mock
+from charging_stations.models import ChargingStation
+
+User = get_user_model()
+
+
+class StationLivenessTests(TestCase):
+    """Test cases for the heartbeat liveness tracker and offline sweep"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from charging_stations.models import StationOwner
+        from ..liveness import offline_after, station_liveness
+        from ..models import OCPPStation
+
+        for override in (
+            self.settings(STATION_LIVENESS={**settings.STATION_LIVENESS, 'FLUSH_INTERVAL_SECONDS': 3600}),
+            self.settings(OCPP_WEBHOOKS={'WINDOW_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+        self.tracker = station_liveness
+        self.tracker.reset()
+        self.addCleanup(self.tracker.reset)
+
+        owner = StationOwner.objects.create(
+            user=User.objects.create_user(email='beat-owner@example.com', password='testpass123'),
+            company_name='Beat Co'
+        )
+        self.stations = []
+        for number in (1, 2):
+            charging_station = ChargingStation.objects.create(
+                owner=owner,
+                name=f'Beat Station {number}',
+                address=f'{number} Beat Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+            self.stations.append(OCPPStation.objects.create(station_id=f'BEAT-{number}', charging_station=charging_station))
+        self.now = timezone.now()
+        self.timeout = offline_after()
+        self.long_ago = self.now - self.timeout - timedelta(minutes=1)
+
+    def test_heartbeats_are_written_in_one_batch(self):
+        from ..ocpp16 import handle_call
+
+        for _ in range(3):
+            handle_call('BEAT-1', 'Heartbeat', {})
+        self.tracker.beat('BEAT-2', self.long_ago)
+        self.stations[0].refresh_from_db()
+        self.assertFalse(self.stations[0].is_online)
+        self.assertEqual(self.tracker.snapshot()['pending'], 2)
+
+        # One SELECT and one UPDATE, whatever the number of beats
+        with self.assertNumQueries(2):
+            self.assertEqual(self.tracker.flush(), 2)
+        for station in self.stations:
+            station.refresh_from_db()
+            self.assertTrue(station.is_online)
+        self.assertEqual(self.stations[1].last_heartbeat, self.long_ago)
+
+        # An older beat never moves the heartbeat back
+        self.tracker.beat('BEAT-2', self.long_ago - self.timeout)
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_sweep_marks_silent_stations_offline(self):
+        from utils.firestore_repo import firestore_repo
+
+        self.tracker.beat('BEAT-1', self.long_ago)
+        self.tracker.beat('BEAT-2')
+        self.tracker.flush()
+        self.assertEqual(self.tracker.snapshot()['tracked'], 2)
+
+        with patch.object(firestore_repo, 'db', Mock()), \
+                patch.object(firestore_repo, 'update_station_fields') as update_station_fields:
+            self.assertEqual(self.tracker.sweep(), 1)
+        update_station_fields.assert_called_once_with({
+            self.stations[0].charging_station_id: {'is_online': False, 'last_heartbeat': self.long_ago.isoformat()}
+        })
+        for station in self.stations:
+            station.refresh_from_db()
+        self.assertEqual((self.stations[0].is_online, self.stations[1].is_online), (False, True))
+        self.assertIsNone(self.tracker.last_seen('BEAT-1'))
+
+        # Nothing is due: the sweep does not touch the database
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tracker.sweep(), 0)
+        self.assertEqual(self.tracker.sweep(now=self.now + self.timeout * 2), 1)
+
+    def test_beats_written_elsewhere_keep_station_online(self):
+        from ..models import OCPPStation
+
+        OCPPStation.objects.filter(station_id='BEAT-1').update(is_online=True, last_heartbeat=self.long_ago)
+        self.tracker.load()
+        self.assertEqual(self.tracker.last_seen('BEAT-1'), self.long_ago)
+
+        # Another process flushed a later beat
+        OCPPStation.objects.filter(station_id='BEAT-1').update(last_heartbeat=self.now)
+        self.assertEqual(self.tracker.sweep(), 0)
+        self.assertEqual(self.tracker.last_seen('BEAT-1'), self.now)
+        self.assertTrue(OCPPStation.objects.get(station_id='BEAT-1').is_online)
+
+    def test_disconnect_drops_pending_beat(self):
+        from ..ocpp16 import handle_call, station_disconnected
+
+        handle_call('BEAT-1', 'Heartbeat', {})
+        station_disconnected('BEAT-1')
+        self.assertEqual(self.tracker.flush(), 0)
+        self.stations[0].refresh_from_db()
+        self.assertFalse(self.stations[0].is_online)
+
+    def test_webhook_heartbeat_uses_charger_time(self):
+        from ..webhook_coalescer import webhook_coalescer
+
+        sent_at = self.now - self.timeout / 2
+        for station, data in zip(self.stations, ({'last_heartbeat': True}, {'last_heartbeat': self.long_ago.isoformat()})):
+            webhook_coalescer.submit({
+                'type': 'station_status', 'station_id': station.station_id, 'data': data, 'timestamp': sent_at
+            })
+        self.tracker.flush()
+
+        for station in self.stations:
+            station.refresh_from_db()
+        self.assertEqual(self.stations[0].last_heartbeat, sent_at)
+        self.assertEqual(self.stations[1].last_heartbeat, self.long_ago)
+        self.assertEqual(self.tracker.sweep(), 1)
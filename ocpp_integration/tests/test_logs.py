@@ -0,0 +1,101 @@
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from unittest.mock import patch, Mock
+from charging_stations.models import ChargingStation
+import json
+
+User = get_user_model()
+
+
+class OCPPLogRetentionTests(TestCase):
+    """Test cases for the queued OCPP log writer and log archival"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner
+        from ..log_writer import OCPPLogWriter
+        from ..models import OCPPStation
+
+        self.log_settings = self.settings(OCPP_LOGS={
+            **settings.OCPP_LOGS, 'BATCH_SIZE': 100, 'FLUSH_INTERVAL_SECONDS': 3600, 'MAX_BUFFERED': 3
+        })
+        self.log_settings.enable()
+        self.addCleanup(self.log_settings.disable)
+
+        owner = User.objects.create_user(email='log-owner@example.com', password='testpass123')
+        self.station = OCPPStation.objects.create(
+            station_id='LOG-1',
+            charging_station=ChargingStation.objects.create(
+                owner=StationOwner.objects.create(user=owner, company_name='Log Co'),
+                name='Log Station',
+                address='8 Log Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+        )
+        self.writer = OCPPLogWriter()
+        # Keep the flusher thread from starting; flushes are explicit
+        self.writer._thread = Mock()
+
+    def test_entries_are_queued_and_keep_their_log_time(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from ..models import OCPPLog
+
+        logged_at = timezone.now() - timedelta(minutes=5)
+        with patch('ocpp_integration.log_writer.timezone.now', return_value=logged_at):
+            self.writer.log(ocpp_station=self.station, action='Heartbeat', message='first')
+        self.writer.log(ocpp_station=self.station, action='Heartbeat', message='second', raw_data={'n': 2})
+        self.assertEqual(OCPPLog.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(OCPPLog.objects.get(message='first').timestamp, logged_at)
+        self.assertEqual(OCPPLog.objects.get(message='second').raw_data, {'n': 2})
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        for number in range(5):
+            self.writer.log(ocpp_station=self.station, message=f'event {number}')
+        self.assertEqual(self.writer.snapshot()['dropped'], 2)
+        self.assertEqual(self.writer.flush(), 3)
+
+    def test_failed_batch_keeps_the_valid_rows(self):
+        from ..models import OCPPLog
+
+        self.writer.log(ocpp_station=self.station, message='kept')
+        self.writer.log(ocpp_station=self.station, message='rejected')
+        with patch.object(
+            OCPPLog.objects, 'bulk_create', side_effect=[Exception('batch failed'), None, Exception('bad row')]
+        ) as bulk_create:
+            self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual([call.args[0][0].message for call in bulk_create.call_args_list[1:]], ['kept', 'rejected'])
+        self.assertEqual(self.writer.snapshot()['failed'], 1)
+
+    def test_expired_logs_are_moved_to_daily_archives(self):
+        import gzip
+        import os
+        import shutil
+        import tempfile
+        from datetime import datetime, timezone as dt_timezone
+        from django.core.management import call_command
+        from ..models import OCPPLog
+
+        for day, message in ((1, 'old'), (1, 'old too'), (2, 'older day')):
+            OCPPLog.objects.create(
+                ocpp_station=self.station, message=message, raw_data={'day': day},
+                timestamp=datetime(2026, 1, day, 12, tzinfo=dt_timezone.utc)
+            )
+        OCPPLog.objects.create(ocpp_station=self.station, message='recent')
+
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command('archive_ocpp_logs', output_dir=output_dir, batch_size=2, stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(list(OCPPLog.objects.values_list('message', flat=True)), ['recent'])
+        self.assertEqual(sorted(os.listdir(output_dir)), ['ocpp-logs-2026-01-01.jsonl.gz', 'ocpp-logs-2026-01-02.jsonl.gz'])
+        with gzip.open(os.path.join(output_dir, 'ocpp-logs-2026-01-01.jsonl.gz'), 'rt') as archive:
+            records = [json.loads(line) for line in archive]
+        self.assertEqual(sorted(record['message'] for record in records), ['old', 'old too'])
+        self.assertEqual(records[0]['station_id'], 'LOG-1')
+        self.assertEqual(records[0]['raw_data'], {'day': 1})
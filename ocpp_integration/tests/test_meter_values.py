@@ -0,0 +1,188 @@
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class MeterIngestTests(TestCase):
+    """Test cases for buffered meter value ingestion"""
+
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+        from charging_stations.models import StationOwner
+        from ..meter_ingest import MeterIngestBuffer
+        from ..models import OCPPStation, ChargingSession
+
+        self.ingest_settings = self.settings(METER_INGEST={
+            'BATCH_SIZE': 1000, 'FLUSH_INTERVAL_SECONDS': 3600, 'MAX_BUFFERED': 4
+        })
+        self.ingest_settings.enable()
+        self.addCleanup(self.ingest_settings.disable)
+
+        owner = User.objects.create_user(email='ingest-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='ingest-driver@example.com', password='testpass123')
+        station = OCPPStation.objects.create(
+            station_id='INGEST-1',
+            charging_station=ChargingStation.objects.create(
+                owner=StationOwner.objects.create(user=owner, company_name='Ingest Co'),
+                name='Ingest Station',
+                address='3 Ingest Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+        )
+        self.session = ChargingSession.objects.create(
+            transaction_id=7001,
+            user=driver,
+            ocpp_station=station,
+            ocpp_connector=OCPPConnector.objects.create(ocpp_station=station, connector_id=1),
+            id_tag='ingest',
+            status=ChargingSession.SessionStatus.STARTED
+        )
+        self.at = datetime(2025, 6, 2, 10, 0, tzinfo=dt_timezone.utc)
+        self.buffer = MeterIngestBuffer()
+
+    def rows(self, count):
+        from ..models import SessionMeterValue
+        return [
+            SessionMeterValue(
+                charging_session_id=self.session.pk,
+                timestamp=self.at,
+                measurand=SessionMeterValue.MeasurandType.POWER_ACTIVE_IMPORT,
+                value=Decimal(index)
+            )
+            for index in range(count)
+        ]
+
+    def test_buffers_until_flush_and_coalesces_aggregates(self):
+        from ..models import SessionMeterValue
+
+        self.buffer.add(self.session.pk, self.rows(2), {'current_power_kw': Decimal('3.00')})
+        self.buffer.add(self.session.pk, self.rows(1), {'current_power_kw': Decimal('7.00'), 'status': 'charging'})
+        self.assertEqual(SessionMeterValue.objects.count(), 0)
+
+        with self.assertNumQueries(4):  # savepoint, bulk insert, one session update, release
+            self.assertEqual(self.buffer.flush(), 3)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.current_power_kw, Decimal('7.00'))
+        self.assertEqual(self.session.status, 'charging')
+        self.assertEqual(SessionMeterValue.objects.count(), 3)
+
+    def test_full_buffer_flushes_synchronously(self):
+        from ..models import SessionMeterValue
+
+        self.buffer.add(self.session.pk, self.rows(3))
+        self.assertEqual(SessionMeterValue.objects.count(), 0)
+        self.buffer.add(self.session.pk, self.rows(1))
+        self.assertEqual(SessionMeterValue.objects.count(), 4)
+        self.assertEqual(self.buffer.snapshot()['forced_flushes'], 1)
+
+    def test_failed_flush_is_retried_once_then_counted_lost(self):
+        from ..models import SessionMeterValue
+
+        self.buffer.add(self.session.pk, self.rows(2))
+        with patch.object(SessionMeterValue.objects, 'bulk_create', side_effect=Exception('db down')):
+            self.buffer.flush()
+            self.assertEqual(self.buffer.snapshot()['requeued'], 2)
+            self.buffer.flush()
+        stats = self.buffer.snapshot()
+        self.assertEqual((stats['lost'], stats['buffered']), (2, 0))
+
+    def test_aggregates_skip_stopped_sessions(self):
+        from ..models import ChargingSession
+
+        self.buffer.add(self.session.pk, aggregates={'energy_consumed_kwh': Decimal('9.000')})
+        ChargingSession.objects.filter(pk=self.session.pk).update(
+            status=ChargingSession.SessionStatus.COMPLETED, energy_consumed_kwh=Decimal('10.000')
+        )
+        self.buffer.flush()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.energy_consumed_kwh, Decimal('10.000'))
+
+
+class MeterArchiveTests(TestCase):
+    """Test cases for compacting finished sessions' meter values"""
+
+    def setUp(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from charging_stations.models import StationOwner, ChargingConnector
+        from ..models import OCPPStation, ChargingSession, SessionMeterValue
+
+        owner = User.objects.create_user(email='archive-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='archive-driver@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner, company_name='Archive Co'),
+            name='Archive Station',
+            address='4 Archive Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        connector = ChargingConnector.objects.create(
+            station=station, connector_type='type2', power_kw=Decimal('22.00'), price_per_kwh=Decimal('10.00')
+        )
+        ocpp_station = OCPPStation.objects.create(station_id='ARCHIVE-1', charging_station=station)
+        start = datetime(2025, 6, 2, 10, 0, tzinfo=dt_timezone.utc)
+        self.session = ChargingSession.objects.create(
+            transaction_id=8001,
+            user=driver,
+            ocpp_station=ocpp_station,
+            ocpp_connector=OCPPConnector.objects.create(
+                ocpp_station=ocpp_station, connector_id=1, charging_connector=connector
+            ),
+            id_tag='archive',
+            status=ChargingSession.SessionStatus.COMPLETED,
+            start_time=start,
+            meter_start=12345678
+        )
+        for minute in range(0, 60, 10):
+            at = start + timedelta(minutes=minute, milliseconds=250)
+            SessionMeterValue.objects.create(
+                charging_session=self.session, timestamp=at, measurand='energy_active_import_register',
+                value=Decimal(12345678 + minute * 100), unit='Wh', context='Sample.Periodic'
+            )
+            SessionMeterValue.objects.create(
+                charging_session=self.session, timestamp=at, measurand='power_active_import',
+                value=Decimal('7.4'), unit='kW'
+            )
+
+    def test_compaction_preserves_readings_and_billing(self):
+        from ..billing import BILLING_FIELDS, final_costs
+        from ..meter_archive import archived_meter_values, compact_sessions
+        from ..models import ChargingSession, SessionMeterArchive, SessionMeterValue
+        from ..serializers import ChargingSessionSerializer
+
+        sessions = ChargingSession.objects.filter(pk=self.session.pk)
+        before = final_costs(list(sessions.values(*BILLING_FIELDS)))
+        raw = sorted(SessionMeterValue.objects.values_list('timestamp', 'measurand', 'value'))
+
+        stats = compact_sessions(sessions)
+        self.assertEqual((stats['sessions'], stats['samples']), (1, 12))
+        self.assertFalse(SessionMeterValue.objects.exists())
+        self.assertEqual(SessionMeterArchive.objects.get().sample_count, 12)
+
+        archived = archived_meter_values(self.session)
+        self.assertEqual(raw, sorted((row['timestamp'], row['measurand'], row['value']) for row in archived))
+        self.assertEqual(archived[0]['timestamp'], raw[-1][0])
+        self.assertEqual(final_costs(list(sessions.values(*BILLING_FIELDS))), before)
+        self.assertEqual(len(ChargingSessionSerializer(self.session).data['meter_values']), 12)
+
+        # Already archived sessions are skipped
+        self.assertEqual(compact_sessions(sessions)['sessions'], 0)
+
+    def test_recent_and_open_sessions_are_not_compacted(self):
+        from ..meter_archive import compact_sessions
+        from ..models import ChargingSession
+
+        self.assertEqual(compact_sessions()['sessions'], 0)  # finished less than MIN_AGE_HOURS ago
+        with self.settings(METER_ARCHIVE={**settings.METER_ARCHIVE, 'MIN_AGE_HOURS': 0}):
+            ChargingSession.objects.filter(pk=self.session.pk).update(status=ChargingSession.SessionStatus.CHARGING)
+            self.assertEqual(compact_sessions()['sessions'], 0)
+            ChargingSession.objects.filter(pk=self.session.pk).update(status=ChargingSession.SessionStatus.COMPLETED)
+            self.assertEqual(compact_sessions(dry_run=True)['sessions'], 1)
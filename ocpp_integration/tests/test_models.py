@@ -4,9 +4,9 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest.mock import patch, Mock, AsyncMock
-from .models import OCPPChargePoint, OCPPTransaction, OCPPConnector
-from .services import OCPPService
-from .client import OCPPClient
+from ..models import OCPPChargePoint, OCPPTransaction, OCPPConnector
+from ..services import OCPPService
+from ..client import OCPPClient
 from charging_stations.models import ChargingStation, Connector
 from decimal import Decimal
 import asyncio
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from unittest.mock import patch
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+import asyncio
+import json
+import time
+
+User = get_user_model()
+
+
+class SessionStreamTests(APITestCase):
+    """Test cases for the live session progress stream"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner
+        from ..models import OCPPStation, ChargingSession
+
+        owner = User.objects.create_user(email='stream-owner@example.com', password='testpass123')
+        self.driver = User.objects.create_user(email='stream-driver@example.com', password='testpass123')
+        station = OCPPStation.objects.create(
+            station_id='STREAM-1',
+            charging_station=ChargingStation.objects.create(
+                owner=StationOwner.objects.create(user=owner, company_name='Stream Co'),
+                name='Stream Station',
+                address='7 Stream Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+        )
+        self.session = ChargingSession.objects.create(
+            transaction_id=9101, user=self.driver, ocpp_station=station,
+            ocpp_connector=OCPPConnector.objects.create(ocpp_station=station, connector_id=1),
+            id_tag='stream', status=ChargingSession.SessionStatus.STARTED
+        )
+
+    def read_event(self, chunk):
+        lines = chunk.decode() if isinstance(chunk, bytes) else chunk
+        return json.loads(lines.split('data: ', 1)[1])
+
+    def test_hub_fans_out_per_key_and_drops_oldest(self):
+        from utils.pubsub import PubSubHub
+
+        hub = PubSubHub(queue_size=2)
+        watcher, other = hub.subscribe(1), hub.subscribe(2)
+        for value in range(3):
+            self.assertEqual(hub.publish(1, value), 1)
+        self.assertEqual((watcher.get(0), watcher.get(0), watcher.get(0)), (1, 2, None))
+        self.assertEqual(watcher.dropped, 1)
+        self.assertIsNone(other.get(0))
+
+        watcher.close()
+        self.assertEqual(hub.subscriber_count(1), 0)
+        self.assertEqual(hub.latest(1), 2)
+
+    def test_wsgi_stream_sends_snapshot_and_retry_hint(self):
+        from ..session_stream import publish_progress
+
+        self.client.force_authenticate(user=self.driver)
+        response = self.client.get('/api/ocpp/sessions/9101/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        # A WSGI worker is not held: the client gets the current state and reconnects
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 1)
+        self.assertTrue(chunks[0].decode().startswith('retry: 5000\n'))
+        self.assertEqual(self.read_event(chunks[0])['status'], 'started')
+
+        publish_progress(9101, status='charging', energy_consumed_kwh=Decimal('1.250'))
+        response = self.client.get('/api/ocpp/sessions/9101/stream/', HTTP_ACCEPT='text/event-stream')
+        event = self.read_event(b''.join(response.streaming_content))
+        self.assertEqual((event['status'], event['energy_consumed_kwh']), ('charging', '1.250'))
+
+        self.session.status, self.session.final_cost = 'completed', Decimal('12.50')
+        self.session.save()
+        response = self.client.get('/api/ocpp/sessions/9101/stream/', HTTP_ACCEPT='text/event-stream')
+        content = b''.join(response.streaming_content).decode()
+        self.assertNotIn('retry:', content)
+        self.assertEqual(self.read_event(content)['final_cost'], '12.50')
+
+    def test_stream_is_limited_to_the_sessions_user(self):
+        stranger = User.objects.create_user(email='stream-stranger@example.com', password='testpass123')
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get('/api/ocpp/sessions/9101/stream/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_stream_receives_events_from_other_threads(self):
+        from ..session_stream import async_event_stream, publish_progress, session_snapshot
+
+        snapshot = session_snapshot(self.session)
+
+        async def scenario():
+            stream = async_event_stream(9101, snapshot)
+            first = self.read_event(await stream.__anext__())
+            await asyncio.to_thread(publish_progress, 9101, status='charging', current_power_kw=Decimal('7.20'))
+            second = self.read_event(await asyncio.wait_for(stream.__anext__(), 5))
+            await stream.aclose()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(first['status'], 'started')
+        self.assertEqual(second['current_power_kw'], '7.20')
+
+    def test_poller_publishes_changes_from_other_workers(self):
+        from ..models import ChargingSession
+        from ..session_stream import publish_progress, session_hub, session_poller
+
+        self.assertEqual(session_poller.poll(), 0)
+        subscription = session_hub.subscribe(9101)
+        self.addCleanup(subscription.close)
+        publish_progress(9101, status='charging', energy_consumed_kwh=Decimal('1.000'))
+        self.assertEqual(subscription.get(0)['energy_consumed_kwh'], '1.000')
+
+        # Another worker handled a later update
+        ChargingSession.objects.filter(transaction_id=9101).update(
+            status='charging', energy_consumed_kwh=Decimal('2.500'), updated_at=timezone.now()
+        )
+        self.assertEqual(session_poller.poll(), 1)
+        self.assertEqual(subscription.get(0)['energy_consumed_kwh'], '2.500')
+        self.assertEqual(session_poller.poll(), 0)
+
+        ChargingSession.objects.filter(transaction_id=9101).update(status='completed', updated_at=timezone.now())
+        self.assertEqual(session_poller.poll(), 1)
+        self.assertEqual(subscription.get(0)['status'], 'completed')
+        self.assertIsNone(session_hub.latest(9101))
+
+    def test_latest_events_expire(self):
+        from utils.pubsub import PubSubHub
+
+        hub = PubSubHub(latest_ttl=60)
+        hub.publish(1, 'abandoned')
+        with patch('utils.pubsub.time.monotonic', return_value=time.monotonic() + 120):
+            hub.publish(2, 'fresh')
+        self.assertIsNone(hub.latest(1))
+        self.assertEqual(hub.latest(2), 'fresh')
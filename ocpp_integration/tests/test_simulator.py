@@ -0,0 +1,57 @@
+from django.test import TransactionTestCase
+from django.conf import settings
+from unittest.mock import patch
+
+
+class FleetSimulatorTests(TransactionTestCase):
+    """Test cases for the in-process OCPP fleet simulator"""
+
+    def setUp(self):
+        for override in (
+            self.settings(METER_INGEST={**settings.METER_INGEST, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(OCPP_WEBHOOKS={'WINDOW_SECONDS': 0}),
+            self.settings(CONNECTOR_STATE={'DEBOUNCE_SECONDS': 0}),
+            self.settings(OCPP_LOGS={**settings.OCPP_LOGS, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(STATION_LIVENESS={**settings.STATION_LIVENESS, 'FLUSH_INTERVAL_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+
+    def simulate(self, mode):
+        from ..simulator import FleetSimulator
+
+        # The in-memory SQLite test database locks whole tables across connections, so the run is kept
+        # serial: one charger, and state lag is only probed once the fleet has finished
+        return FleetSimulator(
+            chargers=1, connectors=1, mode=mode, duration=1.2, ramp_seconds=0, idle_seconds=0.05,
+            session_seconds=0.5, progress_interval=0.15, heartbeat_interval=3600, probe_interval=3600, seed=7
+        ).run()
+
+    def assert_clean_run(self, report):
+        from ..models import ChargingSession, OCPPStation
+
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['sessions']['completed'], 0)
+        self.assertEqual(report['sessions']['started'], report['sessions']['completed'])
+        self.assertGreater(report['state_lag']['count'], 0)
+        self.assertEqual(report['state_lag_unresolved'], 0)
+        self.assertGreater(report['db_writes']['total'], 0)
+        # The simulated fleet is removed afterwards
+        self.assertFalse(OCPPStation.objects.filter(station_id__startswith='SIM-').exists())
+        self.assertFalse(ChargingSession.objects.exists())
+
+    def test_central_system_fleet(self):
+        from .. import central_system
+
+        # Database threads left by earlier tests hold connections opened before the write counter started
+        with patch.object(central_system, '_executor', None):
+            report = self.simulate('central')
+        self.assert_clean_run(report)
+        self.assertEqual(report['latency']['BootNotification']['count'], 1)
+        self.assertEqual(report['latency']['StartTransaction']['count'], report['sessions']['started'])
+
+    def test_webhook_fleet(self):
+        report = self.simulate('webhook')
+        self.assert_clean_run(report)
+        self.assertEqual(report['latency']['session_stopped']['count'], report['sessions']['completed'])
+        self.assertNotIn('StartTransaction', report['latency'])
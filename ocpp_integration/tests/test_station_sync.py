@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from unittest.mock import patch
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class BulkStationSyncTests(APITestCase):
+    """Test cases for syncing many stations to the OCPP backend"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner, ChargingConnector
+        from ..models import OCPPStation
+
+        self.log_settings = self.settings(OCPP_LOGS={**settings.OCPP_LOGS, 'FLUSH_INTERVAL_SECONDS': 0})
+        self.log_settings.enable()
+        self.addCleanup(self.log_settings.disable)
+
+        self.owner_user = User.objects.create_user(email='sync-owner@example.com', password='testpass123')
+        owner = StationOwner.objects.create(user=self.owner_user, company_name='Sync Co')
+        self.stations = []
+        for number in range(3):
+            station = ChargingStation.objects.create(
+                owner=owner,
+                name=f'Sync Station {number}',
+                address=f'{number} Sync Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+            for power in ('22.00', '50.00'):
+                ChargingConnector.objects.create(station=station, connector_type='type2', power_kw=Decimal(power))
+            self.stations.append(station)
+
+        # The first station already booted and reported connector 1 before being mapped
+        booted = OCPPStation.objects.create(
+            station_id=f'STATION_{self.stations[0].id}', charging_station=self.stations[0], vendor='ABB'
+        )
+        OCPPConnector.objects.create(ocpp_station=booted, connector_id=1)
+
+    def backend(self, failing=()):
+        import threading
+
+        barrier = threading.Barrier(3, timeout=5)
+        calls = []
+
+        def make_request(method, endpoint, data=None, retries=None):
+            calls.append(data)
+            # Every station must be in flight at once for the barrier to open
+            barrier.wait()
+            if data['name'] in failing:
+                return {'success': False, 'error': 'backend rejected station'}
+            return {'success': True, 'data': {'ocpp_websocket': f"wss://ocpp.example.com/{data['station_id']}"}}
+
+        return patch('ocpp_integration.services.OCPPIntegrationService.make_request', side_effect=make_request), calls
+
+    def test_stations_are_posted_concurrently_and_upserted(self):
+        from ..models import OCPPStation
+        from ..services import OCPPIntegrationService
+
+        backend, calls = self.backend(failing=('Sync Station 2',))
+        with backend:
+            results = OCPPIntegrationService().sync_stations_to_ocpp(
+                ChargingStation.objects.filter(owner__user=self.owner_user).order_by('name'), max_workers=3
+            )
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([result['success'] for result in results], [True, True, False])
+        self.assertEqual(results[2]['error'], 'backend rejected station')
+
+        booted = OCPPStation.objects.get(charging_station=self.stations[0])
+        self.assertEqual(booted.vendor, 'ABB')
+        self.assertTrue(booted.is_online)
+        self.assertEqual(booted.ocpp_websocket_url, f'wss://ocpp.example.com/{booted.station_id}')
+        self.assertEqual(
+            sorted(booted.ocpp_connectors.values_list('connector_id', flat=True)), [1, 2]
+        )
+        self.assertEqual(booted.ocpp_connectors.filter(charging_connector__isnull=True).count(), 0)
+        self.assertEqual(OCPPStation.objects.filter(charging_station=self.stations[1]).count(), 1)
+        self.assertFalse(OCPPStation.objects.filter(charging_station=self.stations[2]).exists())
+
+        # A second sync keeps the connector numbers and creates nothing new
+        backend, _ = self.backend()
+        with backend:
+            OCPPIntegrationService().sync_stations_to_ocpp(ChargingStation.objects.all(), max_workers=3)
+        self.assertEqual(OCPPStation.objects.count(), 3)
+        self.assertEqual(OCPPConnector.objects.count(), 6)
+        self.assertEqual(
+            sorted(booted.ocpp_connectors.values_list('connector_id', flat=True)), [1, 2]
+        )
+
+    def test_bulk_sync_api_reports_per_station_results(self):
+        from charging_stations.models import StationOwner
+
+        other = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(
+                user=User.objects.create_user(email='sync-other@example.com', password='testpass123'),
+                company_name='Other Co'
+            ),
+            name='Other Station', address='9 Other Road', city='Addis Ababa', state='Addis Ababa', zip_code='1000'
+        )
+
+        self.client.force_authenticate(user=self.owner_user)
+        backend, calls = self.backend()
+        with backend, self.settings(OCPP_SETTINGS={**settings.OCPP_SETTINGS, 'SYNC_WORKERS': 3}):
+            response = self.client.post('/api/ocpp/sync-stations/', {
+                'charging_station_ids': [str(station.id) for station in self.stations] + [str(other.id)]
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['synced'], response.data['failed']), (3, 1))
+        self.assertEqual(response.data['results'][-1]['charging_station_id'], str(other.id))
+        self.assertEqual(response.data['results'][-1]['error'], 'Charging station not found or not active')
+        self.assertNotIn('Other Station', [call['name'] for call in calls])
+
+        # Users who are neither station owners nor staff cannot sync anyone's stations
+        self.client.force_authenticate(user=User.objects.create_user(email='sync-driver@example.com', password='testpass123'))
+        response = self.client.post('/api/ocpp/sync-stations/', {'charging_station_ids': [str(other.id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
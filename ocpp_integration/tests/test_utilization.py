@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class ConnectorUtilizationTests(APITestCase):
+    """Test cases for the utilization time-series engine"""
+
+    def setUp(self):
+        from datetime import date, datetime, timezone as dt_timezone
+        from charging_stations.models import StationOwner, ChargingConnector
+        from ..models import OCPPStation, ChargingSession, SessionMeterValue
+
+        self.owner = User.objects.create_user(email='util-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='util-driver@example.com', password='testpass123')
+        StationOwner.objects.create(user=self.owner, company_name='Util Co')
+        station = ChargingStation.objects.create(
+            owner=self.owner.station_owner,
+            name='Util Station',
+            address='5 Util Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        charging_connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+        self.ocpp_station = OCPPStation.objects.create(station_id='UTIL-1', charging_station=station)
+        self.connector = OCPPConnector.objects.create(
+            ocpp_station=self.ocpp_station,
+            connector_id=1,
+            charging_connector=charging_connector
+        )
+
+        self.day = date(2025, 6, 2)
+        session = ChargingSession.objects.create(
+            transaction_id=4242,
+            user=driver,
+            ocpp_station=self.ocpp_station,
+            ocpp_connector=self.connector,
+            id_tag='util',
+            status=ChargingSession.SessionStatus.COMPLETED,
+            start_time=datetime(2025, 6, 2, 10, 0, tzinfo=dt_timezone.utc),
+            stop_time=datetime(2025, 6, 2, 11, 0, tzinfo=dt_timezone.utc)
+        )
+        for minute, watts in ((0, 7000), (30, 11000)):
+            SessionMeterValue.objects.create(
+                charging_session=session,
+                timestamp=datetime(2025, 6, 2, 10, minute, tzinfo=dt_timezone.utc),
+                measurand=SessionMeterValue.MeasurandType.POWER_ACTIVE_IMPORT,
+                value=Decimal(watts),
+                unit='W'
+            )
+
+    def test_rebuild_downsamples_occupancy_and_power(self):
+        from ..models import ConnectorUtilization
+        from ..utilization import rebuild_utilization, unpack_series
+
+        self.assertEqual(rebuild_utilization(self.day), 3)
+
+        hourly = ConnectorUtilization.objects.get(ocpp_connector=self.connector, day=self.day, resolution_seconds=3600)
+        occupancy = unpack_series(hourly.occupancy)
+        self.assertEqual(len(occupancy), 24)
+        self.assertAlmostEqual(occupancy[10], 1.0)
+        self.assertEqual(occupancy[9], 0.0)
+        self.assertAlmostEqual(unpack_series(hourly.avg_power_kw)[10], 9.0, places=3)
+        self.assertAlmostEqual(unpack_series(hourly.peak_power_kw)[10], 11.0, places=3)
+
+        minutes = ConnectorUtilization.objects.get(ocpp_connector=self.connector, day=self.day, resolution_seconds=60)
+        self.assertEqual(len(unpack_series(minutes.occupancy)), 1440)
+
+        # Rebuilding is idempotent
+        rebuild_utilization(self.day)
+        self.assertEqual(ConnectorUtilization.objects.filter(day=self.day).count(), 3)
+
+    def test_heatmap_and_power_profile(self):
+        from ..utilization import rebuild_utilization, utilization_heatmap, power_profile
+
+        rebuild_utilization(self.day)
+        heatmap = utilization_heatmap([self.connector.id], self.day, self.day)
+        self.assertEqual(heatmap[self.day.weekday()][10], 100.0)
+        self.assertEqual(heatmap[self.day.weekday()][12], 0.0)
+
+        points, peak = power_profile([self.connector.id], self.day, self.day, 900)
+        self.assertEqual(len(points), 96)
+        self.assertEqual(peak['peak_kw'], 11.0)
+
+    def test_owner_utilization_endpoint(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get('/api/ocpp/stations/UTIL-1/utilization/', {'resolution': '1h', 'days': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['heatmap']), 7)
+        self.assertEqual(len(response.data['power']), 72)
+
+        response = self.client.get('/api/ocpp/stations/UTIL-1/utilization/', {'resolution': '5m'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from ..models import OCPPConnector
+from charging_stations.models import ChargingStation
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class WebhookCoalescerTests(APITestCase):
+    """Test cases for coalescing OCPP status and progress webhooks"""
+
+    def setUp(self):
+        from charging_stations.models import StationOwner
+        from ..models import OCPPStation, ChargingSession
+        from ..webhook_coalescer import webhook_coalescer
+
+        for override in (
+            self.settings(OCPP_WEBHOOKS={'WINDOW_SECONDS': 3600}),
+            self.settings(METER_INGEST={**settings.METER_INGEST, 'FLUSH_INTERVAL_SECONDS': 0}),
+            self.settings(STATION_LIVENESS={**settings.STATION_LIVENESS, 'FLUSH_INTERVAL_SECONDS': 0}),
+        ):
+            override.enable()
+            self.addCleanup(override.disable)
+        self.coalescer = webhook_coalescer
+        self.coalescer.flush()
+
+        owner = User.objects.create_user(email='hook-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='hook-driver@example.com', password='testpass123')
+        self.station = OCPPStation.objects.create(
+            station_id='HOOK-1',
+            charging_station=ChargingStation.objects.create(
+                owner=StationOwner.objects.create(user=owner, company_name='Hook Co'),
+                name='Hook Station',
+                address='5 Hook Road',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+        )
+        self.connector = OCPPConnector.objects.create(ocpp_station=self.station, connector_id=1)
+        self.session = ChargingSession.objects.create(
+            transaction_id=9001, user=driver, ocpp_station=self.station, ocpp_connector=self.connector,
+            id_tag='hook', status=ChargingSession.SessionStatus.STARTED
+        )
+
+    def post(self, webhook_type, data, **extra):
+        response = self.client.post('/api/ocpp/webhook/', {
+            'type': webhook_type, 'station_id': 'HOOK-1', 'data': data, **extra
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_connector_storm_is_applied_once(self):
+        for connector_status in ('preparing', 'charging', 'suspended_ev', 'charging'):
+            self.post('connector_status', {'connector_id': 1, 'status': connector_status, 'error_code': 'NoError'})
+        self.post('connector_status', {'connector_id': '1', 'info': 'plugged'})
+        self.connector.refresh_from_db()
+        self.assertEqual(self.connector.status, 'available')
+
+        self.assertEqual(self.coalescer.snapshot()['pending'], 1)
+        self.assertEqual(self.coalescer.flush(), 1)
+        self.connector.refresh_from_db()
+        self.assertEqual((self.connector.status, self.connector.info), ('charging', 'plugged'))
+
+        # Re-sending the current state writes nothing
+        self.post('connector_status', {'connector_id': 1, 'status': 'charging'})
+        self.assertEqual(self.coalescer.flush(), 0)
+
+    def test_station_and_progress_events_are_merged(self):
+        self.post('station_status', {'status': 'faulted', 'is_online': True})
+        self.post('station_status', {'last_heartbeat': True})
+        self.post('session_progress', {'energy_consumed_kwh': '1.500'}, transaction_id=9001)
+        self.post('session_progress', {'current_power_kw': '7.20'}, transaction_id=9001)
+        self.assertEqual(self.coalescer.snapshot()['pending'], 2)
+
+        self.coalescer.flush()
+        self.station.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual(self.station.status, 'faulted')
+        self.assertIsNotNone(self.station.last_heartbeat)
+        self.assertEqual((self.session.energy_consumed_kwh, self.session.current_power_kw), (Decimal('1.500'), Decimal('7.20')))
+        self.assertEqual(self.session.status, 'charging')
+
+    def test_session_stopped_applies_pending_progress_first(self):
+        self.post('session_progress', {'energy_consumed_kwh': '3.000'}, transaction_id=9001)
+        self.post('session_stopped', {'final_cost': '30.00'}, transaction_id=9001)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'completed')
+        self.assertEqual(self.session.energy_consumed_kwh, Decimal('3.000'))
+        self.assertEqual(self.coalescer.snapshot()['pending'], 0)
@@ -7,7 +7,10 @@ urlpatterns = [
     # OCPP Station Management
     path('stations/', views.OCPPStationListView.as_view(), name='ocpp-station-list'),
     path('stations/<str:station_id>/', views.OCPPStationDetailView.as_view(), name='ocpp-station-detail'),
+    path('stations/<str:station_id>/live/', views.StationLiveConnectorsView.as_view(), name='ocpp-station-live'),
+    path('stations/<str:station_id>/utilization/', views.StationUtilizationView.as_view(), name='ocpp-station-utilization'),
     path('sync-station/', views.SyncStationView.as_view(), name='sync-station'),
+    path('sync-stations/', views.BulkSyncStationsView.as_view(), name='sync-stations'),
     
     path('initiate-charging/', views.InitiateChargingView.as_view(), name='initiate-charging'),
     path('stop-charging/', views.StopChargingView.as_view(), name='stop-charging'),
@@ -15,6 +18,7 @@ urlpatterns = [
     
     path('sessions/', views.ChargingSessionListView.as_view(), name='charging-session-list'),
     path('sessions/<int:transaction_id>/', views.ChargingSessionDetailView.as_view(), name='charging-session-detail'),
+    path('sessions/<int:transaction_id>/stream/', views.SessionStreamView.as_view(), name='charging-session-stream'),
     
     path('webhook/', views.ocpp_webhook, name='ocpp-webhook'),
     
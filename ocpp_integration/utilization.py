@@ -0,0 +1,324 @@
+"""
+Connector utilization engine.
+
+Raw SessionMeterValue rows (or their compacted SessionMeterArchive) and
+session start/stop times are downsampled once
+into per-connector, per-day ConnectorUtilization rows holding packed float32
+arrays at 1-minute, 15-minute and 1-hour resolution:
+
+- occupancy: fraction of each bucket the connector was in a session
+- avg_power_kw / peak_power_kw: mean and maximum charging power in each bucket
+
+Dashboards read the compact rows instead of scanning meter values.
+"""
+import logging
+import sys
+from array import array
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .meter_archive import archived_samples
+from .models import ChargingSession, ConnectorUtilization, SessionMeterValue
+
+logger = logging.getLogger(__name__)
+
+BASE_RESOLUTION = 60
+SECONDS_PER_DAY = 86400
+
+RESOLUTIONS = {
+    '1m': 60,
+    '15m': 900,
+    '1h': 3600,
+}
+
+# Longest range the API serves at each resolution, to bound the response size
+MAX_RANGE_DAYS = {
+    60: 2,
+    900: 31,
+    3600: 90,
+}
+
+POWER_MEASURAND = SessionMeterValue.MeasurandType.POWER_ACTIVE_IMPORT
+ENERGY_MEASURAND = SessionMeterValue.MeasurandType.ENERGY_ACTIVE_IMPORT_REGISTER
+
+ACTIVE_SESSION_STATUSES = [
+    ChargingSession.SessionStatus.STARTED,
+    ChargingSession.SessionStatus.CHARGING,
+    ChargingSession.SessionStatus.SUSPENDED,
+    ChargingSession.SessionStatus.STOPPING,
+]
+
+
+def pack_series(values):
+    """Pack floats into little-endian float32 bytes."""
+    data = array('f', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpack_series(blob):
+    data = array('f')
+    data.frombytes(bytes(blob))
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def day_bounds(day):
+    start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _to_kw(value, unit):
+    # OCPP reports Power.Active.Import in W unless a unit says otherwise
+    return float(value) if unit == 'kW' else float(value) / 1000
+
+
+def _to_kwh(value, unit):
+    return float(value) if unit == 'kWh' else float(value) / 1000
+
+
+def build_minute_series(intervals, samples, day_start, now=None):
+    """
+    Build 1-minute occupancy, average power and peak power lists for one day.
+
+    ``intervals`` holds ``(start, stop)`` pairs; ``stop`` is None for sessions
+    still running. ``samples`` maps a session id to its ``(timestamp, measurand,
+    value, unit)`` readings sorted by time. Power comes from power readings,
+    or from energy register deltas for sessions that report no power.
+    """
+    now = now or timezone.now()
+    buckets = SECONDS_PER_DAY // BASE_RESOLUTION
+    day_end = day_start + timedelta(days=1)
+
+    occupancy = [0.0] * buckets
+    for start, stop in intervals:
+        start = max(start, day_start)
+        stop = min(stop or now, day_end)
+        if stop <= start:
+            continue
+        a = (start - day_start).total_seconds()
+        b = (stop - day_start).total_seconds()
+        for i in range(int(a // BASE_RESOLUTION), min(buckets, int(-(-b // BASE_RESOLUTION)))):
+            overlap = min(b, (i + 1) * BASE_RESOLUTION) - max(a, i * BASE_RESOLUTION)
+            if overlap > 0:
+                occupancy[i] += overlap / BASE_RESOLUTION
+    occupancy = [min(value, 1.0) for value in occupancy]
+
+    power_sum = [0.0] * buckets
+    power_count = [0] * buckets
+    peak = [0.0] * buckets
+
+    def add_reading(timestamp, kw):
+        if not day_start <= timestamp < day_end:
+            return
+        i = int((timestamp - day_start).total_seconds() // BASE_RESOLUTION)
+        power_sum[i] += kw
+        power_count[i] += 1
+        peak[i] = max(peak[i], kw)
+
+    for readings in samples.values():
+        power = [(ts, _to_kw(value, unit)) for ts, measurand, value, unit in readings if measurand == POWER_MEASURAND]
+        if power:
+            for ts, kw in power:
+                add_reading(ts, kw)
+            continue
+
+        energy = [(ts, _to_kwh(value, unit)) for ts, measurand, value, unit in readings if measurand == ENERGY_MEASURAND]
+        for (t1, e1), (t2, e2) in zip(energy, energy[1:]):
+            hours = (t2 - t1).total_seconds() / 3600
+            if hours > 0 and e2 >= e1:
+                add_reading(t2, (e2 - e1) / hours)
+
+    # Carry the last reading forward through occupied minutes without one
+    avg_power = [0.0] * buckets
+    last = None
+    for i in range(buckets):
+        if power_count[i]:
+            avg_power[i] = last = power_sum[i] / power_count[i]
+        elif occupancy[i] > 0 and last is not None:
+            avg_power[i] = peak[i] = last
+        elif occupancy[i] == 0:
+            last = None
+
+    return occupancy, avg_power, peak
+
+
+def downsample(occupancy, avg_power, peak, factor):
+    """Merge ``factor`` consecutive buckets: mean occupancy and power, max peak."""
+    if factor == 1:
+        return occupancy, avg_power, peak
+    chunks = range(0, len(occupancy), factor)
+    return (
+        [sum(occupancy[i:i + factor]) / factor for i in chunks],
+        [sum(avg_power[i:i + factor]) / factor for i in chunks],
+        [max(peak[i:i + factor]) for i in chunks],
+    )
+
+
+def rebuild_utilization(day, connector_ids=None, now=None):
+    """
+    Recompute ConnectorUtilization rows for every connector active on ``day``.
+
+    Reads the day's sessions and meter values once, then upserts one row per
+    connector and resolution. Returns the number of rows written.
+    """
+    day_start, day_end = day_bounds(day)
+
+    sessions = ChargingSession.objects.filter(
+        start_time__lt=day_end
+    ).filter(
+        Q(stop_time__gt=day_start) |
+        Q(stop_time__isnull=True, status__in=ACTIVE_SESSION_STATUSES)
+    )
+    if connector_ids is not None:
+        sessions = sessions.filter(ocpp_connector_id__in=connector_ids)
+
+    intervals = {}
+    session_connector = {}
+    for session_id, connector_id, start, stop in sessions.values_list(
+        'id', 'ocpp_connector_id', 'start_time', 'stop_time'
+    ):
+        intervals.setdefault(connector_id, []).append((start, stop))
+        session_connector[session_id] = connector_id
+
+    samples = {}
+    meter_values = SessionMeterValue.objects.filter(
+        charging_session__in=sessions.values('id'),
+        measurand__in=[POWER_MEASURAND, ENERGY_MEASURAND],
+        timestamp__gte=day_start,
+        timestamp__lt=day_end,
+    ).order_by('timestamp').values_list('charging_session_id', 'timestamp', 'measurand', 'value', 'unit')
+
+    archived = archived_samples(list(session_connector), [POWER_MEASURAND, ENERGY_MEASURAND], day_start, day_end)
+    for session_id, ts, measurand, value, unit in chain(meter_values.iterator(chunk_size=5000), archived):
+        connector_id = session_connector.get(session_id)
+        if connector_id is not None:
+            samples.setdefault(connector_id, {}).setdefault(session_id, []).append((ts, measurand, value, unit))
+
+    rows = []
+    for connector_id, connector_intervals in intervals.items():
+        minute_series = build_minute_series(connector_intervals, samples.get(connector_id, {}), day_start, now=now)
+        for resolution in RESOLUTIONS.values():
+            occupancy, avg_power, peak = downsample(*minute_series, resolution // BASE_RESOLUTION)
+            rows.append(ConnectorUtilization(
+                ocpp_connector_id=connector_id,
+                day=day,
+                resolution_seconds=resolution,
+                occupancy=pack_series(occupancy),
+                avg_power_kw=pack_series(avg_power),
+                peak_power_kw=pack_series(peak),
+            ))
+
+    stale = ConnectorUtilization.objects.filter(day=day).exclude(ocpp_connector_id__in=list(intervals))
+    if connector_ids is not None:
+        stale = stale.filter(ocpp_connector_id__in=connector_ids)
+    stale.delete()
+
+    ConnectorUtilization.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['ocpp_connector', 'day', 'resolution_seconds'],
+        update_fields=['occupancy', 'avg_power_kw', 'peak_power_kw', 'updated_at'],
+    )
+    return len(rows)
+
+
+def rebuild_recent_utilization():
+    """Periodic job: refresh today's and yesterday's series (UTC)."""
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    for day in (today - timedelta(days=1), today):
+        written = rebuild_utilization(day)
+        logger.debug("Rebuilt %d utilization rows for %s", written, day)
+
+
+def _days(start_day, end_day):
+    return [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+
+
+def utilization_heatmap(connector_ids, start_day, end_day):
+    """
+    Mean occupancy (percent) by local weekday (0 = Monday) and hour over a day range.
+
+    Returns a 7x24 list of lists. Connector-days without a stored row count as idle.
+    """
+    connector_ids = list(connector_ids)
+    totals = [[0.0] * 24 for _ in range(7)]
+    slots = [[0] * 24 for _ in range(7)]
+
+    slot_for = {}
+    for day in _days(start_day, end_day):
+        day_start, _ = day_bounds(day)
+        for hour in range(24):
+            local = timezone.localtime(day_start + timedelta(hours=hour))
+            slot_for[(day, hour)] = (local.weekday(), local.hour)
+            slots[local.weekday()][local.hour] += len(connector_ids)
+
+    rows = ConnectorUtilization.objects.filter(
+        ocpp_connector_id__in=connector_ids,
+        resolution_seconds=RESOLUTIONS['1h'],
+        day__range=(start_day, end_day),
+    ).values_list('day', 'occupancy')
+
+    for day, blob in rows:
+        for hour, value in enumerate(unpack_series(blob)):
+            weekday, local_hour = slot_for[(day, hour)]
+            totals[weekday][local_hour] += value
+
+    return [
+        [round(totals[w][h] / slots[w][h] * 100, 1) if slots[w][h] else 0.0 for h in range(24)]
+        for w in range(7)
+    ]
+
+
+def power_profile(connector_ids, start_day, end_day, resolution_seconds):
+    """
+    Combined average and peak power (kW) of the given connectors per bucket.
+
+    Peak is the sum of each connector's bucket peak, an upper bound on the
+    site's instantaneous peak. Returns ``(points, peak)`` where points are
+    ``{'timestamp', 'avg_kw', 'peak_kw'}`` dicts covering the whole range.
+    """
+    per_day = SECONDS_PER_DAY // resolution_seconds
+    days = _days(start_day, end_day)
+    avg_total = {day: [0.0] * per_day for day in days}
+    peak_total = {day: [0.0] * per_day for day in days}
+
+    rows = ConnectorUtilization.objects.filter(
+        ocpp_connector_id__in=list(connector_ids),
+        resolution_seconds=resolution_seconds,
+        day__range=(start_day, end_day),
+    ).values_list('day', 'avg_power_kw', 'peak_power_kw')
+
+    for day, avg_blob, peak_blob in rows:
+        for i, (avg, peak) in enumerate(zip(unpack_series(avg_blob), unpack_series(peak_blob))):
+            avg_total[day][i] += avg
+            peak_total[day][i] += peak
+
+    points = []
+    best = None
+    for day in days:
+        day_start, _ = day_bounds(day)
+        for i in range(per_day):
+            point = {
+                'timestamp': (day_start + timedelta(seconds=i * resolution_seconds)).isoformat(),
+                'avg_kw': round(avg_total[day][i], 3),
+                'peak_kw': round(peak_total[day][i], 3),
+            }
+            points.append(point)
+            if best is None or point['peak_kw'] > best['peak_kw']:
+                best = point
+
+    return points, best
+
+
+def register_jobs(job_scheduler):
+    job_scheduler.add_job(
+        'utilization-rebuild', rebuild_recent_utilization,
+        settings.OCPP_SETTINGS['UTILIZATION_REBUILD_INTERVAL_SECONDS']
+    )
@@ -3,19 +3,27 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.db import transaction
+from datetime import timedelta
 from .models import OCPPStation, OCPPConnector, ChargingSession, SessionMeterValue, OCPPLog
 from .serializers import (
     OCPPStationSerializer, OCPPConnectorSerializer, ChargingSessionSerializer,
-    ChargingSessionDetailSerializer, OCPPLogSerializer, SyncStationSerializer,
+    ChargingSessionDetailSerializer, OCPPLogSerializer, SyncStationSerializer, BulkSyncStationSerializer,
     InitiateChargingSerializer, StopChargingSerializer, SessionStatusSerializer,
     WebhookDataSerializer, StationStatusUpdateSerializer, ConnectorStatusUpdateSerializer
 )
 from .services import OCPPIntegrationService
+from .connector_state import connector_states
+from .meter_ingest import meter_buffer
+from .session_stream import async_event_stream, event_stream, publish_progress, session_snapshot
+from .webhook_coalescer import COALESCED_TYPES, webhook_coalescer
 from charging_stations.models import ChargingStation
 from authentication.models import CustomUser
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -90,6 +98,50 @@ class SyncStationView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkSyncStationsView(APIView):
+    """Sync many charging stations to the OCPP backend in one call, with a result per station"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkSyncStationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        station_ids = serializer.validated_data.get('charging_station_ids')
+        stations = ChargingStation.objects.filter(is_active=True)
+        if hasattr(request.user, 'station_owner'):
+            stations = stations.filter(owner=request.user.station_owner)
+        elif not request.user.is_staff:
+            return Response(
+                {'error': 'Only station owners and staff can sync charging stations'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if station_ids:
+            stations = stations.filter(id__in=station_ids)
+
+        results = OCPPIntegrationService().sync_stations_to_ocpp(
+            stations,
+            vendor=serializer.validated_data['vendor'],
+            model=serializer.validated_data['model']
+        )
+        found = {result['charging_station_id'] for result in results}
+        for station_id in dict.fromkeys(str(station_id) for station_id in station_ids or ()):
+            if station_id not in found:
+                results.append({
+                    'charging_station_id': station_id,
+                    'success': False,
+                    'error': 'Charging station not found or not active'
+                })
+
+        synced = sum(1 for result in results if result['success'])
+        return Response({
+            'success': synced == len(results),
+            'synced': synced,
+            'failed': len(results) - synced,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
 class InitiateChargingView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -248,6 +300,97 @@ class ChargingSessionDetailView(generics.RetrieveAPIView):
         return queryset
 
 
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data)
+
+
+class SessionStreamView(ChargingSessionDetailView):
+    """Server-Sent Events stream of a charging session's progress"""
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request, *args, **kwargs):
+        session = self.get_object()
+        snapshot = session_snapshot(session)
+        if hasattr(request._request, 'scope'):
+            stream = async_event_stream(session.transaction_id, snapshot)
+        else:
+            stream = event_stream(session.transaction_id, snapshot)
+
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class StationLiveConnectorsView(APIView):
+    """Latest OCPP status of each connector of a charge point, from the live connector state map"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, station_id):
+        connectors = connector_states.station_connectors(station_id)
+        if not connectors:
+            return Response({'error': 'Station not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'station_id': station_id,
+            'connectors': [
+                {'connector_id': connector_id, 'status': state.status, 'updated_at': state.updated_at}
+                for connector_id, state in connectors.items()
+            ],
+        })
+
+
+class StationUtilizationView(APIView):
+    """Connector utilization heatmap and power profile for one of the owner's stations"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, station_id):
+        from .utilization import RESOLUTIONS, MAX_RANGE_DAYS, utilization_heatmap, power_profile
+
+        if not hasattr(request.user, 'station_owner'):
+            return Response({'error': 'Station owner profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        ocpp_station = get_object_or_404(
+            OCPPStation,
+            station_id=station_id,
+            charging_station__owner=request.user.station_owner
+        )
+
+        resolution_key = request.GET.get('resolution', '1h')
+        resolution = RESOLUTIONS.get(resolution_key)
+        if resolution is None:
+            return Response(
+                {'error': f'Unsupported resolution, use one of: {", ".join(RESOLUTIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            days = int(request.GET.get('days', 7))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, MAX_RANGE_DAYS[resolution]))
+
+        end_day = timezone.now().date()
+        start_day = end_day - timedelta(days=days - 1)
+        connector_ids = list(ocpp_station.ocpp_connectors.values_list('id', flat=True))
+
+        points, peak = power_profile(connector_ids, start_day, end_day, resolution)
+
+        return Response({
+            'station_id': ocpp_station.station_id,
+            'resolution': resolution_key,
+            'start_day': start_day.isoformat(),
+            'end_day': end_day.isoformat(),
+            'heatmap': utilization_heatmap(connector_ids, start_day, end_day),
+            'power': points,
+            'peak': peak,
+        })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def ocpp_webhook(request):
@@ -257,18 +400,15 @@ def ocpp_webhook(request):
             webhook_data = serializer.validated_data
             webhook_type = webhook_data.get('type')
 
-            if webhook_type == 'session_started':
+            if webhook_type in COALESCED_TYPES:
+                # Status and progress storms are merged and applied in batches
+                webhook_coalescer.submit(webhook_data)
+            elif webhook_type == 'session_started':
+                webhook_coalescer.flush()
                 handle_session_started(webhook_data)
-            elif webhook_type == 'session_progress':
-                handle_session_progress(webhook_data)
             elif webhook_type == 'session_stopped':
+                webhook_coalescer.flush()
                 handle_session_stopped(webhook_data)
-            elif webhook_type == 'availability_changed':
-                handle_availability_changed(webhook_data)
-            elif webhook_type == 'station_status':
-                handle_station_status_update(webhook_data)
-            elif webhook_type == 'connector_status':
-                handle_connector_status_update(webhook_data)
 
             return Response({
                 'status': 'success',
@@ -303,132 +443,61 @@ def handle_session_started(webhook_data):
 
                 session.ocpp_connector.status = OCPPConnector.ConnectorStatus.CHARGING
                 session.ocpp_connector.save()
+                connector_states.set_status(
+                    session.ocpp_station.station_id, session.ocpp_connector.connector_id, session.ocpp_connector.status
+                )
+                publish_progress(transaction_id, status=session.status)
 
                 logger.info(f"Session {transaction_id} started successfully")
     except Exception as e:
         logger.error(f"Error handling session started webhook: {e}")
 
 
-def handle_session_progress(webhook_data):
-    try:
-        transaction_id = webhook_data.get('transaction_id')
-        data = webhook_data.get('data', {})
-
-        if transaction_id:
-            session = ChargingSession.objects.filter(transaction_id=transaction_id).first()
-            if session:
-                session.energy_consumed_kwh = data.get('energy_consumed_kwh', session.energy_consumed_kwh)
-                session.current_power_kw = data.get('current_power_kw', session.current_power_kw)
-                session.duration_seconds = data.get('duration_seconds', session.duration_seconds)
-                session.estimated_cost = data.get('estimated_cost', session.estimated_cost)
-                session.status = ChargingSession.SessionStatus.CHARGING
-                session.save()
-
-                logger.debug(f"Session {transaction_id} progress updated")
-    except Exception as e:
-        logger.error(f"Error handling session progress webhook: {e}")
-
-
 def handle_session_stopped(webhook_data):
     try:
         transaction_id = webhook_data.get('transaction_id')
         data = webhook_data.get('data', {})
 
         if transaction_id:
+            meter_buffer.flush()
+
             session = ChargingSession.objects.filter(transaction_id=transaction_id).first()
             if session:
                 session.status = ChargingSession.SessionStatus.COMPLETED
                 session.stop_time = timezone.now()
-                session.final_cost = data.get('final_cost', session.estimated_cost)
+                if data.get('final_cost') is not None:
+                    session.final_cost = data['final_cost']
+                else:
+                    # Price the metered energy at the connector's tariffs
+                    from .billing import BILLING_FIELDS, final_costs
+                    row = ChargingSession.objects.filter(pk=session.pk).values(*BILLING_FIELDS).get()
+                    session.final_cost = final_costs([row])[session.pk]
                 session.stop_reason = data.get('stop_reason', 'User requested')
                 session.meter_stop = data.get('meter_stop', session.meter_start)
                 session.save()
 
                 session.ocpp_connector.status = OCPPConnector.ConnectorStatus.AVAILABLE
                 session.ocpp_connector.save()
+                connector_states.set_status(
+                    session.ocpp_station.station_id, session.ocpp_connector.connector_id, session.ocpp_connector.status
+                )
+                publish_progress(
+                    transaction_id, status=session.status,
+                    energy_consumed_kwh=session.energy_consumed_kwh, final_cost=session.final_cost
+                )
 
                 logger.info(f"Session {transaction_id} completed successfully")
     except Exception as e:
         logger.error(f"Error handling session stopped webhook: {e}")
 
 
-def handle_availability_changed(webhook_data):
-    try:
-        station_id = webhook_data.get('station_id')
-        data = webhook_data.get('data', {})
-
-        if station_id:
-            ocpp_station = OCPPStation.objects.filter(station_id=station_id).first()
-            if ocpp_station:
-                connector_id = data.get('connector_id')
-                if connector_id:
-                    connector = OCPPConnector.objects.filter(
-                        ocpp_station=ocpp_station,
-                        connector_id=connector_id
-                    ).first()
-                    if connector:
-                        new_status = data.get('status', 'available')
-                        connector.status = new_status
-                        connector.save()
-
-                        logger.info(f"Connector {connector_id} status changed to {new_status}")
-    except Exception as e:
-        logger.error(f"Error handling availability changed webhook: {e}")
-
-
-def handle_station_status_update(webhook_data):
-    try:
-        station_id = webhook_data.get('station_id')
-        data = webhook_data.get('data', {})
-
-        if station_id:
-            ocpp_station = OCPPStation.objects.filter(station_id=station_id).first()
-            if ocpp_station:
-                ocpp_station.status = data.get('status', ocpp_station.status)
-                ocpp_station.is_online = data.get('is_online', ocpp_station.is_online)
-                if data.get('last_heartbeat'):
-                    ocpp_station.last_heartbeat = timezone.now()
-                ocpp_station.save()
-
-                logger.info(f"Station {station_id} status updated")
-    except Exception as e:
-        logger.error(f"Error handling station status update webhook: {e}")
-
-
-def handle_connector_status_update(webhook_data):
-    try:
-        station_id = webhook_data.get('station_id')
-        data = webhook_data.get('data', {})
-
-        if station_id:
-            ocpp_station = OCPPStation.objects.filter(station_id=station_id).first()
-            if ocpp_station:
-                connector_id = data.get('connector_id')
-                if connector_id:
-                    connector = OCPPConnector.objects.filter(
-                        ocpp_station=ocpp_station,
-                        connector_id=connector_id
-                    ).first()
-                    if connector:
-                        connector.status = data.get('status', connector.status)
-                        connector.error_code = data.get('error_code', connector.error_code)
-                        connector.info = data.get('info', connector.info)
-                        connector.vendor_id = data.get('vendor_id', connector.vendor_id)
-                        connector.vendor_error_code = data.get('vendor_error_code', connector.vendor_error_code)
-                        connector.save()
-
-                        logger.info(f"Connector {connector_id} status updated")
-    except Exception as e:
-        logger.error(f"Error handling connector status update webhook: {e}")
-
-
 class OCPPLogListView(generics.ListAPIView):
     serializer_class = OCPPLogSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        queryset = OCPPLog.objects.all()
+        queryset = OCPPLog.objects.select_related('ocpp_station', 'charging_session')
 
         if hasattr(user, 'station_owner'):
             queryset = queryset.filter(
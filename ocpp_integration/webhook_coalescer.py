@@ -0,0 +1,239 @@
+"""
+Coalescing stage for OCPP status and progress webhooks.
+
+``session_progress``, ``connector_status``, ``availability_changed`` and
+``station_status`` webhooks are acknowledged as soon as they are queued. Events
+for the same transaction, (station, connector) or station within
+WINDOW_SECONDS are merged, later fields winning, and each window is applied
+with one lookup query per kind and ``bulk_update`` calls that write only the
+fields whose value actually changed.
+
+Heartbeats reported by ``station_status`` webhooks go to the liveness
+tracker at the charger's time (the reported ``last_heartbeat``, else the
+webhook's ``timestamp``), not the time the webhook was received.
+
+Session start/stop webhooks are not coalesced: the view flushes the pending
+window first so they are applied after every earlier event.
+
+WINDOW_SECONDS=0 applies each event inline.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .connector_state import connector_states
+from .liveness import station_liveness
+from .meter_ingest import meter_buffer
+from .models import ChargingSession, OCPPConnector, OCPPStation
+from .ocpp16 import meter_value_rows
+from .session_stream import publish_progress
+from utils.buffered_flusher import BufferedFlusher
+
+logger = logging.getLogger(__name__)
+
+COALESCED_TYPES = ('session_progress', 'connector_status', 'availability_changed', 'station_status')
+
+PROGRESS_FIELDS = ('energy_consumed_kwh', 'current_power_kw', 'duration_seconds', 'estimated_cost')
+CONNECTOR_FIELDS = ('status', 'error_code', 'info', 'vendor_id', 'vendor_error_code')
+
+
+def _config():
+    return settings.OCPP_WEBHOOKS
+
+
+def _event_key(webhook_data):
+    webhook_type = webhook_data['type']
+    data = webhook_data.get('data') or {}
+    if webhook_type == 'session_progress':
+        return ('session', webhook_data.get('transaction_id'))
+    if webhook_type == 'station_status':
+        return ('station', webhook_data.get('station_id'))
+    try:
+        connector_id = int(data.get('connector_id'))
+    except (TypeError, ValueError):
+        connector_id = None
+    return ('connector', webhook_data.get('station_id'), connector_id)
+
+
+def _connector_changes(webhook_type, data):
+    if webhook_type == 'availability_changed':
+        return {'status': data.get('status', OCPPConnector.ConnectorStatus.AVAILABLE)}
+    return {field: data[field] for field in CONNECTOR_FIELDS if field in data}
+
+
+def _changed_fields(instance, values):
+    changed = []
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed.append(field)
+    return changed
+
+
+def _bulk_update_changed(model, changes):
+    """``bulk_update`` each group of instances that changed the same fields. Returns the rows written."""
+    groups = defaultdict(list)
+    now = timezone.now()
+    for instance, fields in changes:
+        if fields:
+            instance.updated_at = now
+            groups[tuple(sorted(fields)) + ('updated_at',)].append(instance)
+    for fields, instances in groups.items():
+        model.objects.bulk_update(instances, list(fields))
+    return sum(len(instances) for instances in groups.values())
+
+
+def _heartbeat_time(value, sent_at):
+    """The charger's heartbeat time: the reported datetime, else the webhook's timestamp"""
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    return sent_at
+
+
+def apply_station_events(events):
+    stations = OCPPStation.objects.filter(station_id__in=list(events))
+    changes = []
+    beats = {}
+    for station in stations:
+        data, sent_at = events[station.station_id]
+        values = {}
+        if 'status' in data:
+            values['status'] = data['status']
+        if 'is_online' in data:
+            values['is_online'] = data['is_online']
+        if data.get('is_online') is False:
+            station_liveness.forget(station.station_id)
+        elif data.get('last_heartbeat'):
+            beats[station.station_id] = _heartbeat_time(data['last_heartbeat'], sent_at)
+        changes.append((station, _changed_fields(station, values)))
+    written = _bulk_update_changed(OCPPStation, changes)
+
+    for station_id, at in beats.items():
+        station_liveness.beat(station_id, at)
+    return written
+
+
+def apply_connector_events(events):
+    station_ids = {station_id for station_id, _ in events}
+    connector_ids = {connector_id for _, connector_id in events}
+    connectors = OCPPConnector.objects.filter(
+        ocpp_station__station_id__in=station_ids, connector_id__in=connector_ids
+    ).select_related('ocpp_station')
+    changes = []
+    for connector in connectors:
+        values = events.get((connector.ocpp_station.station_id, connector.connector_id))
+        if values is not None:
+            changes.append((connector, _changed_fields(connector, values)))
+    written = _bulk_update_changed(OCPPConnector, changes)
+
+    for connector, fields in changes:
+        if 'status' in fields:
+            connector_states.set_status(connector.ocpp_station.station_id, connector.connector_id, connector.status)
+    return written
+
+
+def apply_progress_events(events):
+    sessions = dict(
+        ChargingSession.objects.filter(transaction_id__in=list(events)).values_list('transaction_id', 'pk')
+    )
+    for transaction_id, data in events.items():
+        session_id = sessions.get(transaction_id)
+        if session_id is None:
+            continue
+        aggregates = {field: data[field] for field in PROGRESS_FIELDS if data.get(field) is not None}
+        aggregates['status'] = ChargingSession.SessionStatus.CHARGING
+        publish_progress(transaction_id, **aggregates)
+        aggregates['updated_at'] = timezone.now()
+        meter_buffer.add(session_id, meter_value_rows(session_id, data.get('meter_values') or []), aggregates)
+    return len(sessions)
+
+
+class WebhookCoalescer(BufferedFlusher):
+    thread_name = 'ocpp-webhooks'
+    failure_message = 'Webhook coalescer failed'
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+        self.stats = {'received': 0, 'coalesced': 0, 'applied': 0, 'flushes': 0, 'failed': 0}
+
+    def submit(self, webhook_data):
+        """Queue a coalescable webhook; events with the same key keep only the latest values."""
+        key = _event_key(webhook_data)
+        if not all(key[1:]):
+            # Events without a transaction, station or connector id have nothing to update
+            return
+        data = dict(webhook_data.get('data') or {})
+        with self._lock:
+            self.stats['received'] += 1
+            previous = self._pending.get(key)
+            sent_at = webhook_data.get('timestamp') or timezone.now()
+            if previous is None:
+                self._pending[key] = (webhook_data['type'], data, sent_at)
+            else:
+                self.stats['coalesced'] += 1
+                previous_type, previous_data, _ = previous
+                if previous_type == 'availability_changed' or webhook_data['type'] == 'availability_changed':
+                    # Resolve the implicit 'available' before merging with a connector_status event
+                    previous_data = _connector_changes(previous_type, previous_data)
+                    data = _connector_changes(webhook_data['type'], data)
+                    merged_type = 'connector_status'
+                else:
+                    merged_type = webhook_data['type']
+                self._pending[key] = (merged_type, {**previous_data, **data}, max(sent_at, previous[2]))
+
+        if _config()['WINDOW_SECONDS'] <= 0:
+            self.flush()
+        else:
+            self._ensure_started()
+
+    def flush(self):
+        """Apply every pending event. Returns the number of rows written or handed to the meter buffer."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            stations, connectors, progress = {}, {}, {}
+            for key, (webhook_type, data, sent_at) in pending.items():
+                if key[0] == 'station':
+                    stations[key[1]] = (data, sent_at)
+                elif key[0] == 'session':
+                    progress[key[1]] = data
+                else:
+                    connectors[key[1:]] = _connector_changes(webhook_type, data)
+
+            applied = 0
+            for apply, events in (
+                (apply_station_events, stations),
+                (apply_connector_events, connectors),
+                (apply_progress_events, progress),
+            ):
+                if not events:
+                    continue
+                try:
+                    applied += apply(events)
+                except Exception as e:
+                    logger.error(f"Applying {len(events)} coalesced webhooks failed: {str(e)}")
+                    with self._lock:
+                        self.stats['failed'] += len(events)
+
+            with self._lock:
+                self.stats['applied'] += applied
+                self.stats['flushes'] += 1
+            return applied
+
+    def interval(self):
+        return _config()['WINDOW_SECONDS']
+
+    def buffer_counts(self):
+        return {'pending': len(self._pending)}
+
+
+webhook_coalescer = WebhookCoalescer()
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        from utils.scheduler import scheduler
+        from .callback_queue import register_jobs
+        from .verification_sweep import register_jobs as register_verification_jobs
+        from .session_expiry import register_jobs as register_expiry_jobs
+
+        register_jobs(scheduler)
+        register_verification_jobs(scheduler)
+        register_expiry_jobs(scheduler)
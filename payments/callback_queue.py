@@ -0,0 +1,153 @@
+"""
+Queue-backed Chapa callback processing.
+
+The webhook only stores the raw callback as a PaymentCallbackEvent, keyed by
+``(tx_ref, status)`` so duplicate deliveries are rejected by the unique index,
+and returns. Events are processed by a KeyedWorkerPool keyed on tx_ref, so the
+events of one payment run one at a time in arrival order. A periodic drain job
+(and the ``process_payment_callbacks`` command) picks up events that were never
+dispatched, failed, or got stuck while processing.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PaymentCallbackEvent
+from utils.worker_pool import KeyedWorkerPool
+
+logger = logging.getLogger(__name__)
+
+EventStatus = PaymentCallbackEvent.ProcessingStatus
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _config():
+    return settings.CALLBACK_QUEUE
+
+
+def record_callback(payload):
+    """
+    Store a callback payload. Returns ``(event_id, created)``; ``event_id`` is
+    None when an event with the same ``(tx_ref, status)`` already exists.
+    """
+    if hasattr(payload, 'dict'):
+        payload = payload.dict()
+    tx_ref = payload['tx_ref']
+    callback_status = str(payload.get('status', 'failed'))[:20]
+
+    try:
+        with transaction.atomic():
+            event = PaymentCallbackEvent.objects.create(tx_ref=tx_ref, status=callback_status, payload=payload)
+    except IntegrityError:
+        logger.info(f"Duplicate callback ignored for tx_ref {tx_ref} ({callback_status})")
+        return None, False
+    return event.id, True
+
+
+def process_event(event_id):
+    """Claim one event and run it through PaymentService.process_callback. Returns True if it was processed."""
+    from .services import PaymentService
+
+    claimed = PaymentCallbackEvent.objects.filter(
+        pk=event_id,
+        processing_status__in=[EventStatus.PENDING, EventStatus.FAILED],
+        attempts__lt=_config()['MAX_ATTEMPTS'],
+    ).update(
+        processing_status=EventStatus.PROCESSING,
+        attempts=F('attempts') + 1,
+        processing_started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    event = PaymentCallbackEvent.objects.get(pk=event_id)
+    try:
+        result = PaymentService().process_callback(event.payload)
+    except Exception as e:
+        logger.exception(f"Callback event {event_id} for tx_ref {event.tx_ref} raised")
+        result = {'success': False, 'message': str(e)}
+
+    if result.get('success'):
+        PaymentCallbackEvent.objects.filter(pk=event_id).update(
+            processing_status=EventStatus.PROCESSED,
+            processed_at=timezone.now(),
+            last_error=None,
+        )
+        return True
+
+    PaymentCallbackEvent.objects.filter(pk=event_id).update(
+        processing_status=EventStatus.FAILED,
+        last_error=result.get('message', 'Unknown error'),
+    )
+    logger.warning(f"Callback event {event_id} for tx_ref {event.tx_ref} failed: {result.get('message')}")
+    return False
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = KeyedWorkerPool('payment-callback', process_event, _config()['WORKERS'])
+    return _pool
+
+
+def dispatch_event(event_id, tx_ref):
+    """Hand an event to the worker that owns its tx_ref, or process it inline when WORKERS is 0."""
+    if _config()['WORKERS'] <= 0:
+        process_event(event_id)
+    else:
+        _get_pool().submit(tx_ref, event_id)
+
+
+def requeue_stuck_events(now=None):
+    """Mark events stuck in 'processing' longer than STALE_AFTER_SECONDS as failed so they are retried."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=_config()['STALE_AFTER_SECONDS'])
+    return PaymentCallbackEvent.objects.filter(
+        processing_status=EventStatus.PROCESSING,
+        processing_started_at__lt=cutoff,
+    ).update(processing_status=EventStatus.FAILED, last_error='Processing timed out')
+
+
+def retryable_events():
+    return PaymentCallbackEvent.objects.filter(
+        Q(processing_status=EventStatus.PENDING) |
+        Q(processing_status=EventStatus.FAILED, attempts__lt=_config()['MAX_ATTEMPTS'])
+    ).order_by('id')
+
+
+def drain_callback_events(limit=None, dispatch=True):
+    """
+    Process or re-dispatch every event that still needs work, oldest first.
+
+    With ``dispatch`` the events go to the worker pool, otherwise they are
+    processed inline in this thread. Returns the number of events handled.
+    """
+    requeue_stuck_events()
+    events = retryable_events().values_list('id', 'tx_ref')
+    if limit:
+        events = events[:limit]
+
+    count = 0
+    for event_id, tx_ref in events.iterator():
+        if dispatch:
+            dispatch_event(event_id, tx_ref)
+        else:
+            process_event(event_id)
+        count += 1
+    return count
+
+
+def register_jobs(job_scheduler):
+    job_scheduler.add_job(
+        'payment-callback-drain', drain_callback_events,
+        _config()['DRAIN_INTERVAL_SECONDS']
+    )
@@ -0,0 +1,94 @@
+"""
+Charging history for drivers.
+
+History is read newest first in keyset pages on ``(created_at, id)``, so a page
+costs the same for a driver with ten sessions or ten thousand. The summary
+totals come from a single ``aggregate()`` query.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import QRPaymentSession
+from utils.keyset import encode_cursor, seek_before
+
+HISTORY_STATUSES = ['charging_completed', 'charging_started', 'payment_completed']
+
+HISTORY_DEFAULT_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Fields the mobile history rows are built from
+MOBILE_HISTORY_FIELDS = (
+    'id', 'session_token', 'status', 'created_at', 'connector_id',
+    'connector__connector_type', 'connector__power_kw', 'connector__price_per_kwh',
+    'connector__station__name', 'connector__station__address', 'connector__station__city',
+    'payment_transaction_id', 'payment_transaction__amount',
+    'simple_charging_session__duration_seconds', 'simple_charging_session__energy_delivered_kwh',
+    'simple_charging_session__start_time', 'simple_charging_session__stop_time',
+)
+
+# Same rule as QRPaymentSession.get_payment_amount: calculated amount, then amount, then 0
+PAYMENT_AMOUNT = Coalesce(
+    NullIf('calculated_amount', Value(Decimal('0'))), 'amount', Value(Decimal('0')),
+    output_field=DecimalField(max_digits=10, decimal_places=2)
+)
+
+
+def history_sessions(user):
+    return QRPaymentSession.objects.filter(user=user, status__in=HISTORY_STATUSES)
+
+
+def history_summary(user):
+    """Session count and total spent, in one query."""
+    summary = history_sessions(user).aggregate(
+        total_sessions=Count('id'),
+        total_amount_spent=Sum(PAYMENT_AMOUNT)
+    )
+    return {
+        'total_sessions': summary['total_sessions'],
+        'total_amount_spent': float(summary['total_amount_spent'] or 0),
+        'currency': 'ETB'
+    }
+
+
+def history_page(queryset, after=None, limit=HISTORY_DEFAULT_PAGE_SIZE):
+    """
+    One page of ``queryset`` newest first.
+
+    ``queryset`` may return model instances or ``values()`` dicts. ``after`` is
+    the ``(created_at, id)`` pair decoded from the previous page's cursor.
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    limit = max(1, min(int(limit), HISTORY_MAX_PAGE_SIZE))
+    if after:
+        queryset = queryset.filter(seek_before(*after))
+    rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        else:
+            next_cursor = encode_cursor(last.created_at, last.pk)
+    return rows, next_cursor
+
+
+def detailed_history(user):
+    """Sessions for QRPaymentSessionWithChargingSerializer, with the related rows it reads joined in."""
+    return history_sessions(user).select_related(
+        'connector__station', 'simple_charging_session'
+    ).only(
+        'id', 'session_token', 'payment_type', 'amount', 'kwh_requested', 'calculated_amount',
+        'phone_number', 'status', 'expires_at', 'created_at', 'updated_at',
+        'connector__id', 'connector__connector_type', 'connector__power_kw', 'connector__price_per_kwh',
+        'connector__available_quantity', 'connector__qr_code_image',
+        'connector__station__name', 'connector__station__address',
+        'simple_charging_session',
+    )
+
+
+def mobile_history(user):
+    return history_sessions(user).values(*MOBILE_HISTORY_FIELDS)
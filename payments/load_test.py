@@ -0,0 +1,273 @@
+"""
+End-to-end load test for QR payment flows.
+
+Each flow walks the same path as a driver paying at a charger:
+
+1. ``initiate``: POST ``/api/payments/qr-initiate/<qr_token>/``, which
+   creates the session and calls Chapa's initialize.
+2. ``callback``: POST ``/api/payments/callback/`` with the result the
+   (fake) Chapa decided for the payment, the way Chapa's webhook would.
+3. ``settle``: poll the session until the callback queue has processed it
+   and charging started (or the payment failed).
+
+Flows run on ``concurrency`` threads, either in-process through DRF's
+APIClient or over HTTP against a running server. Every stage is timed, and
+the report has throughput plus p50/p95/p99 for each stage. The fixtures (an
+owner, a station, one connector per flow and the drivers) are created for
+the run and deleted afterwards.
+"""
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+import requests
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('initiate', 'callback', 'settle', 'total')
+SETTLED_STATUSES = {'charging_started', 'payment_completed', 'charging_completed', 'failed'}
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank ``q`` percentile (0-100) of an already sorted list."""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class StageTimer:
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self):
+        samples = sorted(self.samples)
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            'stage': self.name,
+            'count': len(samples),
+            'errors': self.errors,
+            'p50_ms': to_ms(percentile(samples, 50)),
+            'p95_ms': to_ms(percentile(samples, 95)),
+            'p99_ms': to_ms(percentile(samples, 99)),
+            'max_ms': to_ms(samples[-1] if samples else None),
+        }
+
+
+class InProcessTransport:
+    """Calls the API views in this process through DRF's test client"""
+
+    def __init__(self, user):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def post(self, path, data):
+        response = self.client.post(path, data, format='json')
+        return response.status_code, response.json()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.json()
+
+
+class HTTPTransport:
+    """Calls a running server over HTTP with the driver's API token"""
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Token {token}'
+
+    def post(self, path, data):
+        response = self.session.post(f'{self.base_url}{path}', json=data, timeout=60)
+        return response.status_code, response.json()
+
+    def get(self, path):
+        response = self.session.get(f'{self.base_url}{path}', timeout=60)
+        return response.status_code, response.json()
+
+
+class LoadTestFixtures:
+    """Owner, station, one connector per flow and a pool of drivers, all tagged with the run id"""
+
+    def __init__(self, flows, drivers, amount='50.00'):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.flows = flows
+        self.driver_count = drivers
+        self.amount = Decimal(amount)
+        self.owner = None
+        self.drivers = []
+        self.tokens = {}
+        self.qr_tokens = []
+        self.tx_refs = set()
+
+    def create(self):
+        from rest_framework.authtoken.models import Token
+        from charging_stations.models import StationOwner, ChargingStation, ChargingConnector
+
+        User = get_user_model()
+        self.owner = User.objects.create_user(email=f'loadtest-owner-{self.run_id}@evmeri.test', password=None)
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=self.owner, company_name=f'Load Test {self.run_id}'),
+            name=f'Load Test Station {self.run_id}',
+            address='Load Test Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000',
+            country='Ethiopia'
+        )
+        # bulk_create skips ChargingConnector.save, so no QR images are rendered
+        self.qr_tokens = [f'loadtest-{self.run_id}-{index}' for index in range(self.flows)]
+        ChargingConnector.objects.bulk_create([
+            ChargingConnector(
+                station=station,
+                connector_type='type2',
+                power_kw=Decimal('22.00'),
+                price_per_kwh=Decimal('10.00'),
+                quantity=1,
+                available_quantity=1,
+                is_available=True,
+                qr_code_token=qr_token
+            )
+            for qr_token in self.qr_tokens
+        ])
+
+        for index in range(self.driver_count):
+            driver = User.objects.create_user(
+                email=f'loadtest-driver-{self.run_id}-{index}@evmeri.test', password=None,
+                first_name='Load', last_name='Tester'
+            )
+            self.drivers.append(driver)
+            self.tokens[driver.pk] = Token.objects.get_or_create(user=driver)[0].key
+
+    def cleanup(self):
+        from .models import PaymentCallbackEvent
+
+        PaymentCallbackEvent.objects.filter(tx_ref__in=self.tx_refs).delete()
+        User = get_user_model()
+        User.objects.filter(pk__in=[driver.pk for driver in self.drivers]).delete()
+        if self.owner:
+            User.objects.filter(pk=self.owner.pk).delete()
+
+
+def run_flow(transport, qr_token, chapa_url, amount, timers, settle_timeout, poll_interval):
+    """Run one payment flow. Returns the final QR session status, or an error label."""
+    started = time.monotonic()
+
+    stage_started = time.monotonic()
+    code, body = transport.post(f'/api/payments/qr-initiate/{qr_token}/', {
+        'payment_type': 'amount',
+        'amount': str(amount),
+        'phone_number': '+251911000000',
+    })
+    if code != 200 or not body.get('success'):
+        timers['initiate'].error()
+        return 'initiate_error', None
+    timers['initiate'].add(time.monotonic() - stage_started)
+    session_token = body['session_token']
+    # The fake Chapa's checkout URL ends with the payment's tx_ref
+    tx_ref = body['checkout_url'].rstrip('/').rsplit('/', 1)[-1]
+
+    verify = requests.get(f'{chapa_url.rstrip("/")}/v1/transaction/verify/{tx_ref}', timeout=30)
+    chapa_status = verify.json().get('data', {}).get('status', 'failed') if verify.ok else 'failed'
+
+    stage_started = time.monotonic()
+    code, body = transport.post('/api/payments/callback/', {'tx_ref': tx_ref, 'status': chapa_status})
+    if code != 200:
+        timers['callback'].error()
+        return 'callback_error', tx_ref
+    timers['callback'].add(time.monotonic() - stage_started)
+
+    stage_started = time.monotonic()
+    deadline = stage_started + settle_timeout
+    session_status = None
+    while time.monotonic() < deadline:
+        code, body = transport.get(f'/api/payments/qr-sessions/{session_token}/')
+        session_status = body.get('qr_session', {}).get('status') if code == 200 else None
+        if session_status in SETTLED_STATUSES:
+            break
+        time.sleep(poll_interval)
+    else:
+        timers['settle'].error()
+        return 'settle_timeout', tx_ref
+    timers['settle'].add(time.monotonic() - stage_started)
+
+    timers['total'].add(time.monotonic() - started)
+    return session_status, tx_ref
+
+
+def run_load_test(fixtures, transport_factory, chapa_url, concurrency, settle_timeout=30, poll_interval=0.05):
+    """
+    Drive one flow per connector in ``fixtures`` on ``concurrency`` threads.
+
+    ``transport_factory(driver, token)`` builds the transport a thread uses.
+    Returns the report dict with ``throughput``, ``outcomes`` and per-stage ``stages``.
+    """
+    timers = {stage: StageTimer(stage) for stage in STAGES}
+    outcomes = Counter()
+    outcomes_lock = threading.Lock()
+    work = queue.Queue()
+    for qr_token in fixtures.qr_tokens:
+        work.put(qr_token)
+
+    def worker(index):
+        driver = fixtures.drivers[index % len(fixtures.drivers)]
+        transport = transport_factory(driver, fixtures.tokens[driver.pk])
+        try:
+            while True:
+                try:
+                    qr_token = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    outcome, tx_ref = run_flow(
+                        transport, qr_token, chapa_url, fixtures.amount, timers, settle_timeout, poll_interval
+                    )
+                except Exception as e:
+                    logger.warning(f"Load test flow for {qr_token} raised: {e}")
+                    outcome, tx_ref = 'exception', None
+                with outcomes_lock:
+                    outcomes[outcome] += 1
+                    if tx_ref:
+                        fixtures.tx_refs.add(tx_ref)
+        finally:
+            connection.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,), name=f'load-test-{index}') for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    completed = timers['total'].summary()['count']
+    return {
+        'flows': len(fixtures.qr_tokens),
+        'concurrency': concurrency,
+        'completed': completed,
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput': round(completed / elapsed, 2) if elapsed else None,
+        'outcomes': dict(outcomes),
+        'stages': [timers[stage].summary() for stage in STAGES],
+    }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from payments.session_expiry import expire_sessions
+
+
+class Command(BaseCommand):
+    help = 'Expire QR payment sessions past their expiry and release their connectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Sessions expired per database transaction (default: QR_SESSION_EXPIRY["BATCH_SIZE"])',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the sessions that would be expired',
+        )
+
+    def handle(self, *args, **options):
+        stats = expire_sessions(batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        self.stdout.write(f"💳 Unpaid sessions expired: {stats['expired_payments']}")
+        self.stdout.write(f"🔌 Abandoned charges expired: {stats['expired_charging']}")
+        self.stdout.write(f"✅ Connectors released: {stats['connectors_released']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('This was a dry run. Run without --dry-run to apply changes.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('QR session expiry completed'))
@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from payments.models import Wallet, WalletTransaction, Transaction, QRPaymentSession, SimpleChargingSession
-from charging_stations.models import StationOwner
+from payments.models import Transaction, SimpleChargingSession
 from payments.services import PaymentService
+from payments.reconciliation import reconcile_owner_credits
 from django.utils import timezone
 from decimal import Decimal
 
@@ -31,44 +30,21 @@ class Command(BaseCommand):
         # 1. Fix completed QR payment sessions that didn't credit station owner wallets
         self.stdout.write('\n1️⃣ Fixing QR Payment Sessions...')
         
-        qr_sessions = QRPaymentSession.objects.filter(
-            status='payment_completed',
-            payment_transaction__status='completed'
-        ).select_related('payment_transaction', 'connector__station__owner__user')
+        report = reconcile_owner_credits(dry_run=dry_run)
         
-        self.stdout.write(f'Found {qr_sessions.count()} completed QR payment sessions')
+        self.stdout.write(f"Found {report['missing']} completed QR payments without an owner credit")
         
-        fixed_qr_count = 0
-        for qr_session in qr_sessions:
-            if qr_session.payment_transaction and qr_session.connector:
-                station_owner = qr_session.connector.station.owner
-                transaction = qr_session.payment_transaction
-                
-                # Check if wallet transaction already exists for this
-                existing_wallet_tx = WalletTransaction.objects.filter(
-                    transaction=transaction,
-                    wallet__user=station_owner.user
-                ).first()
-                
-                if not existing_wallet_tx:
-                    self.stdout.write(f'  💰 Would credit {station_owner.user.email} with {transaction.amount} ETB')
-                    self.stdout.write(f'     Transaction: {transaction.reference_number}')
-                    
-                    if not dry_run:
-                        try:
-                            payment_service.credit_wallet(
-                                station_owner.user, 
-                                transaction.amount, 
-                                transaction
-                            )
-                            self.stdout.write(self.style.SUCCESS('  ✅ Successfully credited wallet'))
-                            fixed_qr_count += 1
-                        except Exception as e:
-                            self.stdout.write(self.style.ERROR(f'  ❌ Error crediting wallet: {e}'))
-                    else:
-                        fixed_qr_count += 1
-                else:
-                    self.stdout.write(f'  ✅ Wallet already credited for transaction {transaction.reference_number}')
+        for email, owner_report in sorted(report['owners'].items()):
+            self.stdout.write(f"  💰 Would credit {email} with {owner_report['amount']} ETB")
+            for reference_number in owner_report['transactions']:
+                self.stdout.write(f'     Transaction: {reference_number}')
+        
+        if report['errors']:
+            self.stdout.write(self.style.ERROR(f"  ❌ {report['errors']} credits failed, see the log"))
+        elif not dry_run and report['credited']:
+            self.stdout.write(self.style.SUCCESS(f"  ✅ Successfully credited {report['credited']} payments"))
+        
+        fixed_qr_count = report['missing'] if dry_run else report['credited']
         
         # 2. Fix completed charging sessions that should generate additional revenue
         self.stdout.write('\n2️⃣ Fixing Charging Session Revenue...')
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from payments.load_test import HTTPTransport, InProcessTransport, LoadTestFixtures, run_load_test
+from utils.standin_servers import FakeChapaServer, FakeOCPPServer
+
+
+class Command(BaseCommand):
+    help = 'Load test QR payment flows (initiate -> callback -> settle) and report p50/p95/p99 per stage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', type=int, default=100, help='Number of payment flows to run')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of flows running at once')
+        parser.add_argument('--amount', default='50.00', help='Amount paid in each flow')
+        parser.add_argument(
+            '--base-url',
+            help='Run against a server at this URL over HTTP instead of in-process. '
+                 'It must be configured with CHAPA_SANDBOX_URL pointing at --chapa-url.',
+        )
+        parser.add_argument('--chapa-url', help='Fake Chapa used by the server at --base-url (see run_standin_servers)')
+        parser.add_argument('--callback-workers', type=int, help='Callback queue workers for in-process runs')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Latency added by the in-process fakes')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Random +/- jitter on the fake latency')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of fake requests answered with 503')
+        parser.add_argument('--decline-rate', type=float, default=0.0, help='Share of payments the fake Chapa declines')
+        parser.add_argument('--settle-timeout', type=float, default=30, help='Seconds to wait for a session to settle')
+        parser.add_argument('--keep-data', action='store_true', help='Keep the users, station and sessions created')
+
+    def handle(self, *args, **options):
+        if options['flows'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--flows and --concurrency must be at least 1')
+        if options['base_url'] and not options['chapa_url']:
+            raise CommandError('--chapa-url is required with --base-url')
+
+        concurrency = min(options['concurrency'], options['flows'])
+        fixtures = LoadTestFixtures(options['flows'], concurrency, amount=options['amount'])
+        self.stdout.write(f'🧪 Load test {fixtures.run_id}: {options["flows"]} flows, concurrency {concurrency}')
+
+        try:
+            fixtures.create()
+            if options['base_url']:
+                report = run_load_test(
+                    fixtures,
+                    lambda driver, token: HTTPTransport(options['base_url'], token),
+                    options['chapa_url'],
+                    concurrency,
+                    settle_timeout=options['settle_timeout'],
+                )
+            else:
+                report = self._run_in_process(fixtures, concurrency, options)
+        finally:
+            if options['keep_data']:
+                self.stdout.write(f'Kept load test data tagged {fixtures.run_id}')
+            else:
+                fixtures.cleanup()
+
+        self._print_report(report)
+
+    def _run_in_process(self, fixtures, concurrency, options):
+        common = {
+            'latency_ms': options['latency_ms'],
+            'jitter_ms': options['jitter_ms'],
+            'failure_rate': options['failure_rate'],
+        }
+        chapa = FakeChapaServer(decline_rate=options['decline_rate'], **common).start()
+        ocpp = FakeOCPPServer(**common).start()
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=['*'],
+                CHAPA_SETTINGS={**settings.CHAPA_SETTINGS, 'SANDBOX_URL': chapa.url, 'USE_SANDBOX': True},
+                OCPP_SETTINGS={**settings.OCPP_SETTINGS, 'BASE_URL': ocpp.url},
+                CALLBACK_QUEUE={
+                    **settings.CALLBACK_QUEUE,
+                    'WORKERS': options['callback_workers'] or settings.CALLBACK_QUEUE['WORKERS'],
+                },
+            ):
+                return run_load_test(
+                    fixtures,
+                    lambda driver, token: InProcessTransport(driver),
+                    chapa.url,
+                    concurrency,
+                    settle_timeout=options['settle_timeout'],
+                )
+        finally:
+            chapa.stop()
+            ocpp.stop()
+
+    def _print_report(self, report):
+        self.stdout.write('')
+        self.stdout.write(
+            f'Completed {report["completed"]}/{report["flows"]} flows in {report["elapsed_seconds"]}s '
+            f'({report["throughput"]} flows/s)'
+        )
+        self.stdout.write(f'Outcomes: {report["outcomes"]}')
+        self.stdout.write('')
+        self.stdout.write(f'{"stage":<10}{"count":>7}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+        for stage in report['stages']:
+            self.stdout.write(
+                f'{stage["stage"]:<10}{stage["count"]:>7}{stage["errors"]:>8}'
+                + ''.join(f'{str(stage[key]):>10}' for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+            )
+
+        if report['completed'] == report['flows']:
+            self.stdout.write(self.style.SUCCESS('✅ All flows settled'))
+        else:
+            self.stdout.write(self.style.WARNING(f'⚠️ {report["flows"] - report["completed"]} flows did not settle'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from payments.callback_queue import drain_callback_events, retryable_events
+
+
+class Command(BaseCommand):
+    help = 'Process stored Chapa callback events that are pending or failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum number of events to process',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show how many events are waiting',
+        )
+
+    def handle(self, *args, **options):
+        waiting = retryable_events().count()
+        self.stdout.write(f'📬 {waiting} callback events waiting')
+
+        if options['dry_run'] or not waiting:
+            return
+
+        processed = drain_callback_events(limit=options['limit'], dispatch=False)
+        self.stdout.write(self.style.SUCCESS(f'✅ Processed {processed} callback events'))
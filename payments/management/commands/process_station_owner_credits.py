@@ -1,6 +1,5 @@
 from django.core.management.base import BaseCommand
-from payments.services import PaymentService
-from payments.models import Wallet, WalletTransaction, QRPaymentSession
+from payments.reconciliation import reconcile_owner_credits
 from charging_stations.models import StationOwner
 import logging
 
@@ -21,6 +20,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Show detailed output',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Credits posted per database transaction (default: RECONCILIATION_SETTINGS["CHUNK_SIZE"])',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -32,104 +37,24 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('🔧 Processing Station Owner Wallet Credits'))
         self.stdout.write('=' * 60)
         
-        # Initialize payment service
-        payment_service = PaymentService()
-        
-        # Get all completed QR payment sessions
-        qr_sessions = QRPaymentSession.objects.filter(
-            payment_transaction__status='completed'
-        ).select_related(
-            'payment_transaction',
-            'connector__station__owner__user'
-        )
+        # One anti-join finds every completed QR payment without an owner credit
+        report = reconcile_owner_credits(dry_run=dry_run, chunk_size=options['chunk_size'])
         
-        self.stdout.write(f'📊 Found {qr_sessions.count()} completed QR payment sessions')
+        self.stdout.write(f"📊 Found {report['missing']} completed QR payments without an owner credit")
         
-        processed_count = 0
-        already_credited_count = 0
-        error_count = 0
-        total_amount_credited = 0
+        for email, owner_report in sorted(report['owners'].items()):
+            self.stdout.write(f"❌ Missing credit for {email}: {owner_report['missing']} payments, {owner_report['amount']} ETB")
+            if verbose:
+                for reference_number in owner_report['transactions']:
+                    self.stdout.write(f'   Transaction: {reference_number}')
         
-        for qr_session in qr_sessions:
-            try:
-                # Validate QR session structure
-                if not qr_session.connector:
-                    if verbose:
-                        self.stdout.write(f'⚠️  QR session {qr_session.session_token} has no connector')
-                    continue
-                    
-                if not qr_session.connector.station:
-                    if verbose:
-                        self.stdout.write(f'⚠️  QR session {qr_session.session_token} connector has no station')
-                    continue
-                    
-                if not qr_session.connector.station.owner:
-                    if verbose:
-                        self.stdout.write(f'⚠️  QR session {qr_session.session_token} station has no owner')
-                    continue
-                
-                if not qr_session.payment_transaction:
-                    if verbose:
-                        self.stdout.write(f'⚠️  QR session {qr_session.session_token} has no payment transaction')
-                    continue
-                
-                station_owner = qr_session.connector.station.owner
-                transaction = qr_session.payment_transaction
-                
-                if verbose:
-                    self.stdout.write(f'\n🎫 QR Session: {qr_session.session_token}')
-                    self.stdout.write(f'   🏢 Station Owner: {station_owner.user.email}')
-                    self.stdout.write(f'   🏪 Station: {qr_session.connector.station.name}')
-                    self.stdout.write(f'   💰 Amount: {transaction.amount} ETB')
-                
-                # Check if station owner wallet was already credited
-                station_wallet, created = Wallet.objects.get_or_create(user=station_owner.user)
-                
-                existing_credit = WalletTransaction.objects.filter(
-                    wallet=station_wallet,
-                    transaction=transaction,
-                    transaction_type=WalletTransaction.TransactionType.CREDIT
-                ).first()
-                
-                if existing_credit:
-                    if verbose:
-                        self.stdout.write(f'   ✅ Already credited: {existing_credit.amount} ETB')
-                    already_credited_count += 1
-                else:
-                    self.stdout.write(f'❌ Missing credit for {station_owner.user.email}: {transaction.amount} ETB')
-                    self.stdout.write(f'   Transaction: {transaction.reference_number}')
-                    self.stdout.write(f'   Station: {qr_session.connector.station.name}')
-                    
-                    if not dry_run:
-                        try:
-                            # Credit the station owner's wallet
-                            wallet = payment_service.credit_wallet(
-                                station_owner.user,
-                                transaction.amount,
-                                transaction
-                            )
-                            if wallet:
-                                self.stdout.write(self.style.SUCCESS(f'   ✅ Successfully credited {transaction.amount} ETB'))
-                                processed_count += 1
-                                total_amount_credited += float(transaction.amount)
-                            else:
-                                self.stdout.write(self.style.ERROR(f'   ❌ Failed to credit wallet'))
-                                error_count += 1
-                        except Exception as e:
-                            self.stdout.write(self.style.ERROR(f'   ❌ Error crediting wallet: {e}'))
-                            error_count += 1
-                    else:
-                        processed_count += 1
-                        total_amount_credited += float(transaction.amount)
-                        
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'❌ Error processing QR session {qr_session.session_token}: {e}'))
-                error_count += 1
+        processed_count = report['missing'] if dry_run else report['credited']
+        error_count = report['errors']
+        total_amount_credited = float(report['amount'] if dry_run else report['credited_amount'])
         
         # Summary
         self.stdout.write('\n📊 SUMMARY')
         self.stdout.write('=' * 30)
-        self.stdout.write(f'✅ Already credited: {already_credited_count}')
         self.stdout.write(f'🔧 Processed (new credits): {processed_count}')
         self.stdout.write(f'❌ Errors: {error_count}')
         self.stdout.write(f'💰 Total amount credited: {total_amount_credited:.2f} ETB')
@@ -143,7 +68,7 @@ class Command(BaseCommand):
         self.stdout.write('\n💼 Current Station Owner Wallet Balances:')
         self.stdout.write('-' * 50)
         
-        station_owners = StationOwner.objects.all()
+        station_owners = StationOwner.objects.select_related('user__wallet')
         for owner in station_owners:
-            wallet, created = Wallet.objects.get_or_create(user=owner.user)
-            self.stdout.write(f'{owner.company_name} ({owner.user.email}): {wallet.balance} ETB')
+            balance = owner.user.wallet.balance if hasattr(owner.user, 'wallet') else 0
+            self.stdout.write(f'{owner.company_name} ({owner.user.email}): {balance} ETB')
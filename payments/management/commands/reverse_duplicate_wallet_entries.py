@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from payments.wallet_ledger import reverse_duplicate_entries
+
+
+class Command(BaseCommand):
+    help = 'Reverse wallet credits and debits that were posted more than once for the same payment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the duplicate entries without correcting them',
+        )
+        parser.add_argument(
+            '--allow-negative',
+            action='store_true',
+            help='Reverse duplicates even when the wallet balance goes below zero',
+        )
+
+    def handle(self, *args, **options):
+        report = reverse_duplicate_entries(
+            dry_run=options['dry_run'], allow_negative=options['allow_negative']
+        )
+        self.stdout.write(f"🔍 {report['duplicates']} duplicate wallet entries")
+
+        for correction in report['corrections']:
+            self.stdout.write(
+                f"  ↩️  {correction['type']} {correction['entry']} of {correction['amount']} ETB on "
+                f"{correction['transaction']} ({correction['user']}) → {correction['reference']}"
+            )
+        for correction in report['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"  ❌ {correction['type']} {correction['entry']} of {correction['amount']} ETB on "
+                f"{correction['transaction']} ({correction['user']}): balance does not cover the reversal"
+            ))
+        for wallet_id, balance in report['negative_balances'].items():
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Wallet {wallet_id} is now at {balance} ETB"))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('This was a dry run. Run without --dry-run to post the reversals.'))
+        elif report['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"{len(report['failed'])} duplicates need a manual correction, "
+                f"or run again with --allow-negative to reverse them anyway"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Reversed {report['reversed']} duplicate entries"))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.standin_servers import FakeChapaServer, FakeOCPPServer
+
+
+class Command(BaseCommand):
+    help = 'Run local stand-ins for Chapa and the OCPP backend (point CHAPA_SANDBOX_URL / OCPP_BASE_URL at them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+        parser.add_argument('--chapa-port', type=int, default=8900, help='Port for the fake Chapa API')
+        parser.add_argument('--ocpp-port', type=int, default=8901, help='Port for the fake OCPP backend')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Added latency per request')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Random +/- jitter on the latency')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with 503 (0-1)')
+        parser.add_argument('--decline-rate', type=float, default=0.0, help='Share of Chapa payments that are declined (0-1)')
+        parser.add_argument(
+            '--send-callbacks',
+            action='store_true',
+            help='POST payment results to the callback_url of each initialized payment',
+        )
+        parser.add_argument('--callback-delay-ms', type=float, default=500, help='Delay before a callback is sent')
+
+    def handle(self, *args, **options):
+        common = {
+            'host': options['host'],
+            'latency_ms': options['latency_ms'],
+            'jitter_ms': options['jitter_ms'],
+            'failure_rate': options['failure_rate'],
+        }
+        chapa = FakeChapaServer(
+            port=options['chapa_port'],
+            decline_rate=options['decline_rate'],
+            send_callbacks=options['send_callbacks'],
+            callback_delay_ms=options['callback_delay_ms'],
+            **common
+        ).start()
+        ocpp = FakeOCPPServer(port=options['ocpp_port'], **common).start()
+
+        self.stdout.write(self.style.SUCCESS(f'💳 Fake Chapa listening on {chapa.url}'))
+        self.stdout.write(self.style.SUCCESS(f'🔌 Fake OCPP backend listening on {ocpp.url}'))
+        self.stdout.write(f'   CHAPA_SANDBOX_URL={chapa.url} CHAPA_USE_SANDBOX=true OCPP_BASE_URL={ocpp.url}')
+        self.stdout.write('Press Ctrl+C to stop')
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            chapa.stop()
+            ocpp.stop()
+            self.stdout.write(f'Served {chapa.requests} Chapa and {ocpp.requests} OCPP requests')
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from payments.verification_sweep import stale_pending_transactions, sweep_pending_transactions
+
+
+class Command(BaseCommand):
+    help = 'Verify stale pending payments with Chapa and process the ones that have settled'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum number of transactions to verify',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Concurrent Chapa requests (default: PAYMENT_VERIFICATION["WORKERS"])',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=None,
+            help='Maximum Chapa requests per second (default: PAYMENT_VERIFICATION["RATE_PER_SECOND"])',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Query Chapa and report, without updating any payment',
+        )
+
+    def handle(self, *args, **options):
+        waiting = stale_pending_transactions().count()
+        self.stdout.write(f'🔍 {waiting} stale pending transactions')
+
+        if not waiting:
+            return
+
+        stats = sweep_pending_transactions(
+            limit=options['limit'],
+            workers=options['workers'],
+            rate=options['rate'],
+            dry_run=options['dry_run'],
+            dispatch=False,
+        )
+
+        self.stdout.write(f"✅ Paid: {stats['success']}")
+        self.stdout.write(f"❌ Failed: {stats['failed']}")
+        self.stdout.write(f"⏳ Still pending: {stats['pending']}")
+        self.stdout.write(f"⚠️  Could not verify: {stats['errors']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('This was a dry run. Run without --dry-run to apply changes.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Verified {stats['checked']} transactions"))
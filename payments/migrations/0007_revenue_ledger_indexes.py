@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0006_remove_unused_models"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="qrpaymentsession",
+            index=models.Index(fields=["connector", "-created_at", "-id"], name="qr_session_connector_created"),
+        ),
+        migrations.AddIndex(
+            model_name="simplechargingsession",
+            index=models.Index(fields=["connector", "-created_at", "-id"], name="simple_session_conn_created"),
+        ),
+    ]
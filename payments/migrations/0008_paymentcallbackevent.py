@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0007_revenue_ledger_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentCallbackEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("tx_ref", models.CharField(max_length=100)),
+                ("status", models.CharField(max_length=20)),
+                ("payload", models.JSONField(default=dict)),
+                ("processing_status", models.CharField(choices=[("pending", "Pending"), ("processing", "Processing"), ("processed", "Processed"), ("failed", "Failed")], default="pending", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, null=True)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processing_started_at", models.DateTimeField(blank=True, null=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Payment Callback Event",
+                "verbose_name_plural": "Payment Callback Events",
+                "ordering": ["id"],
+                "indexes": [models.Index(fields=["processing_status", "id"], name="callback_event_status_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="paymentcallbackevent",
+            constraint=models.UniqueConstraint(fields=("tx_ref", "status"), name="unique_callback_tx_ref_status"),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_no_duplicate_entries(apps, schema_editor):
+    """
+    Refuse to add the constraint over duplicated entries. They are ledger
+    history, so they are corrected with reversing entries by the
+    reverse_duplicate_wallet_entries command, never deleted here.
+    """
+    WalletTransaction = apps.get_model("payments", "WalletTransaction")
+
+    duplicates = (
+        WalletTransaction.objects.values("wallet_id", "transaction_id", "transaction_type")
+        .annotate(entries=Count("id"))
+        .filter(entries__gt=1)
+        .count()
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} wallet entries were posted more than once. Review them with "
+            f"'python manage.py reverse_duplicate_wallet_entries --dry-run', correct them with "
+            f"'python manage.py reverse_duplicate_wallet_entries' (add --allow-negative for "
+            f"duplicates the balance no longer covers), then migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0008_paymentcallbackevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="wallettransaction",
+            constraint=models.UniqueConstraint(fields=("wallet", "transaction", "transaction_type"), name="unique_wallet_entry_per_transaction"),
+        ),
+    ]
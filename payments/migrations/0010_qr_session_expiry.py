@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:11
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def extend_charging_deadlines(apps, schema_editor):
+    """
+    Sessions already charging still carry their 15 minute payment expiry. Give
+    them the default charging window from their last update so the first
+    expiry sweep does not reclaim charges that are still running.
+    """
+    QRPaymentSession = apps.get_model("payments", "QRPaymentSession")
+    QRPaymentSession.objects.filter(status="charging_started").update(
+        expires_at=F("updated_at") + timedelta(hours=12)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0009_wallet_entry_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(extend_charging_deadlines, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="qrpaymentsession",
+            index=models.Index(condition=models.Q(("status__in", ["pending", "payment_initiated", "charging_started"])), fields=["status", "expires_at"], name="qr_session_live_expiry"),
+        ),
+    ]
@@ -72,6 +72,13 @@ class WalletTransaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One credit and one debit per payment transaction; see payments.wallet_ledger
+            models.UniqueConstraint(
+                fields=['wallet', 'transaction', 'transaction_type'],
+                name='unique_wallet_entry_per_transaction'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.wallet.user.email} - {self.transaction_type} {self.amount}"
@@ -117,13 +124,25 @@ class QRPaymentSession(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['connector', '-created_at', '-id'], name='qr_session_connector_created'),
+            # Expiry queue for payments.session_expiry; only live sessions are indexed
+            models.Index(
+                fields=['status', 'expires_at'],
+                name='qr_session_live_expiry',
+                condition=models.Q(status__in=['pending', 'payment_initiated', 'charging_started'])
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.session_token:
             self.session_token = str(uuid.uuid4())
 
-        if self.payment_type == 'kwh' and self.kwh_requested and self.connector.price_per_kwh:
-            self.calculated_amount = self.kwh_requested * self.connector.price_per_kwh
+        if self.payment_type == 'kwh' and self.kwh_requested:
+            # Priced once, at the tariff in force when the session is created
+            if self._state.adding or self.calculated_amount is None:
+                from charging_stations.tariffs import CENT, price_at
+                self.calculated_amount = (self.kwh_requested * price_at(self.connector_id)).quantize(CENT)
         elif self.payment_type == 'amount' and self.amount:
             self.calculated_amount = self.amount
 
@@ -192,5 +211,50 @@ class SimpleChargingSession(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['connector', '-created_at', '-id'], name='simple_session_conn_created'),
+        ]
         verbose_name = "Simple Charging Session"
         verbose_name_plural = "Simple Charging Sessions"
+
+
+class PaymentCallbackEvent(models.Model):
+    """Raw Chapa callback, stored once per (tx_ref, status) and processed by the callback workers"""
+
+    class ProcessingStatus(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        PROCESSING = 'processing', _('Processing')
+        PROCESSED = 'processed', _('Processed')
+        FAILED = 'failed', _('Failed')
+
+    # Sequential key, so events for one tx_ref are processed in arrival order
+    id = models.BigAutoField(primary_key=True)
+    tx_ref = models.CharField(max_length=100)
+    status = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+
+    processing_status = models.CharField(
+        max_length=20,
+        choices=ProcessingStatus.choices,
+        default=ProcessingStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processing_started_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Callback {self.tx_ref} ({self.status}) - {self.processing_status}"
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['tx_ref', 'status'], name='unique_callback_tx_ref_status'),
+        ]
+        indexes = [
+            models.Index(fields=['processing_status', 'id'], name='callback_event_status_idx'),
+        ]
+        verbose_name = "Payment Callback Event"
+        verbose_name_plural = "Payment Callback Events"
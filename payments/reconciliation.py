@@ -0,0 +1,150 @@
+"""
+Station owner credit reconciliation.
+
+A QR payment whose transaction completed must have a matching CREDIT entry in
+the station owner's wallet. ``missing_owner_credits`` finds the payments
+without one using a single anti-join (``~Exists``), and ``reconcile_owner_credits``
+reports them or posts them through ``wallet_ledger.post_credits``. Each
+chunk is posted in its own transaction.
+"""
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Exists, OuterRef, Sum
+
+from . import wallet_ledger
+from .models import QRPaymentSession, Transaction, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+MISSING_CREDIT_FIELDS = (
+    'payment_transaction_id', 'session_token', 'created_at',
+    'payment_transaction__amount', 'payment_transaction__reference_number',
+    'connector__station__owner__user_id', 'connector__station__owner__user__email',
+    'connector__station__name',
+)
+
+
+def owner_credit_exists():
+    return Exists(WalletTransaction.objects.filter(
+        wallet__user=OuterRef('connector__station__owner__user'),
+        transaction=OuterRef('payment_transaction'),
+        transaction_type=WalletTransaction.TransactionType.CREDIT
+    ))
+
+
+def completed_qr_payments(owner=None):
+    sessions = QRPaymentSession.objects.filter(
+        payment_transaction__status=Transaction.TransactionStatus.COMPLETED,
+        connector__station__owner__isnull=False
+    )
+    if owner is not None:
+        sessions = sessions.filter(connector__station__owner=owner)
+    return sessions
+
+
+def missing_owner_credits(owner=None):
+    """Completed QR payments whose owner wallet has no credit for the transaction."""
+    return completed_qr_payments(owner).filter(~owner_credit_exists())
+
+
+def _missing_rows(owner, chunk_size):
+    """Yield chunks of missing-credit rows, one row per transaction, paged by transaction id."""
+    last_id = None
+    while True:
+        rows = missing_owner_credits(owner).order_by('payment_transaction_id')
+        if last_id is not None:
+            rows = rows.filter(payment_transaction_id__gt=last_id)
+        rows = list(rows.values(*MISSING_CREDIT_FIELDS)[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1]['payment_transaction_id']
+
+        # A transaction shared by several sessions is only credited once
+        unique_rows = OrderedDict()
+        for row in rows:
+            unique_rows.setdefault(row['payment_transaction_id'], row)
+        yield list(unique_rows.values())
+        if len(rows) < chunk_size:
+            return
+
+
+def owner_credit_summary(owner):
+    """Expected, credited and missing totals for one station owner."""
+    sessions = completed_qr_payments(owner).annotate(credited=owner_credit_exists())
+    expected = sessions.aggregate(
+        count=Count('payment_transaction', distinct=True),
+        total=Sum('payment_transaction__amount')
+    )
+    missing = sessions.filter(credited=False).aggregate(
+        count=Count('payment_transaction', distinct=True),
+        total=Sum('payment_transaction__amount')
+    )
+    return {
+        'total_expected': expected['total'] or Decimal('0'),
+        'total_credited': (expected['total'] or Decimal('0')) - (missing['total'] or Decimal('0')),
+        'missing_amount': missing['total'] or Decimal('0'),
+        'missing_count': missing['count'],
+    }
+
+
+def reconcile_owner_credits(owner=None, dry_run=False, chunk_size=None):
+    """
+    Post every missing station owner credit, or only report them with ``dry_run``.
+
+    Returns a report with the overall counts and a per-owner diff:
+    ``{'missing': n, 'amount': Decimal, 'credited': n, 'credited_amount': Decimal,
+    'errors': n, 'owners': {email: {...}}}``.
+    A chunk that fails is rolled back and counted in ``errors``; later chunks still run.
+    """
+    chunk_size = chunk_size or settings.RECONCILIATION_SETTINGS['CHUNK_SIZE']
+    report = {
+        'missing': 0, 'amount': Decimal('0'), 'credited': 0, 'credited_amount': Decimal('0'),
+        'errors': 0, 'owners': {}
+    }
+
+    for rows in _missing_rows(owner, chunk_size):
+        for row in rows:
+            owner_report = report['owners'].setdefault(row['connector__station__owner__user__email'], {
+                'missing': 0, 'amount': Decimal('0'), 'credited': 0, 'transactions': []
+            })
+            owner_report['missing'] += 1
+            owner_report['amount'] += row['payment_transaction__amount']
+            owner_report['transactions'].append(row['payment_transaction__reference_number'])
+            report['missing'] += 1
+            report['amount'] += row['payment_transaction__amount']
+
+        if dry_run:
+            continue
+
+        credits = [
+            (
+                row['connector__station__owner__user_id'],
+                row['payment_transaction_id'],
+                row['payment_transaction__amount'],
+                f"Credit from payment {row['payment_transaction__reference_number']}",
+            )
+            for row in rows
+        ]
+        try:
+            entries = wallet_ledger.post_credits(credits)
+        except DatabaseError as e:
+            logger.error(f"Reconciliation chunk of {len(rows)} credits failed: {e}")
+            report['errors'] += len(rows)
+            continue
+
+        credited = {entry.transaction_id for entry in entries}
+        for row in rows:
+            if row['payment_transaction_id'] in credited:
+                report['owners'][row['connector__station__owner__user__email']]['credited'] += 1
+        report['credited'] += len(entries)
+        report['credited_amount'] += sum((entry.amount for entry in entries), Decimal('0'))
+
+    logger.info(
+        f"Reconciliation {'dry run' if dry_run else 'run'}: {report['missing']} missing credits "
+        f"({report['amount']} ETB), {report['credited']} posted, {report['errors']} errors"
+    )
+    return report
@@ -4,8 +4,12 @@ import json
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import transaction as db_transaction
 from django.utils import timezone
-from .models import Transaction, Wallet, WalletTransaction
+from .models import Transaction, Wallet
+from . import wallet_ledger
+from .session_expiry import charging_deadline
+from utils import http_client
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -68,7 +72,8 @@ class ChapaService:
 
         try:
             logger.info(f"Chapa payload: {payload}")
-            response = requests.post(url, json=payload, headers=headers)
+            # Not retried after the request is sent, so a slow Chapa can't create two checkouts
+            response = http_client.request('POST', url, service='chapa', json=payload, headers=headers)
             logger.info(f"Chapa response status: {response.status_code}")
             logger.info(f"Chapa response: {response.text}")
             response.raise_for_status()
@@ -95,7 +100,7 @@ class ChapaService:
         headers = self.get_headers()
 
         try:
-            response = requests.get(url, headers=headers)
+            response = http_client.request('GET', url, service='chapa', headers=headers)
             response.raise_for_status()
             return {'success': True, 'data': response.json()}
         except requests.exceptions.RequestException as e:
@@ -166,41 +171,26 @@ class PaymentService:
                 logger.error("Missing tx_ref in callback data")
                 return {'success': False, 'message': 'Missing tx_ref'}
 
-            # Check for QR payment session - try multiple ways to find it
             from .models import QRPaymentSession
-            qr_session = QRPaymentSession.objects.filter(
-                payment_transaction__external_reference=tx_ref
+            from django.db.models import Q
+
+            transaction = Transaction.objects.filter(
+                external_reference=tx_ref
             ).first()
 
-            # If not found, try by session token (in case tx_ref is the session token)
-            if not qr_session:
-                qr_session = QRPaymentSession.objects.filter(
-                    session_token=tx_ref
-                ).first()
+            # The QR session is linked through its payment transaction, or tx_ref is the session token
+            session_match = Q(session_token=tx_ref)
+            if transaction:
+                session_match |= Q(payment_transaction=transaction)
+            qr_session = QRPaymentSession.objects.filter(session_match).select_related(
+                'connector__station__owner__user'
+            ).first()
 
             logger.info(f"Found QR session: {qr_session}")
 
             if not qr_session:
                 logger.error(f"No QR session found for tx_ref: {tx_ref}")
-                # Try to find transaction directly
-                transaction = Transaction.objects.filter(
-                    external_reference=tx_ref
-                ).first()
-                if transaction:
-                    logger.info(f"Found orphaned transaction: {transaction.reference_number}")
-                    # Try to find QR session by transaction
-                    qr_session = QRPaymentSession.objects.filter(
-                        payment_transaction=transaction
-                    ).first()
-                    if qr_session:
-                        logger.info(f"Found QR session via transaction: {qr_session.session_token}")
-
-                if not qr_session:
-                    return {'success': False, 'message': 'Session not found'}
-
-            transaction = Transaction.objects.filter(
-                external_reference=tx_ref
-            ).first()
+                return {'success': False, 'message': 'Session not found'}
 
             logger.info(f"Found transaction: {transaction}")
 
@@ -210,49 +200,52 @@ class PaymentService:
 
             status = callback_data.get('status', 'failed')
 
-            if status == 'success':
-                transaction.status = Transaction.TransactionStatus.COMPLETED
-                transaction.completed_at = timezone.now()
+            # Chapa retries, verification sweeps and requeued events can deliver a payment more than once,
+            # possibly at the same time; the row lock lets only one of them complete it
+            with db_transaction.atomic():
+                transaction = Transaction.objects.select_for_update().get(pk=transaction.pk)
+                if transaction.status == Transaction.TransactionStatus.COMPLETED:
+                    logger.info(f"Transaction {transaction.reference_number} already completed, skipping callback")
+                    return {'success': True, 'message': 'Callback already processed'}
 
-                if qr_session:
-                    logger.info(f"Processing QR session payment completion: {qr_session.session_token}")
-                    qr_session.status = 'payment_completed'
-                    qr_session.payment_transaction = transaction
-                    qr_session.save()
+                if status == 'success':
+                    transaction.status = Transaction.TransactionStatus.COMPLETED
+                    transaction.completed_at = timezone.now()
 
-                    # Credit station owner wallet - this is the critical part
-                    success = self._credit_station_owner_for_qr_payment(qr_session, transaction)
-
-                    if success:
-                        try:
-                            # Send charging payment notification
-                            self._send_payment_notification(transaction.user, transaction.amount, 'charging_payment', qr_session)
+                    if qr_session:
+                        logger.info(f"Processing QR session payment completion: {qr_session.session_token}")
+                        qr_session.status = 'payment_completed'
+                        qr_session.payment_transaction = transaction
+                        qr_session.save()
 
-                            # Send notification to station owner
-                            self._send_station_owner_payment_notification(qr_session, transaction)
+                        # Credit station owner wallet - this is the critical part
+                        success = self._credit_station_owner_for_qr_payment(qr_session, transaction)
 
-                            # Auto-start charging if configured
-                            self._auto_start_charging_if_enabled(qr_session)
-                        except Exception as e:
-                            logger.error(f"Error sending notifications: {e}")
+                        if success:
+                            # Notifications and auto-start run once, after this call's completion is committed
+                            db_transaction.on_commit(
+                                lambda: self._after_qr_payment_completed(qr_session, transaction)
+                            )
+                        else:
+                            logger.error(f"Failed to credit station owner for QR session {qr_session.session_token}")
                     else:
-                        logger.error(f"Failed to credit station owner for QR session {qr_session.session_token}")
+                        # For non-QR payments (direct wallet deposits), credit user's wallet
+                        self.credit_wallet(transaction.user, transaction.amount, transaction)
+                        logger.info(f"Credited user wallet: {transaction.user.email} with {transaction.amount}")
+
+                        # Send payment received notification
+                        db_transaction.on_commit(lambda: self._send_payment_notification(
+                            transaction.user, transaction.amount, 'wallet_credit'
+                        ))
                 else:
-                    # For non-QR payments (direct wallet deposits), credit user's wallet
-                    self.credit_wallet(transaction.user, transaction.amount, transaction)
-                    logger.info(f"Credited user wallet: {transaction.user.email} with {transaction.amount}")
-
-                    # Send payment received notification
-                    self._send_payment_notification(transaction.user, transaction.amount, 'wallet_credit')
-            else:
-                transaction.status = Transaction.TransactionStatus.FAILED
+                    transaction.status = Transaction.TransactionStatus.FAILED
 
-                if qr_session:
-                    qr_session.status = 'failed'
-                    qr_session.save()
+                    if qr_session:
+                        qr_session.status = 'failed'
+                        qr_session.save()
 
-            transaction.callback_data = callback_data
-            transaction.save()
+                transaction.callback_data = callback_data
+                transaction.save()
 
             return {'success': True, 'message': 'Callback processed successfully'}
 
@@ -262,10 +255,24 @@ class PaymentService:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return {'success': False, 'message': str(e)}
 
+    def _after_qr_payment_completed(self, qr_session, transaction):
+        try:
+            # Send charging payment notification
+            self._send_payment_notification(transaction.user, transaction.amount, 'charging_payment', qr_session)
+
+            # Send notification to station owner
+            self._send_station_owner_payment_notification(qr_session, transaction)
+
+            # Auto-start charging if configured
+            self._auto_start_charging_if_enabled(qr_session)
+        except Exception as e:
+            logger.error(f"Error sending notifications: {e}")
+
     def _auto_start_charging_if_enabled(self, qr_session):
         """Auto-start charging after successful payment"""
         try:
             from .models import SimpleChargingSession
+            from charging_stations.tariffs import price_at
             import uuid
 
             # Auto-start charging session
@@ -280,7 +287,7 @@ class PaymentService:
                     status='started',
                     estimated_duration_minutes=60,  # Default 1 hour
                     energy_delivered_kwh=0.0,
-                    cost_per_kwh=qr_session.connector.price_per_kwh or 5.50,  # Default price if None
+                    cost_per_kwh=price_at(qr_session.connector_id),
                     max_power_kw=qr_session.connector.power_kw or 50.0,  # Default power if None
                     id_tag='mobile_app'
                 )
@@ -288,6 +295,7 @@ class PaymentService:
                 # Update QR session status and link to charging session
                 qr_session.status = 'charging_started'
                 qr_session.simple_charging_session = charging_session
+                qr_session.expires_at = charging_deadline()
                 qr_session.save()
 
                 # Make connector unavailable
@@ -324,32 +332,19 @@ class PaymentService:
             station_owner = qr_session.connector.station.owner
             logger.info(f"Station owner identified: {station_owner.user.email}")
             logger.info(f"Station: {qr_session.connector.station.name}")
-            logger.info(f"Connector: {qr_session.connector.name}")
+            logger.info(f"Connector: {qr_session.connector}")
             logger.info(f"Payment amount: {transaction.amount} ETB")
 
-            # Check if wallet already credited for this transaction
-            existing_credit = WalletTransaction.objects.filter(
-                wallet__user=station_owner.user,
-                transaction=transaction,
-                transaction_type=WalletTransaction.TransactionType.CREDIT
-            ).first()
-
-            if existing_credit:
-                logger.info(f"Station owner wallet already credited for transaction {transaction.reference_number}")
-                logger.info(f"Existing credit amount: {existing_credit.amount} ETB")
-                return True
-
-            # Credit the wallet
+            # The ledger skips the credit if this transaction was already posted to the wallet
             logger.info(f"Crediting station owner wallet: {station_owner.user.email} with {transaction.amount} ETB")
-            wallet = self.credit_wallet(station_owner.user, transaction.amount, transaction)
+            wallet, entry, created = wallet_ledger.credit(station_owner.user, transaction.amount, transaction)
 
-            if wallet:
+            if created:
                 logger.info(f"Successfully credited station owner wallet")
                 logger.info(f"New wallet balance: {wallet.balance} ETB")
-                return True
             else:
-                logger.error(f"Failed to credit station owner wallet")
-                return False
+                logger.info(f"Station owner wallet already credited for transaction {transaction.reference_number}")
+            return True
 
         except Exception as e:
             logger.error(f"Error crediting station owner wallet for QR session {qr_session.session_token}: {e}")
@@ -360,43 +355,11 @@ class PaymentService:
     def credit_wallet(self, user, amount, transaction):
         try:
             logger.info(f"Attempting to credit wallet for user: {user.email} with amount: {amount}")
-            
-            # Get or create wallet
-            wallet, created = Wallet.objects.get_or_create(
-                user=user,
-                defaults={
-                    'balance': 0,
-                    'currency': 'ETB',
-                    'is_active': True
-                }
-            )
-            
-            if created:
-                logger.info(f"Created new wallet for user: {user.email}")
-
-            # Get current balance
-            balance_before = wallet.balance
-            logger.info(f"Current wallet balance for {user.email}: {balance_before}")
-
-            # Update balance
-            wallet.balance += amount
-            wallet.save()
-            logger.info(f"Updated wallet balance for {user.email}: {wallet.balance}")
-
-            # Create wallet transaction record
-            wallet_transaction = WalletTransaction.objects.create(
-                wallet=wallet,
-                transaction=transaction,
-                transaction_type=WalletTransaction.TransactionType.CREDIT,
-                amount=amount,
-                balance_before=balance_before,
-                balance_after=wallet.balance,
-                description=f"Credit from payment {transaction.reference_number}"
-            )
-            logger.info(f"Created wallet transaction: {wallet_transaction.id}")
-
+            wallet, entry, created = wallet_ledger.credit(user, amount, transaction)
+            if not created:
+                logger.info(f"Wallet already credited for transaction {transaction.reference_number}")
             return wallet
-            
+
         except Exception as e:
             logger.error(f"Error crediting wallet for user {user.email}: {e}")
             import traceback
@@ -404,24 +367,12 @@ class PaymentService:
             raise
 
     def debit_wallet(self, user, amount, transaction):
-        wallet = Wallet.objects.filter(user=user).first()
-        if not wallet or wallet.balance < amount:
+        if not Wallet.objects.filter(user=user).exists():
+            return None
+        try:
+            wallet, entry, created = wallet_ledger.debit(user, amount, transaction)
+        except wallet_ledger.InsufficientBalance:
             return None
-
-        balance_before = wallet.balance
-        wallet.balance -= amount
-        wallet.save()
-
-        WalletTransaction.objects.create(
-            wallet=wallet,
-            transaction=transaction,
-            transaction_type=WalletTransaction.TransactionType.DEBIT,
-            amount=amount,
-            balance_before=balance_before,
-            balance_after=wallet.balance,
-            description=f"Debit for transaction {transaction.reference_number}"
-        )
-
         return wallet
 
     def _send_payment_notification(self, user, amount, payment_type, qr_session=None):
@@ -482,48 +433,9 @@ class PaymentService:
         """
         logger.info("Processing pending station owner credits...")
 
-        from .models import QRPaymentSession
-
-        # Find completed QR payments that should have credited station owners
-        qr_sessions = QRPaymentSession.objects.filter(
-            status='payment_completed',
-            payment_transaction__status='completed'
-        ).select_related(
-            'payment_transaction',
-            'connector__station__owner__user'
-        )
-
-        processed_count = 0
-        error_count = 0
-
-        for qr_session in qr_sessions:
-            try:
-                if (qr_session.connector and
-                    qr_session.connector.station and
-                    qr_session.connector.station.owner and
-                    qr_session.payment_transaction):
-
-                    station_owner = qr_session.connector.station.owner
-                    transaction = qr_session.payment_transaction
-
-                    # Check if already credited
-                    existing_credit = WalletTransaction.objects.filter(
-                        wallet__user=station_owner.user,
-                        transaction=transaction,
-                        transaction_type=WalletTransaction.TransactionType.CREDIT
-                    ).first()
-
-                    if not existing_credit:
-                        logger.info(f"Processing missed credit for QR session {qr_session.session_token}")
-                        success = self._credit_station_owner_for_qr_payment(qr_session, transaction)
-                        if success:
-                            processed_count += 1
-                        else:
-                            error_count += 1
+        from .reconciliation import reconcile_owner_credits
 
-            except Exception as e:
-                logger.error(f"Error processing QR session {qr_session.session_token}: {e}")
-                error_count += 1
+        report = reconcile_owner_credits()
 
-        logger.info(f"Processed {processed_count} pending credits, {error_count} errors")
-        return {'processed': processed_count, 'errors': error_count}
+        logger.info(f"Processed {report['credited']} pending credits, {report['errors']} errors")
+        return {'processed': report['credited'], 'errors': report['errors']}
@@ -0,0 +1,166 @@
+"""
+QR payment session expiry.
+
+Sessions waiting for payment expire at ``expires_at`` (15 minutes after they
+were created). When charging starts, ``expires_at`` is moved to
+``charging_deadline()`` so an abandoned charge is also reclaimed. The sweeper
+finds live sessions past their expiry through the partial
+``qr_session_live_expiry`` index. It expires them in batches with bulk UPDATEs
+and gives their connector slots back, so availability stays accurate without
+checks on every request.
+
+Counts from the last run and running totals are kept in the cache for the
+admin statistics page.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, F, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import QRPaymentSession, SimpleChargingSession
+
+logger = logging.getLogger(__name__)
+
+SessionStatus = QRPaymentSession.SessionStatus
+
+PAYMENT_WINDOW_STATUSES = (SessionStatus.PENDING, SessionStatus.PAYMENT_INITIATED)
+LIVE_STATUSES = PAYMENT_WINDOW_STATUSES + (SessionStatus.CHARGING_STARTED,)
+
+EXPIRY_STATS_CACHE_KEY = 'payments:session_expiry_stats'
+
+
+def _config():
+    return settings.QR_SESSION_EXPIRY
+
+
+def charging_deadline(now=None):
+    """``expires_at`` for a session that has just started charging."""
+    return (now or timezone.now()) + timedelta(seconds=_config()['CHARGING_MAX_SECONDS'])
+
+
+def expired_sessions(now=None):
+    return QRPaymentSession.objects.filter(status__in=LIVE_STATUSES, expires_at__lt=now or timezone.now())
+
+
+def _release_connectors(charging_rows):
+    """
+    Give one slot back per reclaimed session, without going above the
+    connector's quantity. Only a connector whose status is ``available`` is
+    advertised again, the same rule as ``connector_state``.
+    """
+    from charging_stations.models import ChargingConnector
+
+    slots = Counter(connector_id for _, _, connector_id, _ in charging_rows)
+    by_count = defaultdict(list)
+    for connector_id, count in slots.items():
+        by_count[count].append(connector_id)
+
+    released = 0
+    for count, connector_ids in by_count.items():
+        released += ChargingConnector.objects.filter(pk__in=connector_ids).update(
+            # With a slot given back available_quantity is > 0 whenever quantity is
+            is_available=Case(
+                When(status='available', quantity__gt=0, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+            available_quantity=Least(F('available_quantity') + Value(count), F('quantity')),
+            updated_at=timezone.now()
+        )
+    return released
+
+
+def _mark_owner_reports_stale(connector_ids):
+    from charging_stations.analytics import mark_owner_reports_stale
+    from charging_stations.models import ChargingConnector
+
+    owner_ids = ChargingConnector.objects.filter(pk__in=connector_ids).values_list(
+        'station__owner__user', flat=True
+    ).distinct()
+    for owner_id in owner_ids:
+        if owner_id:
+            mark_owner_reports_stale(owner_id)
+
+
+def expire_sessions(now=None, batch_size=None, dry_run=False):
+    """
+    Expire every live session past its ``expires_at``.
+
+    Returns counts of ``expired_payments`` (sessions that never got paid),
+    ``expired_charging`` (abandoned charges) and ``connectors_released``.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or _config()['BATCH_SIZE']
+    stats = {'expired_payments': 0, 'expired_charging': 0, 'connectors_released': 0}
+
+    if dry_run:
+        counts = expired_sessions(now).aggregate(
+            expired_payments=Count('id', filter=Q(status__in=PAYMENT_WINDOW_STATUSES)),
+            expired_charging=Count('id', filter=Q(status=SessionStatus.CHARGING_STARTED)),
+            connectors_released=Count(
+                'connector', filter=Q(status=SessionStatus.CHARGING_STARTED), distinct=True
+            )
+        )
+        return {**stats, **counts}
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                expired_sessions(now).select_for_update(skip_locked=True)
+                .order_by('expires_at')
+                .values_list('id', 'status', 'connector_id', 'simple_charging_session_id')[:batch_size]
+            )
+            if not rows:
+                break
+
+            payment_ids = [row[0] for row in rows if row[1] in PAYMENT_WINDOW_STATUSES]
+            charging_rows = [row for row in rows if row[1] == SessionStatus.CHARGING_STARTED]
+            charging_ids = [row[0] for row in charging_rows]
+
+            if payment_ids:
+                stats['expired_payments'] += QRPaymentSession.objects.filter(pk__in=payment_ids).update(
+                    status=SessionStatus.EXPIRED, updated_at=now
+                )
+            if charging_ids:
+                stats['expired_charging'] += QRPaymentSession.objects.filter(pk__in=charging_ids).update(
+                    status=SessionStatus.EXPIRED, updated_at=now
+                )
+                SimpleChargingSession.objects.filter(
+                    pk__in=[row[3] for row in charging_rows if row[3]],
+                    status__in=[SimpleChargingSession.SessionStatus.STARTED, SimpleChargingSession.SessionStatus.CHARGING]
+                ).update(status=SimpleChargingSession.SessionStatus.STOPPED, stop_time=now)
+                stats['connectors_released'] += _release_connectors(charging_rows)
+
+        # Bulk updates skip the post_save signals that normally invalidate owner reports
+        _mark_owner_reports_stale({row[2] for row in rows})
+        if len(rows) < batch_size:
+            break
+
+    _record_stats(stats, now)
+    if stats['expired_payments'] or stats['expired_charging']:
+        logger.info(f"Expired QR sessions: {stats}")
+    return stats
+
+
+def _record_stats(stats, now):
+    totals = cache.get(EXPIRY_STATS_CACHE_KEY) or {}
+    cache.set(EXPIRY_STATS_CACHE_KEY, {
+        'last_run': now,
+        'last': stats,
+        'totals': {key: totals.get('totals', {}).get(key, 0) + value for key, value in stats.items()},
+    }, None)
+
+
+def expiry_stats():
+    """Counts from the last sweep and totals since the cache was last cleared, or None."""
+    return cache.get(EXPIRY_STATS_CACHE_KEY)
+
+
+def register_jobs(job_scheduler):
+    job_scheduler.add_job('qr-session-expiry', expire_sessions, _config()['INTERVAL_SECONDS'])
@@ -0,0 +1,102 @@
+from django.conf import settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+
+class PaymentCallbackQueueTests(APITestCase):
+    """Test cases for queue-backed Chapa callback processing"""
+
+    def setUp(self):
+        self.queue_settings = self.settings(CALLBACK_QUEUE={**settings.CALLBACK_QUEUE, 'WORKERS': 0})
+        self.queue_settings.enable()
+
+    def tearDown(self):
+        self.queue_settings.disable()
+
+    def test_duplicate_callbacks_are_recorded_once(self):
+        from ..models import PaymentCallbackEvent
+
+        payload = {'tx_ref': 'EVMERI-UNKNOWN1', 'status': 'success'}
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            first = self.client.post('/api/payments/callback/', payload, format='json')
+            second = self.client.post('/api/payments/callback/', payload, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(callbacks), 1)
+        event = PaymentCallbackEvent.objects.get(tx_ref='EVMERI-UNKNOWN1')
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.processing_status, PaymentCallbackEvent.ProcessingStatus.FAILED)
+        self.assertEqual(event.last_error, 'Session not found')
+
+    def test_completed_payment_side_effects_run_once(self):
+        from decimal import Decimal
+        from unittest.mock import patch
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from charging_stations.models import ChargingConnector, ChargingStation, StationOwner
+        from ..models import QRPaymentSession, Transaction, Wallet
+        from ..services import PaymentService
+
+        User = get_user_model()
+        owner = User.objects.create_user(email='callback-owner@example.com', password='testpass123')
+        driver = User.objects.create_user(email='callback-driver@example.com', password='testpass123')
+        connector = ChargingConnector.objects.create(
+            station=ChargingStation.objects.create(
+                owner=StationOwner.objects.create(user=owner, company_name='Callback Co'),
+                name='Callback Station', address='1 Callback Road', city='Addis Ababa',
+                state='Addis Ababa', zip_code='1000'
+            ),
+            connector_type='type2', power_kw=Decimal('22.00'), price_per_kwh=Decimal('10.00')
+        )
+        payment = Transaction.objects.create(
+            user=driver, transaction_type=Transaction.TransactionType.PAYMENT, amount=Decimal('100.00'),
+            reference_number='EVMERI-PAID', external_reference='EVMERI-PAID'
+        )
+        QRPaymentSession.objects.create(
+            user=driver, connector=connector, payment_type='amount', amount=Decimal('100.00'),
+            phone_number='+251912345678', payment_transaction=payment, expires_at=timezone.now()
+        )
+
+        with patch.object(PaymentService, '_after_qr_payment_completed') as after_completed, \
+                self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                result = PaymentService().process_callback({'tx_ref': 'EVMERI-PAID', 'status': 'success'})
+                self.assertTrue(result['success'])
+
+        after_completed.assert_called_once()
+        self.assertEqual(Wallet.objects.get(user=owner).balance, Decimal('100.00'))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Transaction.TransactionStatus.COMPLETED)
+
+    def test_callback_without_tx_ref_is_rejected(self):
+        from ..models import PaymentCallbackEvent
+
+        response = self.client.post('/api/payments/callback/', {'status': 'success'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PaymentCallbackEvent.objects.exists())
+
+    def test_drain_stops_after_max_attempts(self):
+        from ..callback_queue import drain_callback_events, record_callback
+        from ..models import PaymentCallbackEvent
+
+        record_callback({'tx_ref': 'EVMERI-UNKNOWN2', 'status': 'failed'})
+        max_attempts = settings.CALLBACK_QUEUE['MAX_ATTEMPTS']
+        for _ in range(max_attempts + 2):
+            drain_callback_events()
+
+        event = PaymentCallbackEvent.objects.get(tx_ref='EVMERI-UNKNOWN2')
+        self.assertEqual(event.attempts, max_attempts)
+
+    def test_worker_pool_keeps_per_key_order(self):
+        from utils.worker_pool import KeyedWorkerPool
+
+        seen = []
+        pool = KeyedWorkerPool('test-pool', seen.append, workers=3)
+        try:
+            for index in range(20):
+                pool.submit('EVMERI-SAME', index)
+            pool.join()
+        finally:
+            pool.stop()
+        self.assertEqual(seen, list(range(20)))
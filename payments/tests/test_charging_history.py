@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class ChargingHistoryTests(APITestCase):
+    """Test cases for the keyset-paginated charging history"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from charging_stations.models import StationOwner, ChargingStation, ChargingConnector
+        from ..models import QRPaymentSession
+
+        owner_user = User.objects.create_user(email='history-owner@example.com', password='testpass123')
+        self.driver = User.objects.create_user(email='history-driver@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner_user, company_name='History Co'),
+            name='History Station',
+            address='5 History Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+
+        # Seven paid sessions, one of them paid by kWh, plus one that never got paid
+        for i in range(8):
+            session = QRPaymentSession.objects.create(
+                user=self.driver,
+                connector=connector,
+                payment_type='kwh' if i == 0 else 'amount',
+                amount=None if i == 0 else Decimal('10.00'),
+                kwh_requested=Decimal('3.000') if i == 0 else None,
+                phone_number='+251912345678',
+                status='charging_completed' if i < 7 else 'expired',
+                expires_at=timezone.now()
+            )
+            QRPaymentSession.objects.filter(pk=session.pk).update(created_at=timezone.now() - timedelta(minutes=i))
+        self.client.force_authenticate(user=self.driver)
+
+    def test_history_pages_with_summary(self):
+        first = self.client.get('/api/payments/charging-history/', {'limit': 5})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data['charging_history']), 5)
+        self.assertTrue(first.data['has_more'])
+        self.assertEqual(first.data['summary']['total_sessions'], 7)
+        self.assertEqual(first.data['summary']['total_amount_spent'], 90.0)
+
+        second = self.client.get('/api/payments/charging-history/', {'limit': 5, 'cursor': first.data['next_cursor']})
+        self.assertEqual(len(second.data['charging_history']), 2)
+        self.assertFalse(second.data['has_more'])
+
+        tokens = [row['session_token'] for row in first.data['charging_history'] + second.data['charging_history']]
+        self.assertEqual(len(set(tokens)), 7)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/payments/charging-history/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mobile_history_pages(self):
+        first = self.client.get('/api/mobile/charging-history/', {'limit': 4})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['count'], 4)
+        self.assertEqual(first.data['results'][0]['station_name'], 'History Station')
+        self.assertEqual(first.data['results'][0]['status'], 'CHARGING_COMPLETED')
+
+        second = self.client.get('/api/mobile/charging-history/', {'cursor': first.data['next_cursor']})
+        self.assertEqual(second.data['count'], 3)
+        self.assertFalse(second.data['has_more'])
@@ -0,0 +1,71 @@
+from django.test import TestCase
+from django.conf import settings
+
+
+class PooledHTTPClientTests(TestCase):
+    """Test cases for the shared outbound HTTP client"""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        test = self
+        self.connections = set()
+        self.responses = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                test.connections.add(self.client_address)
+                code = test.responses.pop(0) if test.responses else 200
+                body = b'{"status": "success"}'
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        from utils.http_client import close_sessions
+        close_sessions()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_reuse_pooled_connection(self):
+        from utils import http_client
+        from utils.metrics import histogram
+
+        for tx_ref in ('EVMERI-AAAA1111', 'EVMERI-BBBB2222', 'EVMERI-CCCC3333'):
+            response = http_client.request('GET', f'{self.base_url}/v1/transaction/verify/{tx_ref}', service='test-pool')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(histogram('test-pool GET /v1/transaction/verify/:id').snapshot()['count'], 3)
+
+    def test_retries_only_idempotent_requests(self):
+        from utils import http_client
+
+        with self.settings(OUTBOUND_HTTP={**settings.OUTBOUND_HTTP, 'BACKOFF_BASE_SECONDS': 0}):
+            self.responses = [503, 200]
+            self.assertEqual(http_client.request('GET', f'{self.base_url}/status', service='test-retry').status_code, 200)
+
+            self.responses = [503, 200]
+            self.assertEqual(http_client.request('POST', f'{self.base_url}/initialize', service='test-retry').status_code, 503)
+
+    def test_chapa_status_query_uses_client(self):
+        from ..services import ChapaService
+
+        with self.settings(CHAPA_SETTINGS={**settings.CHAPA_SETTINGS, 'SANDBOX_URL': self.base_url, 'USE_SANDBOX': True}):
+            result = ChapaService().query_transaction_status('EVMERI-DDDD4444')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['data']['status'], 'success')
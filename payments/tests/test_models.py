@@ -3,8 +3,8 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from .models import PaymentMethod, Transaction, Wallet, PaymentSession
-from .services import PaymentService
+from ..models import PaymentMethod, Transaction, Wallet, PaymentSession
+from ..services import PaymentService
 from decimal import Decimal
 
 User = get_user_model()
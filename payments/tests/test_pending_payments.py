@@ -0,0 +1,104 @@
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from ..models import Transaction
+from decimal import Decimal
+import json
+
+User = get_user_model()
+
+
+class PendingPaymentSweepTests(TestCase):
+    """Test cases for the pending payment verification sweep"""
+
+    def setUp(self):
+        import threading
+        from datetime import timedelta
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from django.utils import timezone
+
+        statuses = {'SWEEP-PAID': 'success', 'SWEEP-FAILED': 'failed', 'SWEEP-WAITING': 'pending'}
+        self.requested = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                tx_ref = self.path.rsplit('/', 1)[-1]
+                test.requested.append(tx_ref)
+                if tx_ref in statuses:
+                    code, body = 200, {'status': 'success', 'data': {'tx_ref': tx_ref, 'status': statuses[tx_ref]}}
+                else:
+                    code, body = 404, {'status': 'failed', 'message': 'Invalid transaction'}
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.chapa_settings = self.settings(CHAPA_SETTINGS={
+            **settings.CHAPA_SETTINGS,
+            'SANDBOX_URL': f'http://127.0.0.1:{self.server.server_address[1]}',
+            'USE_SANDBOX': True
+        })
+        self.chapa_settings.enable()
+
+        user = User.objects.create_user(email='sweep@example.com', password='testpass123')
+        for tx_ref in ('SWEEP-PAID', 'SWEEP-FAILED', 'SWEEP-WAITING', 'SWEEP-UNKNOWN', 'SWEEP-RECENT'):
+            Transaction.objects.create(
+                user=user,
+                transaction_type=Transaction.TransactionType.PAYMENT,
+                amount=Decimal('50.00'),
+                reference_number=tx_ref,
+                external_reference=tx_ref
+            )
+        Transaction.objects.exclude(reference_number='SWEEP-RECENT').update(
+            created_at=timezone.now() - timedelta(minutes=30)
+        )
+
+    def tearDown(self):
+        from utils.http_client import close_sessions
+        self.chapa_settings.disable()
+        close_sessions()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_settled_payments_are_fed_to_callback_queue(self):
+        from ..models import PaymentCallbackEvent
+        from ..verification_sweep import sweep_pending_transactions
+
+        stats = sweep_pending_transactions(workers=3, rate=100, dispatch=False)
+        self.assertEqual(stats, {'checked': 4, 'success': 1, 'failed': 1, 'pending': 1, 'errors': 1})
+        self.assertNotIn('SWEEP-RECENT', self.requested)
+        self.assertEqual(
+            set(PaymentCallbackEvent.objects.values_list('tx_ref', 'status')),
+            {('SWEEP-PAID', 'success'), ('SWEEP-FAILED', 'failed')}
+        )
+
+        # Sweeping again does not record the same result twice
+        sweep_pending_transactions(workers=3, rate=100, dispatch=False)
+        self.assertEqual(PaymentCallbackEvent.objects.count(), 2)
+
+    def test_dry_run_records_nothing(self):
+        from ..models import PaymentCallbackEvent
+        from ..verification_sweep import sweep_pending_transactions
+
+        stats = sweep_pending_transactions(limit=2, workers=2, rate=100, dry_run=True)
+        self.assertEqual(stats['checked'], 2)
+        self.assertFalse(PaymentCallbackEvent.objects.exists())
+
+    def test_rate_limiter_spaces_requests(self):
+        from utils.rate_limit import RateLimiter
+
+        now = [0.0]
+        limiter = RateLimiter(2, burst=1, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+        for _ in range(5):
+            limiter.acquire()
+        self.assertAlmostEqual(now[0], 2.0)
@@ -0,0 +1,106 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class QRSessionExpiryTests(TestCase):
+    """Test cases for the QR payment session expiry sweeper"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+        from charging_stations.models import StationOwner, ChargingStation, ChargingConnector
+        from ..models import QRPaymentSession, SimpleChargingSession
+        from ..session_expiry import EXPIRY_STATS_CACHE_KEY
+
+        cache.delete(EXPIRY_STATS_CACHE_KEY)
+
+        owner_user = User.objects.create_user(email='expiry-owner@example.com', password='testpass123')
+        customer = User.objects.create_user(email='expiry-driver@example.com', password='testpass123')
+        station = ChargingStation.objects.create(
+            owner=StationOwner.objects.create(user=owner_user, company_name='Expiry Co'),
+            name='Expiry Station',
+            address='4 Expiry Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        self.connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            quantity=2,
+            price_per_kwh=Decimal('10.00')
+        )
+        ChargingConnector.objects.filter(pk=self.connector.pk).update(available_quantity=0, is_available=False)
+
+        now = timezone.now()
+        past, future = now - timedelta(minutes=1), now + timedelta(minutes=10)
+        self.sessions = {}
+        for name, session_status, expires_at in [
+            ('unpaid', 'payment_initiated', past),
+            ('waiting', 'pending', future),
+            ('abandoned', 'charging_started', past),
+            ('charging', 'charging_started', future),
+            ('paid', 'payment_completed', past),
+        ]:
+            self.sessions[name] = QRPaymentSession.objects.create(
+                user=customer,
+                connector=self.connector,
+                payment_type='amount',
+                amount=Decimal('50.00'),
+                phone_number='+251912345678',
+                status=session_status,
+                expires_at=expires_at
+            )
+        self.simple_session = SimpleChargingSession.objects.create(
+            transaction_id='expiry-charge',
+            user=customer,
+            connector=self.connector,
+            qr_session=self.sessions['abandoned']
+        )
+        QRPaymentSession.objects.filter(pk=self.sessions['abandoned'].pk).update(simple_charging_session=self.simple_session)
+
+    def _status(self, name):
+        self.sessions[name].refresh_from_db()
+        return self.sessions[name].status
+
+    def test_expired_sessions_are_reclaimed_in_batches(self):
+        from ..session_expiry import expire_sessions, expiry_stats
+
+        stats = expire_sessions(batch_size=1)
+        self.assertEqual(stats, {'expired_payments': 1, 'expired_charging': 1, 'connectors_released': 1})
+
+        self.assertEqual(self._status('unpaid'), 'expired')
+        self.assertEqual(self._status('abandoned'), 'expired')
+        self.assertEqual(self._status('waiting'), 'pending')
+        self.assertEqual(self._status('charging'), 'charging_started')
+        self.assertEqual(self._status('paid'), 'payment_completed')
+
+        self.connector.refresh_from_db()
+        self.assertTrue(self.connector.is_available)
+        self.assertEqual(self.connector.available_quantity, 1)
+        self.simple_session.refresh_from_db()
+        self.assertEqual(self.simple_session.status, 'stopped')
+        self.assertEqual(expiry_stats()['totals']['expired_charging'], 1)
+
+    def test_connector_under_maintenance_is_not_advertised(self):
+        from charging_stations.models import ChargingConnector
+        from ..session_expiry import expire_sessions
+
+        ChargingConnector.objects.filter(pk=self.connector.pk).update(status='maintenance')
+        expire_sessions()
+
+        self.connector.refresh_from_db()
+        self.assertEqual(self.connector.available_quantity, 1)
+        self.assertFalse(self.connector.is_available)
+
+    def test_dry_run_only_counts(self):
+        from ..session_expiry import expire_sessions
+
+        stats = expire_sessions(dry_run=True)
+        self.assertEqual(stats, {'expired_payments': 1, 'expired_charging': 1, 'connectors_released': 1})
+        self.assertEqual(self._status('unpaid'), 'payment_initiated')
@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.conf import settings
+from decimal import Decimal
+
+
+class StandInServerTests(TestCase):
+    """Test cases for the fake Chapa server and the load-test statistics"""
+
+    def setUp(self):
+        from utils.standin_servers import FakeChapaServer
+
+        self.chapa = FakeChapaServer().start()
+        self.addCleanup(self.chapa.stop)
+        self.override = self.settings(
+            CHAPA_SETTINGS={**settings.CHAPA_SETTINGS, 'SANDBOX_URL': self.chapa.url, 'USE_SANDBOX': True}
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_chapa_service_against_fake(self):
+        from ..services import ChapaService
+
+        chapa = ChapaService()
+        initialized = chapa.initiate_payment(
+            '+251912345678', Decimal('50.00'), 'TX-STANDIN-1', 'Stand-in test', 'driver@example.com', 'Test', 'Driver'
+        )
+        self.assertTrue(initialized['success'])
+        self.assertEqual(initialized['data']['data']['checkout_url'], f'{self.chapa.url}/checkout/TX-STANDIN-1')
+
+        verified = chapa.query_transaction_status('TX-STANDIN-1')
+        self.assertTrue(verified['success'])
+        self.assertEqual(verified['data']['data']['status'], 'success')
+        self.assertFalse(chapa.query_transaction_status('TX-UNKNOWN')['success'])
+
+    def test_failure_rate_returns_503(self):
+        import requests
+        from utils.standin_servers import FakeChapaServer
+
+        failing = FakeChapaServer(failure_rate=1.0).start()
+        self.addCleanup(failing.stop)
+        response = requests.get(f'{failing.url}/v1/transaction/verify/TX-1', timeout=5)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(failing.requests, 1)
+
+    def test_stage_percentiles(self):
+        from ..load_test import StageTimer
+
+        timer = StageTimer('initiate')
+        for ms in range(1, 101):
+            timer.add(ms / 1000)
+        timer.error()
+        summary = timer.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual((summary['p50_ms'], summary['p95_ms'], summary['p99_ms'], summary['max_ms']), (50.0, 95.0, 99.0, 100.0))
@@ -0,0 +1,263 @@
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import Transaction, Wallet
+from ..services import PaymentService
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+User = get_user_model()
+
+
+class WalletLedgerTests(TestCase):
+    """Test cases for the row-locked wallet ledger"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com',
+            password='testpass123'
+        )
+
+    def _transaction(self, reference, amount='100.00'):
+        return Transaction.objects.create(
+            user=self.user,
+            transaction_type=Transaction.TransactionType.PAYMENT,
+            status=Transaction.TransactionStatus.COMPLETED,
+            amount=Decimal(amount),
+            reference_number=reference
+        )
+
+    def test_credit_is_posted_once_per_transaction(self):
+        from .. import wallet_ledger
+        from ..models import WalletTransaction
+
+        payment = self._transaction('LEDGER-1')
+        wallet, entry, created = wallet_ledger.credit(self.user, payment.amount, payment)
+        self.assertTrue(created)
+        _, again, created = wallet_ledger.credit(self.user, payment.amount, payment)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, entry.pk)
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('100.00'))
+        self.assertEqual(WalletTransaction.objects.filter(transaction=payment).count(), 1)
+
+    def test_entries_record_running_balance(self):
+        from .. import wallet_ledger
+
+        wallet_ledger.credit(self.user, Decimal('40.00'), self._transaction('LEDGER-2'))
+        wallet, entry, _ = wallet_ledger.credit(self.user, Decimal('60.50'), self._transaction('LEDGER-3'))
+        self.assertEqual(entry.balance_before, Decimal('40.00'))
+        self.assertEqual(entry.balance_after, Decimal('100.50'))
+
+        wallet, entry, _ = wallet_ledger.debit(self.user, Decimal('30.50'), self._transaction('LEDGER-4'))
+        self.assertEqual(entry.balance_after, Decimal('70.00'))
+        self.assertEqual(wallet.balance, Decimal('70.00'))
+
+    def test_debit_never_overdraws(self):
+        from .. import wallet_ledger
+        from ..models import WalletTransaction
+
+        wallet_ledger.credit(self.user, Decimal('20.00'), self._transaction('LEDGER-5'))
+        withdrawal = self._transaction('LEDGER-6', amount='50.00')
+        with self.assertRaises(wallet_ledger.InsufficientBalance):
+            wallet_ledger.debit(self.user, withdrawal.amount, withdrawal)
+
+        self.assertIsNone(PaymentService().debit_wallet(self.user, withdrawal.amount, withdrawal))
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('20.00'))
+        self.assertFalse(WalletTransaction.objects.filter(transaction=withdrawal).exists())
+
+
+class OwnerCreditReconciliationTests(TestCase):
+    """Test cases for station owner credit reconciliation"""
+
+    def setUp(self):
+        from django.utils import timezone
+        from charging_stations.models import StationOwner, ChargingStation, ChargingConnector
+        from ..models import QRPaymentSession
+
+        self.owner_user = User.objects.create_user(email='recon-owner@example.com', password='testpass123')
+        customer = User.objects.create_user(email='recon-driver@example.com', password='testpass123')
+        self.owner = StationOwner.objects.create(user=self.owner_user, company_name='Recon Co')
+        station = ChargingStation.objects.create(
+            owner=self.owner,
+            name='Recon Station',
+            address='3 Recon Road',
+            city='Addis Ababa',
+            state='Addis Ababa',
+            zip_code='1000'
+        )
+        connector = ChargingConnector.objects.create(
+            station=station,
+            connector_type='type2',
+            power_kw=Decimal('22.00'),
+            price_per_kwh=Decimal('10.00')
+        )
+
+        self.transactions = []
+        for i in range(5):
+            transaction = Transaction.objects.create(
+                user=customer,
+                transaction_type=Transaction.TransactionType.PAYMENT,
+                status=Transaction.TransactionStatus.COMPLETED if i < 4 else Transaction.TransactionStatus.PENDING,
+                amount=Decimal('25.00'),
+                reference_number=f'RECON-{i}'
+            )
+            QRPaymentSession.objects.create(
+                user=customer,
+                connector=connector,
+                payment_type='amount',
+                amount=Decimal('25.00'),
+                phone_number='+251912345678',
+                status='charging_completed',
+                payment_transaction=transaction,
+                session_token=f'recon-session-{i}',
+                expires_at=timezone.now()
+            )
+            self.transactions.append(transaction)
+
+        # The first payment was already credited
+        PaymentService().credit_wallet(self.owner_user, Decimal('25.00'), self.transactions[0])
+
+    def test_dry_run_reports_without_posting(self):
+        from ..reconciliation import reconcile_owner_credits
+        from ..models import WalletTransaction
+
+        report = reconcile_owner_credits(dry_run=True)
+        self.assertEqual(report['missing'], 3)
+        self.assertEqual(report['amount'], Decimal('75.00'))
+        self.assertEqual(
+            sorted(report['owners']['recon-owner@example.com']['transactions']),
+            ['RECON-1', 'RECON-2', 'RECON-3']
+        )
+        self.assertEqual(report['credited'], 0)
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+
+    def test_missing_credits_are_posted_in_chunks(self):
+        from ..reconciliation import reconcile_owner_credits, missing_owner_credits
+
+        report = reconcile_owner_credits(chunk_size=2)
+        self.assertEqual(report['credited'], 3)
+        self.assertEqual(report['credited_amount'], Decimal('75.00'))
+        self.assertFalse(missing_owner_credits().exists())
+
+        wallet = Wallet.objects.get(user=self.owner_user)
+        self.assertEqual(wallet.balance, Decimal('100.00'))
+        balances = list(wallet.wallet_transactions.order_by('balance_after').values_list('balance_after', flat=True))
+        self.assertEqual(balances, [Decimal('25.00'), Decimal('50.00'), Decimal('75.00'), Decimal('100.00')])
+
+        # A second run finds nothing left to do
+        self.assertEqual(reconcile_owner_credits()['missing'], 0)
+
+    def test_wallet_status_uses_summary(self):
+        client = APIClient()
+        client.force_authenticate(user=self.owner_user)
+        response = client.get('/api/payments/check-wallet-status/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        wallet_status = response.data['wallet_status']
+        self.assertEqual(wallet_status['total_expected'], 100.0)
+        self.assertEqual(wallet_status['total_credited'], 25.0)
+        self.assertEqual(wallet_status['missing_credits_count'], 3)
+        self.assertTrue(wallet_status['needs_fix'])
+
+
+class DuplicateWalletEntryTests(TransactionTestCase):
+    """Test cases for reversing wallet entries posted twice before the unique constraint"""
+
+    def setUp(self):
+        from django.db import connection
+        from ..models import WalletTransaction
+
+        constraint = WalletTransaction._meta.constraints[0]
+        # SQLite rebuilds the table from the model's Meta
+        with patch.object(WalletTransaction._meta, 'constraints', []), connection.schema_editor() as editor:
+            editor.remove_constraint(WalletTransaction, constraint)
+
+        def restore_constraint():
+            WalletTransaction.objects.all().delete()
+            with connection.schema_editor() as editor:
+                editor.add_constraint(WalletTransaction, constraint)
+        self.addCleanup(restore_constraint)
+
+        self.user = User.objects.create_user(email='double@example.com', password='testpass123')
+        self.payment = Transaction.objects.create(
+            user=self.user,
+            transaction_type=Transaction.TransactionType.PAYMENT,
+            status=Transaction.TransactionStatus.COMPLETED,
+            amount=Decimal('100.00'),
+            reference_number='DOUBLE-1'
+        )
+
+    def post_twice(self):
+        from .. import wallet_ledger
+        from ..models import WalletTransaction
+
+        wallet, entry, _ = wallet_ledger.credit(self.user, self.payment.amount, self.payment)
+        WalletTransaction.objects.create(
+            wallet=wallet, transaction=self.payment, transaction_type='credit', amount=entry.amount,
+            balance_before=wallet.balance, balance_after=wallet.balance + entry.amount
+        )
+        Wallet.objects.filter(pk=wallet.pk).update(balance=wallet.balance + entry.amount)
+        return wallet
+
+    def test_duplicates_are_reversed_not_deleted(self):
+        import importlib
+        from django.apps import apps
+        from django.core.management import call_command
+        from ..models import WalletTransaction
+
+        wallet = self.post_twice()
+        migration = importlib.import_module('payments.migrations.0009_wallet_entry_unique')
+        with self.assertRaises(RuntimeError):
+            migration.check_no_duplicate_entries(apps, None)
+
+        call_command('reverse_duplicate_wallet_entries', '--dry-run', stdout=StringIO())
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('200.00'))
+
+        output = StringIO()
+        call_command('reverse_duplicate_wallet_entries', stdout=output)
+        self.assertIn('Reversed 1 duplicate entries', output.getvalue())
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('100.00'))
+
+        # The duplicate is kept, next to its reversal, on a correction transaction
+        self.assertEqual(WalletTransaction.objects.filter(transaction=self.payment).count(), 1)
+        correction = Transaction.objects.get(reference_number__startswith='DUPFIX-')
+        self.assertEqual(
+            sorted(correction.wallet_transactions.values_list('transaction_type', 'amount')),
+            [('credit', Decimal('100.00')), ('debit', Decimal('100.00'))]
+        )
+        self.assertEqual(WalletTransaction.objects.count(), 3)
+        migration.check_no_duplicate_entries(apps, None)
+
+    def test_uncovered_reversal_is_left_for_review(self):
+        from .. import wallet_ledger
+        from ..models import WalletTransaction
+
+        wallet = self.post_twice()
+        Wallet.objects.filter(pk=wallet.pk).update(balance=Decimal('50.00'))
+
+        report = wallet_ledger.reverse_duplicate_entries()
+        self.assertEqual((report['reversed'], len(report['failed'])), (0, 1))
+        self.assertEqual(WalletTransaction.objects.filter(transaction=self.payment).count(), 2)
+        self.assertFalse(Transaction.objects.filter(reference_number__startswith='DUPFIX-').exists())
+
+    def test_allow_negative_reverses_uncovered_duplicates(self):
+        import importlib
+        from django.apps import apps
+        from django.core.management import call_command
+
+        wallet = self.post_twice()
+        Wallet.objects.filter(pk=wallet.pk).update(balance=Decimal('50.00'))
+
+        output = StringIO()
+        call_command('reverse_duplicate_wallet_entries', '--allow-negative', stdout=output)
+        self.assertIn(f"Wallet {wallet.pk} is now at -50.00 ETB", output.getvalue())
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('-50.00'))
+
+        migration = importlib.import_module('payments.migrations.0009_wallet_entry_unique')
+        migration.check_no_duplicate_entries(apps, None)
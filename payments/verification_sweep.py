@@ -0,0 +1,129 @@
+"""
+Sweeper for payments whose Chapa callback never arrived.
+
+Pending transactions older than PAYMENT_VERIFICATION['MIN_AGE_SECONDS'] are
+read in keyset pages and verified against Chapa on a bounded thread pool. A
+shared token bucket keeps the total request rate under RATE_PER_SECOND.
+A verified success or failure is recorded as a PaymentCallbackEvent and then
+goes through the same idempotent path as a real callback (callback_queue).
+Transactions Chapa still reports as pending are left for the next sweep.
+Worker threads only make HTTP calls. All database work happens on the
+calling thread.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .callback_queue import dispatch_event, process_event, record_callback
+from .models import Transaction
+from .services import ChapaService
+from utils.keyset import seek_after
+from utils.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('success', 'failed')
+
+
+def _config():
+    return settings.PAYMENT_VERIFICATION
+
+
+def stale_pending_transactions(now=None):
+    """Pending Chapa transactions old enough that their callback is overdue."""
+    config = _config()
+    now = now or timezone.now()
+    return Transaction.objects.filter(
+        status=Transaction.TransactionStatus.PENDING,
+        external_reference__isnull=False,
+        created_at__lte=now - timedelta(seconds=config['MIN_AGE_SECONDS']),
+        created_at__gte=now - timedelta(seconds=config['MAX_AGE_SECONDS'])
+    ).order_by('created_at', 'id')
+
+
+def _pages(queryset, page_size, limit=None):
+    """Yield ``(id, created_at, external_reference)`` rows page by page in keyset order."""
+    last = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page = queryset if last is None else queryset.filter(seek_after(*last))
+        size = page_size if remaining is None else min(page_size, remaining)
+        rows = list(page.values_list('id', 'created_at', 'external_reference')[:size])
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1][1], rows[-1][0])
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+
+def verify_with_chapa(chapa, limiter, tx_ref):
+    """Ask Chapa for ``tx_ref``'s status. Returns ``(status, data)``; status is None if the lookup failed."""
+    limiter.acquire()
+    result = chapa.query_transaction_status(tx_ref)
+    if not result['success']:
+        return None, result
+    data = result['data'].get('data') or {}
+    return str(data.get('status', '')).lower() or None, data
+
+
+def sweep_pending_transactions(limit=None, workers=None, rate=None, dry_run=False, dispatch=True, now=None):
+    """
+    Verify stale pending transactions and feed resolved ones into the callback queue.
+
+    With ``dispatch`` the events go to the callback worker pool, otherwise they
+    are processed inline. With ``dry_run`` Chapa is queried but nothing is
+    recorded. Returns counts of ``checked``, ``success``, ``failed``,
+    ``pending`` and ``errors``.
+    """
+    config = _config()
+    workers = workers or config['WORKERS']
+    limiter = RateLimiter(rate or config['RATE_PER_SECOND'], burst=workers)
+    chapa = ChapaService()
+    stats = {'checked': 0, 'success': 0, 'failed': 0, 'pending': 0, 'errors': 0}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payment-verify') as executor:
+        for rows in _pages(stale_pending_transactions(now), config['PAGE_SIZE'], limit):
+            tx_refs = [tx_ref for _, _, tx_ref in rows]
+            results = executor.map(lambda tx_ref: verify_with_chapa(chapa, limiter, tx_ref), tx_refs)
+
+            for tx_ref, (chapa_status, data) in zip(tx_refs, results):
+                stats['checked'] += 1
+                if chapa_status is None:
+                    stats['errors'] += 1
+                    logger.warning(f"Could not verify {tx_ref}: {data.get('message')}")
+                    continue
+                if chapa_status not in TERMINAL_STATUSES:
+                    stats['pending'] += 1
+                    continue
+
+                stats[chapa_status] += 1
+                if dry_run:
+                    continue
+
+                event_id, created = record_callback({
+                    'tx_ref': tx_ref,
+                    'status': chapa_status,
+                    'source': 'verification',
+                    'verification': data,
+                })
+                if not created:
+                    continue
+                if dispatch:
+                    dispatch_event(event_id, tx_ref)
+                else:
+                    process_event(event_id)
+
+    logger.info(f"Payment verification sweep: {stats}")
+    return stats
+
+
+def register_jobs(job_scheduler):
+    interval = _config()['INTERVAL_SECONDS']
+    if interval > 0:
+        job_scheduler.add_job('payment-verification-sweep', sweep_pending_transactions, interval)
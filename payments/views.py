@@ -6,6 +6,7 @@ from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
 from django.utils import timezone
+from django.db import transaction as db_transaction
 from .models import Transaction, Wallet, WalletTransaction, QRPaymentSession, SimpleChargingSession
 from .serializers import (
     TransactionSerializer, WalletSerializer,
@@ -15,6 +16,11 @@ from .serializers import (
 )
 from charging_stations.models import ChargingConnector
 from .services import PaymentService
+from .callback_queue import record_callback, dispatch_event
+from .reconciliation import missing_owner_credits, owner_credit_summary
+from .session_expiry import charging_deadline
+from .history import detailed_history, history_page, history_summary, HISTORY_DEFAULT_PAGE_SIZE
+from utils.keyset import decode_cursor, InvalidCursor
 import logging
 import uuid
 
@@ -96,26 +102,30 @@ class InitiatePaymentView(APIView):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def payment_callback(request):
+    """
+    Store the Chapa callback and acknowledge it straight away.
+
+    Processing happens on the callback workers (payments.callback_queue);
+    a duplicate delivery costs one rejected insert.
+    """
     try:
         callback_data = request.data
-        logger.info(f"Payment callback received: {callback_data}")
+        tx_ref = callback_data.get('tx_ref')
+        logger.info(f"Payment callback received for tx_ref: {tx_ref}")
 
-        payment_service = PaymentService()
-        result = payment_service.process_callback(callback_data)
-
-        logger.info(f"Callback processing result: {result}")
+        if not tx_ref:
+            return Response({
+                'status': 'error',
+                'message': 'Missing tx_ref'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # If callback processing was successful, also process any pending credits
-        if result.get('success'):
-            try:
-                pending_result = payment_service.process_pending_station_owner_credits()
-                logger.info(f"Pending credits processed: {pending_result}")
-            except Exception as e:
-                logger.error(f"Error processing pending credits: {e}")
+        event_id, created = record_callback(callback_data)
+        if created:
+            db_transaction.on_commit(lambda: dispatch_event(event_id, tx_ref))
 
         return Response({
             'status': 'success',
-            'message': 'Callback processed successfully'
+            'message': 'Callback received' if created else 'Callback already received'
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -272,7 +282,7 @@ class QRPaymentInitiateView(APIView):
                     return Response({
                         'success': True,
                         'message': 'Payment initiated successfully',
-                        'checkout_url': result['data']['checkout_url'],
+                        'checkout_url': result['checkout_url'],
                         'session_token': qr_session.session_token,
                         'transaction_id': transaction.id,
                     }, status=status.HTTP_200_OK)
@@ -351,6 +361,7 @@ class StartChargingFromQRView(APIView):
 
             # Update QR session status
             qr_session.status = 'charging_started'
+            qr_session.expires_at = charging_deadline()
             qr_session.save()
 
             # Update connector status to occupied
@@ -463,14 +474,15 @@ class StopChargingFromQRView(APIView):
                     duration = timezone.now() - charging_session.start_time
                     charging_session.duration_seconds = int(duration.total_seconds())
 
-                # Set some demo energy values
-                charging_session.energy_delivered_kwh = 5.0  # Demo value
-                charging_session.energy_consumed_kwh = 5.0   # Demo value
                 charging_session.save()
 
-                # Credit station owner's wallet with additional revenue from energy consumed
-                if charging_session.energy_consumed_kwh and charging_session.cost_per_kwh:
-                    additional_revenue = float(charging_session.energy_consumed_kwh * charging_session.cost_per_kwh)
+                # Credit station owner's wallet with additional revenue from the energy the charger reported
+                energy_kwh = charging_session.energy_consumed_kwh or charging_session.energy_delivered_kwh
+                if energy_kwh:
+                    from charging_stations.tariffs import price_sessions
+                    additional_revenue = float(price_sessions({
+                        charging_session.pk: (qr_session.connector_id, [(charging_session.start_time, energy_kwh)])
+                    })[charging_session.pk])
 
                     # Only credit if there's additional revenue beyond the initial payment
                     initial_payment = float(qr_session.payment_transaction.amount) if qr_session.payment_transaction else 0
@@ -557,39 +569,31 @@ class TestCreateChargingSessionView(APIView):
 
 
 class ChargingHistoryView(generics.ListAPIView):
-    """Get user's charging history"""
+    """Get user's charging history, newest first, a page at a time"""
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # Return completed charging sessions for the user
-        return QRPaymentSession.objects.select_related(
-            'connector', 'connector__station', 'simple_charging_session'
-        ).filter(
-            user=self.request.user,
-            status__in=['charging_completed', 'charging_started', 'payment_completed']
-        ).order_by('-created_at')
+        return detailed_history(self.request.user)
 
     def list(self, request, *args, **kwargs):
         from .serializers import QRPaymentSessionWithChargingSerializer
 
-        queryset = self.get_queryset()
-        serializer = QRPaymentSessionWithChargingSerializer(queryset, many=True)
+        try:
+            after = decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+            limit = int(request.GET.get('limit', HISTORY_DEFAULT_PAGE_SIZE))
+        except (InvalidCursor, ValueError) as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Add summary statistics
-        total_sessions = queryset.count()
-        total_amount_spent = sum(
-            float(session.payment_amount) for session in queryset
-            if session.payment_amount
-        )
+        sessions, next_cursor = history_page(self.get_queryset(), after=after, limit=limit)
+        serializer = QRPaymentSessionWithChargingSerializer(sessions, many=True)
 
         return Response({
             'success': True,
             'charging_history': serializer.data,
-            'summary': {
-                'total_sessions': total_sessions,
-                'total_amount_spent': total_amount_spent,
-                'currency': 'ETB'
-            }
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'summary': history_summary(request.user)
         }, status=status.HTTP_200_OK)
 
 
@@ -782,48 +786,30 @@ def check_wallet_status(request):
         # Get wallet
         wallet, created = Wallet.objects.get_or_create(user=request.user)
 
-        # Get completed QR sessions
-        qr_sessions = QRPaymentSession.objects.filter(
-            connector__station__owner=station_owner,
-            payment_transaction__status='completed'
-        )
-
-        total_expected = 0
-        credited_amount = 0
-        missing_credits = []
-
-        for qr_session in qr_sessions:
-            if qr_session.payment_transaction:
-                amount = float(qr_session.payment_transaction.amount)
-                total_expected += amount
-
-                # Check if credited
-                existing_credit = WalletTransaction.objects.filter(
-                    wallet=wallet,
-                    transaction=qr_session.payment_transaction,
-                    transaction_type=WalletTransaction.TransactionType.CREDIT
-                ).first()
-
-                if existing_credit:
-                    credited_amount += float(existing_credit.amount)
-                else:
-                    missing_credits.append({
-                        'session_token': qr_session.session_token,
-                        'amount': amount,
-                        'transaction_ref': qr_session.payment_transaction.reference_number,
-                        'created_at': qr_session.created_at.isoformat()
-                    })
+        summary = owner_credit_summary(station_owner)
+        missing_credits = [
+            {
+                'session_token': row['session_token'],
+                'amount': float(row['payment_transaction__amount']),
+                'transaction_ref': row['payment_transaction__reference_number'],
+                'created_at': row['created_at'].isoformat()
+            }
+            for row in missing_owner_credits(station_owner).order_by('-created_at').values(
+                'session_token', 'payment_transaction__amount',
+                'payment_transaction__reference_number', 'created_at'
+            )[:5]
+        ]
 
         return Response({
             'success': True,
             'wallet_status': {
                 'current_balance': float(wallet.balance),
-                'total_expected': total_expected,
-                'total_credited': credited_amount,
-                'missing_amount': total_expected - credited_amount,
-                'missing_credits_count': len(missing_credits),
-                'missing_credits': missing_credits[:5],  # Show first 5
-                'needs_fix': len(missing_credits) > 0
+                'total_expected': float(summary['total_expected']),
+                'total_credited': float(summary['total_credited']),
+                'missing_amount': float(summary['missing_amount']),
+                'missing_credits_count': summary['missing_count'],
+                'missing_credits': missing_credits,  # Show first 5
+                'needs_fix': summary['missing_count'] > 0
             }
         }, status=status.HTTP_200_OK)
 
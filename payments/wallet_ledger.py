@@ -0,0 +1,297 @@
+"""
+Wallet ledger.
+
+Every balance change goes through ``post_entry``, which runs inside one
+database transaction:
+
+1. lock the wallet row (``select_for_update``),
+2. return the existing entry if this (wallet, transaction, type) was already
+   posted,
+3. move the balance with a single ``UPDATE ... SET balance = balance +/- x``
+   (debits only match when the balance covers the amount),
+4. insert the WalletTransaction with the before/after balances.
+
+Only the one wallet row is locked, so credits to different owners never wait
+on each other. The unique (wallet, transaction, transaction_type) constraint
+backs up step 2 on databases without row locks (SQLite), where a concurrent
+duplicate fails the insert and rolls its balance update back.
+
+``post_credits`` and ``post_debits`` are the bulk variants used by
+reconciliation and payout batches. ``reverse_duplicate_entries`` corrects
+entries posted twice before the constraint existed, with reversing entries.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Transaction, Wallet, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+EntryType = WalletTransaction.TransactionType
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def get_or_create_wallet(user):
+    wallet, created = Wallet.objects.get_or_create(
+        user=user,
+        defaults={
+            'balance': 0,
+            'currency': 'ETB',
+            'is_active': True
+        }
+    )
+    if created:
+        logger.info(f"Created new wallet for user: {user.email}")
+    return wallet
+
+
+def _existing_entry(wallet, payment_transaction, entry_type):
+    return WalletTransaction.objects.filter(
+        wallet=wallet,
+        transaction=payment_transaction,
+        transaction_type=entry_type
+    ).first()
+
+
+def post_entry(user, amount, payment_transaction, entry_type, description=None, allow_negative=False):
+    """
+    Apply one credit or debit to ``user``'s wallet.
+
+    Returns ``(wallet, entry, created)``. ``created`` is False when the entry
+    had already been posted, in which case the balance is left untouched.
+    Raises InsufficientBalance when a debit exceeds the balance, unless
+    ``allow_negative`` is set.
+    """
+    amount = Decimal(str(amount))
+    wallet_id = get_or_create_wallet(user).pk
+    delta = amount if entry_type == EntryType.CREDIT else -amount
+
+    try:
+        with db_transaction.atomic():
+            wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+            existing = _existing_entry(wallet, payment_transaction, entry_type)
+            if existing:
+                return wallet, existing, False
+
+            balance_update = Wallet.objects.filter(pk=wallet_id)
+            if entry_type == EntryType.DEBIT and not allow_negative:
+                balance_update = balance_update.filter(balance__gte=amount)
+            if not balance_update.update(balance=F('balance') + delta, updated_at=timezone.now()):
+                raise InsufficientBalance(f"Insufficient wallet balance for {amount} {wallet.currency}")
+
+            # Read back inside the transaction so before/after match the row we wrote
+            wallet.refresh_from_db(fields=['balance', 'updated_at'])
+            entry = WalletTransaction.objects.create(
+                wallet=wallet,
+                transaction=payment_transaction,
+                transaction_type=entry_type,
+                amount=amount,
+                balance_before=wallet.balance - delta,
+                balance_after=wallet.balance,
+                description=description
+            )
+    except IntegrityError:
+        # A concurrent post of the same entry won; ours was rolled back
+        wallet = Wallet.objects.get(pk=wallet_id)
+        existing = _existing_entry(wallet, payment_transaction, entry_type)
+        if existing is None:
+            raise
+        return wallet, existing, False
+
+    logger.info(f"Posted {entry_type} of {amount} to wallet {wallet_id}: balance {wallet.balance}")
+    return wallet, entry, True
+
+
+def credit(user, amount, payment_transaction, description=None):
+    description = description or f"Credit from payment {payment_transaction.reference_number}"
+    return post_entry(user, amount, payment_transaction, EntryType.CREDIT, description)
+
+
+def debit(user, amount, payment_transaction, description=None):
+    description = description or f"Debit for transaction {payment_transaction.reference_number}"
+    return post_entry(user, amount, payment_transaction, EntryType.DEBIT, description)
+
+
+def post_credits(credits):
+    """
+    Credit many wallets in one database transaction.
+
+    ``credits`` is an iterable of ``(user_id, transaction_id, amount,
+    description)``. Credits that were already posted are skipped.
+    Returns the created WalletTransaction objects.
+    """
+    entries, _ = _post_bulk(credits, EntryType.CREDIT)
+    return entries
+
+
+def post_debits(debits):
+    """
+    Debit many wallets in one database transaction, as ``post_credits``.
+
+    A debit that would take its wallet below zero is not posted. Returns
+    ``(entries, rejected)``, where ``rejected`` holds the refused
+    ``(user_id, transaction_id, amount, description)`` rows.
+    """
+    return _post_bulk(debits, EntryType.DEBIT)
+
+
+def _post_bulk(rows, entry_type):
+    """
+    The affected wallets are locked in primary-key order and entries already
+    posted are skipped. The new entries are inserted with one bulk insert, and
+    each wallet gets a single F() update for its net change.
+    """
+    rows = list(rows)
+    if not rows:
+        return [], []
+
+    user_ids = {user_id for user_id, _, _, _ in rows}
+    Wallet.objects.bulk_create(
+        [Wallet(user_id=user_id, balance=0, currency='ETB', is_active=True) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+    with db_transaction.atomic():
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk')
+        }
+        posted = set(WalletTransaction.objects.filter(
+            wallet__in=wallets.values(),
+            transaction_id__in=[transaction_id for _, transaction_id, _, _ in rows],
+            transaction_type=entry_type
+        ).values_list('wallet_id', 'transaction_id'))
+
+        entries = []
+        rejected = []
+        totals = defaultdict(Decimal)
+        for row in rows:
+            user_id, transaction_id, amount, description = row
+            wallet = wallets[user_id]
+            if (wallet.pk, transaction_id) in posted:
+                continue
+
+            amount = Decimal(str(amount))
+            delta = amount if entry_type == EntryType.CREDIT else -amount
+            if wallet.balance + delta < 0:
+                rejected.append(row)
+                continue
+            posted.add((wallet.pk, transaction_id))
+
+            balance_before = wallet.balance
+            wallet.balance += delta
+            totals[wallet.pk] += delta
+            entries.append(WalletTransaction(
+                wallet=wallet,
+                transaction_id=transaction_id,
+                transaction_type=entry_type,
+                amount=amount,
+                balance_before=balance_before,
+                balance_after=wallet.balance,
+                description=description
+            ))
+
+        WalletTransaction.objects.bulk_create(entries)
+        now = timezone.now()
+        for wallet_id, total in totals.items():
+            Wallet.objects.filter(pk=wallet_id).update(balance=F('balance') + total, updated_at=now)
+
+    logger.info(f"Posted {len(entries)} {entry_type}s to {len(totals)} wallets, {len(rejected)} rejected")
+    return entries, rejected
+
+
+def duplicate_entry_groups():
+    """(wallet, transaction, type) groups posted more than once, from before the unique constraint"""
+    return (
+        WalletTransaction.objects.values('wallet_id', 'transaction_id', 'transaction_type')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=1)
+    )
+
+
+def reverse_duplicate_entries(dry_run=False, allow_negative=False):
+    """
+    Undo double credits and debits without deleting ledger history.
+
+    The earliest entry of each duplicated (wallet, transaction, type) stays.
+    Each later entry is moved to a new COMPLETED correction Transaction
+    (``DUPFIX-<entry id>``), which then gets the reversing entry through
+    ``post_entry``. Both entries stay in the wallet's history. Every
+    correction is logged. A duplicate credit whose reversal the balance no
+    longer covers is left in place and reported in ``failed``; with
+    ``allow_negative`` it is reversed anyway and the wallet's resulting
+    balance is reported in ``negative_balances``.
+
+    Returns ``{'duplicates', 'reversed', 'failed': [...], 'corrections': [...],
+    'negative_balances': {wallet id: balance}}``.
+    """
+    report = {'duplicates': 0, 'reversed': 0, 'failed': [], 'corrections': [], 'negative_balances': {}}
+    for group in duplicate_entry_groups():
+        entries = list(WalletTransaction.objects.filter(
+            wallet_id=group['wallet_id'],
+            transaction_id=group['transaction_id'],
+            transaction_type=group['transaction_type'],
+        ).select_related('wallet__user', 'transaction').order_by('created_at', 'pk'))
+
+        for entry in entries[1:]:
+            report['duplicates'] += 1
+            original = entry.transaction
+            reversal_type = EntryType.DEBIT if entry.transaction_type == EntryType.CREDIT else EntryType.CREDIT
+            correction = {
+                'entry': str(entry.pk),
+                'wallet': str(entry.wallet_id),
+                'user': entry.wallet.user.email,
+                'transaction': original.reference_number,
+                'type': entry.transaction_type,
+                'amount': entry.amount,
+                'reference': f"DUPFIX-{entry.pk}",
+            }
+            if dry_run:
+                report['corrections'].append(correction)
+                continue
+
+            try:
+                with db_transaction.atomic():
+                    correction_transaction = Transaction.objects.create(
+                        user=entry.wallet.user,
+                        transaction_type=original.transaction_type,
+                        status=Transaction.TransactionStatus.COMPLETED,
+                        amount=entry.amount,
+                        currency=original.currency,
+                        description=f"Correction of duplicate {entry.transaction_type} {entry.pk} on {original.reference_number}",
+                        reference_number=correction['reference'],
+                        completed_at=timezone.now()
+                    )
+                    WalletTransaction.objects.filter(pk=entry.pk).update(
+                        transaction=correction_transaction,
+                        description=f"{entry.description or ''} [duplicate of {original.reference_number}]".strip()
+                    )
+                    wallet, _, _ = post_entry(
+                        entry.wallet.user, entry.amount, correction_transaction, reversal_type,
+                        f"Reversal of duplicate {entry.transaction_type} on {original.reference_number}",
+                        allow_negative=allow_negative
+                    )
+            except InsufficientBalance as e:
+                logger.error(f"Could not reverse duplicate {entry.transaction_type} {entry.pk} on {original.reference_number}: {e}")
+                report['failed'].append(correction)
+                continue
+
+            logger.warning(
+                f"Reversed duplicate {entry.transaction_type} {entry.pk} of {entry.amount} on "
+                f"{original.reference_number} for {entry.wallet.user.email} as {correction['reference']}"
+            )
+            report['reversed'] += 1
+            report['corrections'].append(correction)
+            if wallet.balance < 0:
+                report['negative_balances'][str(wallet.pk)] = wallet.balance
+            else:
+                report['negative_balances'].pop(str(wallet.pk), None)
+    return report
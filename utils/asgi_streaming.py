@@ -0,0 +1,49 @@
+"""
+Streaming response bodies under ASGI.
+
+Django 4.2's ASGI handler consumes a StreamingHttpResponse built on a sync
+iterator with ``sync_to_async(list)``, and a FileResponse the same way, so
+the whole body is materialized in the worker before the first byte is sent.
+Views that stream large bodies hand the response these async generators
+when the request came through ASGI (``is_asgi_request``): they pull a batch
+at a time from the sync iterator or file on a worker thread, keeping memory
+flat.
+
+The sync iterator runs in the request's thread-sensitive executor, so
+database cursors it opens stay on the request's connection.
+"""
+import itertools
+
+from asgiref.sync import sync_to_async
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FILE_CHUNK_SIZE = 64 * 1024
+
+
+def is_asgi_request(request):
+    """Whether a Django or DRF request is served by the ASGI handler"""
+    return hasattr(getattr(request, '_request', request), 'scope')
+
+
+async def aiter_batches(iterable, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of up to ``batch_size`` items of a sync iterable, each read with one thread hop"""
+    iterator = iter(iterable)
+    next_batch = sync_to_async(lambda: list(itertools.islice(iterator, batch_size)))
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        yield batch
+
+
+async def aiter_file(file, chunk_size=DEFAULT_FILE_CHUNK_SIZE):
+    """Yield ``file`` in chunks of ``chunk_size`` bytes, then close it"""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
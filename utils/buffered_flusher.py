@@ -0,0 +1,65 @@
+"""
+Base class for in-process buffers written out by a background thread.
+
+Subclasses buffer work under ``_lock`` and implement ``flush`` (serialized
+by ``_flush_lock``) and ``interval``. The first call to ``_ensure_started``
+starts a daemon thread that flushes every ``interval()`` seconds, or as soon
+as ``_wake`` is set, and registers ``flush`` to run at exit so buffered work
+is not lost on a clean shutdown. Each flush runs with fresh database
+connections; a failing flush is logged and retried on the next tick.
+"""
+import atexit
+import logging
+import threading
+
+from django.db import close_old_connections
+
+
+class BufferedFlusher:
+    thread_name = 'buffered-flusher'
+    failure_message = 'Buffered flush failed'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {}
+
+    def interval(self):
+        """Seconds between background flushes"""
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+    def buffer_counts(self):
+        """Sizes of the buffers for ``snapshot``; called with ``_lock`` held"""
+        return {}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        logger = logging.getLogger(type(self).__module__)
+        while True:
+            self._wake.wait(self.interval())
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(self.failure_message)
+            finally:
+                close_old_connections()
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, **self.buffer_counts()}
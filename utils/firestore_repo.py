@@ -434,6 +434,24 @@ class FirestoreRepository:
             
         return results
 
+    def count_collection(self, name, filters=None):
+        """
+        Count documents in a top-level collection with a server-side aggregation query.
+
+        Only the count is transferred, not the documents. Returns None when
+        Firestore is unavailable.
+        """
+        if not self.db:
+            return None
+
+        query = self.db.collection(name)
+        if filters:
+            for key, value in filters.items():
+                query = query.where(key, '==', value)
+
+        result = query.count(alias='total').get()
+        return int(result[0][0].value)
+
     # ---------------------------------------------------------
     # Favorites Management
     # ---------------------------------------------------------
@@ -550,10 +568,12 @@ class FirestoreRepository:
             return dict(doc.to_dict(), id=doc.id)
         return None
 
-    def list_withdrawals(self, owner_id=None):
+    def list_withdrawals(self, owner_id=None, status=None):
         col = self._get_withdrawals_collection()
         if owner_id:
             query = col.where('owner_id', '==', str(owner_id))
+        elif status:
+            query = col.where('status', '==', status)
         else:
             query = col.order_by('created_at', direction=firestore.Query.DESCENDING)
             
@@ -564,5 +584,46 @@ class FirestoreRepository:
         self._get_withdrawals_collection().document(str(request_id)).update(data)
         return self.get_withdrawal(request_id)
 
+    # ---------------------------------------------------------
+    # Payout Batches
+    # ---------------------------------------------------------
+    # Firestore allows at most 500 writes per batch
+    MAX_BATCH_WRITES = 500
+
+    def write_payout_batch(self, batch_id, batch_data, withdrawal_updates):
+        """Write the batch document and update its withdrawals (id -> fields) with batched writes"""
+        now = datetime.utcnow().isoformat()
+        writes = [(self.db.collection('payout_batches').document(str(batch_id)), dict(batch_data, updated_at=now), True)]
+        writes += [
+            (self._get_withdrawals_collection().document(str(withdrawal_id)), dict(fields, updated_at=now), False)
+            for withdrawal_id, fields in withdrawal_updates.items()
+        ]
+
+        for start in range(0, len(writes), self.MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for doc_ref, data, is_new in writes[start:start + self.MAX_BATCH_WRITES]:
+                if is_new:
+                    batch.set(doc_ref, data, merge=True)
+                else:
+                    batch.update(doc_ref, data)
+            batch.commit()
+
+    # ---------------------------------------------------------
+    # Station Availability
+    # ---------------------------------------------------------
+    def update_station_counts(self, counts):
+        """Write connector counts (station id -> fields) to many station documents with batched writes"""
+        self.update_station_fields(counts)
+
+    def update_station_fields(self, updates):
+        """Write fields (station id -> fields) to many station documents with batched writes"""
+        now = datetime.utcnow().isoformat()
+        items = list(updates.items())
+        for start in range(0, len(items), self.MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for station_id, fields in items[start:start + self.MAX_BATCH_WRITES]:
+                batch.update(self._get_collection().document(str(station_id)), dict(fields, updated_at=now))
+            batch.commit()
+
 # Singleton instance
 firestore_repo = FirestoreRepository()
@@ -0,0 +1,135 @@
+"""
+Shared outbound HTTP client.
+
+Keeps one ``requests.Session`` per scheme and host, so calls to Chapa and the
+OCPP backend reuse pooled keep-alive connections instead of doing a TCP+TLS
+handshake on every request. Adds connect/read timeouts, retries with jittered
+exponential backoff and per-endpoint latency histograms (utils.metrics).
+
+Settings live in OUTBOUND_HTTP.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+# Path segments that look like ids: all digits, or 8+ characters containing a digit (UUIDs, tx_refs)
+_ID_SEGMENT = re.compile(r'/(?:\d+|(?=[A-Za-z0-9_-]*\d)[A-Za-z0-9_-]{8,})(?=/|$)')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _config():
+    return settings.OUTBOUND_HTTP
+
+
+def get_session(url):
+    """Pooled session for the scheme and host of ``url``."""
+    parts = urlsplit(url)
+    key = f'{parts.scheme}://{parts.netloc}'
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                config = _config()
+                session = requests.Session()
+                # Retries are handled in request() so they get jitter and metrics
+                adapter = HTTPAdapter(
+                    pool_connections=config['POOL_CONNECTIONS'],
+                    pool_maxsize=config['POOL_MAXSIZE'],
+                    max_retries=0,
+                )
+                session.mount(f'{parts.scheme}://', adapter)
+                _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def endpoint_label(url):
+    """Metric label for ``url`` with ids collapsed, e.g. ``/v1/transaction/verify/:id``."""
+    return _ID_SEGMENT.sub('/:id', urlsplit(url).path) or '/'
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2 ** attempt))."""
+    config = _config()
+    base = config['BACKOFF_BASE_SECONDS'] if base is None else base
+    cap = config['BACKOFF_MAX_SECONDS'] if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def request(method, url, service, retries=None, timeout=None, retry_unsafe=False, **kwargs):
+    """
+    Send a request through the pooled session for ``url``'s host.
+
+    Failures to open a connection are retried for every method because nothing
+    reached the server. Other connection errors, read timeouts and
+    429/502/503/504 responses are only retried for idempotent methods, or when
+    ``retry_unsafe`` is set. Returns the last
+    response (callers still call raise_for_status) and re-raises the last
+    exception when every attempt failed.
+    """
+    config = _config()
+    method = method.upper()
+    retries = config['RETRIES'] if retries is None else retries
+    timeout = timeout or (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+    can_retry_unsafe = retry_unsafe or method in IDEMPOTENT_METHODS
+
+    metric = histogram(f'{service} {method} {endpoint_label(url)}')
+    session = get_session(url)
+
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            metric.observe(time.monotonic() - started, error=True)
+            # ConnectTimeout is a ConnectionError; a read timeout is not
+            retryable = can_retry_unsafe or isinstance(e, requests.exceptions.ConnectTimeout) or _not_sent(e)
+            if attempt == retries or not retryable:
+                raise
+            logger.warning("%s %s %s failed (attempt %d): %s", service, method, url, attempt + 1, e)
+        except requests.exceptions.Timeout as e:
+            metric.observe(time.monotonic() - started, error=True)
+            if attempt == retries or not can_retry_unsafe:
+                raise
+            logger.warning("%s %s %s timed out (attempt %d): %s", service, method, url, attempt + 1, e)
+        else:
+            metric.observe(time.monotonic() - started, error=response.status_code >= 500)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries or not can_retry_unsafe:
+                return response
+            logger.warning(
+                "%s %s %s returned %s (attempt %d)", service, method, url, response.status_code, attempt + 1
+            )
+            response.close()
+
+        time.sleep(backoff_delay(attempt))
+
+
+def _not_sent(exc):
+    """True when a ConnectionError happened before the request was written."""
+    reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
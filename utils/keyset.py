@@ -0,0 +1,59 @@
+"""
+Keyset (seek) pagination helpers.
+
+Pages are addressed by an opaque cursor holding the ``(created_at, id)`` of the
+last row returned, so fetching page N costs the same as fetching page 1.
+"""
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded"""
+
+
+def encode_cursor(created_at, pk):
+    """Build an opaque cursor pointing just after the row ``(created_at, pk)``."""
+    payload = json.dumps({'t': created_at.isoformat(), 'i': str(pk)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(created_at, id)`` pair stored in ``cursor``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        created_at = parse_datetime(payload['t'])
+        pk = uuid.UUID(payload['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor: bad timestamp')
+    return created_at, pk
+
+
+def seek_before(created_at, pk, created_field='created_at', pk_field='id'):
+    """
+    Q object matching rows that sort after ``(created_at, pk)`` in
+    ``ORDER BY created_at DESC, id DESC``.
+    """
+    return (
+        Q(**{f'{created_field}__lt': created_at}) |
+        Q(**{created_field: created_at, f'{pk_field}__lt': pk})
+    )
+
+
+def seek_after(created_at, pk, created_field='created_at', pk_field='id'):
+    """
+    Q object matching rows that sort after ``(created_at, pk)`` in
+    ``ORDER BY created_at ASC, id ASC``.
+    """
+    return (
+        Q(**{f'{created_field}__gt': created_at}) |
+        Q(**{created_field: created_at, f'{pk_field}__gt': pk})
+    )
@@ -0,0 +1,94 @@
+"""
+In-process latency histograms.
+
+Histograms use fixed millisecond buckets, so recording is O(1) and memory is
+constant. Percentiles are estimated from the bucket counts.
+"""
+import bisect
+import threading
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    def __init__(self, name, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        ms = seconds * 1000
+        index = bisect.bisect_left(self.buckets_ms, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum_ms += ms
+            self._max_ms = max(self._max_ms, ms)
+            if error:
+                self._errors += 1
+
+    def percentile(self, q):
+        """Estimated ``q`` percentile (0-100) in milliseconds: the upper bound of its bucket."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            max_ms = self._max_ms
+        if not total:
+            return None
+
+        rank = q / 100 * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(self.buckets_ms):
+                    return min(float(self.buckets_ms[index]), max_ms)
+                return max_ms
+        return max_ms
+
+    def snapshot(self):
+        with self._lock:
+            count, sum_ms, max_ms, errors = self._count, self._sum_ms, self._max_ms, self._errors
+        return {
+            'name': self.name,
+            'count': count,
+            'errors': errors,
+            'avg_ms': round(sum_ms / count, 2) if count else None,
+            'max_ms': round(max_ms, 2) if count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets_ms) + 1)
+            self._count = 0
+            self._sum_ms = 0.0
+            self._max_ms = 0.0
+            self._errors = 0
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name):
+    """Return the process-wide histogram called ``name``, creating it on first use."""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, LatencyHistogram(name))
+    return hist
+
+
+def snapshot_all(prefix=''):
+    with _registry_lock:
+        names = sorted(name for name in _histograms if name.startswith(prefix))
+    return [_histograms[name].snapshot() for name in names]
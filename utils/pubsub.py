@@ -0,0 +1,132 @@
+"""
+In-process publish/subscribe hub.
+
+Subscribers register for a key and get their own bounded queue; ``publish``
+fans an event out to every subscriber of its key. A subscriber that falls
+behind loses its oldest events rather than slowing publishers down, which
+suits state updates where only the latest value matters.
+
+Subscriptions work from threads (``get``) and from an asyncio event loop
+(``aget``); publishers can be on any thread. The hub also keeps the last
+event of each key so new subscribers start from the current state; with
+``latest_ttl`` set, events older than that many seconds are evicted.
+
+The hub is per process: an event only reaches subscribers in the process
+that published it.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+
+class Subscription:
+    def __init__(self, hub, key, maxsize, loop=None):
+        self.hub = hub
+        self.key = key
+        self.loop = loop
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize) if loop else queue.Queue(maxsize)
+
+    def _put(self, event):
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except (queue.Full, asyncio.QueueFull):
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except (queue.Empty, asyncio.QueueEmpty):
+                    pass
+
+    def put(self, event):
+        if self.loop is None:
+            self._put(event)
+        else:
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def get(self, timeout=None):
+        """Next event, or None after ``timeout`` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class PubSubHub:
+    def __init__(self, queue_size=32, latest_ttl=None):
+        self.queue_size = queue_size
+        self.latest_ttl = latest_ttl
+        self._subscribers = {}
+        self._latest = {}
+        self._last_eviction = time.monotonic()
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, loop=None):
+        """Subscribe to ``key``. Pass the running ``loop`` to read with ``aget``."""
+        subscription = Subscription(self, key, self.queue_size, loop)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, key, event):
+        """Deliver ``event`` to every subscriber of ``key``. Returns the number of subscribers."""
+        now = time.monotonic()
+        with self._lock:
+            self._latest[key] = (event, now)
+            subscribers = list(self._subscribers.get(key, ()))
+            if self.latest_ttl and now - self._last_eviction >= self.latest_ttl:
+                self._evict(now)
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def _evict(self, now):
+        cutoff = now - self.latest_ttl
+        for key in [key for key, (_, published_at) in self._latest.items() if published_at < cutoff]:
+            del self._latest[key]
+        self._last_eviction = now
+
+    def evict_stale(self):
+        """Drop the last events published more than ``latest_ttl`` seconds ago"""
+        if self.latest_ttl:
+            with self._lock:
+                self._evict(time.monotonic())
+
+    def latest(self, key):
+        latest = self._latest.get(key)
+        return latest[0] if latest else None
+
+    def keys(self):
+        """Keys that currently have subscribers"""
+        with self._lock:
+            return list(self._subscribers)
+
+    def forget(self, key):
+        """Drop the last event kept for ``key``, once nothing more will be published for it"""
+        with self._lock:
+            self._latest.pop(key, None)
+
+    def subscriber_count(self, key=None):
+        with self._lock:
+            if key is not None:
+                return len(self._subscribers.get(key, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
@@ -0,0 +1,39 @@
+"""
+Thread-safe token bucket rate limiter.
+
+``acquire`` blocks until a token is available, so any number of worker
+threads sharing one limiter stay under ``rate`` calls per second overall,
+with bursts of up to ``burst`` calls.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
@@ -0,0 +1,137 @@
+"""
+Small in-process job scheduler.
+
+Runs periodic jobs on a daemon thread and one-off background tasks on a
+bounded thread pool. One-off tasks are de-duplicated by key, so asking for
+the same refresh many times while it is running only runs it once.
+
+The scheduler is started automatically when BACKGROUND_JOBS['AUTOSTART'] is
+set, or in the foreground with ``python manage.py run_background_jobs``.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """A callable that runs every ``interval`` seconds"""
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = 0.0
+
+    def __repr__(self):
+        return f"PeriodicJob({self.name!r}, every {self.interval}s)"
+
+
+class JobScheduler:
+    def __init__(self):
+        self._jobs = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_job(self, name, func, interval):
+        """Register (or replace) a periodic job. The first run happens on the next tick."""
+        with self._lock:
+            self._jobs[name] = PeriodicJob(name, func, interval)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        Run ``func`` on the background pool unless a task with the same key is
+        already queued or running. Returns True if the task was queued.
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_JOBS['MAX_WORKERS'],
+                    thread_name_prefix='background-job'
+                )
+            executor = self._executor
+
+        executor.submit(self._run_task, key, func, args, kwargs)
+        return True
+
+    def _run_task(self, key, func, args, kwargs):
+        try:
+            self._call(key, func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _call(self, name, func, *args, **kwargs):
+        close_old_connections()
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        finally:
+            close_old_connections()
+
+    def run_pending(self, now=None):
+        """Run every periodic job that is due, inline. Returns the number of jobs run."""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job.next_run <= now:
+                    job.next_run = now + job.interval
+                    due.append(job)
+
+        for job in due:
+            self._call(job.name, job.func)
+        return len(due)
+
+    def run_forever(self, tick=None):
+        """Run periodic jobs until stop() is called."""
+        tick = tick or settings.BACKGROUND_JOBS['TICK_SECONDS']
+        self._stop_event.clear()
+        while not self._stop_event.is_set():
+            self.run_pending()
+            self._stop_event.wait(tick)
+
+    def start(self):
+        """Run periodic jobs on a daemon thread."""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self.run_forever, name='job-scheduler', daemon=True)
+        self._thread.start()
+        logger.info("Background job scheduler started with %d jobs", len(self._jobs))
+
+    def stop(self, wait=False):
+        self._stop_event.set()
+        if self._thread and wait:
+            self._thread.join()
+        self._thread = None
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+scheduler = JobScheduler()
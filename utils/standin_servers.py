@@ -0,0 +1,214 @@
+"""
+Local stand-ins for Chapa and the OCPP backend.
+
+Both are small threaded HTTP servers meant for development and load tests
+(``run_standin_servers``, ``load_test_payments``). Every response can be
+delayed by a configurable latency and turned into a 503 at a configurable
+failure rate. The fake Chapa keeps its transactions in memory. When
+``send_callbacks`` is set, it POSTs the payment result to the
+``callback_url`` from the initialize request, the way Chapa does.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class StandInServer:
+    """Threaded JSON HTTP server with simulated latency and failures"""
+
+    name = 'stand-in'
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread = None
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _random_uniform(self, low, high):
+        with self._random_lock:
+            return self._random.uniform(low, high)
+
+    def simulate(self):
+        """Sleep for the configured latency. Returns True if this request should fail."""
+        delay_ms = self.latency_ms + (self._random_uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return self.failure_rate > 0 and self._random_uniform(0, 1) < self.failure_rate
+
+    def handle(self, method, path, body):
+        """Return ``(status_code, payload)`` for one request. Subclasses implement the routes."""
+        return 404, {'status': 'failed', 'message': 'Not found'}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+
+                server.requests += 1
+                if server.simulate():
+                    code, payload = 503, {'status': 'failed', 'message': 'Simulated failure'}
+                else:
+                    code, payload = server.handle(method, self.path, body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def do_PUT(self):
+                self._respond('PUT')
+
+            def do_DELETE(self):
+                self._respond('DELETE')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+class FakeChapaServer(StandInServer):
+    """
+    Implements ``/v1/transaction/initialize`` and ``/v1/transaction/verify/<tx_ref>``.
+
+    Each initialized payment succeeds, except for a ``decline_rate`` share that
+    is declined. With ``send_callbacks`` the result is POSTed to the payment's
+    callback URL ``callback_delay_ms`` after initialize.
+    """
+
+    name = 'fake-chapa'
+    VERIFY_PATH = re.compile(r'^/v1/transaction/verify/(?P<tx_ref>[^/?]+)')
+
+    def __init__(self, decline_rate=0.0, send_callbacks=False, callback_delay_ms=0, **kwargs):
+        super().__init__(**kwargs)
+        self.decline_rate = decline_rate
+        self.send_callbacks = send_callbacks
+        self.callback_delay_ms = callback_delay_ms
+        self.transactions = {}
+        self._lock = threading.Lock()
+
+    def checkout_url(self, tx_ref):
+        return f'{self.url}/checkout/{tx_ref}'
+
+    def handle(self, method, path, body):
+        if method == 'POST' and path.startswith('/v1/transaction/initialize'):
+            return self._initialize(body)
+        match = self.VERIFY_PATH.match(path)
+        if method == 'GET' and match:
+            return self._verify(match.group('tx_ref'))
+        return super().handle(method, path, body)
+
+    def _initialize(self, body):
+        tx_ref = body.get('tx_ref')
+        if not tx_ref or not body.get('amount'):
+            return 400, {'status': 'failed', 'message': 'tx_ref and amount are required'}
+
+        declined = self.decline_rate > 0 and self._random_uniform(0, 1) < self.decline_rate
+        payment = {
+            'tx_ref': tx_ref,
+            'amount': body['amount'],
+            'currency': body.get('currency', 'ETB'),
+            'status': 'failed' if declined else 'success',
+        }
+        with self._lock:
+            self.transactions[tx_ref] = payment
+
+        if self.send_callbacks and body.get('callback_url'):
+            timer = threading.Timer(self.callback_delay_ms / 1000, self._send_callback, (body['callback_url'], payment))
+            timer.daemon = True
+            timer.start()
+
+        return 200, {
+            'status': 'success',
+            'message': 'Hosted Link',
+            'data': {'checkout_url': self.checkout_url(tx_ref)},
+        }
+
+    def _verify(self, tx_ref):
+        with self._lock:
+            payment = self.transactions.get(tx_ref)
+        if payment is None:
+            return 404, {'status': 'failed', 'message': 'Invalid transaction or Transaction not found'}
+        return 200, {'status': 'success', 'message': 'Payment details', 'data': dict(payment)}
+
+    def _send_callback(self, callback_url, payment):
+        try:
+            requests.post(callback_url, json={'tx_ref': payment['tx_ref'], 'status': payment['status']}, timeout=10)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Fake Chapa callback to {callback_url} failed: {e}")
+
+
+class FakeOCPPServer(StandInServer):
+    """Accepts the locator endpoints OCPPIntegrationService calls and answers like the OCPP backend"""
+
+    name = 'fake-ocpp'
+    SESSION_PATH = re.compile(r'^/api/locator/session/(?P<transaction_id>[^/?]+)')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._transaction_ids = iter(range(1, 1 << 31))
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, body):
+        if method == 'POST' and path.startswith('/api/locator/initiate-charging/'):
+            with self._lock:
+                transaction_id = next(self._transaction_ids)
+            return 200, {'success': True, 'transaction': {'transaction_id': str(transaction_id)}}
+        if method == 'POST' and path.startswith('/api/locator/stop-charging/'):
+            return 200, {'success': True, 'transaction_id': body.get('transaction_id')}
+        if method == 'POST' and path.startswith('/api/locator/sync-station/'):
+            return 200, {'success': True, 'station_id': body.get('station_id')}
+        match = self.SESSION_PATH.match(path)
+        if method == 'GET' and match:
+            return 200, {'success': True, 'session_data': {'status': 'Charging', 'duration_seconds': 0}}
+        return super().handle(method, path, body)
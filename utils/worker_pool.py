@@ -0,0 +1,96 @@
+"""
+Keyed worker pool.
+
+Items are routed to one of N worker threads by a stable hash of their key, and
+each worker handles its queue in FIFO order. Items that share a key are
+therefore processed one at a time, in submission order, while different keys
+run in parallel.
+"""
+import logging
+import queue
+import threading
+import zlib
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class KeyedWorkerPool:
+    def __init__(self, name, handler, workers):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self._queues = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                work_queue = queue.Queue()
+                thread = threading.Thread(
+                    target=self._run, args=(work_queue,),
+                    name=f'{self.name}-{index}', daemon=True
+                )
+                self._queues.append(work_queue)
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker_for(self, key):
+        # crc32 rather than hash() so routing is stable across processes
+        return zlib.crc32(str(key).encode()) % self.workers
+
+    def submit(self, key, item):
+        """Queue ``item`` on the worker that owns ``key``. Runs inline when the pool has no workers."""
+        if self.workers <= 0:
+            self._handle(item)
+            return
+        self._ensure_started()
+        self._queues[self._worker_for(key)].put(item)
+
+    def pending(self):
+        return sum(work_queue.qsize() for work_queue in self._queues)
+
+    def _handle(self, item):
+        close_old_connections()
+        try:
+            self.handler(item)
+        except Exception:
+            logger.exception("%s worker failed on %r", self.name, item)
+        finally:
+            close_old_connections()
+
+    def _run(self, work_queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._handle(item)
+            finally:
+                work_queue.task_done()
+
+    def join(self):
+        """Block until every queued item has been handled."""
+        for work_queue in list(self._queues):
+            work_queue.join()
+
+    def stop(self):
+        with self._lock:
+            queues, threads = self._queues, self._threads
+            self._queues, self._threads = [], []
+        for work_queue in queues:
+            work_queue.put(_STOP)
+        for thread in threads:
+            thread.join()